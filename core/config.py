@@ -39,6 +39,20 @@ import ruamel.yaml as yaml
 from io import BytesIO
 
 
+class ArrayReference:
+    """
+    Reference to an array stored in a binary array container next to the
+    YAML file (see core.statusstore). Written as '!binarray container#name'.
+    """
+
+    def __init__(self, container, name):
+        self.container = container
+        self.name = name
+
+    def __repr__(self):
+        return 'ArrayReference({0!r}, {1!r})'.format(self.container, self.name)
+
+
 def ordered_load(stream, Loader=yaml.Loader):
     """
     Loads a YAML formatted data from stream and puts it into an OrderedDict
@@ -80,6 +94,13 @@ def ordered_load(stream, Loader=yaml.Loader):
         arrays = numpy.load(filename)
         return arrays['array']
 
+    def construct_array_reference(loader, node):
+        """
+        The constructor for a reference to an array in a binary array container.
+        """
+        container, name = loader.construct_scalar(node).rsplit('#', 1)
+        return ArrayReference(container, name)
+
     def construct_frozenset(loader, node):
         """
         The frozenset constructor.
@@ -120,6 +141,9 @@ def ordered_load(stream, Loader=yaml.Loader):
     OrderedLoader.add_constructor(
             '!extndarray',
             construct_external_ndarray)
+    OrderedLoader.add_constructor(
+            '!binarray',
+            construct_array_reference)
     OrderedLoader.add_constructor(
         '!frozenset',
         construct_frozenset)
@@ -184,6 +208,13 @@ def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
         node.tag = '!frozenset'
         return node
 
+    def represent_array_reference(dumper, reference):
+        """
+        Representer for references to arrays in a binary array container
+        """
+        return dumper.represent_scalar(
+            '!binarray', '{0}#{1}'.format(reference.container, reference.name))
+
     def represent_ndarray(dumper, array_data):
         """
         Representer for numpy ndarrays
@@ -222,6 +253,7 @@ def ordered_dump(data, stream=None, Dumper=yaml.Dumper, **kwds):
     # OrderedDumper.add_representer(numpy.float128, represent_float)
     OrderedDumper.add_representer(numpy.ndarray, represent_ndarray)
     OrderedDumper.add_representer(frozenset, represent_frozenset)
+    OrderedDumper.add_representer(ArrayReference, represent_array_reference)
 
     # dump data
     return yaml.dump(data, stream, OrderedDumper, **kwds)
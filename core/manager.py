@@ -31,12 +31,15 @@ import sys
 import re
 import time
 import importlib
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from qtpy import QtCore
 from . import config
 
 from .util.mutex import Mutex   # Mutex provides access serialization between threads
-from .util.modules import toposort, is_base
+from .util.modules import toposort, toposort_levels, is_base
+from .util.startup_profiler import StartupProfiler
+from .statusstore import StatusVariableStore
 from collections import OrderedDict
 from .logger import register_exception_handler
 from .threadmanager import ThreadManager
@@ -98,8 +101,15 @@ class Manager(QtCore.QObject):
 
         self.tree['global'] = OrderedDict()
         self.tree['global']['startup'] = list()
+        # duration of the last activation of each module in s, key is (base, name)
+        self.activationTimes = OrderedDict()
+        # import, configure, connect and activation times of all modules
+        self.startupProfiler = StartupProfiler()
+        # saves status variables in the background
+        self.statusStore = StatusVariableStore()
 
         self.hasGui = not args.no_gui
+        self.logDir = getattr(args, 'logdir', '')
         self.currentDir = None
         self.baseDir = None
         self.alreadyQuit = False
@@ -194,19 +204,18 @@ class Manager(QtCore.QObject):
             if 'startup' in self.tree['global']:
                 # walk throug the list of loadable modules to be loaded on
                 # startup and load them if appropriate
+                startup_modules = list()
                 for key in self.tree['global']['startup']:
                     if key in self.tree['defined']['hardware']:
-                        self.startModule('hardware', key)
-                        self.sigModulesChanged.emit()
+                        startup_modules.append(('hardware', key))
                     elif key in self.tree['defined']['logic']:
-                        self.startModule('logic', key)
-                        self.sigModulesChanged.emit()
+                        startup_modules.append(('logic', key))
                     elif self.hasGui and key in self.tree['defined']['gui']:
-                        self.startModule('gui', key)
-                        self.sigModulesChanged.emit()
+                        startup_modules.append(('gui', key))
                     else:
                         logger.error('Loading startup module {} failed, not '
                                      'defined anywhere.'.format(key))
+                self.startModules(startup_modules)
         except:
             logger.exception('Error while configuring Manager:')
         finally:
@@ -613,6 +622,12 @@ class Manager(QtCore.QObject):
 
           @return int: 0 on success, -1 on failure
         """
+        with self.startupProfiler.measure(base, mkey, 'connect'):
+            return self._connectModule(base, mkey)
+
+    def _connectModule(self, base, mkey):
+        """ Connects the given module, see connectModule.
+        """
         thismodule = self.tree['defined'][base][mkey]
         if not self.isModuleLoaded(base, mkey):
             logger.error('Loading of {0} module {1} as {2} was not '
@@ -765,10 +780,11 @@ class Manager(QtCore.QObject):
                 try:
                     certfile = defined_module.get('certfile', None)
                     keyfile = defined_module.get('keyfile', None)
-                    instance = self.rm.getRemoteModuleUrl(
-                        defined_module['remote'],
-                        certfile=certfile,
-                        keyfile=keyfile)
+                    with self.startupProfiler.measure(base, key, 'import'):
+                        instance = self.rm.getRemoteModuleUrl(
+                            defined_module['remote'],
+                            certfile=certfile,
+                            keyfile=keyfile)
                     logger.info('Remote module {0} loaded as {1}.{2}.'
                                 ''.format(defined_module['remote'], base, key))
                     with self.lock:
@@ -793,19 +809,24 @@ class Manager(QtCore.QObject):
                         '',
                         defined_module['module.Class'])
 
-                    modObj = self.importModule(base, module_name)
-
-                    # Ensure that the namespace of a module is reloaded before 
-                    # instantiation. That will not harm anything.
-                    # Even if the import is successful an error might occur 
-                    # during instantiation. E.g. in an abc metaclass, 
-                    # methods might be missing in a derived interface file.
-                    # Reloading the namespace will prevent the need to restart 
-                    # Qudi, if a module instantiation was not successful upon 
-                    # load.
-                    importlib.reload(modObj)  # keep the namespace of module up to date
-
-                    self.configureModule(modObj, base, class_name, key, defined_module)
+                    already_imported = '{0}.{1}'.format(base, module_name) in sys.modules
+                    with self.startupProfiler.measure(base, key, 'import'):
+                        modObj = self.importModule(base, module_name)
+
+                        # Ensure that the namespace of a module is reloaded before 
+                        # instantiation. That will not harm anything.
+                        # Even if the import is successful an error might occur 
+                        # during instantiation. E.g. in an abc metaclass, 
+                        # methods might be missing in a derived interface file.
+                        # Reloading the namespace will prevent the need to restart 
+                        # Qudi, if a module instantiation was not successful upon 
+                        # load. A module imported for the first time is up to date
+                        # already, reloading it would only execute it twice.
+                        if already_imported:
+                            importlib.reload(modObj)  # keep the namespace of module up to date
+
+                    with self.startupProfiler.measure(base, key, 'configure'):
+                        self.configureModule(modObj, base, class_name, key, defined_module)
                     if 'remoteaccess' in defined_module and defined_module['remoteaccess']:
                         if self.rm is None:
                             logger.error('Remote module sharing functionality disabled. Rpyc not'
@@ -927,6 +948,21 @@ class Manager(QtCore.QObject):
             return False
         return self.tree['loaded'][base][name].module_state() in ('idle', 'running', 'locked')
 
+    def isModuleOnDemand(self, name):
+        """ Check whether a module is marked with on_demand: True in the configuration.
+            On demand modules are not started by startAllConfiguredModules, they are
+            imported and activated when they are started themselves or are needed by
+            another module.
+
+          @param str name: unique module name
+
+          @return bool: module is started on demand only
+        """
+        try:
+            return bool(self.tree['defined'][self.findBase(name)][name].get('on_demand', False))
+        except KeyError:
+            return False
+
     def findBase(self, name):
         """ Find base for a given module name.
           @param str name: module name
@@ -945,19 +981,37 @@ class Manager(QtCore.QObject):
           @param string base: module base package (hardware, logic or gui)
           @param string name: module which is going to be activated.
 
+          @return bool: True if the module is active afterwards
+        """
+        module = self._prepareActivation(base, name)
+        if module is not None:
+            success = self._runActivation(base, name, module)
+        else:
+            success = self._isActivationSuccessful(base, name)
+        QtCore.QCoreApplication.instance().processEvents()
+        return success
+
+    def _prepareActivation(self, base, name):
+        """ Check that a module can be activated, load its status variables and
+            move it into its own thread if it is threaded.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string name: module which is going to be activated.
+
+          @return object: the module, None if it should not be activated
         """
         if not self.isModuleLoaded(base, name):
             logger.error('{0} module {1} not loaded.'.format(base, name))
-            return
+            return None
         module = self.tree['loaded'][base][name]
         if module.module_state() != 'deactivated' and (
                 self.isModuleDefined(base, name)
                 and 'remote' in self.tree['defined'][base][name]):
             logger.debug('No need to activate remote module {0}.{1}.'.format(base, name))
-            return
+            return None
         if module.module_state() != 'deactivated':
             logger.error('{0} module {1} not deactivated'.format(base, name))
-            return
+            return None
         try:
             module.setStatusVariables(self.loadStatusVariables(base, name))
             # start main loop for qt objects
@@ -965,6 +1019,28 @@ class Manager(QtCore.QObject):
                 modthread = self.tm.newThread('mod-{0}-{1}'.format(base, name))
                 module.moveToThread(modthread)
                 modthread.start()
+        except:
+            logger.exception(
+                '{0} module {1}: error during activation:'.format(base, name))
+            return None
+        return module
+
+    def _runActivation(self, base, name, module):
+        """ Run on_activate of a module prepared by _prepareActivation and record the time it took.
+            Threaded modules are activated in their own thread, this method then blocks until
+            the activation has finished. It may therefore be called from a worker thread for
+            threaded modules only.
+
+          @param string base: module base package (hardware, logic or gui)
+          @param string name: module which is going to be activated.
+          @param object module: the module
+
+          @return bool: True if on_activate finished without error
+        """
+        start = time.perf_counter()
+        success = False
+        try:
+            if module.is_module_threaded:
                 success = QtCore.QMetaObject.invokeMethod(
                     module.module_state,
                     'trigger',
@@ -977,7 +1053,64 @@ class Manager(QtCore.QObject):
         except:
             logger.exception(
                 '{0} module {1}: error during activation:'.format(base, name))
-        QtCore.QCoreApplication.instance().processEvents()
+        duration = time.perf_counter() - start
+        with self.lock:
+            self.activationTimes[(base, name)] = duration
+        self.startupProfiler.record(base, name, 'activate', duration)
+        logger.info('Activation of {0}.{1} took {2:.3f} s'.format(base, name, duration))
+        return bool(success)
+
+    def _isActivationSuccessful(self, base, name):
+        """ Check whether a module that was not activated by _runActivation is active (e.g. a
+            remote module that needs no activation).
+        """
+        try:
+            return self.tree['loaded'][base][name].module_state() != 'deactivated'
+        except:
+            return False
+
+    def activateModules(self, modules):
+        """ Activate several modules that do not depend on each other.
+
+            Threaded modules are activated concurrently, each in its own thread, while the
+            modules running in the main thread (e.g. GUI modules) are activated one after
+            another. The Qt event loop keeps running while waiting for the threaded modules.
+            If parallel_activation is set to False in the global section of the configuration,
+            all modules are activated one after another.
+
+          @param list modules: list of (base, name) tuples
+
+          @return dict: activation success of each module, key is (base, name)
+        """
+        parallel = self.tree['global'].get('parallel_activation', True)
+        results = OrderedDict()
+        prepared = list()
+        for base, name in modules:
+            module = self._prepareActivation(base, name)
+            if module is not None:
+                prepared.append((base, name, module))
+            else:
+                results[(base, name)] = self._isActivationSuccessful(base, name)
+
+        threaded = [entry for entry in prepared if entry[2].is_module_threaded]
+        if parallel and len(threaded) > 1:
+            with ThreadPoolExecutor(max_workers=len(threaded)) as executor:
+                futures = [(entry[:2], executor.submit(self._runActivation, *entry))
+                           for entry in threaded]
+                for base, name, module in prepared:
+                    if not module.is_module_threaded:
+                        results[(base, name)] = self._runActivation(base, name, module)
+                        QtCore.QCoreApplication.instance().processEvents()
+                # modules activating in their threads may need the main thread
+                while len(wait([f for _, f in futures], timeout=0.01).not_done) > 0:
+                    QtCore.QCoreApplication.instance().processEvents()
+                for key, future in futures:
+                    results[key] = future.result()
+        else:
+            for base, name, module in prepared:
+                results[(base, name)] = self._runActivation(base, name, module)
+                QtCore.QCoreApplication.instance().processEvents()
+        return results
 
     @QtCore.Slot(str, str)
     def deactivateModule(self, base, name):
@@ -1255,18 +1388,106 @@ class Manager(QtCore.QObject):
                     self.activateModule(mbase, mkey)
         return 0
 
+    def startModules(self, modules):
+        """ Load, connect and activate several modules together with their dependencies.
+
+            The modules are started level by level of the dependency graph. The modules
+            of one level are independent of each other and activated concurrently, see
+            activateModules. If a module fails to load, connect or activate, the modules
+            depending on it are skipped while all other modules are started.
+
+          @param list modules: list of (base, name) tuples
+
+          @return int: 0 on success, -1 if any module failed to start
+        """
+        deps = dict()
+        for base, key in modules:
+            mdeps = self.getRecursiveModuleDependencies(base, key)
+            if mdeps is None:
+                return -1
+            deps.update(mdeps)
+        try:
+            levels = toposort_levels(deps, [key for base, key in modules])
+        except Exception:
+            logger.exception('Cannot start modules:')
+            return -1
+
+        start = time.perf_counter()
+        failed = set()
+        activated = set()
+        for level in levels:
+            to_activate = list()
+            for mkey in level:
+                try:
+                    mbase = self.findBase(mkey)
+                except KeyError:
+                    logger.error('Module {0} is not defined.'.format(mkey))
+                    failed.add(mkey)
+                    continue
+                failed_deps = failed.intersection(deps.get(mkey, []))
+                if len(failed_deps) > 0:
+                    logger.warning('Not starting module {0}.{1}, since {2} failed.'.format(
+                        mbase, mkey, ', '.join(sorted(failed_deps))))
+                    failed.add(mkey)
+                    continue
+                if mkey not in self.tree['loaded'][mbase]:
+                    success = self.loadConfigureModule(mbase, mkey)
+                    if success < 0:
+                        logger.warning('Stopping module {0}.{1} after loading failure.'
+                                       ''.format(mbase, mkey))
+                        failed.add(mkey)
+                        continue
+                    elif success > 0:
+                        logger.warning('Nonfatal loading error, going on.')
+                    success = self.connectModule(mbase, mkey)
+                    if success < 0:
+                        logger.warning('Stopping loading module {0}.{1} after '
+                                       'connection failure.'.format(mbase, mkey))
+                        failed.add(mkey)
+                        continue
+                    to_activate.append((mbase, mkey))
+                elif self.tree['loaded'][mbase][mkey].module_state() == 'deactivated':
+                    to_activate.append((mbase, mkey))
+                elif mbase == 'gui':
+                    self.tree['loaded'][mbase][mkey].show()
+
+            for module, success in self.activateModules(to_activate).items():
+                activated.add(module)
+                if not success:
+                    failed.add(module[1])
+            self.sigModulesChanged.emit()
+
+        times = sorted(((self.activationTimes[m], '{0}.{1}'.format(*m)) for m in activated
+                        if m in self.activationTimes), reverse=True)
+        logger.info('Started modules in {0:.3f} s, slowest activations: {1}'.format(
+            time.perf_counter() - start,
+            ', '.join('{0} {1:.3f} s'.format(m, t) for t, m in times[:5])))
+        self.saveStartupProfile()
+        if len(failed) > 0:
+            logger.error('Modules failed to start: {0}'.format(', '.join(sorted(failed))))
+            return -1
+        return 0
+
+    def saveStartupProfile(self):
+        """ Write the timings of the startup profiler to startup_profile.txt in the log directory.
+        """
+        path = os.path.join(self.logDir, 'startup_profile.txt')
+        try:
+            self.startupProfiler.save_report(path)
+            logger.debug('Startup profile:\n{0}'.format(self.startupProfiler.report()))
+        except:
+            logger.exception('Could not save the startup profile to {0}.'.format(path))
+
     @QtCore.Slot()
     def startAllConfiguredModules(self):
         """Connect all Qudi modules from the currently loaded configuration and
             activate them.
         """
-        deps = self.getAllRecursiveModuleDependencies(self.tree['defined'])
-        sorteddeps = toposort(deps)
-
-        for module in sorteddeps:
-            base = self.findBase(module)
-            if self.startModule(base, module) < 0:
-                break
+        # modules marked as on_demand are only started when needed by another module
+        self.startModules([(base, module)
+                           for base in ('hardware', 'logic', 'gui')
+                           for module in self.tree['defined'][base]
+                           if not self.isModuleOnDemand(module)])
 
         logger.info('Start all modules finished.')
 
@@ -1283,6 +1504,8 @@ class Manager(QtCore.QObject):
     @QtCore.Slot(str, str, dict)
     def saveStatusVariables(self, base, module, variables):
         """ If a module has status variables, save them to a file in the application status directory.
+            Arrays are stored in a binary container next to it. The files are written in the
+            background and only if the variables changed, see core.statusstore.
 
           @param str base: the module category
           @param str module: the unique module name
@@ -1294,7 +1517,7 @@ class Manager(QtCore.QObject):
                 classname = self.tree['loaded'][base][module].__class__.__name__
                 filename = os.path.join(statusdir,
                     'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-                config.save(filename, variables)
+                self.statusStore.save(filename, variables)
             except:
                 print(variables)
                 logger.exception('Failed to save status variables of module '
@@ -1313,10 +1536,7 @@ class Manager(QtCore.QObject):
             classname = self.tree['loaded'][base][module].__class__.__name__
             filename = os.path.join(
                 statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                variables = config.load(filename)
-            else:
-                variables = OrderedDict()
+            variables = self.statusStore.load(filename)
         except:
             logger.exception('Failed to load status variables.')
             variables = OrderedDict()
@@ -1330,8 +1550,7 @@ class Manager(QtCore.QObject):
                 module]['module.Class'].split('.')[-1]
             filename = os.path.join(
                 statusdir, 'status-{0}_{1}_{2}.cfg'.format(classname, base, module))
-            if os.path.isfile(filename):
-                os.remove(filename)
+            self.statusStore.remove(filename)
         except:
             logger.exception('Failed to remove module status file.')
 
@@ -1379,6 +1598,7 @@ class Manager(QtCore.QObject):
                 logger.info('Deactivating module {0}.{1}'.format(base, module))
                 self.deactivateModule(base, module)
             QtCore.QCoreApplication.processEvents()
+        self.statusStore.close()
         self.sigManagerQuit.emit(self, False)
 
     @QtCore.Slot()
@@ -1393,6 +1613,7 @@ class Manager(QtCore.QObject):
                     logger.exception(
                         'Module {0} failed to stop, continuing anyway.'.format(module))
                 QtCore.QCoreApplication.processEvents()
+        self.statusStore.close()
         self.sigManagerQuit.emit(self, True)
 
     @QtCore.Slot(object)
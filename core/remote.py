@@ -27,6 +27,7 @@ from qtpy.QtCore import QObject
 from urllib.parse import urlparse
 import ssl
 from .util.models import DictTableModel, ListTableModel
+from .util.network import BulkArrayService
 import rpyc
 from rpyc.utils.server import ThreadedServer
 from rpyc.utils.authenticators import SSLAuthenticator
@@ -51,8 +52,9 @@ class RemoteObjectManager(QObject):
     def makeRemoteService(self):
         """ A function that returns a class containing a module list hat can be manipulated from the host.
         """
-        class RemoteModuleService(rpyc.Service):
-            """ An RPyC service that has a module list.
+        class RemoteModuleService(BulkArrayService):
+            """ An RPyC service that has a module list. Arrays of the shared modules can be
+                transferred in bulk, see core.util.network.netobtain.
             """
             modules = self.sharedModules
             _manager = self.manager
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the storage of the module status variables.
+
+Status variables are saved into a YAML file per module. Numpy arrays are taken out of the YAML
+file and stored as raw data in a binary array container next to it, which is memory mapped when
+the status variables are loaded again. The YAML file references the arrays with
+'!binarray container#name'. The name of the container is derived from a hash of the arrays, so
+unchanged arrays are never written twice. Files are written by a background thread and only if
+the status variables changed since they were last saved or loaded.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+
+import numpy
+import ruamel.yaml as yaml
+
+from collections import OrderedDict
+from io import StringIO
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_CONTAINER_MAGIC = b'QSVA'
+_CONTAINER_VERSION = 1
+# magic, version, length of the json header
+_CONTAINER_HEADER = struct.Struct('<4sBQ')
+# alignment of the array data in the container
+_ALIGNMENT = 64
+
+
+def write_array_container(path, arrays):
+    """ Write arrays as raw data into a single binary file.
+
+    @param str path: file path
+    @param dict arrays: array name: numpy.ndarray (no python object arrays)
+    """
+    entries = OrderedDict()
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+        entries[name] = {'dtype': array.dtype.str if array.dtype.fields is None
+                                  else array.dtype.descr,
+                         'shape': array.shape,
+                         'offset': offset}
+        offset += array.nbytes
+    header = json.dumps(entries).encode()
+    data_start = -(-(_CONTAINER_HEADER.size + len(header)) // _ALIGNMENT) * _ALIGNMENT
+    with open(path, 'wb') as file:
+        file.write(_CONTAINER_HEADER.pack(_CONTAINER_MAGIC, _CONTAINER_VERSION, len(header)))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(data_start + entries[name]['offset'])
+            file.write(numpy.ascontiguousarray(array).data)
+        file.truncate(data_start + offset)
+
+
+def read_array_container(path):
+    """ Memory map all arrays of a binary array container.
+
+    The arrays are mapped copy-on-write, so they can be modified without changing the file.
+
+    @param str path: file path
+
+    @return dict: array name: numpy array
+    """
+    with open(path, 'rb') as file:
+        magic, version, length = _CONTAINER_HEADER.unpack(file.read(_CONTAINER_HEADER.size))
+        if magic != _CONTAINER_MAGIC or version != _CONTAINER_VERSION:
+            raise ValueError('{0} is not a status variable array container.'.format(path))
+        entries = json.loads(file.read(length).decode())
+    data_start = -(-(_CONTAINER_HEADER.size + length) // _ALIGNMENT) * _ALIGNMENT
+    arrays = dict()
+    for name, entry in entries.items():
+        dtype = entry['dtype']
+        if isinstance(dtype, list):
+            dtype = [tuple(field) for field in dtype]
+        dtype = numpy.dtype(dtype)
+        shape = tuple(entry['shape'])
+        if dtype.itemsize == 0 or 0 in shape:
+            arrays[name] = numpy.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = numpy.memmap(path, dtype=dtype, mode='c',
+                                        offset=data_start + entry['offset'], shape=shape)
+    return arrays
+
+
+class StatusVariableStore:
+    """
+    Saves and loads the status variables of modules, see the module docstring.
+    All methods are thread safe. Call close before exiting to write all pending files.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        # file name: YAML text last saved or loaded
+        self._saved = dict()
+        # file name: (YAML text, container path, arrays) waiting to be written
+        self._pending = OrderedDict()
+        self._writing = None
+        self._thread = None
+        self._stop = False
+
+    def save(self, filename, variables):
+        """ Save status variables, if they changed. The files are written in the background.
+
+        @param str filename: path of the YAML file
+        @param dict variables: status variable names and values
+        """
+        arrays = OrderedDict()
+        data = self._extract_arrays(variables, arrays)
+        container = None
+        if len(arrays) > 0:
+            digest = hashlib.blake2b(digest_size=10)
+            for name, array in arrays.items():
+                digest.update(json.dumps([name, array.dtype.str, array.shape]).encode())
+                digest.update(numpy.ascontiguousarray(array).data)
+            container = '{0}-{1}.arrays'.format(os.path.splitext(filename)[0],
+                                                digest.hexdigest())
+            container_name = os.path.basename(container)
+            for reference in self._references(data):
+                reference.container = container_name
+
+        with StringIO() as stream:
+            config.ordered_dump(data, stream=stream, Dumper=yaml.SafeDumper,
+                                default_flow_style=False)
+            text = stream.getvalue()
+
+        with self._lock:
+            if self._saved.get(filename) == text:
+                logger.debug('Status variables in {0} unchanged.'.format(filename))
+                return
+            # copy the arrays, the module may change them before they are written
+            arrays = OrderedDict((name, numpy.array(array)) for name, array in arrays.items())
+            self._saved[filename] = text
+            self._pending.pop(filename, None)
+            self._pending[filename] = (text, container, arrays)
+            if self._thread is None:
+                self._stop = False
+                self._thread = threading.Thread(target=self._write_loop,
+                                                name='status-variable-writer', daemon=True)
+                self._thread.start()
+            self._lock.notify_all()
+
+    def load(self, filename):
+        """ Load status variables. Arrays in binary containers are memory mapped.
+
+        @param str filename: path of the YAML file
+
+        @return OrderedDict: status variable names and values
+        """
+        self.flush(filename)
+        if not os.path.isfile(filename):
+            return OrderedDict()
+        with open(filename, 'r') as file:
+            text = file.read()
+        data = config.ordered_load(text, yaml.SafeLoader)
+        containers = dict()
+        directory = os.path.dirname(filename)
+
+        def resolve(reference):
+            if reference.container not in containers:
+                try:
+                    containers[reference.container] = read_array_container(
+                        os.path.join(directory, reference.container))
+                except:
+                    logger.exception('Could not read status variable arrays from {0}.'.format(
+                        reference.container))
+                    containers[reference.container] = dict()
+            array = containers[reference.container].get(reference.name)
+            if array is None:
+                logger.error('Status variable array {0} missing in {1}.'.format(
+                    reference.name, reference.container))
+            return array
+
+        data = self._resolve_references(data, resolve)
+        with self._lock:
+            self._saved[filename] = text
+        return data
+
+    def remove(self, filename):
+        """ Delete the status variable files of a module.
+
+        @param str filename: path of the YAML file
+        """
+        with self._lock:
+            self._pending.pop(filename, None)
+            self._saved.pop(filename, None)
+        self.flush(filename)
+        if os.path.isfile(filename):
+            os.remove(filename)
+        self._remove_containers(filename, keep=None)
+
+    def flush(self, filename=None):
+        """ Wait until the pending files (of one module or all) are written.
+
+        @param str filename: optional, path of the YAML file of a module
+        """
+        with self._lock:
+            if filename is None:
+                self._lock.wait_for(lambda: not self._pending and self._writing is None)
+            else:
+                self._lock.wait_for(
+                    lambda: filename not in self._pending and self._writing != filename)
+
+    def close(self):
+        """ Write all pending files and stop the writer thread. """
+        self.flush()
+        with self._lock:
+            self._stop = True
+            self._lock.notify_all()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join()
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._pending or self._stop)
+                if not self._pending:
+                    return
+                filename, (text, container, arrays) = self._pending.popitem(last=False)
+                self._writing = filename
+            try:
+                self._write(filename, text, container, arrays)
+            except:
+                logger.exception('Failed to save status variables to {0}.'.format(filename))
+                with self._lock:
+                    # make sure the next save is not skipped
+                    if self._saved.get(filename) == text:
+                        self._saved.pop(filename)
+            finally:
+                with self._lock:
+                    self._writing = None
+                    self._lock.notify_all()
+
+    def _write(self, filename, text, container, arrays):
+        """ Write the YAML file and the array container, replacing the previous files. """
+        if container is not None and not os.path.isfile(container):
+            write_array_container(container + '.tmp', arrays)
+            os.replace(container + '.tmp', container)
+        with open(filename + '.tmp', 'w') as file:
+            file.write(text)
+        os.replace(filename + '.tmp', filename)
+        self._remove_containers(filename, keep=container)
+
+    @staticmethod
+    def _remove_containers(filename, keep):
+        """ Delete the array containers of a module except keep. Containers still memory mapped
+        can not be deleted on Windows, they are removed on a later save.
+        """
+        pattern = '{0}-*.arrays'.format(glob.escape(os.path.splitext(filename)[0]))
+        for path in glob.glob(pattern):
+            if keep is not None and os.path.normcase(path) == os.path.normcase(keep):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _extract_arrays(self, value, arrays):
+        """ Replace numpy arrays in nested dicts, lists and tuples by ArrayReferences. """
+        if isinstance(value, numpy.ndarray) and not value.dtype.hasobject:
+            name = 'a{0}'.format(len(arrays))
+            arrays[name] = value
+            return config.ArrayReference(None, name)
+        elif isinstance(value, dict):
+            return type(value)((k, self._extract_arrays(v, arrays)) for k, v in value.items())
+        elif isinstance(value, (list, tuple)) and type(value) in (list, tuple):
+            return type(value)(self._extract_arrays(v, arrays) for v in value)
+        return value
+
+    def _references(self, value):
+        """ All ArrayReferences in nested dicts, lists and tuples. """
+        if isinstance(value, config.ArrayReference):
+            yield value
+        elif isinstance(value, dict):
+            for v in value.values():
+                yield from self._references(v)
+        elif isinstance(value, (list, tuple)):
+            for v in value:
+                yield from self._references(v)
+
+    def _resolve_references(self, value, resolve):
+        """ Replace ArrayReferences in nested dicts and lists by the arrays. """
+        if isinstance(value, config.ArrayReference):
+            return resolve(value)
+        elif isinstance(value, dict):
+            for k, v in value.items():
+                value[k] = self._resolve_references(v, resolve)
+        elif isinstance(value, list):
+            for i, v in enumerate(value):
+                value[i] = self._resolve_references(v, resolve)
+        return value
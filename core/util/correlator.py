@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a software correlator for time tag streams, e.g. for HBT measurements.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+
+
+class TimeTagCorrelator:
+    """
+    Incremental cross correlation histogram of the time tags of two channels.
+
+    The histogram contains the time differences (t_stop - t_start) between the events of the start
+    and the stop channel in n_bins bins of width bin_width, centered around zero delay. The
+    index and the binning are the same as for the Swabian Instruments Correlation measurement.
+
+    Time tags are integers (e.g. in ps) and must be added in chunks in chronological order.
+    Events close to the end of a chunk are kept until the next chunk arrives, so the histogram does
+    not depend on how the stream is divided into chunks.
+
+    Two modes are available:
+        'multi_stop': every pair of start and stop events within the histogram range is counted
+        'start_stop': only the first stop event after each start event is counted (classic TCSPC)
+    """
+
+    def __init__(self, bin_width=1000, n_bins=1000, mode='multi_stop'):
+        if mode not in ('multi_stop', 'start_stop'):
+            raise ValueError('Correlator mode must be "multi_stop" or "start_stop".')
+        self.bin_width = int(bin_width)
+        self.n_bins = int(n_bins)
+        self.mode = mode
+        # Delay of the lower edge of the first bin
+        if mode == 'multi_stop':
+            self._lower_edge = -(self.n_bins // 2) * self.bin_width
+        else:
+            self._lower_edge = 0
+        self._upper_edge = self._lower_edge + self.n_bins * self.bin_width
+        self.clear()
+
+    def clear(self):
+        """ Reset the histogram and all buffered events. """
+        self._histogram = np.zeros(self.n_bins, dtype=np.int64)
+        self._pending_start = np.zeros(0, dtype=np.int64)
+        self._pending_stop = np.zeros(0, dtype=np.int64)
+        self._start_count = 0
+        self._stop_count = 0
+        self._first_time = None
+        self._processed_until = None
+        return
+
+    @property
+    def counts(self):
+        """ Number of processed events (start_channel, stop_channel). """
+        return self._start_count, self._stop_count
+
+    @property
+    def duration(self):
+        """ Time span covered by the processed time tags. """
+        if self._first_time is None or self._processed_until is None:
+            return 0
+        return self._processed_until - self._first_time
+
+    def get_index(self):
+        """ Delay of the lower edge of each bin, in the units of the time tags. """
+        return self._lower_edge + np.arange(self.n_bins, dtype=np.int64) * self.bin_width
+
+    def get_data(self):
+        """ Raw histogram of coincidences. """
+        return self._histogram.copy()
+
+    def get_normalised_data(self):
+        """ Histogram normalised to the coincidences expected for uncorrelated (Poissonian) events
+        with the measured count rates, i.e. g2(tau) for 'multi_stop' mode.
+        """
+        start_count, stop_count = self.counts
+        duration = self.duration
+        if start_count == 0 or stop_count == 0 or duration <= 0:
+            return np.zeros(self.n_bins, dtype=float)
+        expected = start_count * stop_count * self.bin_width / duration
+        return self._histogram / expected
+
+    def add_timestamps(self, start_tags, stop_tags, end_time=None):
+        """ Add a chunk of time tags and update the histogram.
+
+        @param numpy.ndarray start_tags: sorted time tags of the start channel
+        @param numpy.ndarray stop_tags: sorted time tags of the stop channel
+        @param int end_time: optional, time up to which the chunk is complete for both channels.
+                             Defaults to the latest time tag in the chunk.
+        """
+        start_tags = np.asarray(start_tags, dtype=np.int64)
+        stop_tags = np.asarray(stop_tags, dtype=np.int64)
+        if end_time is None:
+            end_time = max(start_tags[-1] if start_tags.size else np.iinfo(np.int64).min,
+                           stop_tags[-1] if stop_tags.size else np.iinfo(np.int64).min)
+            if end_time == np.iinfo(np.int64).min:
+                return
+        if self._first_time is None:
+            first = [tags[0] for tags in (start_tags, stop_tags) if tags.size]
+            self._first_time = min(first) if first else end_time
+
+        starts = np.concatenate((self._pending_start, start_tags))
+        stops = np.concatenate((self._pending_stop, stop_tags))
+
+        # Only start events whose complete delay window is known can be processed
+        n_ready = np.searchsorted(starts, end_time - self._upper_edge, side='right')
+        if self.mode == 'multi_stop':
+            self._correlate_multi_stop(starts[:n_ready], stops)
+        else:
+            self._correlate_start_stop(starts[:n_ready], stops)
+
+        if self._processed_until is None or end_time > self._processed_until:
+            self._processed_until = end_time
+        self._start_count += start_tags.size
+        self._stop_count += stop_tags.size
+
+        # Keep the start events still waiting for stops and all stops they might need
+        self._pending_start = starts[n_ready:]
+        if self._pending_start.size > 0:
+            keep_from = self._pending_start[0] + self._lower_edge
+        else:
+            keep_from = end_time - self._upper_edge + self._lower_edge
+        self._pending_stop = stops[np.searchsorted(stops, keep_from, side='left'):]
+        return
+
+    def _correlate_multi_stop(self, starts, stops):
+        """ Histogram all start-stop pairs within the delay range.
+
+        For each start event the range of stop events inside the delay window is found by
+        searchsorted. The k-th stop of every window is then handled for all start events at once,
+        so the python loop only runs over the maximum number of stops per window.
+        """
+        if starts.size == 0 or stops.size == 0:
+            return
+        first = np.searchsorted(stops, starts + self._lower_edge, side='left')
+        last = np.searchsorted(stops, starts + self._upper_edge, side='left')
+        n_stops = last - first
+        for k in range(int(n_stops.max()) if n_stops.size else 0):
+            valid = n_stops > k
+            delays = stops[first[valid] + k] - starts[valid]
+            bins = (delays - self._lower_edge) // self.bin_width
+            self._histogram += np.bincount(bins, minlength=self.n_bins)[:self.n_bins]
+        return
+
+    def _correlate_start_stop(self, starts, stops):
+        """ Histogram the delay to the first stop event following each start event. """
+        if starts.size == 0 or stops.size == 0:
+            return
+        first = np.searchsorted(stops, starts, side='left')
+        valid = first < stops.size
+        delays = stops[first[valid]] - starts[valid]
+        delays = delays[delays < self._upper_edge]
+        bins = delays // self.bin_width
+        self._histogram += np.bincount(bins, minlength=self.n_bins)[:self.n_bins]
+        return
+
+
+def split_channels(timestamps, channels, start_channel, stop_channel):
+    """ Split a combined stream of time tags (e.g. read from a recorded tag file) into the tags of
+    the start and the stop channel.
+
+    @param numpy.ndarray timestamps: time tags of all channels
+    @param numpy.ndarray channels: channel number of each time tag
+    @param int start_channel: channel number of the start channel
+    @param int stop_channel: channel number of the stop channel
+
+    @return (numpy.ndarray, numpy.ndarray): sorted time tags of start and stop channel
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    channels = np.asarray(channels)
+    start_tags = np.sort(timestamps[channels == start_channel])
+    stop_tags = np.sort(timestamps[channels == stop_channel])
+    return start_tags, stop_tags
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a pool of persistent FTP sessions for file transfer to instruments.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import ftplib
+import os
+import queue
+import socket
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FTPSessionPool:
+    """
+    Pool of logged in FTP sessions to a single host, all working in the same directory.
+
+    Sessions are opened on demand (at most max_sessions at a time) and kept open for reuse, so
+    the connect/login/cwd round trips are only paid once instead of for every single transfer.
+    A session that broke in the meantime (e.g. closed by the server after an idle timeout) is
+    discarded and the operation is retried once on a fresh session.
+
+    The listing of the working directory is cached and kept up to date with the uploads and
+    deletions done through this pool. Call invalidate_listing if the directory was changed by
+    other means.
+    """
+
+    # Errors indicating a broken connection. The operation is retried on a new session. Other
+    # errors, e.g. of local files, are raised right away.
+    _connection_errors = (ftplib.error_temp, ConnectionError, socket.timeout, EOFError)
+
+    def __init__(self, host, user='anonymous', passwd='anonymous@', working_dir='', port=21,
+                 max_sessions=4, timeout=30):
+        """
+        @param str host: IP address or hostname of the FTP server
+        @param str user: login name
+        @param str passwd: login password
+        @param str working_dir: directory to change into after login
+        @param int port: port of the FTP server
+        @param int max_sessions: maximum number of simultaneously open sessions
+        @param float timeout: socket timeout in seconds
+        """
+        self.host = host
+        self.user = user
+        self.passwd = passwd
+        self.working_dir = working_dir
+        self.port = int(port)
+        self.max_sessions = max(1, int(max_sessions))
+        self.timeout = timeout
+
+        self._idle_sessions = queue.LifoQueue()
+        self._session_slots = threading.BoundedSemaphore(self.max_sessions)
+        self._lock = threading.Lock()
+        self._listing = None
+        self._sessions_opened = 0
+
+    @property
+    def sessions_opened(self):
+        """ Total number of logins performed by this pool (for diagnostics). """
+        return self._sessions_opened
+
+    def _connect(self):
+        """ Open and log in a new session and change into the working directory. """
+        ftp = ftplib.FTP(timeout=self.timeout)
+        try:
+            ftp.connect(self.host, self.port)
+            ftp.login(user=self.user, passwd=self.passwd)
+            if self.working_dir:
+                ftp.cwd(self.working_dir)
+        except:
+            ftp.close()
+            raise
+        with self._lock:
+            self._sessions_opened += 1
+        return ftp
+
+    def _acquire(self, fresh=False):
+        """ Get an idle session from the pool or open a new one.
+
+        @param bool fresh: always open a new session instead of reusing an idle one
+        """
+        self._session_slots.acquire()
+        if not fresh:
+            try:
+                return self._idle_sessions.get_nowait()
+            except queue.Empty:
+                pass
+        try:
+            return self._connect()
+        except:
+            self._session_slots.release()
+            raise
+
+    def _release(self, ftp, broken=False):
+        """ Return a session to the pool, or close it if it is broken. """
+        if broken:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+        else:
+            self._idle_sessions.put(ftp)
+        self._session_slots.release()
+
+    def _drop_idle_sessions(self):
+        """ Close all idle sessions without logging out. """
+        while True:
+            try:
+                ftp = self._idle_sessions.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                ftp.close()
+            except Exception:
+                pass
+
+    def run(self, func):
+        """ Call func(ftp) with a session from the pool and return its result.
+
+        If the session turns out to be broken, the other idle sessions most likely timed out as
+        well. They are dropped and the call is repeated once on a newly opened session.
+
+        @param callable func: function taking a logged in ftplib.FTP instance
+
+        @return: return value of func
+        """
+        for attempt in range(2):
+            ftp = self._acquire(fresh=attempt > 0)
+            try:
+                result = func(ftp)
+            except self._connection_errors:
+                self._release(ftp, broken=True)
+                if attempt > 0:
+                    raise
+                self._drop_idle_sessions()
+                continue
+            except:
+                self._release(ftp, broken=True)
+                raise
+            self._release(ftp)
+            return result
+
+    def check_connection(self):
+        """ Open (or reuse) a session to verify the server is reachable. Raises on failure. """
+        return self.run(lambda ftp: ftp.pwd())
+
+    def list_files(self, use_cache=True):
+        """ Names of all files (no directories) in the working directory.
+
+        @param bool use_cache: if False, the listing is always requested from the server
+
+        @return list: file names
+        """
+        with self._lock:
+            if use_cache and self._listing is not None:
+                return list(self._listing)
+
+        def retrieve_list(ftp):
+            lines = list()
+            ftp.retrlines('LIST', callback=lines.append)
+            return lines
+
+        lines = self.run(retrieve_list)
+        listing = [name for name in (self._parse_list_line(line) for line in lines) if name]
+        with self._lock:
+            self._listing = set(listing)
+        return listing
+
+    def invalidate_listing(self):
+        """ Drop the cached directory listing. """
+        with self._lock:
+            self._listing = None
+
+    def delete(self, filename):
+        """ Delete a file in the working directory if it exists.
+
+        @param str filename: name of the file to delete
+        """
+        if filename not in self.list_files():
+            return
+        self.run(lambda ftp: ftp.delete(filename))
+        with self._lock:
+            if self._listing is not None:
+                self._listing.discard(filename)
+
+    def upload(self, filepath, filename=None, overwrite=True):
+        """ Upload a local file into the working directory.
+
+        @param str filepath: path of the local file
+        @param str filename: optional, name of the file on the server. Defaults to the basename.
+        @param bool overwrite: delete an existing file by the same name before the upload
+        """
+        if filename is None:
+            filename = os.path.basename(filepath)
+
+        # open the local file first, so a missing file neither deletes the one on the server nor
+        # affects the sessions
+        with open(filepath, 'rb') as file:
+            if overwrite:
+                self.delete(filename)
+
+            def store(ftp):
+                file.seek(0)
+                ftp.storbinary('STOR ' + filename, file)
+
+            try:
+                self.run(store)
+            except:
+                # A partial upload may or may not have created the file
+                self.invalidate_listing()
+                raise
+        with self._lock:
+            if self._listing is not None:
+                self._listing.add(filename)
+
+    def upload_many(self, files, overwrite=True):
+        """ Upload several files concurrently, using up to max_sessions sessions.
+
+        @param list files: list of (filepath, filename) tuples
+        @param bool overwrite: delete existing files by the same names before the upload
+
+        @return list: the filenames uploaded, in the order given. Raises the first error occurred.
+        """
+        files = list(files)
+        if not files:
+            return list()
+        if overwrite:
+            # Fill the listing cache once instead of racing for it in every worker
+            self.list_files()
+        if len(files) == 1 or self.max_sessions == 1:
+            for filepath, filename in files:
+                self.upload(filepath, filename, overwrite)
+        else:
+            workers = min(len(files), self.max_sessions)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.upload, filepath, filename, overwrite)
+                           for filepath, filename in files]
+                for future in futures:
+                    future.result()
+        return [filename for _, filename in files]
+
+    def close(self):
+        """ Close all idle sessions. """
+        while True:
+            try:
+                ftp = self._idle_sessions.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+        self.invalidate_listing()
+
+    @staticmethod
+    def _parse_list_line(line):
+        """ Extract the file name from a line of a LIST reply. Returns None for directories.
+
+        Both the MS-DOS style of the instrument FTP servers
+            '05-10-16  05:22PM                  292 SSR aom adjusted.seq'
+        and the unix style
+            '-rw-r--r--   1 user group        292 Oct 05 17:22 SSR aom adjusted.seq'
+        are understood. File names may contain whitespaces.
+        """
+        if not line.strip():
+            return None
+        if '<DIR>' in line or line.startswith('d'):
+            return None
+        if line[0] in '-lbcps':
+            # unix style: 8 fields before the name
+            parts = line.split(None, 8)
+            return parts[8].strip() if len(parts) == 9 else None
+        # MS-DOS style: date and time, then the file size and the name
+        parts = line.split(None, 3)
+        return parts[3].strip() if len(parts) == 4 else None
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a helper to defer the import of heavy dependencies until they are used.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """ Stand-in for a module that is imported on the first attribute access.
+
+    Missing attributes are looked up as submodules, so that e.g. mpl.transforms works for
+    mpl = lazy_import('matplotlib') even if matplotlib.transforms was not imported yet.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        module = self._load()
+        try:
+            return getattr(module, name)
+        except AttributeError:
+            if name.startswith('__'):
+                raise
+            try:
+                return importlib.import_module('{0}.{1}'.format(self.__name__, name))
+            except ImportError:
+                raise AttributeError(
+                    'module {0} has no attribute {1}'.format(self.__name__, name)) from None
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return '<lazy module {0} ({1})>'.format(self.__name__, state)
+
+
+def lazy_import(name):
+    """ Import a module on first use.
+
+    Use it for heavy dependencies that are only needed by some methods of a qudi module (e.g.
+    matplotlib for saving figures), so that loading the qudi module does not pay for them:
+
+        plt = lazy_import('matplotlib.pyplot')
+
+    If the module is already imported, it is returned directly.
+
+    @param str name: absolute name of the module
+
+    @return module: the module or a LazyModule importing it on the first attribute access
+    """
+    module = importlib.sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
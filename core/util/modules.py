@@ -134,6 +134,45 @@ def toposort(deps, cost=None):
     return order
 
 
+def toposort_levels(deps, nodes=None):
+    """Group the nodes of a dependency graph into topological levels.
+
+      @param dict deps: Dictionary describing dependencies where a:[b,c]
+                        means "a depends on b and c"
+      @param list nodes: Optional additional nodes without dependencies
+
+      @return list: list of lists of nodes. The nodes of each level depend only
+                    on nodes of previous levels, so the nodes within a level
+                    are independent of each other.
+
+    Example::
+
+        deps = {'a': ['b', 'c'], 'c': ['b', 'd'], 'e': ['b']}
+        toposort_levels(deps)
+        => [['b', 'd'], ['c', 'e'], ['a']]
+    """
+    remaining = {}
+    for k, v in list(deps.items()):
+        remaining.setdefault(k, set()).update(v)
+        for k2 in v:
+            remaining.setdefault(k2, set())
+    for k in (nodes or []):
+        remaining.setdefault(k, set())
+
+    levels = []
+    while len(remaining) > 0:
+        ready = [k for k in remaining if len(remaining[k]) == 0]
+        if len(ready) == 0:
+            raise Exception(
+                'Cannot resolve requested device configure/start order.')
+        for k in ready:
+            del remaining[k]
+        for v in remaining.values():
+            v.difference_update(ready)
+        levels.append(ready)
+    return levels
+
+
 def is_base(base):
     """Is the given base one of the three allowed ones?
 
@@ -2,6 +2,14 @@
 """
 Check if something is a rpyc remote object and transfer it
 
+Numpy arrays living on the remote side are transferred as a raw buffer (a short header followed
+by the contiguous array bytes, optionally compressed) instead of being pickled through the rpyc
+channel. The array is staged on the server by an rpyc call and the buffer is then sent over a
+separate plain TCP connection (the bulk channel), which avoids the framing overhead of rpyc. For
+SSL secured connections the buffer is passed through the rpyc channel instead. The server side is
+provided by BulkArrayService, which the remote module service of qudi is derived from. If the
+remote service does not provide it, netobtain falls back to rpyc.utils.classic.obtain.
+
 Qudi is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
 the Free Software Foundation, either version 3 of the License, or
@@ -19,14 +27,372 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import collections
+import json
+import os
+import socket
+import ssl
+import struct
+import threading
+import zlib
+
+import numpy as np
+import rpyc
 import rpyc.core.netref
 import rpyc.utils.classic
 
+# Header of a packed array: magic, format version, length of the json description
+_ARRAY_MAGIC = b'QNDA'
+_ARRAY_VERSION = 1
+_ARRAY_HEADER = struct.Struct('<4sBI')
+_TOKEN_SIZE = 16
 
-def netobtain(obj):
+# Compression used by netobtain for remote arrays, None or 'zlib'. Compression only pays off for
+# slow network links and compressible data (e.g. sparse count histograms).
+bulk_compression = None
+
+# Bulk transfer state of the open remote connections by id(conn), a tuple of the connection and
+# its _BulkClient (False if not supported). The clients hold netrefs, which keep their connection
+# alive, so entries are removed explicitly once their connection is closed.
+_bulk_clients = dict()
+_bulk_clients_lock = threading.Lock()
+
+
+def _array_description(array, compression, payload_size):
+    """ Header and json description of a packed array. """
+    description = json.dumps({'dtype': array.dtype.str if array.dtype.fields is None
+                                       else array.dtype.descr,
+                              'shape': array.shape,
+                              'compression': compression,
+                              'size': payload_size}).encode()
+    return _ARRAY_HEADER.pack(_ARRAY_MAGIC, _ARRAY_VERSION, len(description)) + description
+
+
+def _array_payload(array, compression):
+    """ Contiguous array data, optionally compressed. Arrays are returned as byte view. """
+    if array.dtype.hasobject:
+        raise TypeError('Arrays of python objects can not be packed.')
+    if compression not in (None, 'zlib'):
+        raise ValueError('Unknown compression "{0}".'.format(compression))
+    array = np.ascontiguousarray(array)
+    if compression == 'zlib':
+        return zlib.compress(array, 1)
+    return array.reshape(-1).view(np.uint8)
+
+
+def _parse_description(header, description):
+    """ Check the header and decode the description of a packed array. """
+    magic, version, length = _ARRAY_HEADER.unpack(header)
+    if magic != _ARRAY_MAGIC or version != _ARRAY_VERSION:
+        raise ValueError('Buffer does not contain a packed array.')
+    description = json.loads(bytes(description).decode())
+    dtype = description['dtype']
+    if isinstance(dtype, list):
+        dtype = [tuple(field) for field in dtype]
+    description['dtype'] = np.dtype(dtype)
+    return description
+
+
+def pack_array(array, compression=None):
+    """ Serialize a numpy array into a header and its raw contiguous bytes.
+
+    @param numpy.ndarray array: array to pack. Arrays of python objects are not supported.
+    @param str compression: optional, None or 'zlib'
+
+    @return bytes: packed array
+    """
+    array = np.asarray(array)
+    payload = _array_payload(array, compression)
+    return _array_description(array, compression, len(payload)) + bytes(payload)
+
+
+def unpack_array(buffer):
+    """ Restore a numpy array packed by pack_array.
+
+    @param bytes buffer: packed array
+
+    @return numpy.ndarray: the array, owning a writeable copy of the data
+    """
+    buffer = memoryview(buffer)
+    _, _, length = _ARRAY_HEADER.unpack_from(buffer)
+    offset = _ARRAY_HEADER.size
+    description = _parse_description(buffer[:offset], buffer[offset:offset + length])
+    payload = buffer[offset + length:]
+    if description['compression'] == 'zlib':
+        payload = zlib.decompress(payload)
+    array = np.frombuffer(payload, dtype=description['dtype'])
+    return array.reshape(description['shape']).copy()
+
+
+def _recv_into(sock, buffer):
+    """ Fill a writeable buffer completely from a socket. """
+    view = memoryview(buffer).cast('B')
+    while view.nbytes > 0:
+        received = sock.recv_into(view)
+        if received == 0:
+            raise ConnectionError('Bulk channel closed by the remote side.')
+        view = view[received:]
+
+
+class BulkArrayServer:
+    """ Sends staged arrays over plain TCP connections.
+
+    Arrays are staged under a random token, which the client gets through the (possibly
+    authenticated) rpyc connection. A client sends the token and receives the packed array. Staged
+    arrays that are never fetched are dropped once max_staged newer ones are waiting.
+    There is one server per network interface, shared by all rpyc connections.
+    """
+
+    _servers = dict()
+    _servers_lock = threading.Lock()
+
+    def __init__(self, address, max_staged=16):
+        """
+        @param str address: IP address of the interface to listen on
+        @param int max_staged: maximum number of staged arrays waiting to be fetched
+        """
+        self.max_staged = max_staged
+        self._staged = collections.OrderedDict()
+        self._lock = threading.Lock()
+        family = socket.AF_INET6 if ':' in address else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.bind((address, 0))
+        self._socket.listen(8)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, name='bulk-array-server', daemon=True).start()
+
+    @classmethod
+    def for_address(cls, address):
+        """ Get the server listening on an interface, start it if necessary.
+
+        @param str address: IP address of the interface
+
+        @return BulkArrayServer: the server
+        """
+        with cls._servers_lock:
+            if address not in cls._servers:
+                cls._servers[address] = cls(address)
+            return cls._servers[address]
+
+    def stage(self, array, compression=None):
+        """ Keep a copy of an array until it is fetched.
+
+        @param numpy.ndarray array: array to send
+        @param str compression: optional, None or 'zlib'
+
+        @return bytes: token to fetch the array with
+        """
+        # copy now, the owning module may change the array before it is fetched
+        payload = _array_payload(np.array(array, order='C'), compression)
+        header = _array_description(array, compression, len(payload))
+        token = os.urandom(_TOKEN_SIZE)
+        with self._lock:
+            self._staged[token] = (header, payload)
+            while len(self._staged) > self.max_staged:
+                self._staged.popitem(last=False)
+        return token
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(connection,), name='bulk-array-sender',
+                             daemon=True).start()
+
+    def _serve(self, connection):
+        """ Answer the token requests of one client until it disconnects. """
+        token = bytearray(_TOKEN_SIZE)
+        with connection:
+            while True:
+                try:
+                    _recv_into(connection, token)
+                except (ConnectionError, OSError):
+                    return
+                with self._lock:
+                    header, payload = self._staged.pop(bytes(token), (None, None))
+                try:
+                    if header is None:
+                        # unknown or expired token, answer with an empty header
+                        connection.sendall(_ARRAY_HEADER.pack(b'\0' * 4, 0, 0))
+                    else:
+                        connection.sendall(header)
+                        connection.sendall(payload)
+                except OSError:
+                    return
+
+
+class BulkArrayService(rpyc.Service):
+    """ rpyc service providing the bulk array transfer used by netobtain. """
+
+    def exposed_open_bulk_channel(self, address):
+        """ Start listening for bulk channel connections.
+
+        @param str address: address of this server as seen by the client
+
+        @return int: port of the bulk channel
+        """
+        return BulkArrayServer.for_address(str(address)).port
+
+    def exposed_stage_array(self, array, address, compression=None):
+        """ Stage an array for the transfer over the bulk channel.
+
+        @param numpy.ndarray array: array on the server side (passed back by the client as netref)
+        @param str address: address of this server as seen by the client
+        @param str compression: optional, None or 'zlib'
+
+        @return bytes: token to fetch the array with, or None if the array can not be sent
+        """
+        if not isinstance(array, np.ndarray) or array.dtype.hasobject:
+            return None
+        return BulkArrayServer.for_address(str(address)).stage(array, compression)
+
+    def exposed_pack_array(self, array, compression=None):
+        """ Pack a local array for the transfer through the rpyc channel.
+
+        @param numpy.ndarray array: array on the server side (passed back by the client as netref)
+        @param str compression: optional, None or 'zlib'
+
+        @return bytes: packed array, or None if the array can not be packed
+        """
+        if not isinstance(array, np.ndarray) or array.dtype.hasobject:
+            return None
+        return pack_array(array, compression)
+
+
+class _BulkClient:
+    """ Client side of the bulk transfer for one rpyc connection. """
+
+    def __init__(self, conn):
+        """ Negotiate the transfer mode. Raises AttributeError if the remote service does not
+        support the bulk transfer.
+
+        @param rpyc.Connection conn: connection to the remote qudi
+        """
+        root = conn.root
+        self._pack = root.pack_array
+        self._stage = root.stage_array
+        self._lock = threading.Lock()
+        self._socket = None
+        self._address = None
+        try:
+            stream_socket = conn._channel.stream.sock
+        except AttributeError:
+            return
+        # never send data unencrypted that was meant to go through a secured connection
+        if isinstance(stream_socket, ssl.SSLSocket):
+            return
+        try:
+            self._address = stream_socket.getpeername()[0]
+            port = root.open_bulk_channel(self._address)
+            self._socket = socket.create_connection((self._address, port), timeout=30)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            self._socket = None
+
+    def obtain(self, obj, compression=None):
+        """ Transfer a remote array. Returns None if the array can not be transferred in bulk. """
+        if self._socket is not None:
+            token = self._stage(obj, self._address, compression)
+            if token is None:
+                return None
+            with self._lock:
+                try:
+                    if self._socket is not None:
+                        return self._fetch(bytes(token))
+                except OSError:
+                    # continue through the rpyc channel
+                    self._socket.close()
+                    self._socket = None
+        buffer = self._pack(obj, compression)
+        return None if buffer is None else unpack_array(buffer)
+
+    def close(self):
+        """ Close the bulk channel. Arrays are transferred through the rpyc channel afterwards. """
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+
+    def _fetch(self, token):
+        self._socket.sendall(token)
+        header = bytearray(_ARRAY_HEADER.size)
+        _recv_into(self._socket, header)
+        _, _, length = _ARRAY_HEADER.unpack(header)
+        if length == 0:
+            raise ConnectionError('Staged array expired before it was fetched.')
+        description = bytearray(length)
+        _recv_into(self._socket, description)
+        description = _parse_description(header, description)
+        if description['compression'] == 'zlib':
+            payload = bytearray(description['size'])
+            _recv_into(self._socket, payload)
+            array = np.frombuffer(zlib.decompress(payload), dtype=description['dtype']).copy()
+        else:
+            array = np.empty(description['size'] // description['dtype'].itemsize,
+                             dtype=description['dtype'])
+            _recv_into(self._socket, array)
+        return array.reshape(description['shape'])
+
+
+def _is_remote_array(obj):
+    """ Check the class name of the remote object without a round trip. """
+    try:
+        return obj.____id_pack__[0] in ('numpy.ndarray', 'numpy.core.memmap.memmap')
+    except (AttributeError, IndexError, TypeError):
+        return False
+
+
+def _drop_closed_clients():
+    """ Remove the bulk clients of closed connections and close their bulk channels.
+    Call with _bulk_clients_lock held.
     """
+    for key, (conn, client) in list(_bulk_clients.items()):
+        if conn.closed:
+            del _bulk_clients[key]
+            if client is not False:
+                client.close()
+
+
+def _bulk_obtain(obj):
+    """ Transfer a remote array in bulk. Returns None if that is not possible. """
+    conn = object.__getattribute__(obj, '____conn__')
+    with _bulk_clients_lock:
+        _drop_closed_clients()
+        entry = _bulk_clients.get(id(conn))
+        if entry is not None:
+            client = entry[1]
+        else:
+            try:
+                client = _BulkClient(conn)
+            except AttributeError:
+                client = False
+            _bulk_clients[id(conn)] = (conn, client)
+    if client is False:
+        return None
+    return client.obtain(obj, bulk_compression)
+
+
+def netobtain(obj):
+    """ Transfer an object from a remote qudi instance into the local process.
+
+    Remote numpy arrays are transferred in bulk (see BulkArrayService), all other remote objects
+    are pickled by rpyc.utils.classic.obtain. Tuples (which rpyc passes by value) are searched for
+    remote objects element by element. Local objects are returned unchanged.
+
+    @param object obj: local object or rpyc netref
+
+    @return object: local object
     """
     if isinstance(obj, rpyc.core.netref.BaseNetref):
+        if _is_remote_array(obj):
+            array = _bulk_obtain(obj)
+            if array is not None:
+                return array
         return rpyc.utils.classic.obtain(obj)
+    elif type(obj) is tuple:
+        return tuple(netobtain(item) for item in obj)
     else:
         return obj
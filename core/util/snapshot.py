@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a double buffered publisher handing out immutable snapshots of measurement data.
+
+Logic modules fill their data arrays in a worker thread and notify GUIs with signals. If the GUI
+reads the arrays of the logic afterwards, the logic may already be writing into or replacing them.
+A SnapshotPublisher decouples both sides: the logic publishes its arrays after every update and
+the GUI reads the latest Snapshot, a versioned and read-only set of arrays that never changes.
+Publishing and reading never wait for each other.
+
+Arrays the logic replaces instead of changing them in place (e.g. the result of np.mean) are
+published without copying. Arrays changed in place are copied into a back buffer, which is reused
+once no snapshot using it is referenced anymore. If the rows changed since the previous publish
+are given (e.g. one line of a scan image), only these rows are copied into the back buffer.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import sys
+import threading
+import time
+import numpy as np
+
+from collections import deque
+from collections.abc import Mapping
+
+
+def _read_only(array):
+    """ Read-only view of an array. """
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class Snapshot(Mapping):
+    """ Immutable set of named values published together.
+
+    Arrays are read-only. Access the values like a dict, e.g. snapshot['signal_data'].
+    """
+    __slots__ = ('_version', '_timestamp', '_data', '_updated')
+
+    def __init__(self, version, timestamp, data, updated):
+        """
+        @param int version: number of the publish, increases by one with every publish
+        @param float timestamp: time of the publish (time.time())
+        @param dict data: value name: value
+        @param frozenset updated: names of the values published with this version
+        """
+        self._version = version
+        self._timestamp = timestamp
+        self._data = data
+        self._updated = updated
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def updated(self):
+        return self._updated
+
+    def __getitem__(self, name):
+        return self._data[name]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return '<Snapshot version {0} ({1})>'.format(self._version, ', '.join(self._data))
+
+
+class _BackBuffers:
+    """ Back buffers of one array name and the rows changed by the recent publishes. """
+
+    def __init__(self, max_buffers, history):
+        self.max_buffers = max_buffers
+        # [buffer, number of the publish the buffer content belongs to]
+        self.buffers = list()
+        self.count = 0
+        # (number of the publish, changed rows or None for all)
+        self.changes = deque(maxlen=history)
+
+    def reset(self):
+        self.buffers.clear()
+        self.changes.clear()
+
+    def copy(self, array, rows):
+        """ Copy array into a free back buffer.
+
+        @param numpy.ndarray array: source array
+        @param rows: indices or slice of the rows changed since the previous publish, None for all
+
+        @return numpy.ndarray: the back buffer
+        """
+        self.count += 1
+        self.changes.append((self.count, rows))
+        for entry in self.buffers:
+            # only the list and the argument refer to a buffer no snapshot uses anymore
+            if sys.getrefcount(entry[0]) > 2:
+                continue
+            if entry[0].shape != array.shape or entry[0].dtype != array.dtype:
+                continue
+            changed = self._changed_rows(entry[1])
+            if changed is None:
+                np.copyto(entry[0], array)
+            else:
+                for index in changed:
+                    entry[0][index] = array[index]
+            entry[1] = self.count
+            return entry[0]
+        buffer = np.array(array, copy=True)
+        if len(self.buffers) >= self.max_buffers:
+            del self.buffers[0]
+        self.buffers.append([buffer, self.count])
+        return buffer
+
+    def _changed_rows(self, since):
+        """ Rows changed by the publishes after since, None if unknown. """
+        if not self.changes or self.changes[0][0] > since + 1:
+            return None
+        changed = list()
+        for count, rows in self.changes:
+            if count <= since:
+                continue
+            if rows is None:
+                return None
+            changed.append(rows)
+        return changed
+
+
+class SnapshotPublisher:
+    """
+    Double buffered publisher of immutable data snapshots, see the module docstring.
+
+    Create one per logic module and publish the data before emitting the update signal:
+
+        self.snapshots = SnapshotPublisher()
+        ...
+        self.snapshots.publish({'signal_data': self.signal_data, 'x': self.x}, handover=('x',))
+        self.sigDataUpdated.emit()
+
+    The GUI then reads logic.snapshots.latest()['signal_data'] in the slot.
+    Any number of threads may read, publish is serialized.
+    """
+
+    def __init__(self, max_buffers=3, history=64):
+        """
+        @param int max_buffers: maximum number of back buffers kept per array name
+        @param int history: number of publishes of which the changed rows are remembered
+        """
+        self._max_buffers = int(max_buffers)
+        self._history = int(history)
+        self._lock = threading.Lock()
+        self._back_buffers = dict()
+        self._latest = Snapshot(0, time.time(), dict(), frozenset())
+
+    def latest(self):
+        """ The latest snapshot. Never blocks.
+
+        @return Snapshot: latest snapshot, version 0 and empty if nothing was published yet
+        """
+        return self._latest
+
+    @property
+    def version(self):
+        """ Version of the latest snapshot. """
+        return self._latest.version
+
+    def publish(self, data, handover=(), rows=None):
+        """ Publish new values. Values not given are taken over from the previous snapshot.
+
+        Arrays are copied into back buffers unless their name is in handover. Hand over only
+        arrays the caller will never change again, e.g. because the next update creates a new
+        array. Other values (numbers, strings, tuples) are published as they are and must not be
+        changed afterwards either.
+
+        @param dict data: value name: value
+        @param iterable handover: names of arrays published without copying
+        @param dict rows: optional, array name: row indices (list or slice) changed since the
+                          previous publish of that array. Only these rows are copied.
+
+        @return Snapshot: the published snapshot
+        """
+        handover = set(handover)
+        rows = dict() if rows is None else rows
+        with self._lock:
+            published = dict(self._latest._data)
+            for name, value in data.items():
+                if isinstance(value, np.ndarray):
+                    buffers = self._back_buffers.get(name)
+                    if name in handover:
+                        if buffers is not None:
+                            buffers.reset()
+                    else:
+                        if buffers is None:
+                            buffers = _BackBuffers(self._max_buffers, self._history)
+                            self._back_buffers[name] = buffers
+                        changed = rows.get(name)
+                        value = buffers.copy(value, None if changed is None else [changed])
+                    value = _read_only(value)
+                published[name] = value
+            snapshot = Snapshot(self._latest.version + 1, time.time(), published,
+                                frozenset(data))
+            self._latest = snapshot
+        return snapshot
+
+    def clear(self):
+        """ Publish an empty snapshot and release all back buffers. """
+        with self._lock:
+            self._back_buffers.clear()
+            self._latest = Snapshot(self._latest.version + 1, time.time(), dict(), frozenset())
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the profiler recording how long loading and starting each qudi module takes.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Records the time spent in the phases import, configure, connect and activate of each module.
+
+    During the import phase the newly imported top level packages are recorded as well, so that
+    heavy dependencies (e.g. scipy, lmfit) show up at the module that pulled them in first.
+    All methods are thread safe.
+    """
+
+    phases = ('import', 'configure', 'connect', 'activate')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._times = OrderedDict()
+        self._new_packages = dict()
+
+    def clear(self):
+        """ Forget all recorded timings. """
+        with self._lock:
+            self._times.clear()
+            self._new_packages.clear()
+
+    def record(self, base, name, phase, duration):
+        """ Add the duration of a phase of a module.
+
+        @param str base: module base (hardware, logic or gui)
+        @param str name: module name
+        @param str phase: one of StartupProfiler.phases
+        @param float duration: duration in s
+        """
+        with self._lock:
+            times = self._times.setdefault((base, name), dict.fromkeys(self.phases, 0.))
+            times[phase] = times.get(phase, 0.) + duration
+
+    @contextmanager
+    def measure(self, base, name, phase):
+        """ Context manager recording the time spent inside as phase of a module.
+
+        @param str base: module base (hardware, logic or gui)
+        @param str name: module name
+        @param str phase: one of StartupProfiler.phases
+        """
+        if phase == 'import':
+            packages_before = set(m.split('.', 1)[0] for m in list(sys.modules))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(base, name, phase, time.perf_counter() - start)
+            if phase == 'import':
+                packages = set(m.split('.', 1)[0] for m in list(sys.modules)) - packages_before
+                packages.discard(base)
+                with self._lock:
+                    self._new_packages.setdefault((base, name), set()).update(packages)
+
+    def get_times(self):
+        """ Recorded timings.
+
+        @return OrderedDict: key (base, name), value dict of phase: duration in s
+        """
+        with self._lock:
+            return OrderedDict((k, dict(v)) for k, v in self._times.items())
+
+    def report(self):
+        """ Table of the recorded timings, slowest module first.
+
+        @return str: report
+        """
+        times = self.get_times()
+        with self._lock:
+            new_packages = {k: sorted(v) for k, v in self._new_packages.items()}
+        rows = sorted(times.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        width = max([len('{0}.{1}'.format(*key)) for key in times] + [len('module')])
+        header = '{0:{1}s}'.format('module', width) + ''.join(
+            '{0:>11s}'.format(phase) for phase in self.phases + ('total',))
+        lines = [header, '-' * len(header)]
+        totals = dict.fromkeys(self.phases, 0.)
+        for key, phase_times in rows:
+            values = [phase_times.get(phase, 0.) for phase in self.phases]
+            for phase, value in zip(self.phases, values):
+                totals[phase] += value
+            line = '{0:{1}s}'.format('{0}.{1}'.format(*key), width) + ''.join(
+                '{0:11.3f}'.format(value) for value in values + [sum(values)])
+            if new_packages.get(key):
+                line += '   imported ' + ', '.join(new_packages[key])
+            lines.append(line)
+        lines.append('-' * len(header))
+        lines.append('{0:{1}s}'.format('sum', width) + ''.join(
+            '{0:11.3f}'.format(value)
+            for value in [totals[phase] for phase in self.phases] + [sum(totals.values())]))
+        return '\n'.join(lines)
+
+    def save_report(self, path):
+        """ Write the report into a text file.
+
+        @param str path: file path
+        """
+        with open(path, 'w') as file:
+            file.write('Qudi startup profile, {0}, times in s\n\n'.format(
+                time.strftime('%Y-%m-%d %H:%M:%S')))
+            file.write(self.report())
+            file.write('\n')
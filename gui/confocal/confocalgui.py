@@ -34,6 +34,7 @@ from gui.guiutils import ColorBar
 from gui.colordefs import ColorScaleInferno, ColorScaleMagma, ColorScaleViridis, ColorScalePlasma, GreyScale
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitParametersWidget
+from gui.plotrefresh import RefreshRateLimiter
 from qtpy import QtCore
 from qtpy import QtGui
 from qtpy import QtWidgets
@@ -109,6 +110,8 @@ class ConfocalGui(GUIBase):
     image_z_padding = ConfigOption('image_z_padding', 0.02)
 
     default_meter_prefix = ConfigOption('default_meter_prefix', None)  # assume the unit prefix of position spinbox
+    # maximum number of redraws per second of the scan images
+    max_refresh_rate = ConfigOption('max_refresh_rate', 20)
 
     # status var
     adjust_cursor_roi = StatusVar(default=True)
@@ -468,11 +471,11 @@ class ConfocalGui(GUIBase):
         self._mw.depth_cb_high_percentile_DoubleSpinBox.valueChanged.connect(self.shortcut_to_depth_cb_centiles)
 
         # Connect the emitted signal of an image change from the logic with
-        # a refresh of the GUI picture:
-        self._scanning_logic.signal_xy_image_updated.connect(self.refresh_xy_image)
-        self._scanning_logic.signal_xy_image_updated.connect(self.refresh_scan_line)
-        self._scanning_logic.signal_depth_image_updated.connect(self.refresh_scan_line)
-        self._scanning_logic.signal_depth_image_updated.connect(self.refresh_depth_image)
+        # a refresh of the GUI picture. Image updates are coalesced to max_refresh_rate.
+        self._xy_refresh = RefreshRateLimiter(self._refresh_xy_scan, self.max_refresh_rate)
+        self._depth_refresh = RefreshRateLimiter(self._refresh_depth_scan, self.max_refresh_rate)
+        self._scanning_logic.signal_xy_image_updated.connect(self._xy_refresh.request)
+        self._scanning_logic.signal_depth_image_updated.connect(self._depth_refresh.request)
         self._optimizer_logic.sigImageUpdated.connect(self.refresh_refocus_image)
         self._scanning_logic.sigImageXYInitialized.connect(self.adjust_xy_window)
         self._scanning_logic.sigImageDepthInitialized.connect(self.adjust_depth_window)
@@ -628,6 +631,10 @@ class ConfocalGui(GUIBase):
 
         @return int: error code (0:OK, -1:error)
         """
+        self._scanning_logic.signal_xy_image_updated.disconnect(self._xy_refresh.request)
+        self._scanning_logic.signal_depth_image_updated.disconnect(self._depth_refresh.request)
+        self._xy_refresh.stop()
+        self._depth_refresh.stop()
         self._mw.close()
         return 0
 
@@ -1376,12 +1383,15 @@ class ConfocalGui(GUIBase):
         """
         self.xy_image.getViewBox().updateAutoRange()
 
-        xy_image_data = self._scanning_logic.xy_image[:, :, 3 + self.xy_channel]
+        # read the published snapshot, the logic may be writing the next line meanwhile
+        xy_image_data = self._scanning_logic.snapshots.latest()['xy_image'][
+            :, :, 3 + self.xy_channel]
 
         cb_range = self.get_xy_cb_range()
 
-        # Now update image with new color scale, and update colorbar
-        self.xy_image.setImage(image=xy_image_data, levels=(cb_range[0], cb_range[1]))
+        # Now update image with new color scale, and update colorbar. During a scan only the
+        # new lines are rendered.
+        self.xy_image.setImageRows(xy_image_data, levels=(cb_range[0], cb_range[1]))
         self.refresh_xy_colorbar()
 
         # Unlock state widget if scan is finished
@@ -1397,17 +1407,29 @@ class ConfocalGui(GUIBase):
 
         self.depth_image.getViewBox().enableAutoRange()
 
-        depth_image_data = self._scanning_logic.depth_image[:, :, 3 + self.depth_channel]
+        depth_image_data = self._scanning_logic.snapshots.latest()['depth_image'][
+            :, :, 3 + self.depth_channel]
         cb_range = self.get_depth_cb_range()
 
-        # Now update image with new color scale, and update colorbar
-        self.depth_image.setImage(image=depth_image_data, levels=(cb_range[0], cb_range[1]))
+        # Now update image with new color scale, and update colorbar. During a scan only the
+        # new lines are rendered.
+        self.depth_image.setImageRows(depth_image_data, levels=(cb_range[0], cb_range[1]))
         self.refresh_depth_colorbar()
 
         # Unlock state widget if scan is finished
         if self._scanning_logic.module_state() != 'locked':
             self.enable_scan_actions()
 
+    def _refresh_xy_scan(self):
+        """ Redraw the xy image and the scan line plot after a line of an xy scan. """
+        self.refresh_xy_image()
+        self.refresh_scan_line()
+
+    def _refresh_depth_scan(self):
+        """ Redraw the depth image and the scan line plot after a line of a depth scan. """
+        self.refresh_depth_image()
+        self.refresh_scan_line()
+
     def refresh_refocus_image(self):
         """Refreshes the xy image, the crosshair and the colorbar. """
         ##########
@@ -1460,12 +1482,11 @@ class ConfocalGui(GUIBase):
 
     def refresh_scan_line(self):
         """ Get the previously scanned image line and display it in the scan line plot. """
-        sc = self._scanning_logic._scan_counter
-        sc = sc - 1 if sc >= 1 else sc
-        if self._scanning_logic._zscan:
-            self.scan_line_plot.setData(self._scanning_logic.depth_image[sc, :, 0:4:3])
-        else:
-            self.scan_line_plot.setData(self._scanning_logic.xy_image[sc, :, 0:4:3])
+        snapshot = self._scanning_logic.snapshots.latest()
+        name, line = snapshot['scan_line']
+        image = snapshot[name]
+        # copy the line, so that the plot does not hold on to the whole image buffer
+        self.scan_line_plot.setData(np.array(image[min(line, image.shape[0] - 1), :, 0:4:3]))
 
     def adjust_xy_window(self):
         """ Fit the visible window in the xy scan to full view.
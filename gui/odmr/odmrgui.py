@@ -24,6 +24,7 @@ import numpy as np
 import os
 import pyqtgraph as pg
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.util import units
 from gui.guibase import GUIBase
@@ -31,6 +32,7 @@ from gui.guiutils import ColorBar
 from gui.colordefs import ColorScaleInferno
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog, FitSettingsComboBox
+from gui.plotrefresh import RefreshRateLimiter
 from qtpy import QtCore
 from qtpy import QtWidgets
 from qtpy import uic
@@ -72,6 +74,9 @@ class ODMRGui(GUIBase):
     odmrlogic1 = Connector(interface='ODMRLogic')
     savelogic = Connector(interface='SaveLogic')
 
+    # maximum number of redraws per second of the ODMR plots
+    max_refresh_rate = ConfigOption('max_refresh_rate', 20)
+
     sigStartOdmrScan = QtCore.Signal()
     sigStopOdmrScan = QtCore.Signal()
     sigContinueOdmrScan = QtCore.Signal()
@@ -283,7 +288,10 @@ class ODMRGui(GUIBase):
                                                      QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOutputStateUpdated.connect(self.update_status,
                                                        QtCore.Qt.QueuedConnection)
-        self._odmr_logic.sigOdmrPlotsUpdated.connect(self.update_plots, QtCore.Qt.QueuedConnection)
+        # plot updates are coalesced to max_refresh_rate
+        self._plot_refresh = RefreshRateLimiter(self.update_plots, self.max_refresh_rate)
+        self._odmr_logic.sigOdmrPlotsUpdated.connect(self._plot_refresh.request,
+                                                     QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOdmrFitUpdated.connect(self.update_fit, QtCore.Qt.QueuedConnection)
         self._odmr_logic.sigOdmrElapsedTimeUpdated.connect(self.update_elapsedtime,
                                                            QtCore.Qt.QueuedConnection)
@@ -312,6 +320,7 @@ class ODMRGui(GUIBase):
         self._odmr_logic.sigParameterUpdated.disconnect()
         self._odmr_logic.sigOutputStateUpdated.disconnect()
         self._odmr_logic.sigOdmrPlotsUpdated.disconnect()
+        self._plot_refresh.stop()
         self._odmr_logic.sigOdmrFitUpdated.disconnect()
         self._odmr_logic.sigOdmrElapsedTimeUpdated.disconnect()
         self.sigCwMwOn.disconnect()
@@ -528,10 +537,11 @@ class ODMRGui(GUIBase):
     def update_channel(self, index):
         self.display_channel = int(
             self._mw.odmr_channel_ComboBox.itemData(index, QtCore.Qt.UserRole))
+        snapshot = self._odmr_logic.snapshots.latest()
         self.update_plots(
-            self._odmr_logic.odmr_plot_x,
-            self._odmr_logic.odmr_plot_y,
-            self._odmr_logic.odmr_plot_xy)
+            snapshot['odmr_plot_x'],
+            snapshot['odmr_plot_y'],
+            snapshot['odmr_plot_xy'])
 
     def average_level_changed(self):
         """
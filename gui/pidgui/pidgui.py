@@ -196,18 +196,19 @@ class PIDGui(GUIBase):
         """
 
         if self._pid_logic.get_enabled():
+            history = self._pid_logic.get_history()
             self._mw.process_value_Label.setText(
                 '<font color={0}>{1:,.3f}</font>'.format(
                 palette.c1.name(),
-                self._pid_logic.history[0, -1]))
+                history[0, -1]))
             self._mw.control_value_Label.setText(
                 '<font color={0}>{1:,.3f}</font>'.format(
                 palette.c3.name(),
-                self._pid_logic.history[1, -1]))
+                history[1, -1]))
             self._mw.setpoint_value_Label.setText(
                 '<font color={0}>{1:,.3f}</font>'.format(
                 palette.c2.name(),
-                self._pid_logic.history[2, -1]))
+                history[2, -1]))
             extra = self._pid_logic._controller.get_extra()
             if 'P' in extra:
                 self._mw.labelkP.setText('{0:,.6f}'.format(extra['P']))
@@ -215,18 +216,10 @@ class PIDGui(GUIBase):
                 self._mw.labelkI.setText('{0:,.6f}'.format(extra['I']))
             if 'D' in extra:
                 self._mw.labelkD.setText('{0:,.6f}'.format(extra['D']))
-            self._curve1.setData(
-                y=self._pid_logic.history[0],
-                x=np.arange(0, self._pid_logic.getBufferLength()) * self._pid_logic.timestep
-                )
-            self._curve2.setData(
-                y=self._pid_logic.history[1],
-                x=np.arange(0, self._pid_logic.getBufferLength()) * self._pid_logic.timestep
-                )
-            self._curve3.setData(
-                y=self._pid_logic.history[2],
-                x=np.arange(0, self._pid_logic.getBufferLength()) * self._pid_logic.timestep
-                )
+            x = np.arange(0, history.shape[1]) * self._pid_logic.timestep
+            self._curve1.setData(y=history[0], x=x)
+            self._curve2.setData(y=history[1], x=x)
+            self._curve3.setData(y=history[2], x=x)
 
         if self._pid_logic.getSavingState():
             self._mw.record_control_Action.setText('Save')
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains helpers to keep live plots of fast measurements responsive.
+
+Logic modules emit their update signals as often as new data arrives, which may be much more
+often than a screen can show and the GUI thread can draw. RefreshRateLimiter coalesces these
+signals to a maximum frame rate and records how long drawing takes. DecimatedCurve shows long
+traces (e.g. fast counter histograms with millions of bins) as min/max envelope with about two
+points per screen pixel. ScanImageItem.setImageRows (qtwidgets/scan_plotwidget.py) renders only
+the rows of an image that changed, using changed_rows.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+import math
+import time
+import numpy as np
+
+from collections import deque
+from qtpy import QtCore
+
+logger = logging.getLogger(__name__)
+
+
+def envelope_decimate(x, y, max_points):
+    """ Downsample a trace to its min/max envelope.
+
+    The trace is divided into max_points / 2 intervals of equal length. Of each interval the
+    minimum and the maximum are kept in their original order, so that peaks and the noise band
+    look the same as in the full trace when drawn with about one interval per screen pixel.
+
+    @param numpy.ndarray x: x values
+    @param numpy.ndarray y: y values of the same length
+    @param int max_points: maximum number of points returned, at least 2
+
+    @return tuple(numpy.ndarray, numpy.ndarray): decimated x and y. The input arrays if they are
+                                                 not longer than max_points.
+    """
+    n = len(y)
+    max_points = max(2, int(max_points))
+    if n <= max_points:
+        return x, y
+    size = int(math.ceil(n / (max_points // 2)))
+    full = n - n % size
+    blocks = np.asarray(y[:full]).reshape(-1, size)
+    index_min = blocks.argmin(axis=1)
+    index_max = blocks.argmax(axis=1)
+    offsets = np.arange(blocks.shape[0]) * size
+    first = [np.minimum(index_min, index_max) + offsets]
+    second = [np.maximum(index_min, index_max) + offsets]
+    if full < n:
+        rest = np.asarray(y[full:])
+        first.append([full + min(rest.argmin(), rest.argmax())])
+        second.append([full + max(rest.argmin(), rest.argmax())])
+    first = np.concatenate(first)
+    index = np.empty(2 * len(first), dtype=int)
+    index[0::2] = first
+    index[1::2] = np.concatenate(second)
+    return np.asarray(x)[index], np.asarray(y)[index]
+
+
+def changed_rows(previous, image):
+    """ Indices of the rows in which two images differ.
+
+    @param numpy.ndarray previous: the image shown so far, may be None
+    @param numpy.ndarray image: the new image
+
+    @return numpy.ndarray: row indices, None if the shapes or data types differ
+    """
+    if previous is None or previous.shape != image.shape or previous.dtype != image.dtype:
+        return None
+    differ = previous != image
+    if image.dtype.kind in 'fc':
+        differ &= ~(np.isnan(previous) & np.isnan(image))
+    return np.flatnonzero(differ.reshape(image.shape[0], -1).any(axis=1))
+
+
+class RefreshRateLimiter(QtCore.QObject):
+    """ Coalesces redraw requests to a maximum frame rate.
+
+    Connect the update signal of the logic to request instead of the drawing method. The drawing
+    method (callback) is called with the arguments of the latest request at most max_rate times
+    per second, requests in between only replace the arguments. The last request is always
+    drawn. If drawing takes long, the frame rate is reduced further so that at most the fraction
+    max_load of the GUI thread time is spent drawing.
+
+    metrics returns frame time statistics, sigFrameDrawn is emitted with the duration of every
+    frame drawn.
+    """
+    sigFrameDrawn = QtCore.Signal(float)
+
+    def __init__(self, callback, max_rate=20., max_load=0.5, parent=None):
+        """
+        @param callable callback: drawing method
+        @param float max_rate: maximum number of frames per second
+        @param float max_load: maximum fraction of time spent drawing
+        @param QObject parent: optional, parent object
+        """
+        super().__init__(parent)
+        self._callback = callback
+        self.max_rate = float(max_rate)
+        self.max_load = float(max_load)
+        self._pending = None
+        self._next_frame = 0.
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._draw)
+        self._requests = 0
+        self._frames = 0
+        self._draw_times = deque(maxlen=100)
+        self._frame_starts = deque(maxlen=100)
+
+    def request(self, *args):
+        """ Ask for a redraw with the given arguments for the callback. """
+        self._requests += 1
+        self._pending = args
+        if not self._timer.isActive():
+            delay = self._next_frame - time.perf_counter()
+            self._timer.start(max(0, int(math.ceil(delay * 1000))))
+
+    def flush(self):
+        """ Draw a pending request immediately. """
+        if self._pending is not None:
+            self._timer.stop()
+            self._draw()
+
+    def stop(self):
+        """ Discard a pending request. """
+        self._timer.stop()
+        self._pending = None
+
+    def metrics(self):
+        """ Frame time statistics.
+
+        @return dict: requests, frames drawn, requests coalesced, frame rate in Hz and the mean,
+                      maximum and last draw time in s of the last 100 frames
+        """
+        draw_times = list(self._draw_times)
+        starts = list(self._frame_starts)
+        if len(starts) > 1 and starts[-1] > starts[0]:
+            frame_rate = (len(starts) - 1) / (starts[-1] - starts[0])
+        else:
+            frame_rate = 0.
+        return {'requests': self._requests,
+                'frames': self._frames,
+                'coalesced': self._requests - self._frames,
+                'frame_rate': frame_rate,
+                'mean_draw_time': float(np.mean(draw_times)) if draw_times else 0.,
+                'max_draw_time': max(draw_times) if draw_times else 0.,
+                'last_draw_time': draw_times[-1] if draw_times else 0.}
+
+    def _draw(self):
+        if self._pending is None:
+            return
+        args = self._pending
+        self._pending = None
+        start = time.perf_counter()
+        try:
+            self._callback(*args)
+        except:
+            logger.exception('Error while drawing plot.')
+        duration = time.perf_counter() - start
+        self._next_frame = start + max(1 / self.max_rate, duration / self.max_load)
+        self._frames += 1
+        self._draw_times.append(duration)
+        self._frame_starts.append(start)
+        self.sigFrameDrawn.emit(duration)
+
+
+class DecimatedCurve:
+    """ Feeds a pyqtgraph PlotDataItem with the min/max envelope of a long trace.
+
+    Only the part of the trace in the visible x range is decimated to two points per pixel of
+    the view box width, so zooming in shows the full detail. The x values have to increase
+    monotonically. Traces with up to min_points points are drawn as they are.
+    """
+
+    def __init__(self, curve, points_per_pixel=2, min_points=10000):
+        """
+        @param pyqtgraph.PlotDataItem curve: curve to draw the trace with
+        @param float points_per_pixel: points drawn per pixel of the view box width
+        @param int min_points: traces up to this length are not decimated
+        """
+        self._curve = curve
+        self.points_per_pixel = points_per_pixel
+        self.min_points = int(min_points)
+        self._x = None
+        self._y = None
+        self._viewbox = None
+
+    def setData(self, x, y):
+        """ Show a new trace.
+
+        @param numpy.ndarray x: monotonically increasing x values
+        @param numpy.ndarray y: y values
+        """
+        self._x = np.asarray(x)
+        self._y = np.asarray(y)
+        self.refresh()
+
+    def refresh(self):
+        """ Decimate the trace for the current view range and size again. """
+        viewbox = self._curve.getViewBox()
+        if viewbox is not None and viewbox is not self._viewbox:
+            viewbox.sigXRangeChanged.connect(self.refresh)
+            viewbox.sigResized.connect(self.refresh)
+            self._viewbox = viewbox
+        if self._x is None:
+            return
+        x, y = self._x, self._y
+        if len(y) <= self.min_points:
+            self._curve.setData(x=x, y=y)
+            return
+        width = 1000
+        if viewbox is not None:
+            width = max(100, int(viewbox.width()))
+            if not viewbox.autoRangeEnabled()[0]:
+                x_min, x_max = viewbox.viewRange()[0]
+                start = max(0, np.searchsorted(x, x_min) - 1)
+                stop = min(len(x), np.searchsorted(x, x_max) + 1)
+                x, y = x[start:stop], y[start:stop]
+        x, y = envelope_decimate(x, y, self.points_per_pixel * width)
+        self._curve.setData(x=x, y=y)
@@ -25,6 +25,7 @@ import os
 import pyqtgraph as pg
 import datetime
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 from core.util import units
@@ -32,6 +33,7 @@ from core.util.helpers import natural_sort
 from gui.colordefs import QudiPalettePale as palette
 from gui.fitsettings import FitSettingsDialog
 from gui.guibase import GUIBase
+from gui.plotrefresh import RefreshRateLimiter, DecimatedCurve
 from qtpy import QtCore, QtWidgets, uic
 from qtwidgets.scientific_spinbox import ScienDSpinBox, ScienSpinBox
 from enum import Enum
@@ -146,6 +148,9 @@ class PulsedMeasurementGui(GUIBase):
     ## declare connectors
     pulsedmasterlogic = Connector(interface='PulsedMasterLogic')
 
+    # maximum number of redraws per second of the measurement plots
+    _max_refresh_rate = ConfigOption('max_refresh_rate', 20)
+
     # status var
     _ana_param_x_axis_name_text = StatusVar('ana_param_x_axis_name_LineEdit', 'Tau')
     _ana_param_x_axis_unit_text = StatusVar('ana_param_x_axis_unit_LineEdit', 's')
@@ -377,8 +382,12 @@ class PulsedMeasurementGui(GUIBase):
         pass
 
     def _connect_logic_signals(self):
-        # Connect update signals from pulsed_master_logic
-        self.pulsedmasterlogic().sigMeasurementDataUpdated.connect(self.measurement_data_updated)
+        # Connect update signals from pulsed_master_logic. Measurement data updates are coalesced
+        # to max_refresh_rate.
+        self._measurement_refresh = RefreshRateLimiter(self.measurement_data_updated,
+                                                       self._max_refresh_rate)
+        self.pulsedmasterlogic().sigMeasurementDataUpdated.connect(
+            self._measurement_refresh.request)
         self.pulsedmasterlogic().sigTimerUpdated.connect(self.measurement_timer_updated)
         self.pulsedmasterlogic().sigFitUpdated.connect(self.fit_data_updated)
         self.pulsedmasterlogic().sigMeasurementStatusUpdated.connect(self.measurement_status_updated)
@@ -539,6 +548,7 @@ class PulsedMeasurementGui(GUIBase):
     def _disconnect_logic_signals(self):
         # Disconnect update signals from pulsed_master_logic
         self.pulsedmasterlogic().sigMeasurementDataUpdated.disconnect()
+        self._measurement_refresh.stop()
         self.pulsedmasterlogic().sigTimerUpdated.disconnect()
         self.pulsedmasterlogic().sigFitUpdated.disconnect()
         self.pulsedmasterlogic().sigMeasurementStatusUpdated.disconnect()
@@ -2311,9 +2321,10 @@ class PulsedMeasurementGui(GUIBase):
 
         @return:
         """
-        signal_data = self.pulsedmasterlogic().signal_data
-        signal_alt_data = self.pulsedmasterlogic().signal_alt_data
-        measurement_error = self.pulsedmasterlogic().measurement_error
+        snapshot = self.pulsedmasterlogic().measurement_data_snapshot
+        signal_data = snapshot['signal_data']
+        signal_alt_data = snapshot['signal_alt_data']
+        measurement_error = snapshot['measurement_error']
 
         # Adjust number of data sets to plot
         self.set_plot_dimensions()
@@ -2800,6 +2811,8 @@ class PulsedMeasurementGui(GUIBase):
                                             movable=True)
         self.lasertrace_image = pg.PlotDataItem(np.arange(10), np.zeros(10), pen=palette.c1)
         self._pe.laserpulses_PlotWidget.addItem(self.lasertrace_image)
+        # long fast counter traces are drawn as envelope at screen resolution
+        self.lasertrace_curve = DecimatedCurve(self.lasertrace_image)
         self._pe.laserpulses_PlotWidget.addItem(self.sig_start_line)
         self._pe.laserpulses_PlotWidget.addItem(self.sig_end_line)
         self._pe.laserpulses_PlotWidget.addItem(self.ref_start_line)
@@ -3078,29 +3091,32 @@ class PulsedMeasurementGui(GUIBase):
         """
         laser_index = self._pe.laserpulses_ComboBox.currentIndex()
         show_raw = self._pe.laserpulses_display_raw_CheckBox.isChecked()
-        is_gated = len(self.pulsedmasterlogic().raw_data.shape) > 1
+        snapshot = self.pulsedmasterlogic().measurement_data_snapshot
+        raw_data = snapshot['raw_data']
+        laser_data = snapshot['laser_data']
+        is_gated = len(raw_data.shape) > 1
 
         # Determine the right array to plot as y-data
         if show_raw:
             if is_gated:
                 if laser_index == 0:
-                    y_data = np.sum(self.pulsedmasterlogic().raw_data, axis=0)
+                    y_data = np.sum(raw_data, axis=0)
                 else:
-                    y_data = self.pulsedmasterlogic().raw_data[laser_index - 1]
+                    y_data = raw_data[laser_index - 1]
             else:
-                y_data = self.pulsedmasterlogic().raw_data
+                y_data = raw_data
         else:
             if laser_index == 0:
-                y_data = np.sum(self.pulsedmasterlogic().laser_data, axis=0)
+                y_data = np.sum(laser_data, axis=0)
             else:
-                y_data = self.pulsedmasterlogic().laser_data[laser_index - 1]
+                y_data = laser_data[laser_index - 1]
 
         # Calculate the x-axis of the laser plot here
         bin_width = self.pulsedmasterlogic().fast_counter_settings['bin_width']
         x_data = np.arange(y_data.size, dtype=float) * bin_width
 
         # Plot data
-        self.lasertrace_image.setData(x=x_data, y=y_data)
+        self.lasertrace_curve.setData(x=x_data, y=y_data)
         return
 
 
@@ -206,7 +206,7 @@ class WavemeterLogGui(GUIBase):
                 - 6.0e17 / (self._wm_logger_logic.get_max_wavelength() + self._wm_logger_logic.get_min_wavelength())
             )
 
-        plotdata = np.array(self._wm_logger_logic.counts_with_wavelength)
+        plotdata = self._wm_logger_logic.counts_with_wavelength_view
         if len(plotdata.shape) > 1 and plotdata.shape[1] == 3:
             self.curve_data_points.setData(plotdata[:, 2:0:-1])
 
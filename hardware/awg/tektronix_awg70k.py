@@ -27,11 +27,11 @@ import visa
 import numpy as np
 
 from collections import OrderedDict
-from ftplib import FTP
 from lxml import etree as ET
 
 from core.module import Base
 from core.configoption import ConfigOption
+from core.util.ftp import FTPSessionPool
 from core.util.modules import get_home_dir
 from core.util.helpers import natural_sort
 from interface.pulser_interface import PulserInterface, PulserConstraints, SequenceOption
@@ -52,6 +52,7 @@ class AWG70K(Base, PulserInterface):
         # ftp_root_dir: 'C:\\inetpub\\ftproot' # optional, root directory on AWG device
         # ftp_login: 'anonymous' # optional, the username for ftp login
         # ftp_passwd: 'anonymous@' # optional, the password for ftp login
+        # ftp_max_sessions: 4 # optional, number of FTP sessions for parallel uploads
 
     """
 
@@ -65,6 +66,7 @@ class AWG70K(Base, PulserInterface):
     _ftp_dir = ConfigOption(name='ftp_root_dir', default='C:\\inetpub\\ftproot', missing='warn')
     _username = ConfigOption(name='ftp_login', default='anonymous', missing='warn')
     _password = ConfigOption(name='ftp_passwd', default='anonymous@', missing='warn')
+    _ftp_max_sessions = ConfigOption(name='ftp_max_sessions', default=4, missing='nothing')
 
     # translation dict from qudi trigger descriptor to device command
     __event_triggers = {'OFF': 'OFF', 'A': 'ATR', 'B': 'BTR', 'INT': 'INT'}
@@ -79,6 +81,7 @@ class AWG70K(Base, PulserInterface):
         self.awg_model = ''  # String describing the model
 
         self.ftp_working_dir = 'waves'  # subfolder of FTP root dir on AWG disk to work in
+        self._ftp_pool = None  # persistent FTP sessions to the AWG, created on activation
 
         self.__max_seq_steps = 0
         self.__max_seq_repetitions = 0
@@ -105,10 +108,13 @@ class AWG70K(Base, PulserInterface):
             # set timeout by default to 30 sec
             self.awg.timeout = self._visa_timeout * 1000
 
-        # try connecting to AWG using FTP protocol
-        with FTP(self._ip_address) as ftp:
-            ftp.login(user=self._username, passwd=self._password)
-            ftp.cwd(self.ftp_working_dir)
+        # try connecting to AWG using FTP protocol. The sessions are kept open for later uploads.
+        self._ftp_pool = FTPSessionPool(host=self._ip_address,
+                                        user=self._username,
+                                        passwd=self._password,
+                                        working_dir=self.ftp_working_dir,
+                                        max_sessions=self._ftp_max_sessions)
+        self._ftp_pool.check_connection()
 
         if self.awg is not None:
             self.awg_model = self.query('*IDN?').split(',')[1]
@@ -132,6 +138,9 @@ class AWG70K(Base, PulserInterface):
             self.awg.close()
         except:
             self.log.debug('Closing AWG connection using pyvisa failed.')
+        if self._ftp_pool is not None:
+            self._ftp_pool.close()
+            self._ftp_pool = None
         self.log.info('Closed connection to AWG')
         return
 
@@ -364,8 +373,16 @@ class AWG70K(Base, PulserInterface):
                                      set(analog_samples.keys()).union(set(digital_samples.keys()))))
             return -1, waveforms
 
-        # Write waveforms. One for each analog channel.
-        for a_ch in active_analog:
+        # Delete waveforms by the same names from the workspace. Query the list only once.
+        existing_waveforms = set(self.get_waveform_names())
+        channel_waveforms = ['{0}_ch{1:d}'.format(name, int(a_ch.split('ch')[-1]))
+                             for a_ch in active_analog]
+        obsolete = [wfm_name for wfm_name in channel_waveforms if wfm_name in existing_waveforms]
+        if obsolete:
+            self.delete_waveform(obsolete)
+
+        # Write WFMX files. One for each analog channel.
+        for a_ch, wfm_name in zip(active_analog, channel_waveforms):
             # Get the integer analog channel number
             a_ch_num = int(a_ch.split('ch')[-1])
             # Get the digital channel specifiers belonging to this analog channel markers
@@ -385,13 +402,6 @@ class AWG70K(Base, PulserInterface):
                 mrk_bytes = None
             self.log.debug('Prepare digital channel data: {0}'.format(time.time()-start))
 
-            # Create waveform name string
-            wfm_name = '{0}_ch{1:d}'.format(name, a_ch_num)
-
-            # Check if waveform already exists and delete if necessary.
-            if wfm_name in self.get_waveform_names():
-                self.delete_waveform(wfm_name)
-
             # Write WFMX file for waveform
             start = time.time()
             self._write_wfmx(filename=wfm_name,
@@ -402,31 +412,34 @@ class AWG70K(Base, PulserInterface):
                              total_number_of_samples=total_number_of_samples)
             self.log.debug('Write WFMX file: {0}'.format(time.time() - start))
 
-            # transfer waveform to AWG and load into workspace
-            start = time.time()
-            self._send_file(filename=wfm_name + '.wfmx')
-            self.log.debug('Send WFMX file: {0}'.format(time.time() - start))
+        # transfer all channel files to AWG at once
+        start = time.time()
+        if self._send_files([wfm_name + '.wfmx' for wfm_name in channel_waveforms]) < 0:
+            return -1, list()
+        self.log.debug('Send WFMX files: {0}'.format(time.time() - start))
 
-            start = time.time()
+        # load waveforms into workspace
+        start = time.time()
+        for wfm_name in channel_waveforms:
             self.write('MMEM:OPEN "{0}"'.format(os.path.join(
                 self._ftp_dir, self.ftp_working_dir, wfm_name + '.wfmx')))
-            # Wait for everything to complete
-            timeout_old = self.awg.timeout
-            # increase this time so that there is no timeout for loading longer sequences
-            # which might take some minutes
-            self.awg.timeout = 5e6
-            # the answer of the *opc-query is received as soon as the loading is finished
-            opc = int(self.query('*OPC?'))
-            # Just to make sure
-            while wfm_name not in self.get_waveform_names():
-                time.sleep(0.25)
+        # Wait for everything to complete
+        timeout_old = self.awg.timeout
+        # increase this time so that there is no timeout for loading longer sequences
+        # which might take some minutes
+        self.awg.timeout = 5e6
+        # the answer of the *opc-query is received as soon as the loading is finished
+        opc = int(self.query('*OPC?'))
+        # Just to make sure
+        while not set(channel_waveforms).issubset(self.get_waveform_names()):
+            time.sleep(0.25)
 
-            # reset the timeout
-            self.awg.timeout = timeout_old
-            self.log.debug('Load WFMX file into workspace: {0}'.format(time.time() - start))
+        # reset the timeout
+        self.awg.timeout = timeout_old
+        self.log.debug('Load WFMX files into workspace: {0}'.format(time.time() - start))
 
-            # Append created waveform name to waveform list
-            waveforms.append(wfm_name)
+        # Append created waveform names to waveform list
+        waveforms.extend(channel_waveforms)
         return total_number_of_samples, waveforms
 
     def write_sequence(self, name, sequence_parameter_list):
@@ -1500,37 +1513,14 @@ class AWG70K(Base, PulserInterface):
 
         @return list: filenames found in <ftproot>\\waves
         """
-        filename_list = list()
-        with FTP(self._ip_address) as ftp:
-            ftp.login(user=self._username, passwd=self._password)
-            ftp.cwd(self.ftp_working_dir)
-            # get only the files from the dir and skip possible directories
-            log = list()
-            ftp.retrlines('LIST', callback=log.append)
-            for line in log:
-                if '<DIR>' not in line:
-                    # that is how a potential line is looking like:
-                    #   '05-10-16  05:22PM                  292 SSR aom adjusted.seq'
-                    # The first part consists of the date information. Remove this information and
-                    # separate the first number, which indicates the size of the file. This is
-                    # necessary if the filename contains whitespaces.
-                    size_filename = line[18:].lstrip()
-                    # split after the first appearing whitespace and take the rest as filename.
-                    # Remove for safety all trailing and leading whitespaces:
-                    filename = size_filename.split(' ', 1)[1].strip()
-                    filename_list.append(filename)
-        return filename_list
+        return self._ftp_pool.list_files()
 
     def _delete_file(self, filename):
         """
 
         @param str filename:
         """
-        if filename in self._get_filenames_on_device():
-            with FTP(self._ip_address) as ftp:
-                ftp.login(user=self._username, passwd=self._password)
-                ftp.cwd(self.ftp_working_dir)
-                ftp.delete(filename)
+        self._ftp_pool.delete(filename)
         return
 
     def _send_file(self, filename):
@@ -1539,26 +1529,34 @@ class AWG70K(Base, PulserInterface):
         @param filename:
         @return:
         """
+        return self._send_files([filename])
+
+    def _send_files(self, filenames):
+        """ Upload files from the temporary work directory to the AWG.
+
+        Old files by the same names are replaced. Several files are transferred in parallel over
+        the persistent FTP sessions.
+
+        @param list filenames: names of the files in the temporary work directory
+
+        @return int: error code (0: OK, -1: error)
+        """
         # check input
-        if not filename:
+        if not filenames or not all(filenames):
             self.log.error('No filename provided for file upload to awg!\nCommand will be ignored.')
             return -1
 
-        filepath = os.path.join(self._tmp_work_dir, filename)
-        if not os.path.isfile(filepath):
-            self.log.error('No file "{0}" found in "{1}". Unable to upload!'
-                           ''.format(filename, self._tmp_work_dir))
-            return -1
-
-        # Delete old file on AWG by the same filename
-        self._delete_file(filename)
+        files = list()
+        for filename in filenames:
+            filepath = os.path.join(self._tmp_work_dir, filename)
+            if not os.path.isfile(filepath):
+                self.log.error('No file "{0}" found in "{1}". Unable to upload!'
+                               ''.format(filename, self._tmp_work_dir))
+                return -1
+            files.append((filepath, filename))
 
-        # Transfer file
-        with FTP(self._ip_address) as ftp:
-            ftp.login(user=self._username, passwd=self._password)
-            ftp.cwd(self.ftp_working_dir)
-            with open(filepath, 'rb') as file:
-                ftp.storbinary('STOR ' + filename, file)
+        # Transfer files, deleting old files on AWG by the same filenames
+        self._ftp_pool.upload_many(files, overwrite=True)
         return 0
 
     def _write_wfmx(self, filename, analog_samples, marker_bytes, is_first_chunk, is_last_chunk,
@@ -25,9 +25,9 @@ import os
 import time
 import visa
 import numpy as np
-from ftplib import FTP
 from collections import OrderedDict
 
+from core.util.ftp import FTPSessionPool
 from core.util.modules import get_home_dir
 from core.util.helpers import natural_sort
 from core.module import Base
@@ -50,6 +50,7 @@ class AWG7k(Base, PulserInterface):
         # ftp_root_dir: 'C:\\inetpub\\ftproot' # optional, root directory on AWG device
         # ftp_login: 'anonymous' # optional, the username for ftp login
         # ftp_passwd: 'anonymous@' # optional, the password for ftp login
+        # ftp_max_sessions: 4 # optional, number of FTP sessions for parallel uploads
 
     """
 
@@ -62,6 +63,7 @@ class AWG7k(Base, PulserInterface):
     _ftp_dir = ConfigOption(name='ftp_root_dir', default='C:\\inetpub\\ftproot', missing='warn')
     _username = ConfigOption(name='ftp_login', default='anonymous', missing='warn')
     _password = ConfigOption(name='ftp_passwd', default='anonymous@', missing='warn')
+    _ftp_max_sessions = ConfigOption(name='ftp_max_sessions', default=4, missing='nothing')
     _visa_timeout = ConfigOption(name='timeout', default=30, missing='nothing')
 
     def __init__(self, config, **kwargs):
@@ -73,6 +75,7 @@ class AWG7k(Base, PulserInterface):
         self.awg = None  # This variable will hold a reference to the awg visa resource
 
         self.ftp_working_dir = 'waves'  # subfolder of FTP root dir on AWG disk to work in
+        self._ftp_pool = None  # persistent FTP sessions to the AWG, created on activation
 
         self.installed_options = list()  # will hold the encoded installed options available on awg
         self._internal_ch_state = {
@@ -104,11 +107,13 @@ class AWG7k(Base, PulserInterface):
                 'the connection by using for example "Agilent Connection Expert".'
                 ''.format(self._visa_address))
 
-        # try connecting to AWG using FTP protocol
-        with FTP(self._ip_address) as ftp:
-            ftp.login(user=self._username, passwd=self._password)
-            ftp.cwd(self.ftp_working_dir)
-            self.log.debug('FTP working dir: {0}'.format(ftp.pwd()))
+        # try connecting to AWG using FTP protocol. The sessions are kept open for later uploads.
+        self._ftp_pool = FTPSessionPool(host=self._ip_address,
+                                        user=self._username,
+                                        passwd=self._password,
+                                        working_dir=self.ftp_working_dir,
+                                        max_sessions=self._ftp_max_sessions)
+        self.log.debug('FTP working dir: {0}'.format(self._ftp_pool.check_connection()))
 
         idn = self.query('*IDN?').split(',')
         self.mfg, self.model, self.ser, self.fw_ver = idn
@@ -137,6 +142,9 @@ class AWG7k(Base, PulserInterface):
             self.awg.close()
         except:
             self.log.debug('Closing AWG connection using pyvisa failed.')
+        if self._ftp_pool is not None:
+            self._ftp_pool.close()
+            self._ftp_pool = None
         self.log.info('Closed connection to AWG')
         return
 
@@ -937,7 +945,7 @@ class AWG7k(Base, PulserInterface):
                                      set(analog_samples.keys()).union(set(digital_samples.keys()))))
             return -1, waveforms
 
-        # Write waveforms. One for each analog channel.
+        # Write WFM files. One for each analog channel.
         for a_ch in active_analog:
             # Get the integer analog channel number
             a_ch_num = int(a_ch.rsplit('ch', 1)[1])
@@ -971,24 +979,25 @@ class AWG7k(Base, PulserInterface):
                             total_number_of_samples=total_number_of_samples)
 
             self.log.debug('Write WFM file: {0}'.format(time.time() - start))
+            waveforms.append(wfm_name)
 
-            # transfer waveform to AWG and load into workspace
-            start = time.time()
-            self._send_file(filename=wfm_name + '.wfm')
-            self.log.debug('Send WFM file: {0}'.format(time.time() - start))
+        # transfer all channel files to AWG at once
+        start = time.time()
+        if self._send_files([wfm_name + '.wfm' for wfm_name in waveforms]) < 0:
+            return -1, list()
+        self.log.debug('Send WFM files: {0}'.format(time.time() - start))
 
-            start = time.time()
+        # load waveforms into workspace
+        start = time.time()
+        for wfm_name in waveforms:
             self.write('MMEM:IMP "{0}","{1}",WFM'.format(wfm_name, wfm_name + '.wfm'))
-            # Wait for everything to complete
-            while int(self.query('*OPC?')) != 1:
-                time.sleep(0.2)
-            # Just to make sure
-            while wfm_name not in self.get_waveform_names():
-                time.sleep(0.2)
-            self.log.debug('Load WFM file into workspace: {0}'.format(time.time() - start))
-
-            # Append created waveform name to waveform list
-            waveforms.append(wfm_name)
+        # Wait for everything to complete
+        while int(self.query('*OPC?')) != 1:
+            time.sleep(0.2)
+        # Just to make sure
+        while not set(waveforms).issubset(self.get_waveform_names()):
+            time.sleep(0.2)
+        self.log.debug('Load WFM files into workspace: {0}'.format(time.time() - start))
         return total_number_of_samples, waveforms
 
     def write_sequence(self, name, sequence_parameter_list):
@@ -1239,11 +1248,7 @@ class AWG7k(Base, PulserInterface):
 
         @param str filename: The full filename to delete from FTP cwd
         """
-        if filename in self._get_filenames_on_device():
-            with FTP(self._ip_address) as ftp:
-                ftp.login(user=self._username, passwd=self._password)
-                ftp.cwd(self.ftp_working_dir)
-                ftp.delete(filename)
+        self._ftp_pool.delete(filename)
         return
 
     def _send_file(self, filename):
@@ -1252,26 +1257,34 @@ class AWG7k(Base, PulserInterface):
         @param filename:
         @return:
         """
+        return self._send_files([filename])
+
+    def _send_files(self, filenames):
+        """ Upload files from the temporary work directory to the AWG.
+
+        Old files by the same names are replaced. Several files are transferred in parallel over
+        the persistent FTP sessions.
+
+        @param list filenames: names of the files in the temporary work directory
+
+        @return int: error code (0: OK, -1: error)
+        """
         # check input
-        if not filename:
+        if not filenames or not all(filenames):
             self.log.error('No filename provided for file upload to awg!\nCommand will be ignored.')
             return -1
 
-        filepath = os.path.join(self._tmp_work_dir, filename)
-        if not os.path.isfile(filepath):
-            self.log.error('No file "{0}" found in "{1}". Unable to upload!'
-                           ''.format(filename, self._tmp_work_dir))
-            return -1
-
-        # Delete old file on AWG by the same filename
-        self._delete_file(filename)
+        files = list()
+        for filename in filenames:
+            filepath = os.path.join(self._tmp_work_dir, filename)
+            if not os.path.isfile(filepath):
+                self.log.error('No file "{0}" found in "{1}". Unable to upload!'
+                               ''.format(filename, self._tmp_work_dir))
+                return -1
+            files.append((filepath, filename))
 
-        # Transfer file
-        with FTP(self._ip_address) as ftp:
-            ftp.login(user=self._username, passwd=self._password)
-            ftp.cwd(self.ftp_working_dir)
-            with open(filepath, 'rb') as file:
-                ftp.storbinary('STOR ' + filename, file)
+        # Transfer files, deleting old files on AWG by the same filenames
+        self._ftp_pool.upload_many(files, overwrite=True)
         return 0
 
     def _get_filenames_on_device(self):
@@ -1279,26 +1292,7 @@ class AWG7k(Base, PulserInterface):
 
         @return list: filenames found in <ftproot>\\waves
         """
-        filename_list = list()
-        with FTP(self._ip_address) as ftp:
-            ftp.login(user=self._username, passwd=self._password)
-            ftp.cwd(self.ftp_working_dir)
-            # get only the files from the dir and skip possible directories
-            log = list()
-            ftp.retrlines('LIST', callback=log.append)
-            for line in log:
-                if '<DIR>' not in line:
-                    # that is how a potential line is looking like:
-                    #   '05-10-16  05:22PM                  292 SSR aom adjusted.seq'
-                    # The first part consists of the date information. Remove this information and
-                    # separate the first number, which indicates the size of the file. This is
-                    # necessary if the filename contains whitespaces.
-                    size_filename = line[18:].lstrip()
-                    # split after the first appearing whitespace and take the rest as filename.
-                    # Remove for safety all trailing and leading whitespaces:
-                    filename = size_filename.split(' ', 1)[1].strip()
-                    filename_list.append(filename)
-        return filename_list
+        return self._ftp_pool.list_files()
 
     def _get_all_channels(self):
         """
@@ -47,6 +47,7 @@ class CameraDummy(Base, CameraInterface):
 
     _live = False
     _acquiring = False
+    _spot = None
     _exposure = ConfigOption('exposure', .1)
     _gain = ConfigOption('gain', 1.)
 
@@ -119,8 +120,15 @@ class CameraDummy(Base, CameraInterface):
 
         Each pixel might be a float, integer or sub pixels
         """
-        data = np.random.random(self._resolution)*self._exposure*self._gain
-        return data.transpose()
+        width, height = self._resolution
+        if self._spot is None or self._spot.shape != (height, width):
+            # a gaussian spot in the image center on a dark background
+            y, x = np.ogrid[:height, :width]
+            sigma = min(width, height) / 10
+            self._spot = 4 * np.exp(-((x - width / 2) ** 2 + (y - height / 2) ** 2)
+                                    / (2 * sigma ** 2))
+        data = (self._spot + np.random.random((height, width))) * self._exposure * self._gain
+        return data
 
     def set_exposure(self, exposure):
         """ Set the exposure time in seconds
@@ -0,0 +1,618 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains a software stand-in for the PyDAQmx package, simulating an NI X series card.
+
+It implements the subset of the DAQmx C API used by national_instruments_x_series.py with the
+same call signatures, so that the hardware module can be run, tested and benchmarked without a
+card. Activate it with the config option 'simulated: True' of NationalInstrumentsXSeries.
+
+What is simulated:
+  * counter output clocks (CreateCOPulseChanFreq) with finite or continuous implicit timing
+  * analog outputs, on demand or sample clocked from a clock terminal ('<counter>InternalOutput')
+  * counter inputs measuring semi periods of a clock (photon counts per half period) or counting
+    edges (cumulative photon counts) sampled by a clock
+  * analog inputs sampled by a clock
+Samples are produced in real time from the start of the clock, reads block until enough samples
+are available and raise a DAQError on timeout, like the real driver. The photon count rate is
+computed from the analog output voltages at each sample by the module level function count_rate,
+which may be replaced. call_latency is added to every DAQmx call and commit_latency to starting
+a task whose configuration changed since it was started last, to mimic the driver overhead.
+call_count counts the DAQmx calls.
+Gated counting (pulse width channels) and digital outputs are accepted but produce no data.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import ctypes
+import threading
+import time
+
+import numpy as np
+
+# constants, values as in NIDAQmx.h
+DAQmx_Val_Rising = 10280
+DAQmx_Val_Falling = 10171
+DAQmx_Val_FiniteSamps = 10178
+DAQmx_Val_ContSamps = 10123
+DAQmx_Val_OnDemand = 10390
+DAQmx_Val_SampClk = 10388
+DAQmx_Val_GroupByChannel = 0
+DAQmx_Val_GroupByScanNumber = 1
+DAQmx_Val_Volts = 10348
+DAQmx_Val_Hz = 10373
+DAQmx_Val_Ticks = 10304
+DAQmx_Val_Seconds = 10364
+DAQmx_Val_RSE = 10083
+DAQmx_Val_Diff = 10106
+DAQmx_Val_High = 10192
+DAQmx_Val_Low = 10214
+DAQmx_Val_CurrReadPos = 10425
+DAQmx_Val_FirstSample = 10424
+DAQmx_Val_MostRecentSamp = 10428
+DAQmx_Val_DoNotOverwriteUnreadSamps = 10159
+DAQmx_Val_OverwriteUnreadSamps = 10252
+DAQmx_Val_DoNotInvertPolarity = 0
+DAQmx_Val_InvertPolarity = 1
+DAQmx_Val_ChanForAllLines = 1
+DAQmx_Val_ChanPerLine = 0
+DAQmx_Val_CountUp = 10128
+
+# error codes
+_TIMEOUT_ERROR = -200284
+_RUNNING_ERROR = -200479
+_INVALID_TASK_ERROR = -200088
+
+# ctypes types used with the API
+int32 = ctypes.c_int32
+uInt32 = ctypes.c_uint32
+bool32 = ctypes.c_uint32
+float64 = ctypes.c_double
+c_int32 = ctypes.c_int32
+c_uint32 = ctypes.c_uint32
+
+# simulation settings
+call_latency = 0.
+commit_latency = 0.
+# number of DAQmx calls so far
+call_count = 0
+rng = np.random.RandomState()
+
+
+def count_rate(voltages):
+    """ Photon count rate of the simulated sample at the given scanner voltages.
+
+    A square lattice of bright spots with a spacing of 1 V on top of a background.
+
+    @param float[n][m] voltages: voltages of the n analog outputs at m samples
+
+    @return float[m]: count rate in counts/s
+    """
+    x = voltages[0] if len(voltages) > 0 else 0.
+    y = voltages[1] if len(voltages) > 1 else 0.
+    return 2e4 + 4e5 * (np.cos(np.pi * x) * np.cos(np.pi * y)) ** 16
+
+
+class DAQError(Exception):
+    """ Error raised by a DAQmx function, like PyDAQmx.DAQError. """
+
+    def __init__(self, error, mess, fname):
+        super().__init__('{0} in function {1}'.format(mess, fname))
+        self.error = error
+        self.mess = mess
+        self.fname = fname
+
+
+class TaskHandle:
+    """ Handle of a task, filled by DAQmxCreateTask. """
+
+    def __init__(self, value=None):
+        self.value = value
+
+
+def byref(obj):
+    """ The simulated functions write to the objects directly. """
+    return obj
+
+
+class _Channel:
+    def __init__(self, kind, name, **kwargs):
+        self.kind = kind
+        self.name = name
+        self.__dict__.update(kwargs)
+
+
+class _Task:
+    """ State of a simulated task. """
+
+    def __init__(self, name):
+        self.name = name
+        self.channels = list()
+        # (source terminal, rate, sample mode, samples per channel) or None for on demand
+        self.samp_clk = None
+        # (sample mode, samples per channel) for counters
+        self.implicit = None
+        self.read_offset = 0
+        self.running = False
+        self.committed = False
+        self.t_start = 0.
+        self.run_id = 0
+        # analog output samples written, used from the next start on
+        self.pending = None
+        self.reset_data()
+
+    def reset_data(self):
+        # clock run the samples are taken from and the clock edge of the first sample
+        self.clock_run = None
+        self.edge_base = 0
+        # samples acquired in previous clock runs
+        self.samples_before = 0
+        self.acquired = 0
+        self.read_pos = 0
+        self.unread = None
+        self.cumulative = None
+        self.written = None
+
+    @property
+    def kind(self):
+        return self.channels[0].kind if self.channels else None
+
+    def n_channels(self):
+        return len(self.channels)
+
+    def timing(self):
+        """ (clock terminal, sample mode, number of samples, samples per clock edge) """
+        if self.kind in ('ci_semi', 'ci_pulse_width'):
+            source = getattr(self.channels[0], 'term', None)
+            mode, samples = self.implicit if self.implicit else (DAQmx_Val_ContSamps, 1000)
+            return source, mode, samples, 2
+        if self.samp_clk is None:
+            return None, None, 0, 1
+        source, rate, mode, samples = self.samp_clk
+        return source, mode, samples, 1
+
+    def clock_edges(self, t):
+        """ Number of clock edges generated until time t, for counter output tasks. """
+        if not self.running or t < self.t_start:
+            return 0
+        edges = int((t - self.t_start) * self.channels[0].freq) + 1
+        if self.implicit is not None and self.implicit[0] == DAQmx_Val_FiniteSamps:
+            edges = min(edges, self.implicit[1])
+        return edges
+
+    def is_done(self, t):
+        if not self.running:
+            return True
+        if self.kind == 'co':
+            return (self.implicit is not None and self.implicit[0] == DAQmx_Val_FiniteSamps
+                    and self.clock_edges(t) >= self.implicit[1])
+        source, mode, samples, per_edge = self.timing()
+        if mode != DAQmx_Val_FiniteSamps:
+            return False
+        _device.update(self, t)
+        return self.acquired >= samples
+
+
+class _Device:
+    """ State of the simulated card(s). """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tasks = dict()
+        self.ao_values = dict()
+        self.connections = dict()
+
+    def task(self, handle):
+        task = self.tasks.get(id(handle.value) if isinstance(handle, TaskHandle) else None)
+        if task is None:
+            raise DAQError(_INVALID_TASK_ERROR, 'Task specified is invalid or does not exist.',
+                           'DAQmx')
+        return task
+
+    def clock(self, terminal):
+        """ The running counter output task generating the terminal. """
+        if terminal is None:
+            return None
+        for task in self.tasks.values():
+            if (task.kind == 'co' and task.running
+                    and terminal.lower() == (task.channels[0].physical + 'InternalOutput').lower()):
+                return task
+        return None
+
+    def static_voltages(self):
+        return np.array([[v] for v in self.ao_values.values()]) if self.ao_values \
+            else np.zeros((0, 1))
+
+    def voltages_at(self, clock, edges):
+        """ Analog output voltages at clock edges of the current run of clock. """
+        for task in self.tasks.values():
+            if task.kind == 'ao' and task.running:
+                self.update(task, time.perf_counter())
+            if (task.kind == 'ao' and task.running and task.written is not None
+                    and task.clock_run == (id(clock), clock.run_id)):
+                index = edges - task.edge_base + task.samples_before
+                n = task.written.shape[1]
+                if task.timing()[1] == DAQmx_Val_ContSamps:
+                    index = index % n
+                return task.written[:, np.clip(index, 0, n - 1)]
+        return np.repeat(self.static_voltages(), len(edges), axis=1)
+
+    def update(self, task, t):
+        """ Produce the samples of a clocked task up to time t. """
+        source, mode, samples, per_edge = task.timing()
+        if not task.running:
+            return
+        clock = self.clock(source)
+        if clock is None:
+            return
+        if task.clock_run != (id(clock), clock.run_id):
+            task.clock_run = (id(clock), clock.run_id)
+            task.samples_before = task.acquired
+            task.edge_base = clock.clock_edges(task.t_start) if clock.t_start < task.t_start \
+                else 0
+        total = task.samples_before + (clock.clock_edges(t) - task.edge_base) * per_edge
+        if mode == DAQmx_Val_FiniteSamps:
+            total = min(total, samples)
+        if total <= task.acquired:
+            return
+        index = np.arange(task.acquired, total)
+        edges = (index - task.samples_before) // per_edge + task.edge_base
+        freq = clock.channels[0].freq
+        if task.kind == 'ao':
+            if task.written is not None:
+                n = task.written.shape[1]
+                last = (total - 1) % n if mode == DAQmx_Val_ContSamps else min(total, n) - 1
+                for channel, value in zip(task.channels, task.written[:, last]):
+                    self.ao_values[channel.physical] = value
+            task.acquired = total
+            return
+        if task.kind == 'ci_semi':
+            new = rng.poisson(count_rate(self.voltages_at(clock, edges)) / (2 * freq))
+            new = new.astype(np.float64)[np.newaxis]
+        elif task.kind == 'ci_edges':
+            # photons counted between the previous clock edge and this one
+            counts = rng.poisson(count_rate(self.voltages_at(clock, edges - 1)) / freq)
+            counts[edges == task.edge_base] = 0
+            if task.cumulative is None:
+                task.cumulative = 0
+            new = (task.cumulative + np.cumsum(counts)) % 2**32
+            task.cumulative = int(new[-1])
+            new = new.astype(np.float64)[np.newaxis]
+        elif task.kind == 'ai':
+            new = rng.normal(0, 1e-3, (task.n_channels(), len(index)))
+        else:
+            new = np.zeros((task.n_channels(), len(index)))
+        task.unread = new if task.unread is None else np.concatenate((task.unread, new), axis=1)
+        task.acquired = total
+
+    def read(self, handle, samples, timeout, out, layout, fname):
+        """ Blocking read of samples per channel into out. """
+        task = self.task(handle)
+        if samples < 0:
+            with self.lock:
+                self.update(task, time.perf_counter())
+                samples = 0 if task.unread is None else task.unread.shape[1] - task.read_offset
+        deadline = time.perf_counter() + (timeout if timeout >= 0 else np.inf)
+        while True:
+            with self.lock:
+                self.update(task, time.perf_counter())
+                available = 0 if task.unread is None else task.unread.shape[1]
+                if available >= samples + task.read_offset:
+                    start = task.read_offset
+                    data = task.unread[:, start:start + samples]
+                    task.unread = task.unread[:, start + samples:]
+                    task.read_pos += start + samples
+                    break
+                clock = self.clock(task.timing()[0])
+                wait = 1e-3 if clock is None else \
+                    (samples + task.read_offset - available) / clock.channels[0].freq / 2
+            now = time.perf_counter()
+            if now >= deadline:
+                raise DAQError(_TIMEOUT_ERROR,
+                               'Wait Until Done did not indicate all samples were acquired '
+                               'in the time allotted.', fname)
+            time.sleep(max(min(wait, deadline - now), 1e-5))
+        if layout == DAQmx_Val_GroupByScanNumber:
+            data = data.T
+        out = np.asarray(out)
+        out.reshape(-1)[:data.size] = data.reshape(-1)
+        return samples
+
+
+_device = _Device()
+
+
+def _call():
+    global call_count
+    call_count += 1
+    if call_latency > 0:
+        time.sleep(call_latency)
+
+
+def _configure(handle):
+    task = _device.task(handle)
+    task.committed = False
+    return task
+
+
+def _physical_channels(channels):
+    return [c.strip() for c in channels.split(',') if c.strip()]
+
+
+def DAQmxCreateTask(name, handle):
+    _call()
+    with _device.lock:
+        task = _Task(name)
+        handle.value = task
+        _device.tasks[id(task)] = task
+    return 0
+
+
+def DAQmxClearTask(handle):
+    _call()
+    with _device.lock:
+        task = _device.task(handle)
+        DAQmxStopTask(handle)
+        del _device.tasks[id(task)]
+    return 0
+
+
+def DAQmxStartTask(handle):
+    _call()
+    with _device.lock:
+        task = _device.task(handle)
+        if task.running:
+            raise DAQError(_RUNNING_ERROR,
+                           'Specified operation cannot be performed while the task is running.',
+                           'DAQmxStartTask')
+        if not task.committed and commit_latency > 0:
+            time.sleep(commit_latency)
+        task.committed = True
+        task.reset_data()
+        task.running = True
+        task.run_id += 1
+        task.t_start = time.perf_counter()
+        if task.kind == 'ao' and task.samp_clk is None and task.pending is not None:
+            for channel, value in zip(task.channels, task.pending[:, -1]):
+                _device.ao_values[channel.physical] = value
+        elif task.kind == 'ao':
+            task.written = task.pending
+    return 0
+
+
+def DAQmxStopTask(handle):
+    _call()
+    with _device.lock:
+        task = _device.task(handle)
+        if task.running:
+            _device.update(task, time.perf_counter())
+        task.running = False
+    return 0
+
+
+def DAQmxIsTaskDone(handle, done):
+    _call()
+    with _device.lock:
+        done.value = _device.task(handle).is_done(time.perf_counter())
+    return 0
+
+
+def DAQmxWaitUntilTaskDone(handle, timeout):
+    _call()
+    deadline = time.perf_counter() + (timeout if timeout >= 0 else np.inf)
+    while True:
+        with _device.lock:
+            if _device.task(handle).is_done(time.perf_counter()):
+                return 0
+        if time.perf_counter() >= deadline:
+            raise DAQError(_TIMEOUT_ERROR,
+                           'Wait Until Done did not indicate all samples were acquired '
+                           'in the time allotted.', 'DAQmxWaitUntilTaskDone')
+        time.sleep(1e-4)
+
+
+def DAQmxGetTaskNumChans(handle, data):
+    _call()
+    data.value = _device.task(handle).n_channels()
+    return 0
+
+
+def DAQmxResetDevice(device):
+    _call()
+    with _device.lock:
+        prefix = '/{0}/'.format(device.strip('/')).lower()
+        for task in _device.tasks.values():
+            if any(c.physical.lower().startswith(prefix) for c in task.channels):
+                task.running = False
+        _device.connections.clear()
+    return 0
+
+
+def DAQmxConnectTerms(source, destination, polarity):
+    _call()
+    _device.connections[destination] = source
+    return 0
+
+
+def DAQmxDisconnectTerms(source, destination):
+    _call()
+    _device.connections.pop(destination, None)
+    return 0
+
+
+def DAQmxCreateCOPulseChanFreq(handle, counter, name, units, idle, delay, freq, duty):
+    _call()
+    task = _configure(handle)
+    task.channels.append(_Channel('co', name, physical=counter, freq=float(freq), duty=duty))
+    return 0
+
+
+def DAQmxCreateAOVoltageChan(handle, channels, name, vmin, vmax, units, scale):
+    _call()
+    task = _configure(handle)
+    for channel in _physical_channels(channels):
+        task.channels.append(_Channel('ao', name, physical=channel, vmin=vmin, vmax=vmax))
+        _device.ao_values.setdefault(channel, 0.)
+    task.pending = None
+    return 0
+
+
+def DAQmxCreateAIVoltageChan(handle, channels, name, config, vmin, vmax, units, scale):
+    _call()
+    task = _configure(handle)
+    for channel in _physical_channels(channels):
+        task.channels.append(_Channel('ai', name, physical=channel))
+    return 0
+
+
+def DAQmxCreateCISemiPeriodChan(handle, counter, name, vmin, vmax, units, scale):
+    _call()
+    _configure(handle).channels.append(_Channel('ci_semi', name, physical=counter))
+    return 0
+
+
+def DAQmxCreateCICountEdgesChan(handle, counter, name, edge, initial, direction):
+    _call()
+    _configure(handle).channels.append(_Channel('ci_edges', name, physical=counter))
+    return 0
+
+
+def DAQmxCreateCIPulseWidthChan(handle, counter, name, vmin, vmax, units, edge, scale):
+    _call()
+    _configure(handle).channels.append(_Channel('ci_pulse_width', name, physical=counter))
+    return 0
+
+
+def DAQmxCreateDOChan(handle, lines, name, grouping):
+    _call()
+    _configure(handle).channels.append(_Channel('do', name, physical=lines))
+    return 0
+
+
+def _set_channel_attribute(handle, name, value):
+    _call()
+    for channel in _configure(handle).channels:
+        setattr(channel, name, value)
+    return 0
+
+
+def DAQmxSetCISemiPeriodTerm(handle, channel, terminal):
+    return _set_channel_attribute(handle, 'term', terminal)
+
+
+def DAQmxSetCIPulseWidthTerm(handle, channel, terminal):
+    return _set_channel_attribute(handle, 'term', terminal)
+
+
+def DAQmxSetCICountEdgesTerm(handle, channel, terminal):
+    return _set_channel_attribute(handle, 'source', terminal)
+
+
+def DAQmxSetCICtrTimebaseSrc(handle, channel, terminal):
+    return _set_channel_attribute(handle, 'source', terminal)
+
+
+def DAQmxCfgImplicitTiming(handle, mode, samples):
+    _call()
+    _configure(handle).implicit = (mode, int(samples))
+    return 0
+
+
+def DAQmxCfgSampClkTiming(handle, source, rate, edge, mode, samples):
+    _call()
+    _configure(handle).samp_clk = (source, float(rate), mode, int(samples))
+    return 0
+
+
+def DAQmxSetSampTimingType(handle, timing_type):
+    _call()
+    task = _configure(handle)
+    if timing_type == DAQmx_Val_OnDemand:
+        task.samp_clk = None
+    return 0
+
+
+def DAQmxSetReadRelativeTo(handle, relative_to):
+    _call()
+    _device.task(handle).read_relative_to = relative_to
+    return 0
+
+
+def DAQmxSetReadOffset(handle, offset):
+    _call()
+    _device.task(handle).read_offset = int(offset)
+    return 0
+
+
+def DAQmxSetReadOverWrite(handle, overwrite):
+    _call()
+    _device.task(handle).read_overwrite = overwrite
+    return 0
+
+
+def DAQmxSetReadReadAllAvailSamp(handle, value):
+    _call()
+    _device.task(handle).read_all_available = bool(value)
+    return 0
+
+
+def DAQmxWriteAnalogF64(handle, samples, autostart, timeout, layout, data, written, reserved):
+    _call()
+    with _device.lock:
+        task = _device.task(handle)
+        data = np.array(data, dtype=np.float64).reshape(-1)[:task.n_channels() * samples]
+        data = data.reshape((task.n_channels(), samples)) if layout == DAQmx_Val_GroupByChannel \
+            else data.reshape((samples, task.n_channels())).T
+        task.pending = data
+        if task.samp_clk is None:
+            if autostart or task.running:
+                for channel, value in zip(task.channels, data[:, -1]):
+                    _device.ao_values[channel.physical] = value
+        elif task.running:
+            task.written = data
+        if written is not None:
+            written.value = samples
+    if autostart and task.samp_clk is not None and not task.running:
+        DAQmxStartTask(handle)
+    return 0
+
+
+def DAQmxWriteDigitalU32(handle, samples, autostart, timeout, layout, data, written, reserved):
+    _call()
+    _device.task(handle)
+    if written is not None:
+        written.value = samples
+    return 0
+
+
+def DAQmxReadCounterU32(handle, samples, timeout, data, size, read, reserved):
+    _call()
+    read.value = _device.read(handle, samples, timeout, data, DAQmx_Val_GroupByChannel,
+                              'DAQmxReadCounterU32')
+    return 0
+
+
+def DAQmxReadCounterF64(handle, samples, timeout, data, size, read, reserved):
+    _call()
+    read.value = _device.read(handle, samples, timeout, data, DAQmx_Val_GroupByChannel,
+                              'DAQmxReadCounterF64')
+    return 0
+
+
+def DAQmxReadAnalogF64(handle, samples, timeout, layout, data, size, read, reserved):
+    _call()
+    read.value = _device.read(handle, samples, timeout, data, layout, 'DAQmxReadAnalogF64')
+    return 0
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-A module to control the QO Raspberry Pi based H-Bridge hardware.
+A module to log instrument values to InfluxDB.
 
 Qudi is free software: you can redistribute it and/or modify
 it under the terms of the GNU General Public License as published by
@@ -19,15 +19,211 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import json
+import os
+import threading
+import time
+
+from collections import deque
+
 from core.module import Base
 from core.configoption import ConfigOption
+from core.util.modules import get_home_dir
 from interface.data_logger_interface import DataLoggerInterface
 
 from influxdb import InfluxDBClient
 
+
+class BufferedPointWriter:
+    """ Collect data points and write them in batches from a background thread.
+
+    Points are flushed when batch_size points are waiting or flush_interval seconds have passed,
+    whatever comes first. Adding a point never blocks on the database.
+    If a batch can not be written, it is appended to a local spool file (one JSON point per line)
+    and the spool is replayed in order as soon as the database is reachable again. While a spool
+    exists, new batches are appended to it so the chronological order is kept.
+    """
+
+    def __init__(self, write_func, batch_size=500, flush_interval=1.0, spool_file=None,
+                 retry_interval=10.0, max_buffer=100000, log=None):
+        """
+        @param callable write_func: function writing a list of points, raising on failure
+        @param int batch_size: maximum number of points written at once
+        @param float flush_interval: maximum time in seconds a point waits in the buffer
+        @param str spool_file: path of the spool file. Without spool file, unwritten points are lost.
+        @param float retry_interval: time in seconds between attempts to replay the spool
+        @param int max_buffer: maximum number of buffered points, the oldest points are dropped
+        @param logging.Logger log: optional logger for errors
+        """
+        self._write_func = write_func
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.spool_file = spool_file
+        self.retry_interval = float(retry_interval)
+        self._log = log
+
+        self._buffer = deque(maxlen=int(max_buffer))
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._stop_requested = False
+        self._thread = None
+        self._last_retry = 0
+        self._online = True
+
+        self.points_written = 0
+        self.points_spooled = 0
+        self.points_dropped = 0
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def spooled_points(self):
+        """ Number of points waiting in the spool file. """
+        if not self.spool_file or not os.path.isfile(self.spool_file):
+            return 0
+        with open(self.spool_file, 'r') as file:
+            return sum(1 for line in file if line.strip())
+
+    def start(self):
+        """ Start the background writer thread. """
+        if self.is_running:
+            return
+        self._stop_requested = False
+        self._thread = threading.Thread(target=self._run, name='BufferedPointWriter', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """ Write (or spool) all remaining points and stop the background thread.
+
+        @param float timeout: maximum time to wait for the thread to finish
+        """
+        with self._condition:
+            self._stop_requested = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add(self, point):
+        """ Add a data point to the buffer.
+
+        @param dict point: data point in the format of the database API
+        """
+        with self._condition:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.points_dropped += 1
+            self._buffer.append(point)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """ Ask the background thread to write all buffered points now. """
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify()
+
+    def _run(self):
+        """ Background loop waiting for full batches, timeouts or stop requests. """
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while (len(self._buffer) < self.batch_size and not self._flush_requested
+                       and not self._stop_requested):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                points = list(self._buffer)
+                self._buffer.clear()
+                self._flush_requested = False
+                stop = self._stop_requested
+            self._process(points, force_retry=stop)
+            if stop:
+                return
+
+    def _process(self, points, force_retry=False):
+        """ Write points, spooling them if the database is not reachable. """
+        if self.spool_file and os.path.isfile(self.spool_file):
+            # keep order: new points go behind the spooled ones
+            self._spool(points)
+            now = time.monotonic()
+            if force_retry or self._online or now - self._last_retry >= self.retry_interval:
+                self._last_retry = now
+                self._replay_spool()
+            return
+
+        for start in range(0, len(points), self.batch_size):
+            batch = points[start:start + self.batch_size]
+            if not self._write(batch):
+                if self.spool_file:
+                    self._spool(points[start:])
+                else:
+                    self.points_dropped += len(points) - start
+                self._last_retry = time.monotonic()
+                return
+
+    def _write(self, batch):
+        """ Write a single batch. Returns False on failure. """
+        try:
+            self._write_func(batch)
+        except Exception as e:
+            if self._online and self._log is not None:
+                self._log.warning('Writing data points failed, spooling to disk until the '
+                                  'database is reachable again: {0}'.format(e))
+            self._online = False
+            return False
+        if not self._online and self._log is not None:
+            self._log.info('Database reachable again.')
+        self._online = True
+        self.points_written += len(batch)
+        return True
+
+    def _spool(self, points):
+        """ Append points to the spool file. """
+        if not points:
+            return
+        try:
+            with open(self.spool_file, 'a') as file:
+                for point in points:
+                    file.write(json.dumps(point) + '\n')
+            self.points_spooled += len(points)
+        except OSError as e:
+            self.points_dropped += len(points)
+            if self._log is not None:
+                self._log.error('Could not write to spool file "{0}": {1}'
+                                ''.format(self.spool_file, e))
+
+    def _replay_spool(self):
+        """ Write the spooled points in batches. Points not written remain in the spool. """
+        with open(self.spool_file, 'r') as file:
+            points = [json.loads(line) for line in file if line.strip()]
+        written = 0
+        for start in range(0, len(points), self.batch_size):
+            if not self._write(points[start:start + self.batch_size]):
+                break
+            written = min(start + self.batch_size, len(points))
+        if written == len(points):
+            os.remove(self.spool_file)
+        elif written > 0:
+            tmp_file = self.spool_file + '.tmp'
+            with open(tmp_file, 'w') as file:
+                for point in points[written:]:
+                    file.write(json.dumps(point) + '\n')
+            os.replace(tmp_file, self.spool_file)
+
+
 class InfluxLogger(Base, DataLoggerInterface):
     """ Log instrument values to InfluxDB.
 
+    Values are buffered and written in batches from a background thread, so logging does not slow
+    down the measurement loops. If the database can not be reached, the data points are spooled to
+    a local file and written as soon as the database is back.
+
+    Other modules publish through this logger by connecting it to their optional 'datalogger'
+    connector.
+
     Example config for copy-paste:
 
     influx_data_logger:
@@ -40,6 +236,11 @@ class InfluxLogger(Base, DataLoggerInterface):
         dataseries: 'data_series_name'
         field: 'field_name'
         criterion: 'criterion_name'
+        batch_size: 500 # optional, maximum number of points per write
+        flush_interval: 1 # optional, maximum time in s a value waits before it is written
+        spool_file: 'C:\\Data\\influx_spool.jsonl' # optional, local file for unwritten points
+        tags: # optional, tags added to all points
+            setup: 'confocal_1'
 
     """
 
@@ -51,66 +252,134 @@ class InfluxLogger(Base, DataLoggerInterface):
     series = ConfigOption('dataseries', missing='error')
     field = ConfigOption('field', missing='error')
     cr = ConfigOption('criterion', missing='error')
+    batch_size = ConfigOption('batch_size', 500, missing='nothing')
+    flush_interval = ConfigOption('flush_interval', 1.0, missing='nothing')
+    spool_file = ConfigOption('spool_file',
+                              os.path.join(get_home_dir(), 'influx_spool.jsonl'),
+                              missing='nothing')
+    global_tags = ConfigOption('tags', dict(), missing='nothing')
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.log_channels = {}
+        self._writer = None
+        self._channel_lock = threading.Lock()
 
     def on_activate(self):
         """ Activate module.
         """
         self.connect_db()
+        self._writer = BufferedPointWriter(self._write_points,
+                                           batch_size=self.batch_size,
+                                           flush_interval=self.flush_interval,
+                                           spool_file=self.spool_file,
+                                           log=self.log)
+        self._writer.start()
 
     def on_deactivate(self):
         """ Deactivate module.
         """
+        self._writer.stop()
+        self._writer = None
         del self.conn
 
     def connect_db(self):
         """ Connect to Influx database """
         self.conn = InfluxDBClient(self.host, self.port, self.user, self.pw, self.dbname)
 
+    def _write_points(self, points):
+        """ Write a batch of points to the database. Raises on failure.
+
+            @param list points: data points with time stamps in ms
+        """
+        if not self.conn.write_points(points, time_precision='ms'):
+            raise IOError('InfluxDB did not accept the data points.')
+
+    def flush(self):
+        """ Write all buffered values to the database as soon as possible. """
+        if self._writer is not None:
+            self._writer.flush()
+
     def get_log_channels(self):
-        """ Get number of logging channels
+        """ Get logging channels
 
-            @return int: number of channels
+            @return dict: channel name: channel spec
         """
-        return self.log_channels
+        with self._channel_lock:
+            return dict(self.log_channels)
 
     def set_log_channels(self, channelspec):
-        """ Set number of logging channels.
+        """ Add, change or remove logging channels.
 
             @param channelspec dict: name, spec
+                A spec is a dict with the optional keys
+                    'fields': list of field names, for values passed as a sequence
+                    'tags': dict of tags added to each point of this channel
+                    'measurement': name of the measurement, defaults to the channel name.
+                                   Several channels can write to one measurement with
+                                   different tags.
+                A spec of None removes the channel.
         """
-        for name, spec in channelspec.items():
-            if spec is None and name in self.log_channels:
-                self.log_channels.pop(name)
-            elif name in self.log_channels:
-                pass
-            else:
-                pass
-                if True:
-                    pass
+        with self._channel_lock:
+            for name, spec in channelspec.items():
+                if spec is None:
+                    self.log_channels.pop(name, None)
+                else:
+                    tags = dict(self.global_tags)
+                    tags.update(spec.get('tags', dict()))
+                    self.log_channels[name] = {'fields': list(spec.get('fields', ['value'])),
+                                               'tags': tags,
+                                               'measurement': spec.get('measurement', name)}
 
     def log_to_channel(self, channel, values):
         """ Log values to a specific channel.
 
+            The values are buffered and written in the background, this call does not block.
+
             @param channel str: channel name
-            @param values list: data to be logged
+            @param values: dict of field values, sequence of values in the order of the channel
+                           fields or a single value
+
+            @return bool: True if the values were accepted
         """
-        if channel in self.log_channels.keys() and len(values) == len(self.log_channels[channel][values]):
-            conn.write_points(format_data(channel, values, channeltags))
+        with self._channel_lock:
+            spec = self.log_channels.get(channel)
+        if spec is None or self._writer is None:
+            return False
+        if isinstance(values, dict):
+            fields = values
+        elif hasattr(values, '__len__') and not isinstance(values, str):
+            if len(values) != len(spec['fields']):
+                return False
+            fields = dict(zip(spec['fields'], values))
+        else:
+            fields = {spec['fields'][0]: values}
+        self._writer.add(self.format_data(spec['measurement'], fields, spec['tags'],
+                                          timestamp=int(time.time() * 1000)))
+        return True
 
-    def format_data(self, channel_name, values, tags):
+    def format_data(self, channel_name, values, tags, timestamp=None):
         """ Format data according to InfluxDB JSON API.
 
             @param channel_name str: channel name
-            @param values list: data
-            @param tags list(str): list of tags
+            @param values dict: field names and values
+            @param tags dict: tags of the data point
+            @param timestamp int: optional, time in ms since epoch
+
+            @return dict: data point
         """
-        return [{
-             'measurement': channel_name,
-             'fields': values,
-             'tags': tags
-            }]
+        point = {
+            'measurement': channel_name,
+            'fields': {key: self._to_native(value) for key, value in values.items()},
+            'tags': tags
+        }
+        if timestamp is not None:
+            point['time'] = timestamp
+        return point
 
+    @staticmethod
+    def _to_native(value):
+        """ Convert numpy scalars to python types, so points can be serialized as JSON. """
+        if hasattr(value, 'item'):
+            return value.item()
+        return value
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the Qudi dummy module of a laser scanned by a voltage for the laser scanner logic.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import numpy as np
+import time
+
+from core.module import Base
+from core.configoption import ConfigOption
+from interface.confocal_scanner_interface import ConfocalScannerInterface
+
+
+class LaserScannerDummy(Base, ConfocalScannerInterface):
+    """ Dummy scanner whose fourth axis tunes a laser over lorentzian resonances.
+
+    The counts of a scan line depend only on the voltage of the fourth axis (a). Every point takes
+    one clock period, scan_line returns after the time the whole line would take on hardware.
+
+    Example config for copy-paste:
+
+    laser_scanner_dummy:
+        module.Class: 'laser_scanner_dummy.LaserScannerDummy'
+        clock_frequency: 1000  # in Hz
+        resonances: [-3, 2.5]  # in V
+        linewidth: 0.2  # in V, full width at half maximum
+        peak_countrate: 5e4  # in counts/s
+        background_countrate: 1e4  # in counts/s
+    """
+
+    _clock_frequency = ConfigOption('clock_frequency', 1000, missing='warn')
+    _resonances = ConfigOption('resonances', [-3, 2.5], missing='nothing')
+    _linewidth = ConfigOption('linewidth', 0.2, missing='nothing')
+    _peak_countrate = ConfigOption('peak_countrate', 5e4, missing='nothing')
+    _background_countrate = ConfigOption('background_countrate', 1e4, missing='nothing')
+
+    def __init__(self, config, **kwargs):
+        super().__init__(config=config, **kwargs)
+
+        self._voltage_range = [-10, 10]
+        self._position_range = [[0, 100e-6], [0, 100e-6], [0, 100e-6], [-10, 10]]
+        self._current_position = [0, 0, 0, 0]
+
+    def on_activate(self):
+        """ Initialisation performed during activation of the module.
+        """
+        pass
+
+    def on_deactivate(self):
+        """ Deactivate properly the laser scanner dummy.
+        """
+        self.reset_hardware()
+
+    def reset_hardware(self):
+        """ Resets the hardware, so the connection is lost and other programs can access it.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return 0
+
+    def get_position_range(self):
+        """ Returns the physical range of the scanner.
+
+        @return float [4][2]: array of 4 ranges with an array containing lower and upper limit
+        """
+        return self._position_range
+
+    def set_position_range(self, myrange=None):
+        """ Sets the physical range of the scanner.
+
+        @param float [4][2] myrange: array of 4 ranges with an array containing lower and upper
+                                     limit
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if myrange is None:
+            myrange = [[0, 100e-6], [0, 100e-6], [0, 100e-6], [-10, 10]]
+        if len(myrange) != 4 or any(len(pos) != 2 or pos[0] > pos[1] for pos in myrange):
+            self.log.error('Given range should be 4 pairs of lower and upper limit.')
+            return -1
+        self._position_range = myrange
+        return 0
+
+    def set_voltage_range(self, myrange=None):
+        """ Sets the voltage range of the analog outputs.
+
+        @param float [2] myrange: array containing lower and upper limit
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if myrange is None:
+            myrange = [-10., 10.]
+        if len(myrange) != 2 or myrange[0] > myrange[1]:
+            self.log.error('Given range should be a lower and an upper limit.')
+            return -1
+        self._voltage_range = myrange
+        return 0
+
+    def get_scanner_axes(self):
+        """ The dummy has three spatial axes and the laser tuning axis a.
+        """
+        return ['x', 'y', 'z', 'a']
+
+    def get_scanner_count_channels(self):
+        """ One counting channel of the fluorescence. """
+        return ['Counts']
+
+    def set_up_scanner_clock(self, clock_frequency=None, clock_channel=None):
+        """ Configures the clock giving the timing of the scan points.
+
+        @param float clock_frequency: if defined, this sets the frequency of the clock
+        @param str clock_channel: if defined, this is the physical channel of the clock
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if clock_frequency is not None:
+            self._clock_frequency = float(clock_frequency)
+        return 0
+
+    def set_up_scanner(self, counter_channels=None, sources=None,
+                       clock_channel=None, scanner_ao_channels=None):
+        """ Configures the actual scanner with a given clock.
+
+        @param str counter_channels: if defined, the physical channels of the counter
+        @param str sources: if defined, the physical channels where the photons come from
+        @param str clock_channel: if defined, the clock for the counter
+        @param str scanner_ao_channels: if defined, the analog output channels
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return 0
+
+    def scanner_set_position(self, x=None, y=None, z=None, a=None):
+        """ Move to x, y, z, a (where a is the laser tuning voltage).
+
+        @param float x: postion in x-direction
+        @param float y: postion in y-direction
+        @param float z: postion in z-direction
+        @param float a: laser tuning voltage
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self.module_state() == 'locked':
+            self.log.error('A Scanner is already running, close this one first.')
+            return -1
+        self._current_position = [x, y, z, a]
+        return 0
+
+    def get_scanner_position(self):
+        """ Get the current position of the scanner hardware.
+
+        @return float[]: current position in (x, y, z, a).
+        """
+        return self._current_position
+
+    def countrate(self, voltage):
+        """ Count rate of the dummy at the given laser tuning voltages.
+
+        @param numpy.ndarray voltage: laser tuning voltages
+
+        @return numpy.ndarray: count rates in counts/s
+        """
+        half_width = self._linewidth / 2
+        rate = np.full(np.shape(voltage), float(self._background_countrate))
+        for resonance in self._resonances:
+            rate += self._peak_countrate * half_width ** 2 / (
+                (voltage - resonance) ** 2 + half_width ** 2)
+        return rate
+
+    def scan_line(self, line_path=None, pixel_clock=False):
+        """ Scans a line and returns the counts on that line.
+
+        @param float[4][n] line_path: array of 4 rows defining the voltage points
+        @param bool pixel_clock: whether we need to output a pixel clock for this line
+
+        @return float[n][1]: the photon counts per second
+        """
+        if not isinstance(line_path, (frozenset, list, set, tuple, np.ndarray, )):
+            self.log.error('Given voltage list is no array type.')
+            return np.array([[-1.]])
+        line_path = np.asarray(line_path)
+        duration = line_path.shape[1] / self._clock_frequency
+        start = time.monotonic()
+
+        # shot noise of the counts within one clock period
+        rate = self.countrate(line_path[3])
+        counts = np.random.poisson(rate / self._clock_frequency) * self._clock_frequency
+
+        remaining = start + duration - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        self._current_position = list(line_path[:, -1])
+        return counts.astype(float)[:, np.newaxis]
+
+    def close_scanner(self):
+        """ Closes the scanner and cleans up afterwards.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return 0
+
+    def close_scanner_clock(self, power=0):
+        """ Closes the clock and cleans up afterwards.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        return 0
@@ -20,18 +20,55 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import math
+import time
+
 from collections import OrderedDict
 
+from core.configoption import ConfigOption
 from core.module import Base
 from interface.magnet_interface import MagnetInterface
 
 
 class MagnetAxisDummy:
-    """ Generic dummy magnet representing one axis. """
-    def __init__(self, label):
+    """ Generic dummy magnet representing one axis.
+
+    If simulate is True, a new position is approached with the velocity vel instead of being
+    reached immediately and the status reports the movement.
+    """
+    def __init__(self, label, vel):
         self.label = label
-        self.pos = 0.0
-        self.status = 0, {0: 'MagnetDummy Idle'}
+        self.vel = vel
+        self.simulate = False
+        self._start_pos = 0.0
+        self._target_pos = 0.0
+        self._start_time = 0.0
+
+    @property
+    def pos(self):
+        if not self.simulate or not self.vel:
+            return self._target_pos
+        distance = self._target_pos - self._start_pos
+        travelled = self.vel * (time.monotonic() - self._start_time)
+        if travelled >= abs(distance):
+            return self._target_pos
+        return self._start_pos + math.copysign(travelled, distance)
+
+    @pos.setter
+    def pos(self, value):
+        self._start_pos = self.pos
+        self._start_time = time.monotonic()
+        self._target_pos = value
+
+    @property
+    def status(self):
+        if self.pos != self._target_pos:
+            return 1, {1: 'MagnetDummy Moving'}
+        return 0, {0: 'MagnetDummy Idle'}
+
+    def stop(self):
+        """ Stop at the current position. """
+        self.pos = self.pos
 
 
 class MagnetDummy(Base, MagnetInterface):
@@ -42,23 +79,27 @@ class MagnetDummy(Base, MagnetInterface):
 
     magnet_dummy:
         module.Class: 'magnet.magnet_dummy.MagnetDummy'
+        simulate_motion: False  # optional, move with the set velocity instead of jumping
 
     """
+    _simulate_motion = ConfigOption('simulate_motion', False)
+
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
 
         #these label should be actually set by the config.
-        self._x_axis = MagnetAxisDummy('x')
-        self._y_axis = MagnetAxisDummy('y')
-        self._z_axis = MagnetAxisDummy('z')
-        self._phi_axis = MagnetAxisDummy('phi')
+        self._x_axis = MagnetAxisDummy('x', 1e-3)
+        self._y_axis = MagnetAxisDummy('y', 1e-3)
+        self._z_axis = MagnetAxisDummy('z', 1e-3)
+        self._phi_axis = MagnetAxisDummy('phi', 10)
 
     #TODO: Checks if configuration is set and is reasonable
 
     def on_activate(self):
         """ Definition and initialisation of the GUI.
         """
-        pass
+        for axis in (self._x_axis, self._y_axis, self._z_axis, self._phi_axis):
+            axis.simulate = self._simulate_motion
 
     def on_deactivate(self):
         """ Deactivate the module properly.
@@ -323,6 +364,8 @@ class MagnetDummy(Base, MagnetInterface):
 
         @return int: error code (0:OK, -1:error)
         """
+        for axis in (self._x_axis, self._y_axis, self._z_axis, self._phi_axis):
+            axis.stop()
         self.log.info('MagnetDummy: Movement stopped!')
         return 0
 
@@ -446,16 +489,16 @@ class MagnetDummy(Base, MagnetInterface):
             if self._x_axis.label in param_list:
                 vel[self._x_axis.label] = self._x_axis.vel
             if self._y_axis.label in param_list:
-                vel[self._x_axis.label] = self._y_axis.vel
+                vel[self._y_axis.label] = self._y_axis.vel
             if self._z_axis.label in param_list:
-                vel[self._x_axis.label] = self._z_axis.vel
+                vel[self._z_axis.label] = self._z_axis.vel
             if self._phi_axis.label in param_list:
                 vel[self._phi_axis.label] = self._phi_axis.vel
 
         else:
-            vel[self._x_axis.label] = self._x_axis.get_vel
-            vel[self._y_axis.label] = self._y_axis.get_vel
-            vel[self._z_axis.label] = self._z_axis.get_vel
+            vel[self._x_axis.label] = self._x_axis.vel
+            vel[self._y_axis.label] = self._y_axis.vel
+            vel[self._z_axis.label] = self._z_axis.vel
             vel[self._phi_axis.label] = self._phi_axis.vel
 
         return vel
@@ -23,7 +23,10 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 import numpy as np
 import re
 
-import PyDAQmx as daq
+try:
+    import PyDAQmx as daq
+except ImportError:
+    daq = None
 
 from core.module import Base
 from core.configoption import ConfigOption
@@ -88,6 +91,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         max_counts: 3e7
         read_write_timeout: 10
         counting_edge_rising: True
+        simulated: False # optional, use hardware/daqmx_simulator.py instead of a card
 
     """
 
@@ -126,10 +130,23 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
     # timeout for the Read or/and write process in s
     _RWTimeout = ConfigOption('read_write_timeout', default=10)
     _counting_edge_rising = ConfigOption('counting_edge_rising', default=True)
+    # run on the software simulation of the card
+    _simulated = ConfigOption('simulated', default=False)
 
     def on_activate(self):
         """ Starts up the NI Card at activation.
         """
+        # the DAQmx library used by this instance, the simulator if the config option is set
+        if self._simulated:
+            from hardware import daqmx_simulator
+            self.log.warning('Using the simulated DAQmx library, no card is accessed.')
+            self._daq = daqmx_simulator
+        elif daq is None:
+            raise Exception('PyDAQmx is not installed. Install it or set the config option '
+                            '"simulated: True" to use the simulated card.')
+        else:
+            self._daq = daq
+
         # the tasks used on that hardware device:
         self._counter_daq_tasks = []
         self._counter_analog_daq_task = None
@@ -144,6 +161,16 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         self._odmr_pulser_daq_task = None
         self._oversampling = 0
         self._lock_in_active = False
+        self._frame_counter_daq_tasks = []
+        self._frame_shape = None
+        self._frame_running = False
+        self._frame_lines_read = 0
+        self._frame_pixel_clock = False
+        self._frame_last_position = None
+        self._frame_raw_counts = np.empty((0, 0), dtype=np.uint32)
+        self._frame_counts = np.empty((0, 0), dtype=np.uint32)
+        self._frame_analog = np.empty((0, 0), dtype=np.float64)
+        self._frame_data = np.empty((0, 0), dtype=np.float64)
 
         # handle all the parameters given by the config
         if self._a_other:
@@ -231,7 +258,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
         # Create handle for task, this task will generate pulse signal for
         # photon counting
-        my_clock_daq_task = daq.TaskHandle()
+        my_clock_daq_task = self._daq.TaskHandle()
 
         # assign the clock frequency, if given
         if clock_frequency is not None:
@@ -275,14 +302,14 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 return -1
 
         # Adjust the idle state if necessary
-        my_idle = daq.DAQmx_Val_High if idle else daq.DAQmx_Val_Low
+        my_idle = self._daq.DAQmx_Val_High if idle else self._daq.DAQmx_Val_Low
         try:
             # create task for clock
             task_name = 'ScannerClock' if scanner else 'CounterClock'
-            daq.DAQmxCreateTask(task_name, daq.byref(my_clock_daq_task))
+            self._daq.DAQmxCreateTask(task_name, self._daq.byref(my_clock_daq_task))
 
             # create a digital clock channel with specific clock frequency:
-            daq.DAQmxCreateCOPulseChanFreq(
+            self._daq.DAQmxCreateCOPulseChanFreq(
                 # The task to which to add the channels
                 my_clock_daq_task,
                 # which channel is used?
@@ -292,7 +319,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # when you refer to that channel in other NIDAQ functions)
                 'Clock Producer',
                 # units, Hertz in our case
-                daq.DAQmx_Val_Hz,
+                self._daq.DAQmx_Val_Hz,
                 # idle state
                 my_idle,
                 # initial delay
@@ -306,11 +333,11 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # Configure Implicit Timing.
             # Set timing to continuous, i.e. set only the number of samples to
             # acquire or generate without specifying timing:
-            daq.DAQmxCfgImplicitTiming(
+            self._daq.DAQmxCfgImplicitTiming(
                 # Define task
                 my_clock_daq_task,
                 # Sample Mode: set the task to generate a continuous amount of running samples
-                daq.DAQmx_Val_ContSamps,
+                self._daq.DAQmx_Val_ContSamps,
                 # buffer length which stores temporarily the number of generated samples
                 1000)
 
@@ -318,7 +345,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 self._scanner_clock_daq_task = my_clock_daq_task
             else:
                 # actually start the preconfigured clock task
-                daq.DAQmxStartTask(my_clock_daq_task)
+                self._daq.DAQmxStartTask(my_clock_daq_task)
                 self._clock_daq_task = my_clock_daq_task
         except:
             self.log.exception('Error while setting up clock.')
@@ -376,9 +403,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         try:
             for i, ch in enumerate(my_counter_channels):
                 # This task will count photons with binning defined by the clock_channel
-                task = daq.TaskHandle()  # Initialize a Task
+                task = self._daq.TaskHandle()  # Initialize a Task
                 # Create task for the counter
-                daq.DAQmxCreateTask('Counter{0}'.format(i), daq.byref(task))
+                self._daq.DAQmxCreateTask('Counter{0}'.format(i), self._daq.byref(task))
                 # Create a Counter Input which samples with Semi-Periodes the Channel.
                 # set up semi period width measurement in photon ticks, i.e. the width
                 # of each pulse (high and low) generated by pulse_out_task is measured
@@ -386,7 +413,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 #   (this task creates a channel to measure the time between state
                 #    transitions of a digital signal and adds the channel to the task
                 #    you choose)
-                daq.DAQmxCreateCISemiPeriodChan(
+                self._daq.DAQmxCreateCISemiPeriodChan(
                     # define to which task to connect this function
                     task,
                     # use this counter channel
@@ -398,13 +425,13 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # Expected maximum count value
                     self._max_counts / 2 / self._clock_frequency,
                     # units of width measurement, here photon ticks
-                    daq.DAQmx_Val_Ticks,
+                    self._daq.DAQmx_Val_Ticks,
                     # empty extra argument
                     '')
 
                 # Set the Counter Input to a Semi Period input Terminal.
                 # Connect the pulses from the counter clock to the counter channel
-                daq.DAQmxSetCISemiPeriodTerm(
+                self._daq.DAQmxSetCISemiPeriodTerm(
                         # The task to which to add the counter channel.
                         task,
                         # use this counter channel
@@ -416,7 +443,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # Specify the terminal of the timebase which is used for the counter:
                 # Define the source of ticks for the counter as self._photon_source for
                 # the Scanner Task.
-                daq.DAQmxSetCICtrTimebaseSrc(
+                self._daq.DAQmxSetCICtrTimebaseSrc(
                     # define to which task to connect this function
                     task,
                     # counter channel
@@ -427,61 +454,61 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # Configure Implicit Timing.
                 # Set timing to continuous, i.e. set only the number of samples to
                 # acquire or generate without specifying timing:
-                daq.DAQmxCfgImplicitTiming(
+                self._daq.DAQmxCfgImplicitTiming(
                     # define to which task to connect this function
                     task,
                     # Sample Mode: Acquire or generate samples until you stop the task.
-                    daq.DAQmx_Val_ContSamps,
+                    self._daq.DAQmx_Val_ContSamps,
                     # buffer length which stores  temporarily the number of generated samples
                     1000)
 
                 # Set the Read point Relative To an operation.
                 # Specifies the point in the buffer at which to begin a read operation.
                 # Here we read most recent recorded samples:
-                daq.DAQmxSetReadRelativeTo(
+                self._daq.DAQmxSetReadRelativeTo(
                     # define to which task to connect this function
                     task,
                     # Start reading samples relative to the last sample returned by the previously.
-                    daq.DAQmx_Val_CurrReadPos)
+                    self._daq.DAQmx_Val_CurrReadPos)
 
                 # Set the Read Offset.
                 # Specifies an offset in samples per channel at which to begin a read
                 # operation. This offset is relative to the location you specify with
                 # RelativeTo. Here we set the Offset to 0 for multiple samples:
-                daq.DAQmxSetReadOffset(task, 0)
+                self._daq.DAQmxSetReadOffset(task, 0)
 
                 # Set Read OverWrite Mode.
                 # Specifies whether to overwrite samples in the buffer that you have
                 # not yet read. Unread data in buffer will be overwritten:
-                daq.DAQmxSetReadOverWrite(
+                self._daq.DAQmxSetReadOverWrite(
                     task,
-                    daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+                    self._daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
                 # add task to counter task list
                 self._counter_daq_tasks.append(task)
 
                 # Counter analog input task
                 if len(self._counter_ai_channels) > 0:
-                    atask = daq.TaskHandle()
+                    atask = self._daq.TaskHandle()
 
-                    daq.DAQmxCreateTask('CounterAnalogIn', daq.byref(atask))
+                    self._daq.DAQmxCreateTask('CounterAnalogIn', self._daq.byref(atask))
 
-                    daq.DAQmxCreateAIVoltageChan(
+                    self._daq.DAQmxCreateAIVoltageChan(
                         atask,
                         ', '.join(self._counter_ai_channels),
                         'Counter Analog In',
-                        daq.DAQmx_Val_RSE,
+                        self._daq.DAQmx_Val_RSE,
                         -10,
                         10,
-                        daq.DAQmx_Val_Volts,
+                        self._daq.DAQmx_Val_Volts,
                         ''
                     )
                     # Analog in channel timebase
-                    daq.DAQmxCfgSampClkTiming(
+                    self._daq.DAQmxCfgSampClkTiming(
                         atask,
                         my_clock_channel + 'InternalOutput',
                         self._clock_frequency,
-                        daq.DAQmx_Val_Rising,
-                        daq.DAQmx_Val_ContSamps,
+                        self._daq.DAQmx_Val_Rising,
+                        self._daq.DAQmx_Val_ContSamps,
                         int(self._clock_frequency * 5)
                     )
                     self._counter_analog_daq_task = atask
@@ -492,9 +519,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         try:
             for i, task in enumerate(self._counter_daq_tasks):
                 # Actually start the preconfigured counter task
-                daq.DAQmxStartTask(task)
+                self._daq.DAQmxStartTask(task)
             if len(self._counter_ai_channels) > 0:
-                daq.DAQmxStartTask(self._counter_analog_daq_task)
+                self._daq.DAQmxStartTask(self._counter_analog_daq_task)
         except:
             self.log.exception('Error while starting Counter')
             try:
@@ -546,11 +573,11 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             count_data = np.empty((len(self._counter_daq_tasks), 2 * samples), dtype=np.uint32)
 
             # number of samples which were actually read, will be stored here
-            n_read_samples = daq.int32()
+            n_read_samples = self._daq.int32()
             for i, task in enumerate(self._counter_daq_tasks):
                 # read the counter value: This function is blocking and waits for the
                 # counts to be all filled:
-                daq.DAQmxReadCounterU32(
+                self._daq.DAQmxReadCounterU32(
                     # read from this task
                     task,
                     # number of samples to read
@@ -562,7 +589,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # length of array to write into
                     2 * samples,
                     # number of samples which were read
-                    daq.byref(n_read_samples),
+                    self._daq.byref(n_read_samples),
                     # Reserved for future use. Pass NULL (here None) to this parameter
                     None)
 
@@ -571,16 +598,16 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 analog_data = np.full(
                     (len(self._counter_ai_channels), samples), 111, dtype=np.float64)
 
-                analog_read_samples = daq.int32()
+                analog_read_samples = self._daq.int32()
 
-                daq.DAQmxReadAnalogF64(
+                self._daq.DAQmxReadAnalogF64(
                     self._counter_analog_daq_task,
                     samples,
                     self._RWTimeout,
-                    daq.DAQmx_Val_GroupByChannel,
+                    self._daq.DAQmx_Val_GroupByChannel,
                     analog_data,
                     len(self._counter_ai_channels) * samples,
-                    daq.byref(analog_read_samples),
+                    self._daq.byref(analog_read_samples),
                     None
                 )
         except:
@@ -620,9 +647,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             for i, task in enumerate(self._scanner_counter_daq_tasks):
                 try:
                     # stop the counter task
-                    daq.DAQmxStopTask(task)
+                    self._daq.DAQmxStopTask(task)
                     # after stopping delete all the configuration of the counter
-                    daq.DAQmxClearTask(task)
+                    self._daq.DAQmxClearTask(task)
                 except:
                     self.log.exception('Could not close scanner counter.')
                     error = -1
@@ -631,9 +658,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             for i, task in enumerate(self._counter_daq_tasks):
                 try:
                     # stop the counter task
-                    daq.DAQmxStopTask(task)
+                    self._daq.DAQmxStopTask(task)
                     # after stopping delete all the configuration of the counter
-                    daq.DAQmxClearTask(task)
+                    self._daq.DAQmxClearTask(task)
                     # set the task handle to None as a safety
                 except:
                     self.log.exception('Could not close counter.')
@@ -643,9 +670,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             if len(self._counter_ai_channels) > 0:
                 try:
                     # stop the counter task
-                    daq.DAQmxStopTask(self._counter_analog_daq_task)
+                    self._daq.DAQmxStopTask(self._counter_analog_daq_task)
                     # after stopping delete all the configuration of the counter
-                    daq.DAQmxClearTask(self._counter_analog_daq_task)
+                    self._daq.DAQmxClearTask(self._counter_analog_daq_task)
                     # set the task handle to None as a safety
                 except:
                     self.log.exception('Could not close counter analog channels.')
@@ -669,10 +696,10 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             my_task = self._clock_daq_task
         try:
             # Stop the clock task:
-            daq.DAQmxStopTask(my_task)
+            self._daq.DAQmxStopTask(my_task)
 
             # After stopping delete all the configuration of the clock:
-            daq.DAQmxClearTask(my_task)
+            self._daq.DAQmxClearTask(my_task)
 
             # Set the task handle to None as a safety
             if scanner:
@@ -719,7 +746,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         for device in set(devicelist):
             self.log.info('Reset device {0}.'.format(device))
             try:
-                daq.DAQmxResetDevice(device)
+                self._daq.DAQmxResetDevice(device)
             except:
                 self.log.exception('Could not reset NI device {0}'.format(device))
                 retval = -1
@@ -732,8 +759,8 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             self.log.error('Cannot get channel number, analog output task does not exist.')
             return []
 
-        n_channels = daq.uInt32()
-        daq.DAQmxGetTaskNumChans(self._scanner_ao_task, n_channels)
+        n_channels = self._daq.uInt32()
+        self._daq.DAQmxGetTaskNumChans(self._scanner_ao_task, n_channels)
         possible_channels = ['x', 'y', 'z', 'a']
 
         n = int(n_channels.value)
@@ -833,24 +860,24 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # If an analog task is already running, kill that one first
             if self._scanner_ao_task is not None:
                 # stop the analog output task
-                daq.DAQmxStopTask(self._scanner_ao_task)
+                self._daq.DAQmxStopTask(self._scanner_ao_task)
 
                 # delete the configuration of the analog output
-                daq.DAQmxClearTask(self._scanner_ao_task)
+                self._daq.DAQmxClearTask(self._scanner_ao_task)
 
                 # set the task handle to None as a safety
                 self._scanner_ao_task = None
 
             # initialize ao channels / task for scanner, should always be active.
             # Define at first the type of the variable as a Task:
-            self._scanner_ao_task = daq.TaskHandle()
+            self._scanner_ao_task = self._daq.TaskHandle()
 
             # create the actual analog output task on the hardware device. Via
             # byref you pass the pointer of the object to the TaskCreation function:
-            daq.DAQmxCreateTask('ScannerAO', daq.byref(self._scanner_ao_task))
+            self._daq.DAQmxCreateTask('ScannerAO', self._daq.byref(self._scanner_ao_task))
             for n, chan in enumerate(self._scanner_ao_channels):
                 # Assign and configure the created task to an analog output voltage channel.
-                daq.DAQmxCreateAOVoltageChan(
+                self._daq.DAQmxCreateAOVoltageChan(
                     # The AO voltage operation function is assigned to this task.
                     self._scanner_ao_task,
                     # use (all) scanner ao_channels for the output
@@ -862,7 +889,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # maximum possible voltage
                     self._scanner_voltage_ranges[n][1],
                     # units is Volt
-                    daq.DAQmx_Val_Volts,
+                    self._daq.DAQmx_Val_Volts,
                     # empty for future use
                     '')
         except:
@@ -880,12 +907,12 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         retval = 0
         try:
             # stop the analog output task
-            daq.DAQmxStopTask(self._scanner_ao_task)
+            self._daq.DAQmxStopTask(self._scanner_ao_task)
         except:
             self.log.exception('Error stopping analog output.')
             retval = -1
         try:
-            daq.DAQmxSetSampTimingType(self._scanner_ao_task, daq.DAQmx_Val_OnDemand)
+            self._daq.DAQmxSetSampTimingType(self._scanner_ao_task, self._daq.DAQmx_Val_OnDemand)
         except:
             self.log.exception('Error changing analog output mode.')
             retval = -1
@@ -948,6 +975,10 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         else:
             self._my_scanner_clock_channel = self._scanner_clock_channel
 
+        # remember the channels for the frame scan
+        self._my_scanner_counter_channels = my_counter_channels
+        self._my_scanner_photon_sources = my_photon_sources
+
         if scanner_ao_channels is not None:
             self._scanner_ao_channels = scanner_ao_channels
             retval = self._start_analog_output()
@@ -963,15 +994,15 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # specify how the Data of the selected task is collected, i.e. set it
             # now to be sampled on demand for the analog output, i.e. when
             # demanded by software.
-            daq.DAQmxSetSampTimingType(self._scanner_ao_task, daq.DAQmx_Val_OnDemand)
+            self._daq.DAQmxSetSampTimingType(self._scanner_ao_task, self._daq.DAQmx_Val_OnDemand)
 
             for i, ch in enumerate(my_counter_channels):
                 # create handle for task, this task will do the photon counting for the
                 # scanner.
-                task = daq.TaskHandle()
+                task = self._daq.TaskHandle()
 
                 # actually create the scanner counting task
-                daq.DAQmxCreateTask('ScannerCounter{0}'.format(i), daq.byref(task))
+                self._daq.DAQmxCreateTask('ScannerCounter{0}'.format(i), self._daq.byref(task))
 
                 # Create a Counter Input which samples with Semi Perides the Channel.
                 # set up semi period width measurement in photon ticks, i.e. the width
@@ -980,7 +1011,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 #   (this task creates a channel to measure the time between state
                 #    transitions of a digital signal and adds the channel to the task
                 #    you choose)
-                daq.DAQmxCreateCISemiPeriodChan(
+                self._daq.DAQmxCreateCISemiPeriodChan(
                     # The task to which to add the channels
                     task,
                     # use this counter channel
@@ -992,12 +1023,12 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # Expected maximum count value
                     self._max_counts / self._scanner_clock_frequency,
                     # units of width measurement, here Timebase photon ticks
-                    daq.DAQmx_Val_Ticks,
+                    self._daq.DAQmx_Val_Ticks,
                     '')
 
                 # Set the Counter Input to a Semi Period input Terminal.
                 # Connect the pulses from the scanner clock to the scanner counter
-                daq.DAQmxSetCISemiPeriodTerm(
+                self._daq.DAQmxSetCISemiPeriodTerm(
                     # The task to which to add the counter channel.
                     task,
                     # use this counter channel
@@ -1009,7 +1040,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # Specify the terminal of the timebase which is used for the counter:
                 # Define the source of ticks for the counter as self._photon_source for
                 # the Scanner Task.
-                daq.DAQmxSetCICtrTimebaseSrc(
+                self._daq.DAQmxSetCICtrTimebaseSrc(
                     # define to which task to# connect this function
                     task,
                     # counter channel to output the# counting results
@@ -1020,18 +1051,18 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
             # Scanner analog input task
             if len(self._scanner_ai_channels) > 0:
-                atask = daq.TaskHandle()
+                atask = self._daq.TaskHandle()
 
-                daq.DAQmxCreateTask('ScanAnalogIn', daq.byref(atask))
+                self._daq.DAQmxCreateTask('ScanAnalogIn', self._daq.byref(atask))
 
-                daq.DAQmxCreateAIVoltageChan(
+                self._daq.DAQmxCreateAIVoltageChan(
                     atask,
                     ', '.join(self._scanner_ai_channels),
                     'Scan Analog In',
-                    daq.DAQmx_Val_RSE,
+                    self._daq.DAQmx_Val_RSE,
                     -10,
                     10,
-                    daq.DAQmx_Val_Volts,
+                    self._daq.DAQmx_Val_Volts,
                     ''
                 )
                 self._scanner_analog_daq_task = atask
@@ -1112,9 +1143,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         # Number of samples which were actually written, will be stored here.
         # The error code of this variable can be asked with .value to check
         # whether all channels have been written successfully.
-        self._AONwritten = daq.int32()
+        self._AONwritten = self._daq.int32()
         # write the voltage instructions for the analog output to the hardware
-        daq.DAQmxWriteAnalogF64(
+        self._daq.DAQmxWriteAnalogF64(
             # write to this task
             self._scanner_ao_task,
             # length of the command (points)
@@ -1124,11 +1155,11 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # maximal timeout in seconds for# the write process
             self._RWTimeout,
             # Specify how the samples are arranged: each pixel is grouped by channel number
-            daq.DAQmx_Val_GroupByChannel,
+            self._daq.DAQmx_Val_GroupByChannel,
             # the voltages to be written
             voltages,
             # The actual number of samples per channel successfully written to the buffer
-            daq.byref(self._AONwritten),
+            self._daq.byref(self._AONwritten),
             # Reserved for future use. Pass NULL(here None) to this parameter
             None)
         return self._AONwritten.value
@@ -1207,7 +1238,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # being scanned (i.e. that you go through each voltage, which
                 # corresponds to a position. How fast the voltages are being
                 # changed is combined with obtaining the counts per voltage peak).
-                daq.DAQmxCfgSampClkTiming(
+                self._daq.DAQmxCfgSampClkTiming(
                     # add to this task
                     self._scanner_ao_task,
                     # use this channel as clock
@@ -1215,48 +1246,48 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # Maximum expected clock frequency
                     self._scanner_clock_frequency,
                     # Generate sample on falling edge
-                    daq.DAQmx_Val_Rising,
+                    self._daq.DAQmx_Val_Rising,
                     # generate finite number of samples
-                    daq.DAQmx_Val_FiniteSamps,
+                    self._daq.DAQmx_Val_FiniteSamps,
                     # number of samples to generate
                     self._line_length)
 
             # Configure Implicit Timing for the clock.
             # Set timing for scanner clock task to the number of pixel.
-            daq.DAQmxCfgImplicitTiming(
+            self._daq.DAQmxCfgImplicitTiming(
                 # define task
                 self._scanner_clock_daq_task,
                 # only a limited number of# counts
-                daq.DAQmx_Val_FiniteSamps,
+                self._daq.DAQmx_Val_FiniteSamps,
                 # count twice for each voltage +1 for safety
                 self._line_length + 1)
 
             for i, task in enumerate(self._scanner_counter_daq_tasks):
                 # Configure Implicit Timing for the scanner counting task.
                 # Set timing for scanner count task to the number of pixel.
-                daq.DAQmxCfgImplicitTiming(
+                self._daq.DAQmxCfgImplicitTiming(
                     # define task
                     task,
                     # only a limited number of counts
-                    daq.DAQmx_Val_FiniteSamps,
+                    self._daq.DAQmx_Val_FiniteSamps,
                     # count twice for each voltage +1 for safety
                     2 * self._line_length + 1)
 
                 # Set the Read point Relative To an operation.
                 # Specifies the point in the buffer at which to begin a read operation,
                 # here we read samples from beginning of acquisition and do not overwrite
-                daq.DAQmxSetReadRelativeTo(
+                self._daq.DAQmxSetReadRelativeTo(
                     # define to which task to connect this function
                     task,
                     # Start reading samples relative to the last sample returned
                     # by the previous read
-                    daq.DAQmx_Val_CurrReadPos)
+                    self._daq.DAQmx_Val_CurrReadPos)
 
                 # Set the Read Offset.
                 # Specifies an offset in samples per channel at which to begin a read
                 # operation. This offset is relative to the location you specify with
                 # RelativeTo. Here we do not read the first sample.
-                daq.DAQmxSetReadOffset(
+                self._daq.DAQmxSetReadOffset(
                     # connect to this task
                     task,
                     # Offset after which to read
@@ -1265,19 +1296,19 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # Set Read OverWrite Mode.
                 # Specifies whether to overwrite samples in the buffer that you have
                 # not yet read. Unread data in buffer will be overwritten:
-                daq.DAQmxSetReadOverWrite(
+                self._daq.DAQmxSetReadOverWrite(
                     task,
-                    daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+                    self._daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
 
             # Analog channels
             if len(self._scanner_ai_channels) > 0:
                 # Analog in channel timebase
-                daq.DAQmxCfgSampClkTiming(
+                self._daq.DAQmxCfgSampClkTiming(
                     self._scanner_analog_daq_task,
                     self._scanner_clock_channel + 'InternalOutput',
                     self._scanner_clock_frequency,
-                    daq.DAQmx_Val_Rising,
-                    daq.DAQmx_Val_ContSamps,
+                    self._daq.DAQmx_Val_Rising,
+                    self._daq.DAQmx_Val_ContSamps,
                     self._line_length + 1
                 )
         except:
@@ -1315,7 +1346,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # set task timing to use a sampling clock:
             # specify how the Data of the selected task is collected, i.e. set it
             # now to be sampled by a hardware (clock) signal.
-            daq.DAQmxSetSampTimingType(self._scanner_ao_task, daq.DAQmx_Val_SampClk)
+            self._daq.DAQmxSetSampTimingType(self._scanner_ao_task, self._daq.DAQmx_Val_SampClk)
             self._set_up_line(np.shape(line_path)[1])
             # may expand from 3 to 4 columns if _a_other
             line_volts = self._scanner_position_to_volt(line_path)
@@ -1326,38 +1357,38 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 start=False)
 
             # start the timed analog output task
-            daq.DAQmxStartTask(self._scanner_ao_task)
+            self._daq.DAQmxStartTask(self._scanner_ao_task)
 
             for i, task in enumerate(self._scanner_counter_daq_tasks):
-                daq.DAQmxStopTask(task)
+                self._daq.DAQmxStopTask(task)
 
-            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
 
             if pixel_clock and self._pixel_clock_channel is not None:
-                daq.DAQmxConnectTerms(
+                self._daq.DAQmxConnectTerms(
                     self._scanner_clock_channel + 'InternalOutput',
                     self._pixel_clock_channel,
-                    daq.DAQmx_Val_DoNotInvertPolarity)
+                    self._daq.DAQmx_Val_DoNotInvertPolarity)
 
             # start the scanner counting task that acquires counts synchroneously
             for i, task in enumerate(self._scanner_counter_daq_tasks):
-                daq.DAQmxStartTask(task)
+                self._daq.DAQmxStartTask(task)
 
             if len(self._scanner_ai_channels) > 0:
-                daq.DAQmxStartTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxStartTask(self._scanner_analog_daq_task)
 
-            daq.DAQmxStartTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStartTask(self._scanner_clock_daq_task)
 
             for i, task in enumerate(self._scanner_counter_daq_tasks):
                 # wait for the scanner counter to finish
-                daq.DAQmxWaitUntilTaskDone(
+                self._daq.DAQmxWaitUntilTaskDone(
                     # define task
                     task,
                     # Maximum timeout for the counter times the positions. Unit is seconds.
                     self._RWTimeout * 2 * self._line_length)
 
             # wait for the scanner clock to finish
-            daq.DAQmxWaitUntilTaskDone(
+            self._daq.DAQmxWaitUntilTaskDone(
                 # define task
                 self._scanner_clock_daq_task,
                 # maximal timeout for the counter times the positions
@@ -1369,10 +1400,10 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 dtype=np.uint32)
 
             # number of samples which were read will be stored here
-            n_read_samples = daq.int32()
+            n_read_samples = self._daq.int32()
             for i, task in enumerate(self._scanner_counter_daq_tasks):
                 # actually read the counted photons
-                daq.DAQmxReadCounterU32(
+                self._daq.DAQmxReadCounterU32(
                     # read from this task
                     task,
                     # read number of double the # number of samples
@@ -1384,12 +1415,12 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # length of array to write into
                     2 * self._line_length,
                     # number of samples which were actually read
-                    daq.byref(n_read_samples),
+                    self._daq.byref(n_read_samples),
                     # Reserved for future use. Pass NULL(here None) to this parameter.
                     None)
 
                 # stop the counter task
-                daq.DAQmxStopTask(task)
+                self._daq.DAQmxStopTask(task)
 
             # Analog channels
             if len(self._scanner_ai_channels) > 0:
@@ -1398,29 +1429,29 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     222,
                     dtype=np.float64)
 
-                analog_read_samples = daq.int32()
+                analog_read_samples = self._daq.int32()
 
-                daq.DAQmxReadAnalogF64(
+                self._daq.DAQmxReadAnalogF64(
                     self._scanner_analog_daq_task,
                     self._line_length + 1,
                     self._RWTimeout,
-                    daq.DAQmx_Val_GroupByChannel,
+                    self._daq.DAQmx_Val_GroupByChannel,
                     self._analog_data,
                     len(self._scanner_ai_channels) * (self._line_length + 1),
-                    daq.byref(analog_read_samples),
+                    self._daq.byref(analog_read_samples),
                     None
                 )
 
-                daq.DAQmxStopTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxStopTask(self._scanner_analog_daq_task)
 
             # stop the clock task
-            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
 
             # stop the analog output task
             self._stop_analog_output()
 
             if pixel_clock and self._pixel_clock_channel is not None:
-                daq.DAQmxDisconnectTerms(
+                self._daq.DAQmxDisconnectTerms(
                     self._scanner_clock_channel + 'InternalOutput',
                     self._pixel_clock_channel)
 
@@ -1451,6 +1482,292 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         # return values is a rate of counts/s
         return all_data.transpose()
 
+    # ========================= Frame scanning =================================
+
+    def set_up_frame(self, frame_path=None, pixel_clock=False):
+        """ Programs the trajectory of a whole frame for hardware timed scanning.
+
+        scan_line configures, starts and stops all tasks for every single line. In frame mode
+        the tasks are configured once per frame: the analog output steps through all samples of
+        the frame on the continuously running scanner clock, while the counters count the photon
+        edges and the analog inputs sample on the same clock into their buffers. The data is
+        read in blocks of lines with read_frame_lines into arrays which are reused as long as
+        the frame size does not change.
+
+        Call set_up_scanner_clock and set_up_scanner first. The counter tasks of set_up_scanner
+        are not used in frame mode, the frame has its own edge counting tasks on the same
+        counter channels. Start the frame with start_frame and release the tasks with
+        close_frame.
+
+        @param float[c][l][m] frame_path: c-tuples of positions of l lines with m samples each,
+            a line usually includes the return to the start of the next line
+        @param bool pixel_clock: whether to output the scanner clock at the pixel clock channel
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if len(self._scanner_counter_channels) > 0 and len(self._scanner_counter_daq_tasks) < 1:
+            self.log.error('Configured counter is not running, cannot set up a frame.')
+            return -1
+
+        if len(self._scanner_ai_channels) > 0 and self._scanner_analog_daq_task is None:
+            self.log.error('Configured analog input is not running, cannot set up a frame.')
+            return -1
+
+        if self._frame_shape is not None:
+            self.log.error('Another frame is already set up, close this one first.')
+            return -1
+
+        if not isinstance(frame_path, (list, tuple, np.ndarray, )) or np.ndim(frame_path) != 3:
+            self.log.error('Given frame_path is not an array of shape (axes, lines, samples).')
+            return -1
+
+        frame_path = np.asarray(frame_path, dtype=np.float64)
+        n_axes, n_lines, line_length = frame_path.shape
+        n_samples = n_lines * line_length
+        frame_volts = self._scanner_position_to_volt(frame_path.reshape(n_axes, n_samples))
+        if np.any(np.isnan(frame_volts)):
+            return -1
+        frame_volts = np.ascontiguousarray(frame_volts)
+
+        # reuse the buffers of the previous frame if the size did not change
+        n_counters = len(self._my_scanner_counter_channels)
+        n_analog = len(self._scanner_ai_channels)
+        if self._frame_raw_counts.shape != (n_counters, n_samples + 1):
+            self._frame_raw_counts = np.zeros((n_counters, n_samples + 1), dtype=np.uint32)
+            self._frame_counts = np.zeros((n_counters, n_samples), dtype=np.uint32)
+        if self._frame_analog.shape != (n_samples, n_analog):
+            self._frame_analog = np.zeros((n_samples, n_analog), dtype=np.float64)
+        if self._frame_data.shape != (n_samples, n_counters + n_analog):
+            self._frame_data = np.zeros((n_samples, n_counters + n_analog), dtype=np.float64)
+
+        clock_terminal = self._my_scanner_clock_channel + 'InternalOutput'
+        self._frame_shape = (n_lines, line_length)
+        self._frame_pixel_clock = pixel_clock and self._pixel_clock_channel is not None
+        self._frame_last_position = np.array(frame_path[:, -1, -1])
+        try:
+            # the analog output steps through the frame once on the scanner clock
+            self._daq.DAQmxSetSampTimingType(self._scanner_ao_task, self._daq.DAQmx_Val_SampClk)
+            self._daq.DAQmxCfgSampClkTiming(
+                self._scanner_ao_task,
+                clock_terminal,
+                self._scanner_clock_frequency,
+                self._daq.DAQmx_Val_Rising,
+                self._daq.DAQmx_Val_FiniteSamps,
+                n_samples)
+            self._write_scanner_ao(voltages=frame_volts, length=n_samples, start=False)
+
+            for i, ch in enumerate(self._my_scanner_counter_channels):
+                task = self._daq.TaskHandle()
+                self._daq.DAQmxCreateTask('FrameCounter{0}'.format(i), self._daq.byref(task))
+                self._frame_counter_daq_tasks.append(task)
+
+                # Count the photon edges, sampled at every rising edge of the scanner clock.
+                # The counts of a pixel are the difference of two consecutive samples, so a
+                # pixel needs one sample instead of the two semi periods of scan_line.
+                self._daq.DAQmxCreateCICountEdgesChan(
+                    task,
+                    ch,
+                    'Frame Counter Channel {0}'.format(i),
+                    self._daq.DAQmx_Val_Rising,
+                    0,
+                    self._daq.DAQmx_Val_CountUp)
+                self._daq.DAQmxSetCICountEdgesTerm(task, ch, self._my_scanner_photon_sources[i])
+                self._daq.DAQmxCfgSampClkTiming(
+                    task,
+                    clock_terminal,
+                    self._scanner_clock_frequency,
+                    self._daq.DAQmx_Val_Rising,
+                    self._daq.DAQmx_Val_ContSamps,
+                    # one more sample than pixels, the first one is the start value
+                    n_samples + 1)
+                self._daq.DAQmxSetReadRelativeTo(task, self._daq.DAQmx_Val_CurrReadPos)
+                self._daq.DAQmxSetReadOffset(task, 0)
+                self._daq.DAQmxSetReadOverWrite(task, self._daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+
+            if n_analog > 0:
+                self._daq.DAQmxCfgSampClkTiming(
+                    self._scanner_analog_daq_task,
+                    clock_terminal,
+                    self._scanner_clock_frequency,
+                    self._daq.DAQmx_Val_Rising,
+                    self._daq.DAQmx_Val_ContSamps,
+                    n_samples)
+
+            # the clock runs until the frame is complete
+            self._daq.DAQmxCfgImplicitTiming(
+                self._scanner_clock_daq_task,
+                self._daq.DAQmx_Val_ContSamps,
+                1000)
+
+            if self._frame_pixel_clock:
+                self._daq.DAQmxConnectTerms(
+                    clock_terminal,
+                    self._pixel_clock_channel,
+                    self._daq.DAQmx_Val_DoNotInvertPolarity)
+        except:
+            self.log.exception('Error while setting up scanner to scan a frame.')
+            self.close_frame()
+            return -1
+        return 0
+
+    def start_frame(self):
+        """ Starts the scan of the frame programmed by set_up_frame.
+
+        A frame can be started again after all its lines were read.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._frame_shape is None:
+            self.log.error('No frame set up, call set_up_frame before starting it.')
+            return -1
+
+        if self._frame_running:
+            self.log.error('The frame is already running, read all its lines first.')
+            return -1
+
+        self._frame_lines_read = 0
+        try:
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            # the tasks wait for the clock, so they are all started before it
+            self._daq.DAQmxStartTask(self._scanner_ao_task)
+            for task in self._frame_counter_daq_tasks:
+                self._daq.DAQmxStartTask(task)
+            if len(self._scanner_ai_channels) > 0:
+                self._daq.DAQmxStartTask(self._scanner_analog_daq_task)
+            self._daq.DAQmxStartTask(self._scanner_clock_daq_task)
+            self._frame_running = True
+        except:
+            self.log.exception('Error while starting the frame scan.')
+            self._stop_frame_tasks()
+            return -1
+        return 0
+
+    def read_frame_lines(self, lines=1):
+        """ Reads the next lines of the running frame. Blocks until they are scanned.
+
+        @param int lines: number of lines to read, at most the lines left in the frame
+
+        @return float[l][m][n]: l lines of m samples with n-channel photon counts per second
+            (analog input channels in V). The array is a view into the frame buffer, which is
+            overwritten by the next frame of the same size. Copy it to keep the data.
+
+        After the last line of the frame the tasks are stopped.
+        """
+        if not self._frame_running:
+            self.log.error('No frame running, call start_frame before reading lines.')
+            return np.array([[[-1.]]])
+
+        n_lines, line_length = self._frame_shape
+        lines = min(int(lines), n_lines - self._frame_lines_read)
+        start = self._frame_lines_read * line_length
+        stop = start + lines * line_length
+        n_counters = len(self._frame_counter_daq_tasks)
+        # the first read of a frame includes the start value of the counters
+        first = 0 if start == 0 else start + 1
+        timeout = self._RWTimeout + (stop - start) / self._scanner_clock_frequency
+        try:
+            n_read_samples = self._daq.int32()
+            for i, task in enumerate(self._frame_counter_daq_tasks):
+                self._daq.DAQmxReadCounterU32(
+                    task,
+                    stop + 1 - first,
+                    timeout,
+                    self._frame_raw_counts[i, first:stop + 1],
+                    stop + 1 - first,
+                    self._daq.byref(n_read_samples),
+                    None)
+
+            # the unsigned difference is also right if the counter overflowed in between
+            counts = self._frame_counts[:, start:stop]
+            np.subtract(self._frame_raw_counts[:, start + 1:stop + 1],
+                        self._frame_raw_counts[:, start:stop],
+                        out=counts)
+            for i in range(n_counters):
+                np.multiply(counts[i], self._scanner_clock_frequency,
+                            out=self._frame_data[start:stop, i])
+
+            if len(self._scanner_ai_channels) > 0:
+                analog_read_samples = self._daq.int32()
+                self._daq.DAQmxReadAnalogF64(
+                    self._scanner_analog_daq_task,
+                    stop - start,
+                    timeout,
+                    self._daq.DAQmx_Val_GroupByScanNumber,
+                    self._frame_analog[start:stop],
+                    self._frame_analog[start:stop].size,
+                    self._daq.byref(analog_read_samples),
+                    None)
+                self._frame_data[start:stop, n_counters:] = self._frame_analog[start:stop]
+        except:
+            self.log.exception('Error while reading lines of the frame.')
+            self._stop_frame_tasks()
+            return np.array([[[-1.]]])
+
+        self._frame_lines_read += lines
+        if self._frame_lines_read >= n_lines:
+            self._stop_frame_tasks()
+            self._current_position = np.array(self._frame_last_position)
+        return self._frame_data[start:stop].reshape((lines, line_length, -1))
+
+    def scan_frame(self):
+        """ Scans the whole frame programmed by set_up_frame.
+
+        @return float[l][m][n]: l lines of m samples with n-channel photon counts per second,
+            see read_frame_lines
+        """
+        if self.start_frame() < 0:
+            return np.array([[[-1.]]])
+        return self.read_frame_lines(self._frame_shape[0])
+
+    def _stop_frame_tasks(self):
+        """ Stops the clock and all tasks of the frame scan.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        retval = 0
+        tasks = [self._scanner_clock_daq_task, self._scanner_ao_task]
+        tasks.extend(self._frame_counter_daq_tasks)
+        if len(self._scanner_ai_channels) > 0:
+            tasks.append(self._scanner_analog_daq_task)
+        for task in tasks:
+            try:
+                self._daq.DAQmxStopTask(task)
+            except:
+                self.log.exception('Could not stop frame scan task.')
+                retval = -1
+        self._frame_running = False
+        return retval
+
+    def close_frame(self):
+        """ Stops the frame scan and releases its tasks. The scanner is ready for scan_line again.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        if self._frame_shape is None:
+            return 0
+        retval = self._stop_frame_tasks()
+        for task in self._frame_counter_daq_tasks:
+            try:
+                self._daq.DAQmxClearTask(task)
+            except:
+                self.log.exception('Could not close frame counter.')
+                retval = -1
+        self._frame_counter_daq_tasks = []
+
+        if self._frame_pixel_clock:
+            try:
+                self._daq.DAQmxDisconnectTerms(
+                    self._my_scanner_clock_channel + 'InternalOutput',
+                    self._pixel_clock_channel)
+            except:
+                self.log.exception('Could not disconnect pixel clock.')
+                retval = -1
+        self._frame_pixel_clock = False
+        self._frame_shape = None
+        if self._stop_analog_output() < 0:
+            retval = -1
+        return retval
+
     def voltage_in_range(self, v):
         if v < self._scanner_voltage_ranges[3][0] or v > self._scanner_voltage_ranges[3][1]:
             return False
@@ -1477,7 +1794,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # set task timing to use a sampling clock:
             # specify how the Data of the selected task is collected, i.e. set it
             # now to be sampled by a hardware (clock) signal.
-            daq.DAQmxSetSampTimingType(self._scanner_ao_task, daq.DAQmx_Val_SampClk)
+            self._daq.DAQmxSetSampTimingType(self._scanner_ao_task, self._daq.DAQmx_Val_SampClk)
             self._set_up_line(len(voltages))
             # may expand from 3 to 4 columns if _a_other
             position = self._current_position
@@ -1505,35 +1822,35 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 start=False)
 
             # start the timed analog output task
-            daq.DAQmxStartTask(self._scanner_ao_task)
+            self._daq.DAQmxStartTask(self._scanner_ao_task)
 
             for i, task in enumerate(self._scanner_counter_daq_tasks):
-                daq.DAQmxStopTask(task)
+                self._daq.DAQmxStopTask(task)
 
-            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
 
             if pixel_clock and self._pixel_clock_channel is not None:
-                daq.DAQmxConnectTerms(
+                self._daq.DAQmxConnectTerms(
                     self._scanner_clock_channel + 'InternalOutput',
                     self._pixel_clock_channel,
-                    daq.DAQmx_Val_DoNotInvertPolarity)
+                    self._daq.DAQmx_Val_DoNotInvertPolarity)
 
             # start the scanner counting task that acquires counts synchroneously
             for i, task in enumerate(self._scanner_counter_daq_tasks):
-                daq.DAQmxStartTask(task)
+                self._daq.DAQmxStartTask(task)
 
-            daq.DAQmxStartTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStartTask(self._scanner_clock_daq_task)
 
             for i, task in enumerate(self._scanner_counter_daq_tasks):
                 # wait for the scanner counter to finish
-                daq.DAQmxWaitUntilTaskDone(
+                self._daq.DAQmxWaitUntilTaskDone(
                     # define task
                     task,
                     # Maximum timeout for the counter times the positions. Unit is seconds.
                     self._RWTimeout * 2 * length)
 
             # wait for the scanner clock to finish
-            daq.DAQmxWaitUntilTaskDone(
+            self._daq.DAQmxWaitUntilTaskDone(
                 # define task
                 self._scanner_clock_daq_task,
                 # maximal timeout for the counter times the positions
@@ -1545,10 +1862,10 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 dtype=np.uint32)
 
             # number of samples which were read will be stored here
-            n_read_samples = daq.int32()
+            n_read_samples = self._daq.int32()
             for i, task in enumerate(self._scanner_counter_daq_tasks):
                 # actually read the counted photons
-                daq.DAQmxReadCounterU32(
+                self._daq.DAQmxReadCounterU32(
                     # read from this task
                     task,
                     # read number of double the # number of samples
@@ -1560,21 +1877,21 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     # length of array to write into
                     2 * length,
                     # number of samples which were actually read
-                    daq.byref(n_read_samples),
+                    self._daq.byref(n_read_samples),
                     # Reserved for future use. Pass NULL(here None) to this parameter.
                     None)
 
                 # stop the counter task
-                daq.DAQmxStopTask(task)
+                self._daq.DAQmxStopTask(task)
 
             # stop the clock task
-            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
 
             # stop the analog output task
             self._stop_analog_output()
 
             if pixel_clock and self._pixel_clock_channel is not None:
-                daq.DAQmxDisconnectTerms(
+                self._daq.DAQmxDisconnectTerms(
                     self._scanner_clock_channel + 'InternalOutput',
                     self._pixel_clock_channel)
 
@@ -1610,15 +1927,16 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
         @return int: error code (0:OK, -1:error)
         """
+        f = self.close_frame()
         a = self._stop_analog_output()
 
         b = 0
         if len(self._scanner_ai_channels) > 0:
             try:
                 # stop the counter task
-                daq.DAQmxStopTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxStopTask(self._scanner_analog_daq_task)
                 # after stopping delete all the configuration of the counter
-                daq.DAQmxClearTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxClearTask(self._scanner_analog_daq_task)
                 # set the task handle to None as a safety
                 self._scanner_analog_daq_task = None
             except:
@@ -1626,7 +1944,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 b = -1
 
         c = self.close_counter(scanner=True)
-        return -1 if a < 0 or b < 0 or c < 0 else 0
+        return -1 if f < 0 or a < 0 or b < 0 or c < 0 else 0
 
     def close_scanner_clock(self):
         """ Closes the clock and cleans up afterwards.
@@ -1696,14 +2014,14 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             my_photon_source = self._photon_sources[0]
 
         # this task will count photons with binning defined by the clock_channel
-        task = daq.TaskHandle()
+        task = self._daq.TaskHandle()
         if len(self._scanner_ai_channels) > 0:
-            atask = daq.TaskHandle()
+            atask = self._daq.TaskHandle()
         try:
             # create task for the counter
-            daq.DAQmxCreateTask('ODMRCounter', daq.byref(task))
+            self._daq.DAQmxCreateTask('ODMRCounter', self._daq.byref(task))
             if len(self._scanner_ai_channels) > 0:
-                daq.DAQmxCreateTask('ODMRAnalog', daq.byref(atask))
+                self._daq.DAQmxCreateTask('ODMRAnalog', self._daq.byref(atask))
 
             # set up semi period width measurement in photon ticks, i.e. the width
             # of each pulse (high and low) generated by pulse_out_task is measured
@@ -1711,7 +2029,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             #   (this task creates a channel to measure the time between state
             #    transitions of a digital signal and adds the channel to the task
             #    you choose)
-            daq.DAQmxCreateCISemiPeriodChan(
+            self._daq.DAQmxCreateCISemiPeriodChan(
                 # define to which task to# connect this function
                 task,
                 # use this counter channel
@@ -1723,56 +2041,56 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # Expected maximum count value
                 self._max_counts / self._scanner_clock_frequency,
                 # units of width measurement, here photon ticks
-                daq.DAQmx_Val_Ticks,
+                self._daq.DAQmx_Val_Ticks,
                 '')
 
             # Analog task
             if len(self._scanner_ai_channels) > 0:
-                daq.DAQmxCreateAIVoltageChan(
+                self._daq.DAQmxCreateAIVoltageChan(
                     atask,
                     ', '.join(self._scanner_ai_channels),
                     'ODMR Analog',
-                    daq.DAQmx_Val_RSE,
+                    self._daq.DAQmx_Val_RSE,
                     -10,
                     10,
-                    daq.DAQmx_Val_Volts,
+                    self._daq.DAQmx_Val_Volts,
                     ''
                 )
 
             # connect the pulses from the clock to the counter
-            daq.DAQmxSetCISemiPeriodTerm(
+            self._daq.DAQmxSetCISemiPeriodTerm(
                 task,
                 my_counter_channel,
                 my_clock_channel + 'InternalOutput')
 
             # define the source of ticks for the counter as self._photon_source
-            daq.DAQmxSetCICtrTimebaseSrc(
+            self._daq.DAQmxSetCICtrTimebaseSrc(
                 task,
                 my_counter_channel,
                 my_photon_source)
 
             # start and stop pulse task to correctly initiate idle state high voltage.
-            daq.DAQmxStartTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStartTask(self._scanner_clock_daq_task)
             # otherwise, it will be low until task starts, and MW will receive wrong pulses.
-            daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
 
             if self.lock_in_active:
-                ptask = daq.TaskHandle()
-                daq.DAQmxCreateTask('ODMRPulser', daq.byref(ptask))
-                daq.DAQmxCreateDOChan(
+                ptask = self._daq.TaskHandle()
+                self._daq.DAQmxCreateTask('ODMRPulser', self._daq.byref(ptask))
+                self._daq.DAQmxCreateDOChan(
                     ptask,
                     '{0:s}, {1:s}'.format(self._odmr_trigger_line, self._odmr_switch_line),
                     "ODMRPulserChannel",
-                    daq.DAQmx_Val_ChanForAllLines)
+                    self._daq.DAQmx_Val_ChanForAllLines)
 
                 self._odmr_pulser_daq_task = ptask
 
             # connect the clock to the trigger channel to give triggers for the
             # microwave
-            daq.DAQmxConnectTerms(
+            self._daq.DAQmxConnectTerms(
                 self._scanner_clock_channel + 'InternalOutput',
                 self._odmr_trigger_channel,
-                daq.DAQmx_Val_DoNotInvertPolarity)
+                self._daq.DAQmx_Val_DoNotInvertPolarity)
             self._scanner_counter_daq_tasks.append(task)
             if len(self._scanner_ai_channels) > 0:
                 self._scanner_analog_daq_task = atask
@@ -1799,60 +2117,60 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         self._odmr_length = length
         try:
             # set timing for odmr clock task to the number of pixel.
-            daq.DAQmxCfgImplicitTiming(
+            self._daq.DAQmxCfgImplicitTiming(
                 # define task
                 self._scanner_clock_daq_task,
                 # only a limited number of counts
-                daq.DAQmx_Val_FiniteSamps,
+                self._daq.DAQmx_Val_FiniteSamps,
                 # count twice for each voltage +1 for starting this task.
                 # This first pulse will start the count task.
                 self._odmr_length + 1)
 
             # set timing for odmr count task to the number of pixel.
-            daq.DAQmxCfgImplicitTiming(
+            self._daq.DAQmxCfgImplicitTiming(
                 # define task
                 self._scanner_counter_daq_tasks[0],
                 # only a limited number of counts
-                daq.DAQmx_Val_ContSamps,
+                self._daq.DAQmx_Val_ContSamps,
                 # count twice for each voltage +1 for starting this task.
                 # This first pulse will start the count task.
                 2 * (self._odmr_length + 1))
 
             # read samples from beginning of acquisition, do not overwrite
-            daq.DAQmxSetReadRelativeTo(
+            self._daq.DAQmxSetReadRelativeTo(
                 self._scanner_counter_daq_tasks[0],
-                daq.DAQmx_Val_CurrReadPos)
+                self._daq.DAQmx_Val_CurrReadPos)
 
             # do not read first sample
-            daq.DAQmxSetReadOffset(
+            self._daq.DAQmxSetReadOffset(
                 self._scanner_counter_daq_tasks[0],
                 0)
 
             # unread data in buffer will be overwritten
-            daq.DAQmxSetReadOverWrite(
+            self._daq.DAQmxSetReadOverWrite(
                 self._scanner_counter_daq_tasks[0],
-                daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+                self._daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
 
             # Analog
             if len(self._scanner_ai_channels) > 0:
                 # Analog in channel timebase
-                daq.DAQmxCfgSampClkTiming(
+                self._daq.DAQmxCfgSampClkTiming(
                     self._scanner_analog_daq_task,
                     self._scanner_clock_channel + 'InternalOutput',
                     self._scanner_clock_frequency,
-                    daq.DAQmx_Val_Rising,
-                    daq.DAQmx_Val_ContSamps,
+                    self._daq.DAQmx_Val_Rising,
+                    self._daq.DAQmx_Val_ContSamps,
                     self._odmr_length + 1
                 )
 
             if self._odmr_pulser_daq_task:
                 # pulser channel timebase
-                daq.DAQmxCfgSampClkTiming(
+                self._daq.DAQmxCfgSampClkTiming(
                     self._odmr_pulser_daq_task,
                     self._scanner_clock_channel + 'InternalOutput',
                     self._scanner_clock_frequency,
-                    daq.DAQmx_Val_Rising,
-                    daq.DAQmx_Val_ContSamps,
+                    self._daq.DAQmx_Val_Rising,
+                    self._daq.DAQmx_Val_ContSamps,
                     self._odmr_length + 1
                 )
         except:
@@ -1916,9 +2234,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
 
         try:
             # start the scanner counting task that acquires counts synchronously
-            daq.DAQmxStartTask(self._scanner_counter_daq_tasks[0])
+            self._daq.DAQmxStartTask(self._scanner_counter_daq_tasks[0])
             if len(self._scanner_ai_channels) > 0:
-                daq.DAQmxStartTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxStartTask(self._scanner_analog_daq_task)
         except:
             self.log.exception('Cannot start ODMR counter.')
             return True, np.array([-1.])
@@ -1933,25 +2251,25 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 pulse_pattern[:self.oversampling] += 1
                 pulse_pattern[::2] += 2
 
-                daq.DAQmxWriteDigitalU32(self._odmr_pulser_daq_task,
-                                         len(pulse_pattern),
-                                         0,
-                                         self._RWTimeout * self._odmr_length,
-                                         daq.DAQmx_Val_GroupByChannel,
-                                         pulse_pattern,
-                                         None,
-                                         None)
+                self._daq.DAQmxWriteDigitalU32(self._odmr_pulser_daq_task,
+                                               len(pulse_pattern),
+                                               0,
+                                               self._RWTimeout * self._odmr_length,
+                                               self._daq.DAQmx_Val_GroupByChannel,
+                                               pulse_pattern,
+                                               None,
+                                               None)
 
-                daq.DAQmxStartTask(self._odmr_pulser_daq_task)
+                self._daq.DAQmxStartTask(self._odmr_pulser_daq_task)
             except:
                 self.log.exception('Cannot start ODMR pulser.')
                 return True, np.array([-1.])
 
         try:
-            daq.DAQmxStartTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStartTask(self._scanner_clock_daq_task)
 
             # wait for the scanner clock to finish
-            daq.DAQmxWaitUntilTaskDone(
+            self._daq.DAQmxWaitUntilTaskDone(
                 # define task
                 self._scanner_clock_daq_task,
                 # maximal timeout for the counter times the positions
@@ -1964,10 +2282,10 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 dtype=np.uint32)
 
             #number of samples which were read will be stored here
-            n_read_samples = daq.int32()
+            n_read_samples = self._daq.int32()
 
             # actually read the counted photons
-            daq.DAQmxReadCounterU32(
+            self._daq.DAQmxReadCounterU32(
                 # read from this task
                 self._scanner_counter_daq_tasks[0],
                 # Read number of double the# number of samples
@@ -1979,7 +2297,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # length of array to write into
                 2 * self._odmr_length + 1,
                 # number of samples which were actually read
-                daq.byref(n_read_samples),
+                self._daq.byref(n_read_samples),
                 # Reserved for future use. Pass NULL (here None) to this parameter.
                 None)
 
@@ -1990,26 +2308,26 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                     222,
                     dtype=np.float64)
 
-                analog_read_samples = daq.int32()
+                analog_read_samples = self._daq.int32()
 
-                daq.DAQmxReadAnalogF64(
+                self._daq.DAQmxReadAnalogF64(
                     self._scanner_analog_daq_task,
                     self._odmr_length + 1,
                     self._RWTimeout,
-                    daq.DAQmx_Val_GroupByChannel,
+                    self._daq.DAQmx_Val_GroupByChannel,
                     odmr_analog_data,
                     len(self._scanner_ai_channels) * (self._odmr_length + 1),
-                    daq.byref(analog_read_samples),
+                    self._daq.byref(analog_read_samples),
                     None
                 )
 
             # stop the counter task
-            daq.DAQmxStopTask(self._scanner_clock_daq_task)
-            daq.DAQmxStopTask(self._scanner_counter_daq_tasks[0])
+            self._daq.DAQmxStopTask(self._scanner_clock_daq_task)
+            self._daq.DAQmxStopTask(self._scanner_counter_daq_tasks[0])
             if len(self._scanner_ai_channels) > 0:
-                daq.DAQmxStopTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxStopTask(self._scanner_analog_daq_task)
             if self._odmr_pulser_daq_task:
-                daq.DAQmxStopTask(self._odmr_pulser_daq_task)
+                self._daq.DAQmxStopTask(self._odmr_pulser_daq_task)
 
             # prepare array to return data
             all_data = np.full((len(self.get_odmr_channels()), length),
@@ -2073,7 +2391,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         retval = 0
         try:
             # disconnect the trigger channel
-            daq.DAQmxDisconnectTerms(
+            self._daq.DAQmxDisconnectTerms(
                 self._scanner_clock_channel + 'InternalOutput',
                 self._odmr_trigger_channel)
 
@@ -2084,9 +2402,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         if len(self._scanner_ai_channels) > 0:
             try:
                 # stop the counter task
-                daq.DAQmxStopTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxStopTask(self._scanner_analog_daq_task)
                 # after stopping delete all the configuration of the counter
-                daq.DAQmxClearTask(self._scanner_analog_daq_task)
+                self._daq.DAQmxClearTask(self._scanner_analog_daq_task)
                 # set the task handle to None as a safety
                 self._scanner_analog_daq_task = None
             except:
@@ -2096,9 +2414,9 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         if self._odmr_pulser_daq_task:
             try:
                 # stop the pulser task
-                daq.DAQmxStopTask(self._odmr_pulser_daq_task)
+                self._daq.DAQmxStopTask(self._odmr_pulser_daq_task)
                 # after stopping delete all the configuration of the pulser
-                daq.DAQmxClearTask(self._odmr_pulser_daq_task)
+                self._daq.DAQmxClearTask(self._odmr_pulser_daq_task)
                 # set the task handle to None as a safety
                 self._odmr_pulser_daq_task = None
             except:
@@ -2138,13 +2456,13 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             # return value represents a uint32 value, i.e.
             #   task_done = 0  => False, i.e. device is runnin
             #   task_done !=0  => True, i.e. device has stopped
-            task_done = daq.bool32()
+            task_done = self._daq.bool32()
 
-            ret_v = daq.DAQmxIsTaskDone(
+            ret_v = self._daq.DAQmxIsTaskDone(
                 # task reference
                 self._gated_counter_daq_task,
                 # reference to bool value.
-                daq.byref(task_done))
+                self._daq.byref(task_done))
 
             if ret_v != 0:
                 return ret_v
@@ -2184,12 +2502,12 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         try:
             # This task will count photons with binning defined by pulse task
             # Initialize a Task
-            self._gated_counter_daq_task = daq.TaskHandle()
-            daq.DAQmxCreateTask('GatedCounter', daq.byref(self._gated_counter_daq_task))
+            self._gated_counter_daq_task = self._daq.TaskHandle()
+            self._daq.DAQmxCreateTask('GatedCounter', self._daq.byref(self._gated_counter_daq_task))
 
             # Set up pulse width measurement in photon ticks, i.e. the width of
             # each pulse generated by pulse_out_task is measured in photon ticks:
-            daq.DAQmxCreateCIPulseWidthChan(
+            self._daq.DAQmxCreateCIPulseWidthChan(
                 # add to this task
                 self._gated_counter_daq_task,
                 # use this counter
@@ -2201,49 +2519,49 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # expected maximum value
                 self._max_counts,
                 # units of width measurement,  here photon ticks.
-                daq.DAQmx_Val_Ticks,
+                self._daq.DAQmx_Val_Ticks,
                 # start pulse width measurement on rising edge
                 self._counting_edge,
                 '')
 
             # Set the pulses to counter self._counter_channel
-            daq.DAQmxSetCIPulseWidthTerm(
+            self._daq.DAQmxSetCIPulseWidthTerm(
                 self._gated_counter_daq_task,
                 self._counter_channel,
                 self._gate_in_channel)
 
             # Set the timebase for width measurement as self._photon_source, i.e.
             # define the source of ticks for the counter as self._photon_source.
-            daq.DAQmxSetCICtrTimebaseSrc(
+            self._daq.DAQmxSetCICtrTimebaseSrc(
                 self._gated_counter_daq_task,
                 self._counter_channel,
                 self._photon_source)
 
             # set timing to continuous
-            daq.DAQmxCfgImplicitTiming(
+            self._daq.DAQmxCfgImplicitTiming(
                 # define to which task to connect this function.
                 self._gated_counter_daq_task,
                 # Sample Mode: set the task to generate a continuous amount of running samples
-                daq.DAQmx_Val_ContSamps,
+                self._daq.DAQmx_Val_ContSamps,
                 # buffer length which stores temporarily the number of generated samples
                 buffer_length)
 
             # Read samples from beginning of acquisition, do not overwrite
-            daq.DAQmxSetReadRelativeTo(self._gated_counter_daq_task, daq.DAQmx_Val_CurrReadPos)
+            self._daq.DAQmxSetReadRelativeTo(self._gated_counter_daq_task, self._daq.DAQmx_Val_CurrReadPos)
 
             # If this is set to True, then the NiDaq will not wait for the sample
             # you asked for to be in the buffer before read out but immediately
             # hand back all samples until samples is reached.
             if read_available_samples:
-                daq.DAQmxSetReadReadAllAvailSamp(self._gated_counter_daq_task, True)
+                self._daq.DAQmxSetReadReadAllAvailSamp(self._gated_counter_daq_task, True)
 
             # Do not read first sample:
-            daq.DAQmxSetReadOffset(self._gated_counter_daq_task, 0)
+            self._daq.DAQmxSetReadOffset(self._gated_counter_daq_task, 0)
 
             # Unread data in buffer is not overwritten
-            daq.DAQmxSetReadOverWrite(
+            self._daq.DAQmxSetReadOverWrite(
                 self._gated_counter_daq_task,
-                daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
+                self._daq.DAQmx_Val_DoNotOverwriteUnreadSamps)
         except:
             self.log.exception('Error while setting up gated counting.')
             return -1
@@ -2261,7 +2579,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             return -1
 
         try:
-            daq.DAQmxStartTask(self._gated_counter_daq_task)
+            self._daq.DAQmxStartTask(self._gated_counter_daq_task)
         except:
             self.log.exception('Error while starting up gated counting.')
             return -1
@@ -2296,7 +2614,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         _gated_count_data = np.empty([2,samples], dtype=np.uint32)
 
         # Number of samples which were read will be stored here
-        n_read_samples = daq.int32()
+        n_read_samples = self._daq.int32()
 
         if read_available_samples:
             # If the task acquires a finite number of samples
@@ -2307,7 +2625,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         else:
             num_samples = int(samples)
         try:
-            daq.DAQmxReadCounterU32(
+            self._daq.DAQmxReadCounterU32(
                 # read from this task
                 self._gated_counter_daq_task,
                 # read number samples
@@ -2319,7 +2637,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 # length of array to write into
                 samples,
                 # number of samples which were actually read.
-                daq.byref(n_read_samples),
+                self._daq.byref(n_read_samples),
                 # Reserved for future use. Pass NULL (here None) to this parameter
                 None)
 
@@ -2344,7 +2662,7 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
                 'Start the Gated Counter Task before you can actually stop it!')
             return -1
         try:
-            daq.DAQmxStopTask(self._gated_counter_daq_task)
+            self._daq.DAQmxStopTask(self._gated_counter_daq_task)
         except:
             self.log.exception('Error while stopping gated counting.')
             return -1
@@ -2358,13 +2676,13 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
         retval = 0
         try:
             # stop the task
-            daq.DAQmxStopTask(self._gated_counter_daq_task)
+            self._daq.DAQmxStopTask(self._gated_counter_daq_task)
         except:
             self.log.exception('Error while closing gated counter.')
             retval = -1
         try:
             # clear the task
-            daq.DAQmxClearTask(self._gated_counter_daq_task)
+            self._daq.DAQmxClearTask(self._gated_counter_daq_task)
             self._gated_counter_daq_task = None
         except:
             self.log.exception('Error while clearing gated counter.')
@@ -2390,22 +2708,22 @@ class NationalInstrumentsXSeries(Base, SlowCounterInterface, ConfocalScannerInte
             return -1
         else:
 
-            self.digital_out_task = daq.TaskHandle()
+            self.digital_out_task = self._daq.TaskHandle()
             if mode:
-                self.digital_data = daq.c_uint32(0xffffffff)
+                self.digital_data = self._daq.c_uint32(0xffffffff)
             else:
-                self.digital_data = daq.c_uint32(0x0)
-            self.digital_read = daq.c_int32()
-            self.digital_samples_channel = daq.c_int32(1)
-            daq.DAQmxCreateTask('DigitalOut', daq.byref(self.digital_out_task))
-            daq.DAQmxCreateDOChan(self.digital_out_task, channel_name, "", daq.DAQmx_Val_ChanForAllLines)
-            daq.DAQmxStartTask(self.digital_out_task)
-            daq.DAQmxWriteDigitalU32(self.digital_out_task, self.digital_samples_channel, True,
-                                        self._RWTimeout, daq.DAQmx_Val_GroupByChannel,
-                                        np.array(self.digital_data), self.digital_read, None)
-
-            daq.DAQmxStopTask(self.digital_out_task)
-            daq.DAQmxClearTask(self.digital_out_task)
+                self.digital_data = self._daq.c_uint32(0x0)
+            self.digital_read = self._daq.c_int32()
+            self.digital_samples_channel = self._daq.c_int32(1)
+            self._daq.DAQmxCreateTask('DigitalOut', self._daq.byref(self.digital_out_task))
+            self._daq.DAQmxCreateDOChan(self.digital_out_task, channel_name, "", self._daq.DAQmx_Val_ChanForAllLines)
+            self._daq.DAQmxStartTask(self.digital_out_task)
+            self._daq.DAQmxWriteDigitalU32(self.digital_out_task, self.digital_samples_channel, True,
+                                           self._RWTimeout, self._daq.DAQmx_Val_GroupByChannel,
+                                           np.array(self.digital_data), self.digital_read, None)
+
+            self._daq.DAQmxStopTask(self.digital_out_task)
+            self._daq.DAQmxClearTask(self.digital_out_task)
             return 0
 
 
@@ -27,6 +27,7 @@ import time
 import visa
 from core.module import Base
 from core.configoption import ConfigOption
+from core.connector import Connector
 import numpy as np
 
 from interface.process_interface import ProcessInterface
@@ -43,6 +44,8 @@ class Cryocon(Base, ProcessInterface, ProcessControlInterface):
         module.Class: 'temperature.cryocon.Cryocon'
         ip_address: '192.168.1.222'
         main_channel: 'B'
+        connect:
+            datalogger: 'influx_data_logger' # optional, publish measured temperatures
 
     """
 
@@ -53,8 +56,12 @@ class Cryocon(Base, ProcessInterface, ProcessControlInterface):
     _ip_port = ConfigOption('port', 5000)
     _timeout = ConfigOption('timeout', 5)
     _main_channel = ConfigOption('main_channel', 'A')
+    _datalogger_channel = ConfigOption('datalogger_channel', 'cryocon', missing='nothing')
+
+    datalogger = Connector(interface='DataLoggerInterface', optional=True)
 
     _inst = None
+    _data_logger = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -67,6 +74,8 @@ class Cryocon(Base, ProcessInterface, ProcessControlInterface):
         except visa.VisaIOError:
             self.log.error('Could not connect to hardware. Please check the wires and the address.')
             raise
+        self._data_logger = self.datalogger()
+        self._logged_channels = set()
 
     def on_deactivate(self):
         """ Deinitialisation performed during deactivation of the module.
@@ -84,8 +93,25 @@ class Cryocon(Base, ProcessInterface, ProcessControlInterface):
             temperature = float(self._inst.query(text))
         except:
             temperature = np.NaN
+        if self._data_logger is not None and not np.isnan(temperature):
+            self._log_temperature(channel, temperature)
         return temperature
 
+    def _log_temperature(self, channel, temperature):
+        """ Publish a temperature to the data logger, tagged with the input channel.
+
+        All inputs are written to the same measurement, one log channel per input is registered
+        on first use.
+        """
+        log_channel = '{0}_{1}'.format(self._datalogger_channel, channel)
+        if channel not in self._logged_channels:
+            self._data_logger.set_log_channels(
+                {log_channel: {'fields': ['temperature'],
+                               'tags': {'channel': channel},
+                               'measurement': self._datalogger_channel}})
+            self._logged_channels.add(channel)
+        self._data_logger.log_to_channel(log_channel, {'temperature': temperature})
+
     def set_temperature(self, temperature, channel=None, turn_on=False):
         """ Function to set the temperature setpoint """
         channel = channel if channel is not None else self._main_channel
@@ -30,13 +30,26 @@ class DataLoggerInterface(metaclass=InterfaceMetaclass):
 
     @abstract_interface_method
     def get_log_channels(self):
+        """ Get the logging channels.
+
+            @return dict: channel name: channel spec
+        """
         pass
 
     @abstract_interface_method
     def set_log_channels(self, channelspec):
+        """ Add, change or remove logging channels.
+
+            @param dict channelspec: channel name: channel spec (None removes the channel)
+        """
         pass
 
     @abstract_interface_method
     def log_to_channel(self, channel, value):
+        """ Log values to a channel. Must not block the caller for long.
+
+            @param str channel: channel name
+            @param value: values to log
+        """
         pass
 
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the frame ring buffer and the streaming frame file of the camera logic.
+
+FrameRingBuffer keeps the last N camera frames in one preallocated array. FrameFileWriter streams
+frames into a binary file in a background thread. Frames are collected in chunks of preallocated
+buffers, so recording does not allocate memory per frame. If the disk can not keep up and all
+chunk buffers are waiting to be written, new frames are dropped and counted instead of blocking
+the acquisition.
+
+File format: a header (magic b'QCFR', version, length of a JSON header with dtype, frame shape and
+metadata) followed by chunks. Every chunk starts with b'CHNK' and the number of frames n, followed
+by n float64 timestamps and the raw data of the n frames. read_frame_file reads such a file.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import json
+import logging
+import queue
+import struct
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_FILE_MAGIC = b'QCFR'
+_FILE_VERSION = 1
+# magic, version, length of the json header
+_FILE_HEADER = struct.Struct('<4sBQ')
+_CHUNK_MAGIC = b'CHNK'
+# magic, number of frames
+_CHUNK_HEADER = struct.Struct('<4sI')
+
+
+class FrameRingBuffer:
+    """ The last frames of an acquisition in a preallocated array.
+
+    The array is allocated with the first frame, since shape and data type of the frames are only
+    known then. A frame of different shape or data type reallocates the buffer.
+    """
+
+    def __init__(self, size):
+        """
+        @param int size: number of frames kept
+        """
+        self.size = max(1, int(size))
+        self._frames = None
+        self._timestamps = np.zeros(self.size)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def full(self):
+        return self._count == self.size
+
+    def clear(self):
+        """ Forget all frames, keep the memory. """
+        self._next = 0
+        self._count = 0
+
+    def fits(self, frame):
+        """ Whether a frame has the shape and data type of the buffered frames.
+
+        @param numpy.ndarray frame: camera frame
+
+        @return bool: True if the frame can be appended without reallocation
+        """
+        return (self._frames is not None and self._frames.shape[1:] == frame.shape
+                and self._frames.dtype == frame.dtype)
+
+    def oldest(self):
+        """ The frame that the next append overwrites.
+
+        @return numpy.ndarray: view of the oldest frame, None if the buffer is not full
+        """
+        if not self.full:
+            return None
+        return self._frames[self._next]
+
+    def latest(self):
+        """ The last appended frame.
+
+        @return numpy.ndarray: view of the frame, None if the buffer is empty
+        """
+        if self._count == 0:
+            return None
+        return self._frames[(self._next - 1) % self.size]
+
+    def append(self, frame, timestamp):
+        """ Copy a frame into the buffer, overwriting the oldest frame if it is full.
+
+        @param numpy.ndarray frame: camera frame
+        @param float timestamp: acquisition time of the frame
+
+        @return numpy.ndarray: view of the frame in the buffer
+        """
+        frame = np.asarray(frame)
+        if not self.fits(frame):
+            self._frames = np.empty((self.size,) + frame.shape, dtype=frame.dtype)
+            self.clear()
+        slot = self._frames[self._next]
+        np.copyto(slot, frame)
+        self._timestamps[self._next] = timestamp
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        return slot
+
+    def frames(self, count=None):
+        """ Copy of the last frames in acquisition order.
+
+        @param int count: optional, number of frames, all buffered frames if None
+
+        @return tuple(numpy.ndarray, numpy.ndarray): timestamps and frames (frame index first)
+        """
+        count = self._count if count is None else min(int(count), self._count)
+        if count == 0 or self._frames is None:
+            return np.empty(0), np.empty((0,))
+        index = np.arange(self._next - count, self._next) % self.size
+        return self._timestamps[index], self._frames[index]
+
+    def sum(self, out):
+        """ Sum of the buffered frames.
+
+        @param numpy.ndarray out: array the sum is written into, shape of a frame
+
+        @return numpy.ndarray: out
+        """
+        if self._count == 0:
+            out[...] = 0
+        elif self.full:
+            np.sum(self._frames, axis=0, out=out)
+        else:
+            np.sum(self._frames[:self._count], axis=0, out=out)
+        return out
+
+
+class FrameFileWriter:
+    """ Streams frames into a chunked binary file in a background thread, see the module
+    docstring.
+    """
+
+    def __init__(self, path, frame_shape, dtype, metadata=None, chunk_frames=32, max_chunks=8):
+        """
+        @param str path: file path
+        @param tuple frame_shape: shape of a frame
+        @param dtype: data type of the frames
+        @param dict metadata: optional, saved in the file header, has to be JSON serializable
+        @param int chunk_frames: number of frames per chunk
+        @param int max_chunks: number of chunk buffers, i.e. how many chunks may wait to be written
+        """
+        self.path = path
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+
+        self._free = queue.Queue()
+        for _ in range(max(2, int(max_chunks))):
+            self._free.put((np.empty(self.chunk_frames), np.empty(
+                (self.chunk_frames,) + self.frame_shape, dtype=self.dtype)))
+        self._pending = queue.Queue()
+        self._chunk = None
+        self._filled = 0
+        self._closed = False
+
+        header = json.dumps({'dtype': self.dtype.str,
+                             'shape': self.frame_shape,
+                             'metadata': dict() if metadata is None else metadata}).encode()
+        self._file = open(path, 'wb')
+        self._file.write(_FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, len(header)))
+        self._file.write(header)
+        self._thread = threading.Thread(target=self._write_loop, name='camera-frame-writer',
+                                        daemon=True)
+        self._thread.start()
+
+    def accepts(self, frame):
+        """ Whether a frame has the shape and data type of the file. """
+        return frame.shape == self.frame_shape and frame.dtype == self.dtype
+
+    def write(self, frame, timestamp):
+        """ Add a frame. Never blocks, frames are dropped if all chunk buffers are in use.
+
+        @param numpy.ndarray frame: camera frame
+        @param float timestamp: acquisition time of the frame
+
+        @return bool: whether the frame was accepted
+        """
+        if self._closed or not self.accepts(frame):
+            self.dropped += 1
+            return False
+        if self._chunk is None:
+            try:
+                self._chunk = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return False
+            self._filled = 0
+        timestamps, frames = self._chunk
+        timestamps[self._filled] = timestamp
+        np.copyto(frames[self._filled], frame)
+        self._filled += 1
+        if self._filled == self.chunk_frames:
+            self._submit()
+        return True
+
+    def close(self):
+        """ Write the remaining frames and close the file. """
+        if self._closed:
+            return
+        self._closed = True
+        if self._chunk is not None and self._filled > 0:
+            self._submit()
+        self._pending.put(None)
+        self._thread.join()
+        self._file.close()
+
+    def _submit(self):
+        self._pending.put((self._chunk, self._filled))
+        self._chunk = None
+        self._filled = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            (timestamps, frames), count = item
+            if self.error is None:
+                try:
+                    self._file.write(_CHUNK_HEADER.pack(_CHUNK_MAGIC, count))
+                    self._file.write(timestamps[:count].tobytes())
+                    self._file.write(np.ascontiguousarray(frames[:count]).data)
+                    self.written += count
+                except Exception as e:
+                    self.error = e
+                    logger.exception('Writing camera frames to {0} failed.'.format(self.path))
+            if self.error is not None:
+                self.dropped += count
+            self._free.put((timestamps, frames))
+
+
+def read_frame_file(path):
+    """ Read a frame file written by FrameFileWriter.
+
+    @param str path: file path
+
+    @return dict: 'timestamps' (numpy.ndarray), 'frames' (numpy.ndarray, frame index first) and
+                  'metadata' (dict)
+    """
+    with open(path, 'rb') as file:
+        magic, version, length = _FILE_HEADER.unpack(file.read(_FILE_HEADER.size))
+        if magic != _FILE_MAGIC or version != _FILE_VERSION:
+            raise ValueError('{0} is not a camera frame file.'.format(path))
+        header = json.loads(file.read(length).decode())
+        dtype = np.dtype(header['dtype'])
+        shape = tuple(header['shape'])
+        frame_size = int(np.prod(shape)) * dtype.itemsize
+        timestamps = list()
+        frames = list()
+        while True:
+            chunk_header = file.read(_CHUNK_HEADER.size)
+            if len(chunk_header) < _CHUNK_HEADER.size:
+                break
+            magic, count = _CHUNK_HEADER.unpack(chunk_header)
+            if magic != _CHUNK_MAGIC:
+                raise ValueError('Corrupt chunk in camera frame file {0}.'.format(path))
+            timestamps.append(np.frombuffer(file.read(8 * count), dtype=np.float64))
+            data = file.read(frame_size * count)
+            if len(data) < frame_size * count:
+                logger.warning('Camera frame file {0} is truncated.'.format(path))
+                timestamps.pop()
+                break
+            frames.append(np.frombuffer(data, dtype=dtype).reshape((count,) + shape))
+    if frames:
+        return {'timestamps': np.concatenate(timestamps),
+                'frames': np.concatenate(frames),
+                'metadata': header['metadata']}
+    return {'timestamps': np.empty(0),
+            'frames': np.empty((0,) + shape, dtype=dtype),
+            'metadata': header['metadata']}
@@ -24,19 +24,43 @@ import numpy as np
 
 from core.connector import Connector
 from core.configoption import ConfigOption
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
+from core.util.snapshot import SnapshotPublisher
+from logic.camera_frame_buffer import FrameRingBuffer, FrameFileWriter
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
-import matplotlib.pyplot as plt
-import matplotlib as mpl
 
 import datetime
+import os
+import time
 from collections import OrderedDict
 
+plt = lazy_import('matplotlib.pyplot')
+mpl = lazy_import('matplotlib')
+
 
 class CameraLogic(GenericLogic):
     """
     Control a camera.
+
+    Every acquired frame is copied into a ring buffer of the last ring_buffer_frames frames. The
+    displayed image is processed in place from the buffer: the frame itself, the running average
+    of the buffered frames or the sum of all frames since the mode was set ('none', 'average',
+    'accumulate'), optionally minus a background image. Frames can be recorded into a chunked
+    binary file while the video runs (start_recording, read with
+    logic.camera_frame_buffer.read_frame_file).
+
+    Example config for copy-paste:
+
+    camera_logic:
+        module.Class: 'camera_logic.CameraLogic'
+        ring_buffer_frames: 100  # optional
+        record_chunk_frames: 32  # optional, frames per chunk of the recorded file
+        record_max_chunks: 8  # optional, chunks waiting to be written before frames are dropped
+        connect:
+            hardware: 'cameradummy'
+            savelogic: 'savelogic'
     """
 
     # declare connectors
@@ -44,11 +68,17 @@ class CameraLogic(GenericLogic):
     savelogic = Connector(interface='SaveLogic')
     _max_fps = ConfigOption('default_exposure', 20)
     _fps = _max_fps
+    _ring_buffer_frames = ConfigOption('ring_buffer_frames', 100, missing='nothing')
+    _record_chunk_frames = ConfigOption('record_chunk_frames', 32, missing='nothing')
+    _record_max_chunks = ConfigOption('record_max_chunks', 8, missing='nothing')
+
+    processing_modes = ('none', 'average', 'accumulate')
 
     # signals
     sigUpdateDisplay = QtCore.Signal()
     sigAcquisitionFinished = QtCore.Signal()
     sigVideoFinished = QtCore.Signal()
+    sigRecordingFinished = QtCore.Signal(str)
     timer = None
 
     enabled = False
@@ -73,13 +103,27 @@ class CameraLogic(GenericLogic):
         self.get_exposure()
         self.get_gain()
 
+        self.snapshots = SnapshotPublisher()
+        self._frames = FrameRingBuffer(self._ring_buffer_frames)
+        self._processing_mode = 'none'
+        # float sum of the buffered (average) or of all frames (accumulate)
+        self._frame_sum = None
+        self._accumulated = 0
+        self._frames_since_sum = 0
+        self._processed = None
+        self._background = None
+        self._subtract_background = False
+        self._record_path = None
+        self._writer = None
+        self._reset_frame_statistics()
+
         self.timer = QtCore.QTimer()
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.loop)
 
     def on_deactivate(self):
         """ Perform required deactivation. """
-        pass
+        self.stop_recording()
 
     def set_exposure(self, time):
         """ Set exposure of hardware """
@@ -105,7 +149,7 @@ class CameraLogic(GenericLogic):
 
         """
         self._hardware.start_single_acquisition()
-        self._last_image = self._hardware.get_acquired_data()
+        self._process_frame(self._hardware.get_acquired_data())
         self.sigUpdateDisplay.emit()
         self.sigAcquisitionFinished.emit()
 
@@ -113,10 +157,12 @@ class CameraLogic(GenericLogic):
         """ Start the data recording loop.
         """
         self.enabled = True
-        self.timer.start(1000*1/self._fps)
+        self._reset_frame_statistics()
+        self.timer.start(int(1000 / self._fps))
 
         if self._hardware.support_live_acquisition():
             self._hardware.start_live_acquisition()
+            self._live_start = time.monotonic()
         else:
             self._hardware.start_single_acquisition()
 
@@ -126,16 +172,21 @@ class CameraLogic(GenericLogic):
         self.timer.stop()
         self.enabled = False
         self._hardware.stop_acquisition()
+        self.stop_recording()
         self.sigVideoFinished.emit()
 
 
     def loop(self):
         """ Execute step in the data recording loop: save one of each control and process values
         """
-        self._last_image = self._hardware.get_acquired_data()
+        self._process_frame(self._hardware.get_acquired_data())
+        if self._live_start is not None:
+            # frames the camera acquired since the start which were never fetched
+            expected = int((time.monotonic() - self._live_start) / self._exposure)
+            self._frames_dropped = max(self._frames_dropped, expected - self._frames_acquired)
         self.sigUpdateDisplay.emit()
         if self.enabled:
-            self.timer.start(1000 * 1 / self._fps)
+            self.timer.start(int(1000 / self._fps))
             if not self._hardware.support_live_acquisition():
                 self._hardware.start_single_acquisition()  # the hardware has to check it's not busy
 
@@ -143,6 +194,195 @@ class CameraLogic(GenericLogic):
         """ Return last acquired image """
         return self._last_image
 
+    def _reset_frame_statistics(self):
+        self._frames_acquired = 0
+        self._frames_dropped = 0
+        self._live_start = None
+
+    def _reset_processing(self, frame):
+        """ Allocate the processing buffers for frames like the given one. """
+        self._frames.clear()
+        self._processed = np.zeros(frame.shape)
+        self._frame_sum = np.zeros(frame.shape)
+        self._accumulated = 0
+        self._frames_since_sum = 0
+        if self._background is not None and self._background.shape != frame.shape:
+            self.log.warning('Background image does not match the camera image size and is '
+                             'discarded.')
+            self._background = None
+
+    def _process_frame(self, frame):
+        """ Buffer, process and record a frame and publish the processed image.
+
+        @param numpy.ndarray frame: camera frame
+        """
+        timestamp = time.time()
+        frame = np.asarray(frame)
+        with self.threadlock:
+            if not self._frames.fits(frame):
+                self._reset_processing(frame)
+            elif self._processing_mode == 'average' and self._frames.full:
+                np.subtract(self._frame_sum, self._frames.oldest(), out=self._frame_sum)
+            slot = self._frames.append(frame, timestamp)
+            self._frames_acquired += 1
+
+            processed = self._processed
+            if self._processing_mode == 'average':
+                self._frames_since_sum += 1
+                if frame.dtype.kind in 'fc' and self._frames_since_sum >= self._frames.size:
+                    # avoid the accumulation of rounding errors of the running sum
+                    self._frames.sum(out=self._frame_sum)
+                    self._frames_since_sum = 0
+                else:
+                    np.add(self._frame_sum, slot, out=self._frame_sum)
+                np.divide(self._frame_sum, len(self._frames), out=processed)
+                count = 1
+            elif self._processing_mode == 'accumulate':
+                np.add(self._frame_sum, slot, out=self._frame_sum)
+                self._accumulated += 1
+                np.copyto(processed, self._frame_sum)
+                count = self._accumulated
+            else:
+                np.copyto(processed, slot)
+                count = 1
+            if self._subtract_background and self._background is not None:
+                if count == 1:
+                    np.subtract(processed, self._background, out=processed)
+                else:
+                    processed -= count * self._background
+
+            if self._record_path is not None:
+                if self._writer is None:
+                    self._open_record_file(frame)
+                self._writer.write(slot, timestamp)
+
+            self._last_image = self.snapshots.publish({'image': processed})['image']
+
+    def set_processing_mode(self, mode):
+        """ Set how the displayed image is calculated from the frames.
+
+        @param str mode: 'none' (last frame), 'average' (running average of the buffered frames)
+                         or 'accumulate' (sum of all frames from now on)
+        """
+        if mode not in self.processing_modes:
+            self.log.error('Unknown processing mode "{0}", use one of {1}.'.format(
+                mode, self.processing_modes))
+            return
+        with self.threadlock:
+            self._processing_mode = mode
+            self._frames_since_sum = 0
+            self._accumulated = 0
+            if self._frame_sum is not None:
+                if mode == 'average':
+                    self._frames.sum(out=self._frame_sum)
+                else:
+                    self._frame_sum[...] = 0
+
+    def get_processing_mode(self):
+        return self._processing_mode
+
+    def set_background(self, image=None):
+        """ Set the background image subtracted from every frame.
+
+        @param numpy.ndarray image: optional, background image. If None, the average of the
+                                    buffered frames is taken, e.g. of a dark video.
+        """
+        with self.threadlock:
+            if image is None:
+                if len(self._frames) == 0:
+                    self.log.error('No frames acquired to take the background from.')
+                    return
+                image = self._frames.sum(out=np.zeros(self._frame_sum.shape)) / len(self._frames)
+            self._background = np.array(image, dtype=float)
+
+    def clear_background(self):
+        """ Discard the background image. """
+        with self.threadlock:
+            self._background = None
+
+    def set_background_subtraction(self, enabled):
+        """ Subtract the background image from the displayed image or not.
+
+        @param bool enabled: subtract the background
+        """
+        self._subtract_background = bool(enabled)
+        if self._subtract_background and self._background is None:
+            self.log.warning('No background image set, use set_background first.')
+
+    def get_buffered_frames(self, count=None):
+        """ Copy of the frames in the ring buffer in acquisition order.
+
+        @param int count: optional, number of the latest frames, all buffered frames if None
+
+        @return tuple(numpy.ndarray, numpy.ndarray): timestamps and frames (frame index first)
+        """
+        with self.threadlock:
+            return self._frames.frames(count)
+
+    def get_frame_statistics(self):
+        """ Counters of the frame pipeline.
+
+        @return dict: frames acquired, dropped (acquired by the camera in live mode but not
+                      fetched), buffered, recorded and record_dropped (not written to the file
+                      because the disk was too slow) and the frame_rate of the buffered frames
+        """
+        with self.threadlock:
+            timestamps = self._frames.frames()[0]
+            frame_rate = 0.
+            if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+                frame_rate = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+            return {'acquired': self._frames_acquired,
+                    'dropped': self._frames_dropped,
+                    'buffered': len(self._frames),
+                    'recorded': 0 if self._writer is None else self._writer.written,
+                    'record_dropped': 0 if self._writer is None else self._writer.dropped,
+                    'frame_rate': frame_rate}
+
+    def start_recording(self, name_tag=''):
+        """ Record all following frames into a chunked binary file until stop_recording.
+
+        @param str name_tag: optional, added to the file name
+
+        @return str: file path
+        """
+        self.stop_recording()
+        filepath = self._save_logic.get_path_for_module('Camera')
+        filelabel = 'camera_frames' if not name_tag else 'camera_frames_' + name_tag
+        filename = '{0}_{1}.frames'.format(
+            datetime.datetime.now().strftime('%Y%m%d-%H%M-%S'), filelabel)
+        with self.threadlock:
+            self._record_path = os.path.join(filepath, filename)
+        return self._record_path
+
+    def _open_record_file(self, frame):
+        metadata = {'exposure': self._exposure,
+                    'gain': self._gain,
+                    'start': datetime.datetime.now().isoformat()}
+        self._writer = FrameFileWriter(self._record_path, frame.shape, frame.dtype,
+                                       metadata=metadata,
+                                       chunk_frames=self._record_chunk_frames,
+                                       max_chunks=self._record_max_chunks)
+
+    def stop_recording(self):
+        """ Write the remaining recorded frames and close the file.
+
+        @return str: file path, None if nothing was recorded
+        """
+        with self.threadlock:
+            writer = self._writer
+            path = self._record_path
+            self._writer = None
+            self._record_path = None
+        if writer is None:
+            return None
+        writer.close()
+        if writer.dropped > 0:
+            self.log.warning('{0:d} camera frames could not be written to {1}.'.format(
+                writer.dropped, path))
+        self.log.info('{0:d} camera frames recorded to {1}.'.format(writer.written, path))
+        self.sigRecordingFinished.emit(path)
+        return path
+
     def save_xy_data(self, colorscale_range=None, percentile_range=None):
         """ Save the current confocal xy data to file.
 
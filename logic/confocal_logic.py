@@ -25,14 +25,17 @@ from copy import copy
 import time
 import datetime
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
+from core.util.snapshot import SnapshotPublisher
 from core.connector import Connector
 from core.statusvariable import StatusVar
 
+mpl = lazy_import('matplotlib')
+plt = lazy_import('matplotlib.pyplot')
+
 
 class OldConfigFileError(Exception):
     """ Exception that is thrown when an old config file is loaded.
@@ -292,6 +295,9 @@ class ConfocalLogic(GenericLogic):
         #locking for thread safety
         self.threadlock = Mutex()
 
+        # snapshots of the scan images for the GUI
+        self.snapshots = SnapshotPublisher()
+
         # counter for scan_image
         self._scan_counter = 0
         self._zscan = False
@@ -346,6 +352,7 @@ class ConfocalLogic(GenericLogic):
             self.history.append(new_state)
 
         self.history_index = len(self.history) - 1
+        self._publish_images()
 
         # Sets connections between signals and functions
         self.signal_scan_lines_next.connect(self._scan_line, QtCore.Qt.QueuedConnection)
@@ -552,6 +559,7 @@ class ConfocalLogic(GenericLogic):
                 self._return_YL = np.linspace(self._YL[-1], self._YL[0], self.return_slowness)
                 self._return_AL = np.zeros(self._return_YL.shape)
 
+            self._publish_images(xy=False)
             self.sigImageDepthInitialized.emit()
 
         # xy scan is in xy plane
@@ -574,6 +582,7 @@ class ConfocalLogic(GenericLogic):
             self.xy_image[:, :, 2] = self._current_z * np.ones(
                 (len(self._image_vert_axis), len(self._X)))
 
+            self._publish_images(depth=False)
             self.sigImageXYInitialized.emit()
         return 0
 
@@ -725,6 +734,23 @@ class ConfocalLogic(GenericLogic):
         """
         return self._scanning_device.get_scanner_count_channels()
 
+    def _publish_images(self, xy=True, depth=True, line=None):
+        """ Publish the scan images in the snapshots read by the GUI.
+
+        @param bool xy: publish the xy image
+        @param bool depth: publish the depth image
+        @param int line: index of the only line of the image being scanned that changed since the
+                         last publish, None if unknown
+        """
+        name = 'depth_image' if self._zscan else 'xy_image'
+        data = {'scan_line': (name, max(self._scan_counter - 1, 0) if line is None else line)}
+        if xy:
+            data['xy_image'] = self.xy_image
+        if depth:
+            data['depth_image'] = self.depth_image
+        rows = None if line is None else {name: line}
+        self.snapshots.publish(data, rows=rows)
+
     def _scan_line(self):
         """scanning an image in either depth or xy
 
@@ -735,6 +761,7 @@ class ConfocalLogic(GenericLogic):
                 self.kill_scanner()
                 self.stopRequested = False
                 self.module_state.unlock()
+                self._publish_images()
                 self.signal_xy_image_updated.emit()
                 self.signal_depth_image_updated.emit()
                 self.set_position('scanner')
@@ -840,9 +867,11 @@ class ConfocalLogic(GenericLogic):
                     self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
                 else:
                     self.depth_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
+                self._publish_images(xy=False, line=self._scan_counter)
                 self.signal_depth_image_updated.emit()
             else:
                 self.xy_image[self._scan_counter, :, 3:3 + s_ch] = line_counts
+                self._publish_images(depth=False, line=self._scan_counter)
                 self.signal_xy_image_updated.emit()
 
             # next line in scan
@@ -1234,6 +1263,7 @@ class ConfocalLogic(GenericLogic):
         if self.history_index < len(self.history) - 1:
             self.history_index += 1
             self.history[self.history_index].restore(self)
+            self._publish_images()
             self.signal_xy_image_updated.emit()
             self.signal_depth_image_updated.emit()
             if hasattr(self._scanning_device,'tiltcorrection'):
@@ -1249,6 +1279,7 @@ class ConfocalLogic(GenericLogic):
         if self.history_index > 0:
             self.history_index -= 1
             self.history[self.history_index].restore(self)
+            self._publish_images()
             self.signal_xy_image_updated.emit()
             self.signal_depth_image_updated.emit()
             if hasattr(self._scanning_device, 'tiltcorrection'):
@@ -23,14 +23,17 @@ from qtpy import QtCore
 from collections import OrderedDict
 import numpy as np
 import time
-import matplotlib.pyplot as plt
 
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
 from interface.slow_counter_interface import CountingMode
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 
+plt = lazy_import('matplotlib.pyplot')
+
 
 class CounterLogic(GenericLogic):
     """ This logic module gathers data from a hardware counting device.
@@ -58,6 +61,10 @@ class CounterLogic(GenericLogic):
     # declare connectors
     counter1 = Connector(interface='SlowCounterInterface')
     savelogic = Connector(interface='SaveLogic')
+    datalogger = Connector(interface='DataLoggerInterface', optional=True)
+
+    # config options
+    _datalogger_channel = ConfigOption('datalogger_channel', 'counter', missing='nothing')
 
     # status vars
     _count_length = StatusVar('count_length', 300)
@@ -103,6 +110,7 @@ class CounterLogic(GenericLogic):
         # Connect to hardware and save logic
         self._counting_device = self.counter1()
         self._save_logic = self.savelogic()
+        self._data_logger = self.datalogger()
 
         # Recall saved app-parameters
         if 'counting_mode' in self._statusVariables:
@@ -123,6 +131,11 @@ class CounterLogic(GenericLogic):
 
         self._saving_start_time = time.time()
 
+        # publish the count rates if a data logger is connected
+        if self._data_logger is not None:
+            self._data_logger.set_log_channels(
+                {self._datalogger_channel: {'fields': list(self.get_channels())}})
+
         # connect signals
         self.sigCountDataNext.connect(self.count_loop_body, QtCore.Qt.QueuedConnection)
         return
@@ -566,6 +579,9 @@ class CounterLogic(GenericLogic):
             self.countdata_smoothed[i, window:] = np.median(self.countdata[i,
                                                             -self._smooth_window_length:])
 
+        if self._data_logger is not None:
+            self._data_logger.log_to_channel(self._datalogger_channel, self.countdata[:, -1])
+
         # save the data if necessary
         if self._saving:
              # if oversampling is necessary
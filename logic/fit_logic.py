@@ -20,14 +20,17 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import ast
 import importlib
 import inspect
+import logging
 import lmfit
 from qtpy import QtCore
 import numpy as np
-from os import listdir
-from os.path import isfile, join
+from os import listdir, cpu_count
+from os.path import isfile, join, getmtime
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from distutils.version import LooseVersion
 
 from logic.generic_logic import GenericLogic
@@ -36,6 +39,115 @@ from core.util.mutex import Mutex
 from core.config import load, save
 
 
+class FitMethodRegistry:
+    """ Declarative registry of all fit methods defined in the modules in logic/fitmethods.
+
+    The registry is built by parsing the source files of the fitmethods modules without importing
+    them. The result can be cached in a file and is only rebuilt for modules whose modification
+    time changed. A fitmethods module is imported only when one of its methods is first requested.
+    """
+
+    def __init__(self, cache_file=None):
+        """ Create the registry.
+
+            @param cache_file str: optional, path of the YAML file to cache the registry in
+        """
+        self.path = join(get_main_dir(), 'logic', 'fitmethods')
+        self.cache_file = cache_file
+        # Name of the fitmethods module defining each method
+        self._method_modules = OrderedDict()
+        # Functions of the already imported fitmethods modules
+        self._loaded_modules = dict()
+        self._build()
+
+    def __contains__(self, method_name):
+        return method_name in self._method_modules
+
+    @property
+    def method_names(self):
+        return list(self._method_modules)
+
+    def _build(self):
+        """ Collect the method names of all fitmethods modules from the cache or the sources. """
+        cache = OrderedDict()
+        if self.cache_file is not None and isfile(self.cache_file):
+            try:
+                cache = load(self.cache_file)
+            except:
+                logging.getLogger(__name__).warning(
+                    'Unable to read fit method registry cache "{0}".'.format(self.cache_file))
+        if not isinstance(cache, dict):
+            cache = OrderedDict()
+
+        modules = OrderedDict()
+        for f in sorted(listdir(self.path)):
+            if not (isfile(join(self.path, f)) and f[-3:] == '.py'):
+                continue
+            module_name = f[:-3]
+            mtime = getmtime(join(self.path, f))
+            entry = cache.get(module_name)
+            if isinstance(entry, dict) and entry.get('mtime') == mtime:
+                modules[module_name] = entry
+            else:
+                modules[module_name] = {'mtime': mtime,
+                                        'methods': self._scan_module(join(self.path, f))}
+
+        if self.cache_file is not None and modules != cache:
+            try:
+                save(self.cache_file, modules)
+            except:
+                logging.getLogger(__name__).warning(
+                    'Unable to write fit method registry cache "{0}".'.format(self.cache_file))
+
+        for module_name, entry in modules.items():
+            for method in entry['methods']:
+                self._method_modules[method] = module_name
+        return
+
+    @staticmethod
+    def _scan_module(filename):
+        """ Find all functions defined at the top level of a python source file.
+
+            @param filename str: path of the python source file
+
+            @return list: names of the functions
+        """
+        with open(filename, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=filename)
+        return [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
+
+    def load_module_methods(self, method_name):
+        """ Import the fitmethods module defining a method.
+
+            @param method_name str: name of the requested method
+
+            @return dict: all registered functions of the module defining the method
+        """
+        module_name = self._method_modules[method_name]
+        if module_name not in self._loaded_modules:
+            mod = importlib.import_module('logic.fitmethods.{0}'.format(module_name))
+            self._loaded_modules[module_name] = {
+                name: getattr(mod, name) for name, module in self._method_modules.items()
+                if module == module_name and inspect.isfunction(getattr(mod, name, None))}
+        return self._loaded_modules[module_name]
+
+
+class LazyFitMethod:
+    """ Callable reference to a fit method of an object whose fitmethods module is imported on
+    the first call.
+    """
+
+    def __init__(self, owner, name):
+        self._owner = owner
+        self.__name__ = name
+
+    def __call__(self, *args, **kwargs):
+        return getattr(self._owner, self.__name__)(*args, **kwargs)
+
+    def __repr__(self):
+        return '<lazy fit method {0}>'.format(self.__name__)
+
+
 class FitLogic(GenericLogic):
     """
     Documentation to add a new fit model/estimator/function can be found in
@@ -53,46 +165,33 @@ class FitLogic(GenericLogic):
         # locking for thread safety
         self.lock = Mutex()
 
-        filenames = []
-        # for path in directories:
-        path = join(get_main_dir(), 'logic', 'fitmethods')
-        for f in listdir(path):
-            if isfile(join(path, f)):
-                if f[-3:] == '.py':
-                    filenames.append(f[:-3])
-
         # A dictionary containing all fit methods and their estimators.
         self.fit_list = OrderedDict()
         self.fit_list['1d'] = OrderedDict()
         self.fit_list['2d'] = OrderedDict()
         self.fit_list['3d'] = OrderedDict()
 
-        # Go through the fitmethods files and import all methods.
+        # Build the registry of all fit methods. The fitmethods modules are only imported when
+        # a method is used for the first time (see __getattr__).
         # Also determine which methods need to be added to the fit_list dictionary
+        try:
+            cache_file = join(self._manager.getStatusDir(), 'fit_method_registry.cfg')
+        except AttributeError:
+            cache_file = None
+        self._fit_registry = FitMethodRegistry(cache_file)
+
         estimators_for_dict = list()
         models_for_dict = list()
         fits_for_dict = list()
 
-        for files in filenames:
-
-            mod = importlib.import_module('logic.fitmethods.{0}'.format(files))
-            for method in dir(mod):
-                ref = getattr(mod, method)
-                if callable(ref) and (inspect.ismethod(ref) or inspect.isfunction(ref)):
-                    method_str = str(method)
-                    try:
-                        # import methods in Fitlogic
-                        setattr(FitLogic, method, ref)
-                        # append method to a list of methods to include in the fit_list dictionary
-                        if method_str.startswith('make_') and method_str.endswith('_fit'):
-                            fits_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
-                        elif method_str.startswith('make_') and method_str.endswith('_model'):
-                            models_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
-                        elif method_str.startswith('estimate_'):
-                            estimators_for_dict.append(method_str.split('_', 1)[1])
-                    except:
-                        self.log.error('Method "{0}" could not be imported to FitLogic.'
-                                       ''.format(str(method)))
+        for method_str in self._fit_registry.method_names:
+            # append method to a list of methods to include in the fit_list dictionary
+            if method_str.startswith('make_') and method_str.endswith('_fit'):
+                fits_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
+            elif method_str.startswith('make_') and method_str.endswith('_model'):
+                models_for_dict.append(method_str.split('_', 1)[1].rsplit('_', 1)[0])
+            elif method_str.startswith('estimate_'):
+                estimators_for_dict.append(method_str.split('_', 1)[1])
 
         fits_for_dict.sort()
         models_for_dict.sort()
@@ -113,11 +212,12 @@ class FitLogic(GenericLogic):
             # Attach make_*_fit method to fit_list
             if fit_name not in self.fit_list[dimension]:
                 self.fit_list[dimension][fit_name] = OrderedDict()
-            self.fit_list[dimension][fit_name]['make_fit'] = getattr(self, fit_method)
+            self.fit_list[dimension][fit_name]['make_fit'] = LazyFitMethod(self, fit_method)
 
             # Attach make_*_model method to fit_list
             if fit_name in models_for_dict:
-                self.fit_list[dimension][fit_name]['make_model'] = getattr(self, model_method)
+                self.fit_list[dimension][fit_name]['make_model'] = LazyFitMethod(self,
+                                                                                 model_method)
             else:
                 self.log.error('No make_*_model method for fit "{0}" found in FitLogic.'
                                ''.format(fit_name))
@@ -127,11 +227,13 @@ class FitLogic(GenericLogic):
             for estimator_name in estimators_for_dict:
                 estimator_method = 'estimate_' + estimator_name
                 if fit_name == estimator_name:
-                    self.fit_list[dimension][fit_name]['generic'] = getattr(self, estimator_method)
+                    self.fit_list[dimension][fit_name]['generic'] = LazyFitMethod(
+                        self, estimator_method)
                     found_estimator = True
                 elif estimator_name.startswith(fit_name + '_'):
                     custom_name = estimator_name.split('_', 1)[1]
-                    self.fit_list[dimension][fit_name][custom_name] = getattr(self, estimator_method)
+                    self.fit_list[dimension][fit_name][custom_name] = LazyFitMethod(
+                        self, estimator_method)
                     found_estimator = True
             if not found_estimator:
                 self.log.error('No estimator method for fit "{0}" found in FitLogic.'
@@ -140,6 +242,21 @@ class FitLogic(GenericLogic):
         self.log.info('Methods were included to FitLogic, but only if naming is right: check the'
                       ' doxygen documentation if you added a new method and it does not show.')
 
+    def __getattr__(self, name):
+        """ Import the fitmethods module of a requested fit method on first access and attach
+        all of its methods to FitLogic. Only called if the attribute is not found otherwise.
+        """
+        registry = self.__dict__.get('_fit_registry')
+        if registry is None or name not in registry:
+            raise AttributeError('\'{0}\' object has no attribute \'{1}\''
+                                 ''.format(type(self).__name__, name))
+        for method, ref in registry.load_module_methods(name).items():
+            try:
+                setattr(FitLogic, method, ref)
+            except:
+                self.log.error('Method "{0}" could not be imported to FitLogic.'.format(method))
+        return object.__getattribute__(self, name)
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -256,6 +373,157 @@ class FitLogic(GenericLogic):
       
         return FitContainer(self, container_name, dimension)
 
+    def batch_fit(self, x_axis, data, fit_function, estimator='generic', add_params=None,
+                  processes=None, chunk_size=None):
+        """ Fit the same 1D model to many traces, e.g. all pixels of an ODMR map or of a lifetime
+        image.
+
+        The model and parameter template are created only once per worker process. Each trace
+        gets its initial values from the estimator before the fit. The traces are distributed in
+        chunks over a pool of worker processes.
+
+        @param numpy.ndarray x_axis: 1D axis values shared by all traces
+        @param numpy.ndarray data: 2D array with one trace per row (n_traces, len(x_axis))
+        @param str fit_function: name of the fit as used in fit_list, e.g. 'lorentzian' or 'sine'
+        @param str estimator: optional, name of the estimator for this fit (default: 'generic')
+        @param Parameters or dict add_params: optional, additional parameters of
+                    type lmfit.parameter.Parameters, OrderedDict or dict for the fit
+                    which will be used instead of the values from the estimator.
+        @param int processes: optional, number of worker processes. Fits are performed in the
+                              calling thread if set to 1. Defaults to the number of CPUs.
+        @param int chunk_size: optional, number of traces fitted per task. By default the traces
+                               are divided into 4 chunks per process.
+
+        @return numpy.ndarray: structured array with one entry per trace. Contains the fields
+                               'success' and 'redchi' and for each fit parameter the fields
+                               '<name>' and '<name>_stderr'.
+        """
+        x_axis = np.asarray(x_axis, dtype=float)
+        data = np.atleast_2d(np.asarray(data, dtype=float))
+        if data.shape[1] != x_axis.size:
+            self.log.error('Batch fit data must be of shape (n_traces, {0:d}) but is {1}.'
+                           ''.format(x_axis.size, data.shape))
+            return None
+        if fit_function not in self.fit_list['1d']:
+            self.log.error('Fit "{0}" not found in FitLogic.'.format(fit_function))
+            return None
+        if estimator not in self.fit_list['1d'][fit_function]:
+            self.log.error('Estimator "{0}" not found for fit "{1}".'
+                           ''.format(estimator, fit_function))
+            return None
+        return run_batch_fit(x_axis, data, fit_function, estimator, add_params, processes,
+                             chunk_size)
+
+
+class FitMethodsContext:
+    """ Lightweight stand-in for FitLogic providing all fit methods without any Qt or qudi
+    module overhead. Used to perform fits in worker processes of FitLogic.batch_fit.
+    """
+    log = logging.getLogger(__name__)
+
+    _fit_registry = None
+
+    def __init__(self):
+        if FitMethodsContext._fit_registry is None:
+            FitMethodsContext._fit_registry = FitMethodRegistry()
+        # Cache of (model, parameter template) for each fit function
+        self._templates = dict()
+
+    def __getattr__(self, name):
+        """ Import the fitmethods module of a requested fit method on first access. """
+        if name.startswith('__') or name not in FitMethodsContext._fit_registry:
+            raise AttributeError('\'{0}\' object has no attribute \'{1}\''
+                                 ''.format(type(self).__name__, name))
+        for method, ref in FitMethodsContext._fit_registry.load_module_methods(name).items():
+            setattr(FitMethodsContext, method, ref)
+        return object.__getattribute__(self, name)
+
+    def get_template(self, fit_function):
+        """ Create the model and parameter template of a fit function once and reuse it.
+
+        @param str fit_function: name of the fit, e.g. 'lorentzian'
+
+        @return tuple (lmfit.Model, lmfit.Parameters): model and parameter template
+        """
+        if fit_function not in self._templates:
+            self._templates[fit_function] = getattr(self, 'make_{0}_model'.format(fit_function))()
+        return self._templates[fit_function]
+
+
+# Fit context of the current (worker) process. Created on the first batch fit chunk.
+_batch_fit_context = None
+
+
+def _batch_fit_chunk(fit_function, estimator, x_axis, data, add_params=None):
+    """ Fit all traces in data with the same model. Called in FitLogic.batch_fit worker processes.
+
+    @param str fit_function: name of the fit, e.g. 'lorentzian'
+    @param str estimator: name of the estimator, e.g. 'generic' or 'dip'
+    @param numpy.ndarray x_axis: 1D axis values
+    @param numpy.ndarray data: 2D array containing one trace per row
+    @param Parameters or dict add_params: optional, parameters overriding the estimator values
+
+    @return numpy.ndarray: structured array with fit results, see FitLogic.batch_fit
+    """
+    global _batch_fit_context
+    if _batch_fit_context is None:
+        _batch_fit_context = FitMethodsContext()
+    context = _batch_fit_context
+    model, template = context.get_template(fit_function)
+    if estimator == 'generic':
+        estimate = getattr(context, 'estimate_{0}'.format(fit_function))
+    else:
+        estimate = getattr(context, 'estimate_{0}_{1}'.format(fit_function, estimator))
+
+    dtype = [('success', bool), ('redchi', float)]
+    for name in template:
+        dtype.extend([(name, float), (name + '_stderr', float)])
+    results = np.zeros(data.shape[0], dtype=dtype)
+
+    for index, trace in enumerate(data):
+        error, params = estimate(x_axis, trace, template.copy())
+        params = context._substitute_params(initial_params=params, update_params=add_params)
+        try:
+            result = model.fit(trace, x=x_axis, params=params)
+        except Exception as e:
+            context.log.warning('Batch fit of trace {0:d} failed: {1}'.format(index, e))
+            results[index]['redchi'] = np.nan
+            for name in template:
+                results[index][name] = np.nan
+                results[index][name + '_stderr'] = np.nan
+            continue
+        results[index]['success'] = result.success
+        results[index]['redchi'] = result.redchi
+        for name, param in result.params.items():
+            if name in template:
+                results[index][name] = param.value
+                results[index][name + '_stderr'] = np.nan if param.stderr is None else param.stderr
+    return results
+
+
+def run_batch_fit(x_axis, data, fit_function, estimator='generic', add_params=None,
+                  processes=None, chunk_size=None):
+    """ Distribute the traces of a batch fit in chunks over a pool of worker processes.
+    See FitLogic.batch_fit for a description of the parameters and the return value.
+    """
+    if processes is None:
+        processes = cpu_count()
+    processes = max(1, int(processes))
+    if chunk_size is None:
+        chunk_size = int(np.ceil(data.shape[0] / (4 * processes)))
+    chunk_size = max(1, int(chunk_size))
+
+    chunks = [data[i:i + chunk_size] for i in range(0, data.shape[0], chunk_size)]
+    task_args = (fit_function, estimator, x_axis)
+    if processes == 1:
+        results = [_batch_fit_chunk(*task_args, chunk, add_params) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_batch_fit_chunk, *task_args, chunk, add_params)
+                       for chunk in chunks]
+            results = [future.result() for future in futures]
+    return np.concatenate(results)
+
 
 class FitContainer(QtCore.QObject):
     """ A class for managing a single flexible fit setting in a logic module.
@@ -294,6 +562,13 @@ class FitContainer(QtCore.QObject):
         self.use_settings = None
         self.units = ['independent variable {0}'.format(i+1) for i in range(self.dim)]
         self.units.append('dependent variable')
+        # live fit options: seed a fit with the previous result and cap the number of iterations
+        self.warm_start = False
+        self.max_iterations = None
+        self._warm_start_fit = None
+        self._warm_start_params = None
+        self._warm_start_x_size = 0
+        self._warm_start_key = None
 
     def set_units(self, units):
         """ Set units for this fit.
@@ -322,6 +597,46 @@ class FitContainer(QtCore.QObject):
         prep = self.fit_logic.prepare_save_fits({self.dimension: self.fit_list})
         return prep
 
+    def set_warm_start(self, enabled):
+        """ Enable or disable warm start fitting for live updates.
+            @param enabled bool: If True, each fit is seeded with the result of the previous
+                                 successful fit of the same fit function instead of running the
+                                 estimator.
+        """
+        self.warm_start = bool(enabled)
+        self.reset_warm_start()
+
+    def set_max_iterations(self, max_iterations):
+        """ Limit the number of function evaluations of each fit, e.g. for live display.
+            @param max_iterations int: maximum number of function evaluations, None for no limit
+        """
+        self.max_iterations = None if max_iterations is None else max(1, int(max_iterations))
+
+    def reset_warm_start(self):
+        """ Forget the previous fit result, so the next fit starts from the estimator again.
+        """
+        self._warm_start_fit = None
+        self._warm_start_params = None
+        self._warm_start_x_size = 0
+        self._warm_start_key = None
+
+    def _warm_start_estimator(self, x_axis, data, params):
+        """ Estimator using the parameter values of the previous fit result. """
+        params = self.fit_logic._substitute_params(initial_params=params,
+                                                   update_params=self._warm_start_params)
+        return 0, params
+
+    def _get_fit_kwargs(self):
+        """ Keyword arguments passed through the make_*_fit methods to lmfit. """
+        if self.max_iterations is None:
+            return dict()
+        # lmfit >= 1.0 ignores maxfev for leastsq and takes the limit as max_nfev instead. Both
+        # limit the evaluations within leastsq, so the covariance (and with it the parameter
+        # errors) is still available for an unfinished fit.
+        if LooseVersion(lmfit.__version__) >= LooseVersion('1.0'):
+            return {'max_nfev': self.max_iterations}
+        return {'fit_kws': {'maxfev': self.max_iterations}}
+
     def clear_result(self):
         """ Reset fit result and fit parameters from result for this container.
         """
@@ -344,6 +659,8 @@ class FitContainer(QtCore.QObject):
         If the name given is not in the list of fits, the current fit will be 'No Fit'.
         This is a reserved name that will do nothing and should not display a fit line if set.
         """
+        if current_fit != self._warm_start_fit:
+            self.reset_warm_start()
         if current_fit not in self.fit_list and current_fit != 'No Fit':
             self.fit_logic.log.warning('{0} not in {1} fit list!'.format(current_fit, self.name))
             self.current_fit = 'No Fit'
@@ -362,7 +679,7 @@ class FitContainer(QtCore.QObject):
         self.sigCurrentFit.emit(self.current_fit)
         return self.current_fit, self.use_settings
 
-    def do_fit(self, x_data, y_data):
+    def do_fit(self, x_data, y_data, warm_start_key='default'):
         """Performs the chosen fit on the measured data.
         @param array x_data: optional, 1D np.array or 1D list with the x values.
                              If None is passed then the module x values are
@@ -371,6 +688,9 @@ class FitContainer(QtCore.QObject):
                              If None is passed then the module y values are
                              taken. If passed, then it should have the same size
                              as x_data.
+        @param warm_start_key: optional, identifies the data source (e.g. a channel). The warm
+                               start only uses a previous result of the same source. None to
+                               never warm start this fit.
 
         @return: tuple (fit_x, fit_y, str_dict, fit_result)
             np.array fit_x: 1D array containing the x values of the fit
@@ -405,9 +725,28 @@ class FitContainer(QtCore.QObject):
         result = None
 
         if self.current_fit in self.fit_list:
-            result = self.fit_list[self.current_fit]['make_fit'](
-                estimator=self.fit_list[self.current_fit]['estimator'],
-                **kwargs)
+            kwargs.update(self._get_fit_kwargs())
+            if (self.warm_start and warm_start_key is not None
+                    and self._warm_start_fit == self.current_fit
+                    and self._warm_start_key == warm_start_key
+                    and self._warm_start_x_size == len(x_data)):
+                result = self.fit_list[self.current_fit]['make_fit'](
+                    estimator=self._warm_start_estimator,
+                    **kwargs)
+                # fall back to a full fit if the data changed too much for the warm start.
+                # With limited iterations an unfinished fit is kept and refined in the next call.
+                if not result.success and self.max_iterations is None:
+                    result = None
+            if result is None:
+                result = self.fit_list[self.current_fit]['make_fit'](
+                    estimator=self.fit_list[self.current_fit]['estimator'],
+                    **kwargs)
+            if (self.warm_start and warm_start_key is not None
+                    and (result.success or self.max_iterations is not None)):
+                self._warm_start_fit = self.current_fit
+                self._warm_start_params = result.params
+                self._warm_start_x_size = len(x_data)
+                self._warm_start_key = warm_start_key
 
         elif self.current_fit == 'No Fit':
             fit_y = np.zeros(fit_x.shape)
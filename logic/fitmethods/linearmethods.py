@@ -248,17 +248,13 @@ def estimate_linear(self, x_axis, data, params):
     error = self._check_1D_input(x_axis=x_axis, data=data, params=params)
 
     try:
-        # calculate the parameters using Least-squares estimation of linear
-        # regression
-        a_1 = 0
-        a_2 = 0
+        # calculate the parameters using the closed form least-squares solution of linear
+        # regression. This is already the optimal fit, so the subsequent fit converges at once.
         x_mean = x_axis.mean()
         data_mean = data.mean()
 
-        for i in range(0, len(x_axis)):
-            a_1 += (x_axis[i]-x_mean)*(data[i]-data_mean)
-            a_2 += np.power(x_axis[i]-x_mean, 2)
-        slope = a_1/a_2
+        slope = (np.sum((x_axis - x_mean) * (data - data_mean)) /
+                 np.sum((x_axis - x_mean) ** 2))
         intercept = data_mean - slope * x_mean
         params['offset'].value = intercept
         params['slope'].value = slope
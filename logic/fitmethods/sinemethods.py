@@ -21,10 +21,18 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 
 
+import hashlib
+import threading
 import numpy as np
+from collections import OrderedDict
 from lmfit.models import Model
 from core.util.math import compute_ft
 
+# DFTs of the recently estimated data, shared by all sine estimators (see _sine_dft)
+_dft_cache = OrderedDict()
+_dft_cache_lock = threading.Lock()
+_DFT_CACHE_SIZE = 8
+
 
 ################################################################################
 #                                                                              #
@@ -402,6 +410,37 @@ def make_sinetriplewiththreeexpdecay_model(self, prefix=None):
 ################################################################################
 
 
+def _sine_dft(self, x_axis, data):
+    """ Zeropadded discrete fourier transform of data, shared by the sine estimators.
+
+    The transforms of the recently estimated data are kept, so the same data is only transformed
+    once, e.g. when several sine fits are tried on it or when a live fit of unchanged data is
+    repeated.
+
+    @param numpy.array x_axis: 1D axis values
+    @param numpy.array data: 1D data, should have the same dimension as x_axis.
+
+    @return tuple (dft_x, dft_y): read-only arrays, see core.util.math.compute_ft
+    """
+    x_axis = np.asarray(x_axis, dtype=float)
+    data = np.asarray(data, dtype=float)
+    key = (x_axis.shape, data.shape,
+           hashlib.sha1(x_axis.tobytes()).digest(), hashlib.sha1(data.tobytes()).digest())
+    with _dft_cache_lock:
+        if key in _dft_cache:
+            _dft_cache.move_to_end(key)
+            return _dft_cache[key]
+
+    dft_x, dft_y = compute_ft(x_axis, data, zeropad_num=1)
+    dft_x.flags.writeable = False
+    dft_y.flags.writeable = False
+    with _dft_cache_lock:
+        _dft_cache[key] = (dft_x, dft_y)
+        while len(_dft_cache) > _DFT_CACHE_SIZE:
+            _dft_cache.popitem(last=False)
+    return dft_x, dft_y
+
+
 def estimate_baresine(self, x_axis, data, params):
     """ Bare sine estimator with a frequency and phase.
 
@@ -426,7 +465,7 @@ def estimate_baresine(self, x_axis, data, params):
 
     # calculate dft with zeropadding to obtain nicer interpolation between the
     # appearing peaks.
-    dft_x, dft_y = compute_ft(x_axis, data, zeropad_num=1)
+    dft_x, dft_y = self._sine_dft(x_axis, data)
 
     stepsize = x_axis[1]-x_axis[0]  # for frequency axis
     frequency_max = np.abs(dft_x[np.log(dft_y).argmax()])
@@ -493,7 +532,7 @@ def estimate_sinewithoutoffset(self, x_axis, data, params):
 
     # calculate dft with zeropadding to obtain nicer interpolation between the
     # appearing peaks.
-    dft_x, dft_y = compute_ft(x_axis, data, zeropad_num=1)
+    dft_x, dft_y = self._sine_dft(x_axis, data)
 
     stepsize = x_axis[1] - x_axis[0]  # for frequency axis
 
@@ -675,6 +714,50 @@ def estimate_sine(self, x_axis, data, params):
 
     return error, params
 
+
+def estimate_sine_linearized(self, x_axis, data, params):
+    """ Provides a fast estimator for sine fitting using a linearized least squares solution.
+
+    Only the frequency is estimated from the discrete fourier transform. For a fixed frequency
+    the model offset + a*sin(2*pi*f*x) + b*cos(2*pi*f*x) is linear in its parameters. Amplitude,
+    phase and offset are therefore obtained in closed form and the subsequent fit only needs to
+    refine the frequency.
+
+    @param numpy.array x_axis: 1D axis values
+    @param numpy.array data: 1D data, should have the same dimension as x_axis.
+    @param lmfit.Parameters params: object includes parameter dictionary which
+                                    can be set
+
+    @return tuple (error, params):
+
+    Explanation of the return parameter:
+        int error: error code (0:OK, -1:error)
+        Parameters object params: set parameters of initial values
+    """
+
+    x_axis = np.array(x_axis)
+    data = np.array(data)
+
+    error = self._check_1D_input(x_axis=x_axis, data=data, params=params)
+
+    # frequency with the highest spectral weight of the leveled data
+    dft_x, dft_y = self._sine_dft(x_axis, data - np.average(data))
+    indices = np.where(dft_y > 0.0)
+    frequency = np.abs(dft_x[indices][dft_y[indices].argmax()])
+
+    # linear least squares for fixed frequency
+    omega_x = 2 * np.pi * frequency * x_axis
+    design = np.column_stack((np.sin(omega_x), np.cos(omega_x), np.ones(x_axis.size)))
+    (sin_coeff, cos_coeff, offset), _, _, _ = np.linalg.lstsq(design, data, rcond=None)
+
+    stepsize = np.abs(x_axis[1] - x_axis[0])
+    params['amplitude'].set(value=np.sqrt(sin_coeff ** 2 + cos_coeff ** 2))
+    params['frequency'].set(value=frequency, min=0.0, max=1 / stepsize * 3)
+    params['phase'].set(value=np.arctan2(cos_coeff, sin_coeff), min=-np.pi, max=np.pi)
+    params['offset'].set(value=offset)
+
+    return error, params
+
 ##########################
 # Sine exponential decay #
 ##########################
@@ -795,7 +878,9 @@ def estimate_sineexponentialdecay(self, x_axis, data, params=None):
     # estimate amplitude
     ampl_val = max(np.abs(data_level.min()), np.abs(data_level.max()))
 
-    dft_x, dft_y = compute_ft(x_axis, data_level, zeropad_num=1)
+    dft_x, dft_y = self._sine_dft(x_axis, data_level)
+    # the noise is removed from a copy, the transform is shared with the other estimators
+    dft_y = dft_y.copy()
 
     stepsize = x_axis[1] - x_axis[0]  # for frequency axis
 
@@ -21,6 +21,7 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 """
 import abc
 import sys
+import time
 import logging
 from qtpy import QtCore
 
@@ -117,6 +118,10 @@ class InterruptableTask(QtCore.QObject, Fysom, metaclass=TaskMetaclass):
         self.runner = runner
         self.ref = references
         self.config = config
+        # set by the task queue of the runner before the task starts
+        self.parameters = dict()
+        self.prepared = None
+        self.timing = {'steps': 0, 'step_time': 0., 'max_step_time': 0.}
 
         self.sigDoStart.connect(self._doStart, QtCore.Qt.QueuedConnection)
         self.sigDoPause.connect(self._doPause, QtCore.Qt.QueuedConnection)
@@ -146,12 +151,22 @@ class InterruptableTask(QtCore.QObject, Fysom, metaclass=TaskMetaclass):
           @return bool: True if task was started, False otherwise
         """
         self.result = TaskResult()
-        if self.checkStartPrerequisites():
+        self.timing = {'steps': 0, 'step_time': 0., 'max_step_time': 0.}
+        try:
+            can_start = self.checkStartPrerequisites()
+        except Exception as e:
+            self.log.exception('Exception while checking the start prerequisites of task {0}. '
+                               '{1}'.format(self.name, e))
+            can_start = False
+        if can_start:
             #print('_run', QtCore.QThread.currentThreadId(), self.current)
             self.sigDoStart.emit()
             #print('_runemit', QtCore.QThread.currentThreadId(), self.current)
             return True
         else:
+            # go back to stopped instead of hanging in starting
+            self.result.update(None, False)
+            self.abort()
             return False
 
     def _doStart(self):
@@ -169,12 +184,24 @@ class InterruptableTask(QtCore.QObject, Fysom, metaclass=TaskMetaclass):
             self.log.exception('Exception during task {0}. {1}'.format(
                 self.name, e))
             self.result.update(None, False)
+            # undo what was done for the start, as _doFinish does
+            self.runner.resumePauseTasks(self)
+            self.runner.postRunPPTasks(self)
+            if self.can('abort'):
+                self.abort()
+                self.sigFinished.emit()
 
     def _doTaskStep(self):
         """ Check for state transitions to pause or stop and execute one step of the task work function.
         """
         try:
-            if self.runTaskStep():
+            start = time.perf_counter()
+            running = self.runTaskStep()
+            duration = time.perf_counter() - start
+            self.timing['steps'] += 1
+            self.timing['step_time'] += duration
+            self.timing['max_step_time'] = max(self.timing['max_step_time'], duration)
+            if running:
                 if self.isstate('pausing') and self.checkPausePrerequisites():
                     self.sigDoPause.emit()
                 elif self.isstate('finishing'):
@@ -295,9 +322,23 @@ class InterruptableTask(QtCore.QObject, Fysom, metaclass=TaskMetaclass):
         """
         return self.interruptable and self.can('pause') and self.checkPausePrerequisites()
 
+    def prepareTask(self, parameters):
+        """ Overwrite this function when sub-classing if your task has a preparation that can run
+            while another task runs, e.g. sampling a waveform. The task queue of the runner calls it
+            in a worker thread before the task starts, possibly while this task still runs with
+            other parameters. So do not change the state of the task here and only use the modules
+            given as 'prepareresources' in the task configuration.
+
+          @param dict parameters: the parameters the task will be started with
+
+          @return object: result of the preparation, available as self.prepared in startTask
+        """
+        return None
+
     @abc.abstractmethod
     def startTask(self):
         """ Implement the operation to start your task here.
+            Parameters given by the task queue are in self.parameters.
         """
         pass
 
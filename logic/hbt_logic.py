@@ -23,13 +23,37 @@ import numpy as np
 from logic.generic_logic import GenericLogic
 from core.module import Connector
 from core.configoption import ConfigOption
-import TimeTagger as tt
+from core.util.correlator import TimeTagCorrelator, split_channels
+from core.util.mutex import Mutex
 from qtpy import QtCore
 
+try:
+    import TimeTagger as tt
+except ImportError:
+    tt = None
+
 
 class HbtLogic(GenericLogic):
     """
     This is the logic for running HBT experiments
+
+    Two correlation backends are available:
+        'timetagger': the correlation is calculated by a Swabian Instruments Time Tagger
+        'software': time tags of the two channels from any source are passed to add_timestamps
+                    (or replayed from a file with load_timestamp_file) and correlated in software
+
+    Example config for the software backend:
+
+    hbtlogic:
+        module.Class: 'hbt_logic.HbtLogic'
+        backend: 'software'
+        correlator_mode: 'multi_stop'
+        timetagger_channel_apd_0: 0
+        timetagger_channel_apd_1: 1
+        bin_width: 500
+        bins: 2000
+        connect:
+            savelogic: 'savelogic'
     """
     _modclass = 'hbtlogic'
     _modtype = 'logic'
@@ -38,6 +62,8 @@ class HbtLogic(GenericLogic):
     _channel_apd_1 = ConfigOption('timetagger_channel_apd_1', missing='error')
     _bin_width = ConfigOption('bin_width', 500, missing='info')
     _n_bins = ConfigOption('bins', 2000, missing='info')
+    _backend = ConfigOption('backend', 'timetagger', missing='nothing')
+    _correlator_mode = ConfigOption('correlator_mode', 'multi_stop', missing='nothing')
     savelogic = Connector(interface='SaveLogic')
 
     hbt_updated = QtCore.Signal()
@@ -54,6 +80,9 @@ class HbtLogic(GenericLogic):
         self.g2_data = []
         self.g2_data_normalised = []
         self.hbt_available = False
+        self._correlator = None
+        self._software_running = False
+        self._threadlock = Mutex()
         self._setup_measurement()
         self._close_measurement()
 
@@ -73,16 +102,35 @@ class HbtLogic(GenericLogic):
         self.sigStart.connect(self._start_hbt)
         self.sigStop.connect(self._stop_hbt)
 
+    @property
+    def uses_software_correlator(self):
+        return self._backend == 'software'
+
     def _setup_measurement(self):
+        if self.uses_software_correlator:
+            if self._correlator is None:
+                self._correlator = TimeTagCorrelator(bin_width=self._bin_width,
+                                                     n_bins=self._n_bins,
+                                                     mode=self._correlator_mode)
+            self.coin = None
+            self.bin_times = self._correlator.get_index()
+            return
+        if tt is None:
+            self.log.error('TimeTagger library not available. Use the "software" backend to '
+                           'correlate time tags from other sources.')
+            self.coin = None
+            return
         self._tagger = tt.createTimeTagger()
         self.coin = tt.Correlation(self._tagger, self._channel_apd_0, self._channel_apd_1,
                                    binwidth=self._bin_width, n_bins=self._n_bins)
         self.bin_times = self.coin.getIndex()
 
     def _close_measurement(self):
-        self.coin.stop()
+        if self.coin is not None:
+            self.coin.stop()
         self.coin = None
         self._tagger = None
+        self._software_running = False
 
     def start_hbt(self):
         self.sigStart.emit()
@@ -92,11 +140,27 @@ class HbtLogic(GenericLogic):
 
     def _start_hbt(self):
         self._setup_measurement()
-        self.coin.clear()
-        self.coin.start()
+        if self.uses_software_correlator:
+            with self._threadlock:
+                self._correlator.clear()
+                self._software_running = True
+        elif self.coin is not None:
+            self.coin.clear()
+            self.coin.start()
+        else:
+            return
         self.timer.start(500)  # 0.5s
 
     def update(self):
+        if self.uses_software_correlator:
+            with self._threadlock:
+                self.bin_times = self._correlator.get_index()
+                self.g2_data = self._correlator.get_data()
+                # normalised to the coincidences expected from the measured count rates
+                self.g2_data_normalised = self._correlator.get_normalised_data()
+            self.hbt_available = True
+            self.hbt_updated.emit()
+            return
         self.bin_times = self.coin.getIndex()
         self.g2_data = self.coin.getData()
         self.hbt_available = True
@@ -107,17 +171,83 @@ class HbtLogic(GenericLogic):
             self.g2_data_normalised = np.zeros_like(self.g2_data)
         self.hbt_updated.emit()
 
+    def add_timestamps(self, start_tags, stop_tags, end_time=None):
+        """ Pass a chunk of time tags to the software correlator.
+
+        Can be called from any thread by the module acquiring the time tags. Tags are ignored while
+        the measurement is not running.
+
+        @param numpy.ndarray start_tags: sorted time tags of channel timetagger_channel_apd_0
+        @param numpy.ndarray stop_tags: sorted time tags of channel timetagger_channel_apd_1
+        @param int end_time: optional, time up to which the chunk is complete for both channels
+        """
+        if not self.uses_software_correlator:
+            self.log.error('Time tags can only be added with the "software" correlation backend.')
+            return
+        with self._threadlock:
+            if self._software_running:
+                self._correlator.add_timestamps(start_tags, stop_tags, end_time)
+        return
+
+    def load_timestamp_file(self, filename, chunk_size=1000000):
+        """ Correlate the time tags recorded in a file with the software correlator.
+
+        The file is a numpy .npz file with the arrays 'timestamps' and 'channels' or a .npy/text
+        file with two columns (timestamp, channel). The histogram is reset before.
+
+        @param str filename: path of the recorded time tag file
+        @param int chunk_size: number of time tags processed per chunk
+        """
+        if not self.uses_software_correlator:
+            self.log.error('Recorded time tags can only be correlated with the "software" '
+                           'correlation backend.')
+            return
+        if filename.endswith('.npz'):
+            with np.load(filename) as tag_file:
+                timestamps = tag_file['timestamps']
+                channels = tag_file['channels']
+        else:
+            if filename.endswith('.npy'):
+                tag_data = np.load(filename)
+            else:
+                tag_data = np.loadtxt(filename)
+            timestamps = tag_data[:, 0]
+            channels = tag_data[:, 1]
+
+        start_tags, stop_tags = split_channels(
+            timestamps, channels, self._channel_apd_0, self._channel_apd_1)
+        self._setup_measurement()
+        with self._threadlock:
+            self._correlator.clear()
+            self._software_running = True
+            chunk_ends = np.sort(np.concatenate((start_tags, stop_tags)))[
+                chunk_size - 1::chunk_size]
+            start_index = stop_index = 0
+            for end_time in chunk_ends:
+                start_end = np.searchsorted(start_tags, end_time, side='right')
+                stop_end = np.searchsorted(stop_tags, end_time, side='right')
+                self._correlator.add_timestamps(start_tags[start_index:start_end],
+                                                stop_tags[stop_index:stop_end],
+                                                end_time + 1)
+                start_index, stop_index = start_end, stop_end
+            self._correlator.add_timestamps(start_tags[start_index:], stop_tags[stop_index:])
+            self._software_running = False
+        self.update()
+        return
+
     def pause_hbt(self):
         if self.coin is not None:
             self.coin.stop()
+        self._software_running = False
 
     def continue_hbt(self):
         if self.coin is not None:
             self.coin.start()
+        if self.uses_software_correlator:
+            self._software_running = True
 
     def _stop_hbt(self):
-        if self.coin is not None:
-            self._close_measurement()
+        self._close_measurement()
 
         self.timer.stop()
 
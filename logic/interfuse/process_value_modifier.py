@@ -21,7 +21,6 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 import numpy as np
-from scipy.interpolate import interp1d
 
 from core.connector import Connector
 from core.configoption import ConfigOption
@@ -48,6 +47,10 @@ class ProcessValueModifier(GenericLogic, ProcessInterface):
     # X Y
     0   0
     1   10
+
+    The calibration is interpolated linearly with numpy for single values and arrays. Controllers
+    can read the hardware directly and apply the transformation themselves, see
+    get_process_value_source.
     """
 
     hardware = Connector(interface='ProcessInterface')
@@ -90,7 +93,19 @@ class ProcessValueModifier(GenericLogic, ProcessInterface):
         if self._calibration is None:
             self._interpolated_function = lambda x: x
         else:
-            self._interpolated_function = interp1d(self._calibration[:, 0], self._calibration[:, 1])
+            calibration = np.asarray(self._calibration, dtype=float)
+            order = np.argsort(calibration[:, 0])
+            x = calibration[order, 0]
+            y = calibration[order, 1]
+            self._interpolated_function = lambda value: self._interpolate(value, x, y)
+
+    @staticmethod
+    def _interpolate(value, x, y):
+        """ Interpolate linearly, like scipy interp1d without extrapolation. """
+        value = np.asarray(value, dtype=float)
+        if np.any(value < x[0]) or np.any(value > x[-1]):
+            raise ValueError('A process value is outside the calibration range.')
+        return np.interp(value, x, y)
 
     def reset_to_identity(self):
         """ Reset the calibration data to use identity """
@@ -106,6 +121,26 @@ class ProcessValueModifier(GenericLogic, ProcessInterface):
             self.log.error('No calibration was found, please set the process value modifier data first.')
             return 0
 
+    def transform_process_value(self, value):
+        """ Apply the calibration to values of the hardware.
+
+        @param float|numpy.ndarray value: value or array of values of the hardware
+
+        @return float|numpy.ndarray: modified values
+        """
+        if self._interpolated_function is None:
+            self.log.error('No calibration was found, please set the process value modifier data '
+                           'first.')
+            return value
+        return self._interpolated_function(value)
+
+    def get_process_value_source(self):
+        """ The module this interfuse reads the process value from and the transformation applied.
+
+        @return tuple(object, callable): connected process module, transform_process_value
+        """
+        return self._hardware, self.transform_process_value
+
     def get_process_unit(self):
         """ Return the process unit
         """
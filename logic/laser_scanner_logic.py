@@ -25,21 +25,41 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 
 from collections import OrderedDict
 import datetime
-import matplotlib.pyplot as plt
 import numpy as np
 import time
 
 from core.connector import Connector
+from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 
+plt = lazy_import('matplotlib.pyplot')
+
 
 class LaserScannerLogic(GenericLogic):
 
     """This logic module controls scans of DC voltage on the fourth analog
     output channel of the NI Card.  It collects countrate as a function of voltage.
+
+    Besides scans of number_of_repeats up and down lines, the voltage can be ramped up and down
+    continuously until the scan is stopped (start_continuous_scanning). Several triangular
+    periods are scanned back to back with one hardware timed scan_line call of about
+    continuous_block_time seconds, without going to the start voltage or setting up the scanner
+    for every line. The counts are binned on the fly into a fixed grid of resolution voltage bins.
+    scan_matrix and scan_matrix2 then hold the last number_of_repeats lines as ring buffers
+    (get_recent_lines returns them in order), plot_y and plot_y2 the average of all lines.
+
+    Example config for copy-paste:
+
+    laserscannerlogic:
+        module.Class: 'laser_scanner_logic.LaserScannerLogic'
+        continuous_block_time: 0.5  # optional, s
+        connect:
+            confocalscanner1: 'laserscannerdummy'
+            savelogic: 'savelogic'
     """
 
     sig_data_updated = QtCore.Signal()
@@ -54,6 +74,8 @@ class LaserScannerLogic(GenericLogic):
     _scan_speed = StatusVar('scan_speed', 10)
     _static_v = StatusVar('goto_voltage', 5)
 
+    continuous_block_time = ConfigOption('continuous_block_time', 0.5, missing='nothing')
+
     sigChangeVoltage = QtCore.Signal(float)
     sigVoltageChanged = QtCore.Signal(float)
     sigScanNextLine = QtCore.Signal()
@@ -71,6 +93,8 @@ class LaserScannerLogic(GenericLogic):
         # locking for thread safety
         self.threadlock = Mutex()
         self.stopRequested = False
+        self._continuous = False
+        self._continuous_data = False
 
         self.fit_x = []
         self.fit_y = []
@@ -277,6 +301,8 @@ class LaserScannerLogic(GenericLogic):
         self._scan_counter_up = 0
         self._scan_counter_down = 0
         self.upwards_scan = True
+        self._continuous = False
+        self._continuous_data = False
 
         # TODO: Generate Ramps
         self._upwards_ramp = self._generate_ramp(v_min, v_max, self._scan_speed)
@@ -294,6 +320,146 @@ class LaserScannerLogic(GenericLogic):
         self.sigScanStarted.emit()
         return 0
 
+    def start_continuous_scanning(self, v_min=None, v_max=None):
+        """ Scan up and down continuously until stop_scanning is called.
+
+        @param float v_min: optional, lower end of the scan range
+        @param float v_max: optional, upper end of the scan range
+
+        @return int: error code (0:OK, -1:error)
+        """
+        self.current_position = self._scanning_device.get_scanner_position()
+
+        if v_min is not None:
+            self.scan_range[0] = v_min
+        else:
+            v_min = self.scan_range[0]
+        if v_max is not None:
+            self.scan_range[1] = v_max
+        else:
+            v_max = self.scan_range[1]
+        if v_min >= v_max:
+            self.log.error('Continuous scan needs a scan range with start below stop.')
+            return -1
+
+        self._scan_counter_up = 0
+        self._scan_counter_down = 0
+        self.upwards_scan = True
+
+        # One triangular period starts after v_min, turns at v_max and ends at v_min, so periods
+        # can be scanned back to back.
+        upwards_ramp = self._generate_ramp(v_min, v_max, self._scan_speed)[:, 1:]
+        downwards_ramp = self._generate_ramp(v_max, v_min, self._scan_speed)[:, 1:]
+        period = np.hstack((upwards_ramp, downwards_ramp))
+        period_time = period.shape[1] / self._clock_frequency
+        periods = max(1, int(round(self.continuous_block_time / period_time)))
+        self._continuous_block = np.tile(period, periods)
+        self._prepare_binning(upwards_ramp.shape[1], downwards_ramp.shape[1], periods)
+        self._initialise_continuous_data()
+
+        returnvalue = self._initialise_scanner()
+        if returnvalue < 0:
+            return -1
+
+        self._continuous = True
+        self._continuous_data = True
+        self.sigScanNextLine.emit()
+        self.sigScanStarted.emit()
+        return 0
+
+    def _prepare_binning(self, up_length, down_length, periods):
+        """ Precalculate the voltage bin and line of every point of the continuous scan block.
+
+        @param int up_length: number of points of an upwards line
+        @param int down_length: number of points of a downwards line
+        @param int periods: number of up and down line pairs in the block
+        """
+        bins = int(self.resolution)
+        edges = np.linspace(self.scan_range[0], self.scan_range[1], bins + 1)
+        voltage_bin = np.clip(
+            np.searchsorted(edges, self._continuous_block[3], side='right') - 1, 0, bins - 1)
+        line = np.repeat(np.arange(2 * periods), np.tile([up_length, down_length], periods))
+        self._continuous_keys = line * bins + voltage_bin
+        occupancy = np.bincount(self._continuous_keys, minlength=2 * periods * bins)
+
+        # bins without points take the value of the closest bin with points
+        fill = np.empty((2 * periods, bins), dtype=int)
+        for direction in range(2):
+            filled = np.flatnonzero(occupancy[direction * bins:(direction + 1) * bins])
+            position = np.searchsorted(filled, np.arange(bins))
+            left = filled[np.clip(position - 1, 0, len(filled) - 1)]
+            right = filled[np.clip(position, 0, len(filled) - 1)]
+            nearest = np.where(np.arange(bins) - left <= right - np.arange(bins), left, right)
+            fill[direction::2] = nearest
+        fill += np.arange(2 * periods)[:, np.newaxis] * bins
+        self._continuous_fill = fill
+        self._continuous_occupancy = np.maximum(occupancy, 1)
+
+    def _initialise_continuous_data(self):
+        """ Initialise ring buffers and averages of a continuous scan on the voltage grid. """
+        bins = int(self.resolution)
+        edges = np.linspace(self.scan_range[0], self.scan_range[1], bins + 1)
+        self.scan_matrix = np.zeros((self.number_of_repeats, bins))
+        self.scan_matrix2 = np.zeros((self.number_of_repeats, bins))
+        self.plot_x = (edges[:-1] + edges[1:]) / 2
+        self.plot_y = np.zeros(bins)
+        self.plot_y2 = np.zeros(bins)
+        self.fit_x = self.plot_x.copy()
+        self.fit_y = np.zeros(bins)
+
+    def _do_next_block(self):
+        """ Scan one block of the continuous scan and bin the counts into lines.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        counts = self._scan_line(self._continuous_block)
+        if len(counts) != self._continuous_block.shape[1] or np.any(counts == -1):
+            self.log.error('The scanner returned an error during the continuous scan, '
+                           'stopping the scan.')
+            self.stop_scanning()
+            return -1
+        sums = np.bincount(self._continuous_keys, weights=counts,
+                           minlength=len(self._continuous_occupancy))
+        lines = (sums / self._continuous_occupancy)[self._continuous_fill]
+        self._scan_counter_up = self._add_lines(
+            self.scan_matrix, self.plot_y, lines[0::2], self._scan_counter_up)
+        self._scan_counter_down = self._add_lines(
+            self.scan_matrix2, self.plot_y2, lines[1::2], self._scan_counter_down)
+        return 0
+
+    @staticmethod
+    def _add_lines(matrix, average, lines, count):
+        """ Write lines into a ring buffer and update their average in place.
+
+        @param numpy.ndarray matrix: ring buffer of lines
+        @param numpy.ndarray average: average of the count lines added before
+        @param numpy.ndarray lines: new lines
+        @param int count: number of lines added before
+
+        @return int: number of lines added including the new ones
+        """
+        average *= count
+        average += lines.sum(axis=0)
+        average /= count + len(lines)
+        rows = matrix.shape[0]
+        index = np.arange(count, count + len(lines))[-rows:] % rows
+        matrix[index] = lines[-rows:]
+        return count + len(lines)
+
+    def get_recent_lines(self, upwards=True):
+        """ The lines of a continuous scan kept in the ring buffer, oldest first.
+
+        @param bool upwards: upwards (trace) or downwards (retrace) lines
+
+        @return numpy.ndarray: lines, one per row
+        """
+        matrix = self.scan_matrix if upwards else self.scan_matrix2
+        count = self._scan_counter_up if upwards else self._scan_counter_down
+        rows = matrix.shape[0]
+        if count <= rows:
+            return matrix[:count].copy()
+        return np.roll(matrix, -(count % rows), axis=0)
+
     def stop_scanning(self):
         """Stops the scan
 
@@ -316,8 +482,10 @@ class LaserScannerLogic(GenericLogic):
         """ If stopRequested then finish the scan, otherwise perform next repeat of the scan line
         """
         # stops scanning
-        if self.stopRequested or self._scan_counter_down >= self.number_of_repeats:
+        if self.stopRequested or (not self._continuous
+                                  and self._scan_counter_down >= self.number_of_repeats):
             print(self.current_position)
+            self._continuous = False
             self._goto_during_scan(self._static_v)
             self._close_scanner()
             self.sigScanFinished.emit()
@@ -327,6 +495,12 @@ class LaserScannerLogic(GenericLogic):
             # move from current voltage to start of scan range.
             self._goto_during_scan(self.scan_range[0])
 
+        if self._continuous:
+            if self._do_next_block() == 0:
+                self.sigUpdatePlots.emit()
+            self.sigScanNextLine.emit()
+            return
+
         if self.upwards_scan:
             counts = self._scan_line(self._upwards_ramp)
             self.scan_matrix[self._scan_counter_up] = counts
@@ -382,12 +556,12 @@ class LaserScannerLogic(GenericLogic):
                     'Voltage ramp too short to apply the '
                     'configured smoothing_steps. A simple linear ramp '
                     'was created instead.')
-                num_of_linear_steps = np.rint((v_max - v_min) / linear_v_step)
+                num_of_linear_steps = int(np.rint((v_max - v_min) / linear_v_step))
                 ramp = np.linspace(v_min, v_max, num_of_linear_steps)
 
             else:
 
-                num_of_linear_steps = np.rint((v_max_linear - v_min_linear) / linear_v_step)
+                num_of_linear_steps = int(np.rint((v_max_linear - v_min_linear) / linear_v_step))
 
                 # Calculate voltage step values for smooth acceleration part of ramp
                 smooth_curve = np.array(
@@ -485,11 +659,20 @@ class LaserScannerLogic(GenericLogic):
         data['trace count data (counts/s)'] = self.plot_y
         data['retrace count data (counts/s)'] = self.plot_y2
 
-        data2 = OrderedDict()
-        data2['count data (counts/s)'] = self.scan_matrix[:self._scan_counter_up, :]
-
-        data3 = OrderedDict()
-        data3['count data (counts/s)'] = self.scan_matrix2[:self._scan_counter_down, :]
+        if self._continuous_data:
+            matrix = self.get_recent_lines(upwards=True)
+            matrix2 = self.get_recent_lines(upwards=False)
+            data2 = OrderedDict()
+            data2['count data (counts/s)'] = matrix
+            data3 = OrderedDict()
+            data3['count data (counts/s)'] = matrix2
+        else:
+            matrix = self.scan_matrix
+            matrix2 = self.scan_matrix2
+            data2 = OrderedDict()
+            data2['count data (counts/s)'] = self.scan_matrix[:self._scan_counter_up, :]
+            data3 = OrderedDict()
+            data3['count data (counts/s)'] = self.scan_matrix2[:self._scan_counter_down, :]
 
         parameters = OrderedDict()
         parameters['Number of frequency sweeps (#)'] = self._scan_counter_up
@@ -499,7 +682,7 @@ class LaserScannerLogic(GenericLogic):
         parameters['Clock Frequency (Hz)'] = self._clock_frequency
 
         fig = self.draw_figure(
-            self.scan_matrix,
+            matrix,
             self.plot_x,
             self.plot_y,
             self.fit_x,
@@ -508,7 +691,7 @@ class LaserScannerLogic(GenericLogic):
             percentile_range=percentile_range)
 
         fig2 = self.draw_figure(
-            self.scan_matrix2,
+            matrix2,
             self.plot_x,
             self.plot_y2,
             self.fit_x,
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains the adaptive search used by the magnet logic for the 2D alignment.
+
+Instead of measuring every point of the alignment grid, the search measures a coarse grid first
+and then climbs from the best coarse point to a local optimum with a compass (pattern) search on
+the full grid. Each measurement takes minutes (ODMR, nuclear spin readout), so the number of
+measured points is what matters. Points are restricted to the grid, so the results fit into the
+2D data matrix of the magnet logic and the search ends exactly at grid resolution.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+
+class GridPatternSearch:
+    """ Coarse grid followed by a compass search on a 2D grid of measurement points.
+
+    The search is driven from outside, since every measurement is a step of the alignment loop:
+
+        search = GridPatternSearch((11, 11), coarse_step=3)
+        index = search.ask()
+        while index is not None:
+            search.tell(index, measure(index))
+            index = search.ask()
+
+    Indices are tuples (axis0 index, axis1 index). Coarse points are visited snake-wise, with
+    axis0 as the inner axis like the snake-wise pathway of the magnet logic. The compass search
+    starts with the coarse step at the best coarse point, moves to the first neighbour that is
+    better and halves the step when no neighbour is better. Every point is measured at most once.
+    """
+
+    def __init__(self, shape, coarse_step=3, maximize=True, max_points=0):
+        """
+        @param tuple shape: number of grid points (axis0, axis1)
+        @param int coarse_step: distance of the coarse grid points in grid points
+        @param bool maximize: search for the maximum (True) or the minimum (False)
+        @param int max_points: stop after this many measured points, 0 for no limit
+        """
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.coarse_step = max(1, int(coarse_step))
+        self.maximize = bool(maximize)
+        self.max_points = max(0, int(max_points))
+        # grid index: measured value
+        self.values = dict()
+        self._search = self._search_points()
+        self._asked = None
+        self._reply = None
+        self._finished = False
+
+    def ask(self):
+        """ The next point to measure.
+
+        @return tuple: grid index, None if the search is finished
+        """
+        if self._asked is not None:
+            return self._asked
+        if self._finished or (self.max_points and len(self.values) >= self.max_points):
+            self._finished = True
+            return None
+        while True:
+            try:
+                index = self._search.send(self._reply)
+            except StopIteration:
+                self._finished = True
+                return None
+            if index in self.values:
+                # measured before, e.g. coarse points around the start of the compass search
+                self._reply = self.values[index]
+                continue
+            self._asked = index
+            return index
+
+    def tell(self, index, value):
+        """ Report the measured value of a point.
+
+        @param tuple index: grid index
+        @param float value: measured value
+        """
+        index = tuple(int(i) for i in index)
+        self.values[index] = float(value)
+        if index == self._asked:
+            self._asked = None
+            self._reply = float(value)
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def best(self):
+        """ The best point measured so far.
+
+        @return tuple: (grid index, value), None if nothing was measured yet
+        """
+        if not self.values:
+            return None
+        if self.maximize:
+            return max(self.values.items(), key=lambda item: item[1])
+        return min(self.values.items(), key=lambda item: item[1])
+
+    def _better(self, value, reference):
+        return value > reference if self.maximize else value < reference
+
+    def _coarse_axis(self, size):
+        points = list(range(0, size, self.coarse_step))
+        if points[-1] != size - 1:
+            points.append(size - 1)
+        return points
+
+    def _search_points(self):
+        """ Generator yielding the points to measure and receiving their values. """
+        axis0 = self._coarse_axis(self.shape[0])
+        for number, index1 in enumerate(self._coarse_axis(self.shape[1])):
+            for index0 in (axis0 if number % 2 == 0 else reversed(axis0)):
+                yield (index0, index1)
+
+        center, center_value = self.best()
+        step = self.coarse_step
+        while step >= 1:
+            moved = False
+            for direction in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                neighbour = (min(max(center[0] + direction[0] * step, 0), self.shape[0] - 1),
+                             min(max(center[1] + direction[1] * step, 0), self.shape[1] - 1))
+                if neighbour == center:
+                    continue
+                value = yield neighbour
+                if self._better(value, center_value):
+                    center, center_value = neighbour, value
+                    moved = True
+                    break
+            if not moved:
+                step //= 2
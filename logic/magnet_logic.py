@@ -25,9 +25,11 @@ import numpy as np
 import time
 
 from collections import OrderedDict
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
 from logic.generic_logic import GenericLogic
+from logic.magnet_alignment_search import GridPatternSearch
 from qtpy import QtCore
 from interface.slow_counter_interface import CountingMode
 
@@ -82,8 +84,16 @@ class MagnetLogic(GenericLogic):
     align_2d_axis1_step = StatusVar('align_2d_axis1_step', 1e-3)
     align_2d_axis1_vel = StatusVar('align_2d_axis1_vel', 10e-6)
     curr_2d_pathway_mode = StatusVar('curr_2d_pathway_mode', 'snake-wise')
+    # 'grid' measures every point, 'adaptive' a coarse grid and then searches the optimum
+    curr_2d_search_mode = StatusVar('curr_2d_search_mode', 'grid')
+    align_2d_coarse_step = StatusVar('align_2d_coarse_step', 3)
+    align_2d_max_points = StatusVar('align_2d_max_points', 0)
+    align_2d_maximize = StatusVar('align_2d_maximize', True)
 
     _checktime = StatusVar('_checktime', 2.5)
+    # waiting for a movement: maximum time in s and shortest interval in s to poll the position
+    _move_timeout = ConfigOption('move_timeout', 600)
+    _min_checktime = ConfigOption('min_checktime', 0.05)
     _1D_axis0_data = StatusVar('_1D_axis0_data', default=np.arange(3))
     _2D_axis0_data = StatusVar('_2D_axis0_data', default=np.arange(3))
     _2D_axis1_data = StatusVar('_2D_axis1_data', default=np.arange(2))
@@ -183,6 +193,8 @@ class MagnetLogic(GenericLogic):
         super().__init__(config=config, **kwargs)
 
         self._stop_measure = False
+        self._adaptive_search = None
+        self._motion_statistics = {'moves': 0, 'polls': 0, 'wait_time': 0.0}
 
     def on_activate(self):
         """ Definition and initialisation of the GUI.
@@ -217,6 +229,7 @@ class MagnetLogic(GenericLogic):
                                                QtCore.Qt.QueuedConnection)
 
         self.pathway_modes = ['spiral-in', 'spiral-out', 'snake-wise', 'diagonal-snake-wise']
+        self.search_modes = ['grid', 'adaptive']
 
         # relative movement settings
 
@@ -756,6 +769,11 @@ class MagnetLogic(GenericLogic):
 
             self._2D_add_data_matrix = np.zeros(shape=np.shape(self._2D_data_matrix), dtype=object)
 
+            if self.curr_2d_search_mode == 'adaptive':
+                self._start_adaptive_search()
+            else:
+                self._adaptive_search = None
+
             if stepwise_meas:
                 # just make it to an empty dict
                 self._pathway_cont = dict()
@@ -797,9 +815,7 @@ class MagnetLogic(GenericLogic):
         # self.set_velocity(move_dict_vel)
         self._magnet_device.move_abs(move_dict_abs)
         # self.move_rel(move_dict_rel)
-        while self._check_is_moving():
-            time.sleep(self._checktime)
-            self.log.debug("Went into while loop in _move_to_curr_pathway_index")
+        self._wait_for_motion(move_dict_abs)
 
         # this function will return to this function if position is reached:
         start_pos = self._saved_pos_before_align
@@ -816,6 +832,38 @@ class MagnetLogic(GenericLogic):
             # start the continuous alignment loop body self._continuous_loop_body:
             self._sigContinuousAlignmentNext.emit()
 
+    def _start_adaptive_search(self):
+        """ Replace the pathway through all grid points by the points of the adaptive search.
+
+        The full pathway and back map are kept to look up the movements to the grid points the
+        search asks for. The pathway starts with the first point and is extended after every
+        measurement by _extend_adaptive_pathway.
+        """
+        self._grid_pathway = self._pathway
+        self._grid_backmap = self._backmap
+        self._grid_lookup = {entry['index']: path_index
+                             for path_index, entry in self._grid_backmap.items()}
+        self._adaptive_search = GridPatternSearch(np.shape(self._2D_data_matrix),
+                                                  self.align_2d_coarse_step,
+                                                  self.align_2d_maximize,
+                                                  self.align_2d_max_points)
+        first_index = self._adaptive_search.ask()
+        self._pathway = [self._grid_pathway[self._grid_lookup[first_index]]]
+        self._backmap = {0: self._grid_backmap[self._grid_lookup[first_index]]}
+
+    def _extend_adaptive_pathway(self, meas_val):
+        """ Pass the value measured at the current pathway index to the adaptive search and
+        append the next point to measure to the pathway.
+
+        @param float meas_val: measured value
+        """
+        self._adaptive_search.tell(self._backmap[self._pathway_index]['index'], meas_val)
+        next_index = self._adaptive_search.ask()
+        if next_index is not None:
+            path_index = self._grid_lookup[next_index]
+            self._backmap[len(self._pathway)] = self._grid_backmap[path_index]
+            self._pathway.append(self._grid_pathway[path_index])
+
     def _stepwise_loop_body(self):
         """ Go one by one through the created path
         @return:
@@ -865,6 +913,10 @@ class MagnetLogic(GenericLogic):
         # done during the measurement in add_meas_val.
         self._set_meas_point(meas_val, add_meas_val, self._pathway_index, self._backmap)
 
+        # in adaptive mode the search appends the next point to the pathway
+        if self._adaptive_search is not None:
+            self._extend_adaptive_pathway(meas_val)
+
         # increase the index
         self._pathway_index += 1
 
@@ -879,10 +931,7 @@ class MagnetLogic(GenericLogic):
             # commenting this out for now, because it is kind of useless for us
             # self.set_velocity(move_dict_vel)
             self._magnet_device.move_abs(move_dict_abs)
-
-            while self._check_is_moving():
-                time.sleep(self._checktime)
-                self.log.debug("Went into while loop in stepwise_loop_body")
+            self._wait_for_motion(move_dict_abs)
 
             self.log.debug("stepwise_loop_body reports magnet moving ? {0}".format(self._check_is_moving()))
 
@@ -933,10 +982,18 @@ class MagnetLogic(GenericLogic):
         for axis_name in self._saved_pos_before_align:
             last_pos[axis_name] = self._backmap[self._pathway_index - 1][axis_name]
 
-        self._magnet_device.move_abs(self._saved_pos_before_align)
+        # after an adaptive alignment go to the best point, otherwise back to the start
+        end_pos = self._saved_pos_before_align
+        if self._adaptive_search is not None and self._adaptive_search.best() is not None:
+            best_index, best_value = self._adaptive_search.best()
+            best_pos = self._grid_backmap[self._grid_lookup[best_index]]
+            end_pos = {axis_name: best_pos[axis_name] for axis_name in end_pos}
+            self.log.info('Adaptive alignment measured {0:d} of {1:d} points. Best value {2} at '
+                          '{3}.'.format(len(self._adaptive_search.values),
+                                        len(self._grid_pathway), best_value, end_pos))
 
-        while self._check_is_moving():
-            time.sleep(self._checktime)
+        self._magnet_device.move_abs(end_pos)
+        self._wait_for_motion(end_pos)
 
         self.sigMeasurementFinished.emit()
 
@@ -948,54 +1005,110 @@ class MagnetLogic(GenericLogic):
         pass
 
     def _check_position_reached_loop(self, start_pos_dict, end_pos_dict):
-        """ Perform just a while loop, which checks everytime the conditions
+        """ Wait until the magnet reached a position and emit sigPosReached if it did.
+
+        A timeout or a magnet stopping before the target is logged by _wait_for_motion and
+        sigPosReached is not emitted.
 
         @param dict start_pos_dict: the position in this dictionary must be
                                     absolute positions!
-        @param dict end_pos_dict:
-        @param float checktime: the checktime in seconds
+        @param dict end_pos_dict: absolute target position
 
-        @return:
-
-        Whenever the magnet has passed 95% of the way, the method will return.
-
-        Check also whether the difference in position increases again, and if so
-        stop the measurement and raise an error, since either the velocity was
-        too fast or the magnet does not move further.
+        @return bool: True if the position was reached, see _wait_for_motion
         """
+        reached = self._wait_for_motion(end_pos_dict)
+        if reached:
+            self.sigPosReached.emit()
+        return reached
 
-        distance_init = 0.0
-        constraints = self.get_hardware_constraints()
-        minimal_distance = 0.0
-        for axis_label in start_pos_dict:
-            distance_init = (end_pos_dict[axis_label] - start_pos_dict[axis_label]) ** 2
-            minimal_distance = minimal_distance + (constraints[axis_label]['pos_step']) ** 2
-        distance_init = np.sqrt(distance_init)
-        minimal_distance = np.sqrt(minimal_distance)
-
-        # take 97% distance tolerance:
-        distance_tolerance = 0.03 * distance_init
+    def _wait_for_motion(self, target_pos, timeout=None):
+        """ Wait until the magnet reached an absolute position.
 
-        current_dist = 0.0
+        Instead of polling every _checktime seconds, the remaining travel time expected from the
+        distance and the axis velocities is waited before the position is polled again. Close to
+        the target, the polling interval grows from min_checktime to _checktime. The wait ends
+        early if the alignment is stopped or if the position did not change for three times
+        _checktime, e.g. because the move was ignored by the hardware.
 
-        while True:
-            time.sleep(self._checktime)
+        @param dict target_pos: axis label: absolute target position
+        @param float timeout: optional, maximum waiting time in s. Default is the config option
+                              move_timeout.
 
-            curr_pos = self.get_pos(list(end_pos_dict))
-
-            for axis_label in start_pos_dict:
-                current_dist = (end_pos_dict[axis_label] - curr_pos[axis_label]) ** 2
-
-            current_dist = np.sqrt(current_dist)
-
-            self.sigPosChanged.emit(curr_pos)
+        @return bool: True if the position was reached, False otherwise
+        """
+        timeout = self._move_timeout if timeout is None else timeout
+        start = time.monotonic()
+        axes = list(target_pos)
+        constraints = self.get_hardware_constraints()
+        tolerance = {axis: constraints.get(axis, dict()).get('pos_step') or 0 for axis in axes}
+        velocities = self._get_axis_velocities(axes)
+        stall_time = 3 * self._checktime
+
+        def distance(position, axis):
+            return abs(position[axis] - target_pos[axis])
+
+        def reached(position):
+            return all(distance(position, axis) <= tolerance[axis]
+                       or np.isclose(position[axis], target_pos[axis]) for axis in axes)
+
+        self._motion_statistics['moves'] += 1
+        self._motion_statistics['polls'] += 1
+        pos = self.get_pos(axes)
+        interval = self._min_checktime
+        last_pos = pos
+        unchanged_since = time.monotonic()
+        result = reached(pos)
+        while not result:
+            travel_time = 0
+            if velocities is not None:
+                travel_time = max(distance(pos, axis) / velocities[axis] for axis in axes)
+            remaining = timeout - (time.monotonic() - start)
+            time.sleep(max(0, min(max(min(travel_time, stall_time), interval), remaining)))
+            interval = min(2 * interval, self._checktime)
+
+            pos = self.get_pos(axes)
+            self._motion_statistics['polls'] += 1
+            self.sigPosChanged.emit(pos)
+            now = time.monotonic()
+            result = reached(pos)
+            if result or self._stop_measure:
+                break
+            if now - start >= timeout:
+                self.log.error('Magnet did not reach the position {0} within {1} s, the '
+                               'current position is {2}.'.format(target_pos, timeout, pos))
+                break
+            if any(abs(pos[axis] - last_pos[axis]) > tolerance[axis] for axis in axes):
+                unchanged_since = now
+                last_pos = pos
+            elif now - unchanged_since >= stall_time:
+                self.log.warning('Magnet stopped at {0} before reaching the position '
+                                 '{1}.'.format(pos, target_pos))
+                break
+        self._motion_statistics['wait_time'] += time.monotonic() - start
+        return result
 
-            if (current_dist <= distance_tolerance) or (current_dist <= minimal_distance) or self._stop_measure:
-                self.sigPosReached.emit()
+    def _get_axis_velocities(self, axes):
+        """ Velocities of the axes reported by the hardware.
 
-                break
+        @param list axes: axis labels
 
-                # return either pos reached signal of check position
+        @return dict: axis label: velocity, None if not available for all axes
+        """
+        try:
+            velocities = self._magnet_device.get_velocity(axes)
+            if all(velocities[axis] > 0 for axis in axes):
+                return {axis: velocities[axis] for axis in axes}
+        except Exception:
+            pass
+        return None
+
+    def get_motion_statistics(self):
+        """ Statistics of the waiting for movements.
+
+        @return dict: number of movements waited for, number of position polls and total
+                      waiting time in s
+        """
+        return dict(self._motion_statistics)
 
     def _check_is_moving(self):
         """
@@ -2055,6 +2168,48 @@ class MagnetLogic(GenericLogic):
         self.sig2DAxis1VelChanged.emit(vel)
         return vel
 
+    def set_2d_search_mode(self, mode):
+        """ Set how the 2D alignment visits the grid points.
+
+        @param str mode: 'grid' for all points along the pathway, 'adaptive' for a coarse grid
+                         followed by a search of the optimum
+
+        @return str: the search mode set
+        """
+        if mode in self.search_modes:
+            self.curr_2d_search_mode = mode
+        else:
+            self.log.error('Unknown 2D alignment search mode "{0}". Use one of {1}.'
+                           ''.format(mode, self.search_modes))
+        return self.curr_2d_search_mode
+
+    def set_align_2d_adaptive_para(self, coarse_step=None, max_points=None, maximize=None):
+        """ Set the parameters of the adaptive 2D alignment.
+
+        @param int coarse_step: optional, distance of the coarse grid points in grid steps
+        @param int max_points: optional, maximum number of measured points, 0 for no limit
+        @param bool maximize: optional, search the maximum (True) or minimum (False) of the
+                              measured value
+
+        @return dict: the parameters set
+        """
+        if coarse_step is not None:
+            self.align_2d_coarse_step = max(1, int(coarse_step))
+        if max_points is not None:
+            self.align_2d_max_points = max(0, int(max_points))
+        if maximize is not None:
+            self.align_2d_maximize = bool(maximize)
+        return self.get_align_2d_adaptive_para()
+
+    def get_align_2d_adaptive_para(self):
+        """ Get the parameters of the adaptive 2D alignment.
+
+        @return dict: with the keys 'coarse_step', 'max_points' and 'maximize'
+        """
+        return {'coarse_step': self.align_2d_coarse_step,
+                'max_points': self.align_2d_max_points,
+                'maximize': self.align_2d_maximize}
+
     def get_align_2d_axis0_name(self):
         """Return the current value"""
         return self.align_2d_axis0_name
@@ -27,14 +27,17 @@ from interface.microwave_interface import TriggerEdge
 import numpy as np
 import time
 import datetime
-import matplotlib.pyplot as plt
 
 from logic.generic_logic import GenericLogic
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
+from core.util.snapshot import SnapshotPublisher
 from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
 
+plt = lazy_import('matplotlib.pyplot')
+
 
 class ODMRLogic(GenericLogic):
     """This is the Logic class for ODMR."""
@@ -66,6 +69,8 @@ class ODMRLogic(GenericLogic):
     lines_to_average = StatusVar('lines_to_average', 0)
     _oversampling = StatusVar('oversampling', default=10)
     _lock_in_active = StatusVar('lock_in_active', default=False)
+    _fit_warm_start = StatusVar('fit_warm_start', default=False)
+    _fit_max_iterations = StatusVar('fit_max_iterations', default=None)
 
     # Internal signals
     sigNextLine = QtCore.Signal()
@@ -80,6 +85,8 @@ class ODMRLogic(GenericLogic):
     def __init__(self, config, **kwargs):
         super().__init__(config=config, **kwargs)
         self.threadlock = Mutex()
+        # snapshots of the plot data for the GUI
+        self.snapshots = SnapshotPublisher()
 
     def on_activate(self):
         """
@@ -91,6 +98,7 @@ class ODMRLogic(GenericLogic):
         self._odmr_counter = self.odmrcounter()
         self._save_logic = self.savelogic()
         self._taskrunner = self.taskrunner()
+        self.set_fit_warm_start(self._fit_warm_start, self._fit_max_iterations)
 
         # Get hardware constraints
         limits = self.get_hw_constraints()
@@ -207,11 +215,22 @@ class ODMRLogic(GenericLogic):
         self.odmr_fit_y = np.zeros(self.odmr_fit_x.size)
         self.odmr_plot_xy = np.zeros(
             [self.number_of_lines, len(self.get_odmr_channels()), self.odmr_plot_x.size])
-        self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
+        self._publish_plots()
         current_fit = self.fc.current_fit
         self.sigOdmrFitUpdated.emit(self.odmr_fit_x, self.odmr_fit_y, {}, current_fit)
         return
 
+    def _publish_plots(self):
+        """ Publish the ODMR plots and emit them with sigOdmrPlotsUpdated.
+
+        The plot arrays are replaced and never changed in place, so they are published without
+        copying. The signal carries the read-only arrays of the snapshot.
+        """
+        names = ('odmr_plot_x', 'odmr_plot_y', 'odmr_plot_xy')
+        snapshot = self.snapshots.publish({name: getattr(self, name) for name in names},
+                                          handover=names)
+        self.sigOdmrPlotsUpdated.emit(*(snapshot[name] for name in names))
+
     def set_trigger(self, trigger_pol, frequency):
         """
         Set trigger polarity of external microwave trigger (for list and sweep mode).
@@ -256,7 +275,7 @@ class ODMRLogic(GenericLogic):
                 dtype=np.float64
             )
 
-        self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
+        self._publish_plots()
         self.sigParameterUpdated.emit({'average_length': self.lines_to_average})
         return self.lines_to_average
 
@@ -710,7 +729,8 @@ class ODMRLogic(GenericLogic):
 
             # Add new count data to raw_data array and append if array is too small
             if self._clearOdmrData:
-                self.odmr_raw_data[:, :, :] = 0
+                # new array, the matrix published last still uses the old one
+                self.odmr_raw_data = np.zeros(self.odmr_raw_data.shape)
                 self._clearOdmrData = False
             if self.elapsed_sweeps == (self.odmr_raw_data.shape[0] - 1):
                 expanded_array = np.zeros(self.odmr_raw_data.shape)
@@ -755,7 +775,7 @@ class ODMRLogic(GenericLogic):
                 self.stopRequested = True
             # Fire update signals
             self.sigOdmrElapsedTimeUpdated.emit(self.elapsed_time, self.elapsed_sweeps)
-            self.sigOdmrPlotsUpdated.emit(self.odmr_plot_x, self.odmr_plot_y, self.odmr_plot_xy)
+            self._publish_plots()
             self.sigNextLine.emit()
             return
 
@@ -769,6 +789,18 @@ class ODMRLogic(GenericLogic):
         constraints = self._mw_device.get_limits()
         return constraints
 
+    def set_fit_warm_start(self, enabled, max_iterations=None):
+        """ Configure the fits for live updates during a running scan.
+
+        @param bool enabled: seed each fit of a channel with the previous result of that channel
+        @param int max_iterations: optional, maximum number of function evaluations per fit,
+                                   None for no limit
+        """
+        self._fit_warm_start = bool(enabled)
+        self._fit_max_iterations = None if max_iterations is None else int(max_iterations)
+        self.fc.set_warm_start(self._fit_warm_start)
+        self.fc.set_max_iterations(self._fit_max_iterations)
+
     def get_fit_functions(self):
         """ Return the hardware constraints/limits
         @return list(str): list of fit function names
@@ -782,6 +814,9 @@ class ODMRLogic(GenericLogic):
         if (x_data is None) or (y_data is None):
             x_data = self.odmr_plot_x
             y_data = self.odmr_plot_y[channel_index]
+            warm_start_key = channel_index
+        else:
+            warm_start_key = None
 
         if fit_function is not None and isinstance(fit_function, str):
             if fit_function in self.get_fit_functions():
@@ -792,7 +827,8 @@ class ODMRLogic(GenericLogic):
                     self.log.warning('Fit function "{0}" not available in ODMRLogic fit container.'
                                      ''.format(fit_function))
 
-        self.odmr_fit_x, self.odmr_fit_y, result = self.fc.do_fit(x_data, y_data)
+        self.odmr_fit_x, self.odmr_fit_y, result = self.fc.do_fit(
+            x_data, y_data, warm_start_key=warm_start_key)
 
         if result is None:
             result_str_dict = {}
@@ -50,10 +50,12 @@ class OptimizerLogic(GenericLogic):
     do_surface_subtraction = StatusVar('surface_subtraction', False)
     surface_subtr_scan_offset = StatusVar('surface_subtraction_offset', 1e-6)
     opt_channel = StatusVar('optimization_channel', 0)
+    cross_scan_res = StatusVar('cross_scan_resolution', 15)
 
     # "private" signals to keep track of activities here in the optimizer logic
     _sigScanNextXyLine = QtCore.Signal()
     _sigScanZLine = QtCore.Signal()
+    _sigScanCrossLine = QtCore.Signal(str)
     _sigCompletedXyOptimizerScan = QtCore.Signal()
     _sigDoNextOptimizationStep = QtCore.Signal()
     _sigFinishedAllOptimizationSteps = QtCore.Signal()
@@ -79,6 +81,11 @@ class OptimizerLogic(GenericLogic):
         # Keep track of who called the refocus
         self._caller_tag = ''
 
+        # Timing and result of the most recent refocus runs to compare optimization sequences
+        self.refocus_statistics = list()
+        self._max_refocus_statistics = 100
+        self._refocus_start_time = 0.
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
 
@@ -101,6 +108,8 @@ class OptimizerLogic(GenericLogic):
         self.optim_sigma_x = 0.
         self.optim_sigma_y = 0.
         self.optim_sigma_z = 0.
+        # Widths of the last successful fits used as warm start for the cross line fits
+        self._last_sigma = {'X': 0., 'Y': 0., 'Z': 0.}
 
         self._max_offset = 3.
 
@@ -125,6 +134,7 @@ class OptimizerLogic(GenericLogic):
         # Sets connections between signals and functions
         self._sigScanNextXyLine.connect(self._refocus_xy_line, QtCore.Qt.QueuedConnection)
         self._sigScanZLine.connect(self.do_z_optimization, QtCore.Qt.QueuedConnection)
+        self._sigScanCrossLine.connect(self.do_cross_optimization, QtCore.Qt.QueuedConnection)
         self._sigCompletedXyOptimizerScan.connect(self._set_optimized_xy_from_fit, QtCore.Qt.QueuedConnection)
 
         self._sigDoNextOptimizationStep.connect(self._do_next_optimization_step, QtCore.Qt.QueuedConnection)
@@ -144,11 +154,12 @@ class OptimizerLogic(GenericLogic):
         """ Check the sequence of scan events for the optimization.
         """
 
-        # Check the supplied optimization sequence only contains 'XY' and 'Z'
-        if len(set(self.optimization_sequence).difference({'XY', 'Z'})) > 0:
+        # Check the supplied optimization sequence only contains 'XY', 'Z' and the fast cross
+        # line steps 'X' and 'Y'
+        if len(set(self.optimization_sequence).difference({'XY', 'Z', 'X', 'Y'})) > 0:
             self.log.error('Requested optimization sequence contains unknown steps. Please provide '
-                           'a sequence containing only \'XY\' and \'Z\' strings. '
-                           'The default [\'XY\', \'Z\'] will be used.')
+                           'a sequence containing only \'XY\', \'X\', \'Y\' and \'Z\' '
+                           'strings. The default [\'XY\', \'Z\'] will be used.')
             self.optimization_sequence = ['XY', 'Z']
 
     def get_scanner_count_channels(self):
@@ -224,6 +235,7 @@ class OptimizerLogic(GenericLogic):
         self._xy_scan_line_count = 0
         self._optimization_step = 0
         self.check_optimization_sequence()
+        self._refocus_start_time = time.time()
 
         scanner_status = self.start_scanner()
         if scanner_status < 0:
@@ -467,6 +479,7 @@ class OptimizerLogic(GenericLogic):
                 if self.z_range[0] <= result.best_values['center'] <= self.z_range[1]:
                     self.optim_pos_z = result.best_values['center']
                     self.optim_sigma_z = result.best_values['sigma']
+                    self._last_sigma['Z'] = self.optim_sigma_z
                     gauss, params = self._fit_logic.make_gaussianlinearoffset_model()
                     self.z_fit_data = gauss.eval(
                         x=self._fit_zimage_Z_values, params=result.params)
@@ -489,6 +502,139 @@ class OptimizerLogic(GenericLogic):
         self.sigImageUpdated.emit()
         self._sigDoNextOptimizationStep.emit()
 
+    def _scan_cross_line(self, axis):
+        """ Scans a single line through the current optimum along the X or Y axis.
+
+        @param str axis: scan axis, either 'X' or 'Y'
+
+        @return (numpy.ndarray, numpy.ndarray): scan positions along the axis and the counts of the
+                                                optimization channel. (None, None) on error.
+        """
+        if axis == 'X':
+            center, axis_range = self.optim_pos_x, self.x_range
+        else:
+            center, axis_range = self.optim_pos_y, self.y_range
+        # With a known spot width the cross line only needs to cover the spot itself
+        size = self.refocus_XY_size
+        if self._last_sigma[axis] > 0:
+            size = min(size, 8 * self._last_sigma[axis])
+        values = np.linspace(np.clip(center - 0.5 * size, axis_range[0], axis_range[1]),
+                             np.clip(center + 0.5 * size, axis_range[0], axis_range[1]),
+                             num=self.cross_scan_res)
+
+        scan_x_line = self.optim_pos_x * np.ones(values.shape)
+        scan_y_line = self.optim_pos_y * np.ones(values.shape)
+        scan_z_line = self.optim_pos_z * np.ones(values.shape)
+        if axis == 'X':
+            scan_x_line = values
+        else:
+            scan_y_line = values
+
+        status = self._move_to_start_pos([scan_x_line[0], scan_y_line[0], scan_z_line[0]])
+        if status < 0:
+            self.log.error('Error during move to starting point.')
+            self.stop_refocus()
+            return None, None
+
+        n_ch = len(self._scanning_device.get_scanner_axes())
+        if n_ch <= 3:
+            line = np.vstack((scan_x_line, scan_y_line, scan_z_line)[0:n_ch])
+        else:
+            line = np.vstack((scan_x_line, scan_y_line, scan_z_line, np.zeros(values.shape)))
+
+        line_counts = self._scanning_device.scan_line(line)
+        if np.any(line_counts == -1):
+            self.log.error('{0} cross line scan went wrong, killing the scanner.'.format(axis))
+            self.stop_refocus()
+            return None, None
+        return values, line_counts[:, self.opt_channel]
+
+    def do_cross_optimization(self, axis):
+        """ Do a fast optimization along a single axis.
+
+        A line through the current optimum is scanned along X or Y and fitted with a 1D gaussian.
+        The fit is warm started with the spot width of the previous successful fit.
+        Sequences like ['X', 'Y', 'Z'] need a fraction of the time of the full ['XY', 'Z'] image.
+
+        @param str axis: optimization axis, either 'X' or 'Y'
+        """
+        if self.stopRequested:
+            with self.threadlock:
+                self.stopRequested = False
+                self.finish_refocus()
+                self.sigImageUpdated.emit()
+                return
+
+        values, counts = self._scan_cross_line(axis)
+        if values is None:
+            # stop was requested by the failed scan, finish the refocus in the next call
+            self._sigScanCrossLine.emit(axis)
+            return
+
+        add_params = None
+        if self._last_sigma[axis] > 0:
+            add_params = {'sigma': {'value': self._last_sigma[axis]}}
+        result = self._fit_logic.make_gaussianlinearoffset_fit(
+            x_axis=values,
+            data=counts,
+            units='m',
+            estimator=self._fit_logic.estimate_gaussianlinearoffset_peak,
+            add_params=add_params)
+
+        if axis == 'X':
+            initial_pos, axis_range = self._initial_pos_x, self.x_range
+        else:
+            initial_pos, axis_range = self._initial_pos_y, self.y_range
+        center = result.best_values['center']
+        if (result.success and abs(initial_pos - center) < self._max_offset and
+                axis_range[0] <= center <= axis_range[1] and values[0] <= center <= values[-1]):
+            self._last_sigma[axis] = abs(result.best_values['sigma'])
+            if axis == 'X':
+                self.optim_pos_x = center
+                self.optim_sigma_x = self._last_sigma[axis]
+            else:
+                self.optim_pos_y = center
+                self.optim_sigma_y = self._last_sigma[axis]
+        else:
+            self.log.warning('{0} cross line fit failed. Keeping previous position.'.format(axis))
+            # The warm start width might be the reason for the failure
+            self._last_sigma[axis] = 0.
+
+        self.sigImageUpdated.emit()
+        self._sigDoNextOptimizationStep.emit()
+
+    def _add_refocus_statistics(self):
+        """ Store duration and result of the finished refocus for sequence comparison. """
+        self.refocus_statistics.append(
+            {'sequence': list(self.optimization_sequence),
+             'duration': time.time() - self._refocus_start_time,
+             'initial_position': (self._initial_pos_x, self._initial_pos_y, self._initial_pos_z),
+             'optimal_position': (self.optim_pos_x, self.optim_pos_y, self.optim_pos_z),
+             'sigma': (self.optim_sigma_x, self.optim_sigma_y, self.optim_sigma_z)})
+        del self.refocus_statistics[:-self._max_refocus_statistics]
+        return
+
+    def compare_optimization_sequences(self):
+        """ Compare the accuracy and the time needed by the optimization sequences used in the
+        recorded refocus runs. Repeated refocus runs on the same emitter with different sequences
+        give a comparison of the fast cross line refocus with the full XY image refocus.
+
+        @return dict: for each sequence (joined by ', ') the number of runs, mean and standard
+                      deviation of the duration in s and the standard deviation of the optimal
+                      position (x, y, z) in m.
+        """
+        comparison = dict()
+        for sequence in {', '.join(entry['sequence']) for entry in self.refocus_statistics}:
+            entries = [entry for entry in self.refocus_statistics
+                       if ', '.join(entry['sequence']) == sequence]
+            durations = np.array([entry['duration'] for entry in entries])
+            positions = np.array([entry['optimal_position'] for entry in entries])
+            comparison[sequence] = {'runs': len(entries),
+                                    'duration_mean': durations.mean(),
+                                    'duration_std': durations.std(),
+                                    'position_std': positions.std(axis=0)}
+        return comparison
+
     def finish_refocus(self):
         """ Finishes up and releases hardware after the optimizer scans."""
         self.kill_scanner()
@@ -503,6 +649,8 @@ class OptimizerLogic(GenericLogic):
                     self.optim_pos_y,
                     self.optim_pos_z))
 
+        self._add_refocus_statistics()
+
         # Signal that the optimization has finished, and "return" the optimal position along with
         # caller_tag
         self.sigRefocusFinished.emit(
@@ -634,6 +782,8 @@ class OptimizerLogic(GenericLogic):
         elif this_step == 'Z':
             self._initialize_z_refocus_image()
             self._sigScanZLine.emit()
+        elif this_step in ('X', 'Y'):
+            self._sigScanCrossLine.emit(this_step)
 
     def set_position(self, tag, x=None, y=None, z=None, a=None):
         """ Set focus position.
@@ -59,7 +59,7 @@ class PIDLogic(GenericLogic):
         self._controller = self.controller()
         self._save_logic = self.savelogic()
 
-        self.history = np.zeros([3, self.bufferLength])
+        self._initialise_history()
         self.savingState = False
         self.enabled = False
         self.timer = QtCore.QTimer()
@@ -87,13 +87,40 @@ class PIDLogic(GenericLogic):
         """
         self.enabled = False
 
+    def _initialise_history(self):
+        """ Set up an empty ring buffer of bufferLength steps.
+
+            Every step is written twice, at its index and one buffer length later, so the last
+            bufferLength steps are always a contiguous slice.
+        """
+        self._history = np.zeros([3, 2 * self.bufferLength])
+        self._history_index = 0
+
+    def get_history(self):
+        """ Process value, control value and setpoint of the last bufferLength steps.
+
+            @return numpy.ndarray: read-only view of the ring buffer, rows process value, control
+                                   value and setpoint, oldest step first
+        """
+        history = self._history[:, self._history_index:self._history_index + self.bufferLength]
+        history.flags.writeable = False
+        return history
+
+    @property
+    def history(self):
+        """ Read-only view of the last bufferLength steps, see get_history. """
+        return self.get_history()
+
     def loop(self):
         """ Execute step in the data recording loop: save one of each control and process values
         """
-        self.history = np.roll(self.history, -1, axis=1)
-        self.history[0, -1] = self._controller.get_process_value()
-        self.history[1, -1] = self._controller.get_control_value()
-        self.history[2, -1] = self._controller.get_setpoint()
+        index = self._history_index
+        values = (self._controller.get_process_value(),
+                  self._controller.get_control_value(),
+                  self._controller.get_setpoint())
+        self._history[:, index] = values
+        self._history[:, index + self.bufferLength] = values
+        self._history_index = (index + 1) % self.bufferLength
         self.sigUpdateDisplay.emit()
         if self.enabled:
             self.timer.start(self.timestep)
@@ -125,7 +152,7 @@ class PIDLogic(GenericLogic):
             @param int newBufferLength: new buffer length
         """
         self.bufferLength = newBufferLength
-        self.history = np.zeros([3, self.bufferLength])
+        self._initialise_history()
 
     def get_kp(self):
         """ Return the proportional constant.
@@ -174,7 +201,7 @@ class PIDLogic(GenericLogic):
 
             @return float: current set point of the PID controller
         """
-        return self.history[2, -1]
+        return self.get_history()[2, -1]
 
     def set_setpoint(self, setpoint):
         """ Set the current setpoint of the PID controller.
@@ -235,11 +262,11 @@ class PIDLogic(GenericLogic):
 
             @return float: current process input value
         """
-        return self.history[0, -1]
+        return self.get_history()[0, -1]
 
     def get_cv(self):
         """ Get current control output value.
 
             @return float: control output value
         """
-        return self.history[1, -1]
+        return self.get_history()[1, -1]
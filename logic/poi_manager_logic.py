@@ -349,6 +349,238 @@ class PointOfInterest:
         return cls(**dict_repr)
 
 
+class PoiTrackingScheduler:
+    """
+    Helper class deciding which POIs need to be refocused next and in which order.
+
+    Each finished refocus of a POI is recorded as (time_in_s, x, y, z). From these records a
+    linear drift velocity is estimated per POI which is used to predict the current POI position
+    and the expected displacement since the last refocus. POIs whose expected displacement exceeds
+    the tracking tolerance are visited in an order that minimizes the total stage travel
+    (nearest neighbor tour improved by 2-opt).
+    """
+
+    def __init__(self, tolerance=100e-9, history_length=10):
+        # Maximum tolerated (predicted) displacement of a POI before it needs a refocus
+        self.tolerance = float(tolerance)
+        # Number of most recent refocus results used to estimate the drift velocity
+        self.history_length = int(history_length)
+        # Refocus records for each POI. Each item is a float[4] array (time_in_s, x, y, z)
+        self._records = dict()
+        # Fallback drift velocity (x, y, z) for POIs without sufficient records
+        self.global_velocity = np.zeros(3, dtype=float)
+        # ROI shifts applied to each POI since its last refocus record
+        self._shifts = dict()
+
+    def reset(self):
+        self._records = dict()
+        self._shifts = dict()
+        self.global_velocity = np.zeros(3, dtype=float)
+        return
+
+    def add_record(self, name, position, timestamp=None):
+        """
+        Add a refocus result for a POI.
+
+        @param str name: Name of the POI
+        @param float[3] position: Optimized absolute position (x,y,z) of the POI
+        @param float timestamp: optional, time of the refocus in seconds (default: now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        record = np.array((timestamp, *position[:3]), dtype=float)
+        self._records.setdefault(name, list()).append(record)
+        del self._records[name][:-self.history_length]
+        self._shifts.pop(name, None)
+        return
+
+    def add_shift(self, names, shift):
+        """
+        Register a shift of the ROI that moved the given POIs without refocusing them.
+        The shift already contains (part of) the drift since their last refocus, so it is not
+        extrapolated again in predict_position.
+
+        @param list names: Names of the shifted POIs
+        @param float[3] shift: Applied shift (x,y,z)
+        """
+        shift = np.array(shift[:3], dtype=float)
+        for name in names:
+            if name in self._records:
+                self._shifts[name] = self._shifts.get(name, 0) + shift
+        return
+
+    def forget(self, name):
+        self._records.pop(name, None)
+        self._shifts.pop(name, None)
+        return
+
+    def last_refocus_time(self, name):
+        if name not in self._records:
+            return None
+        return self._records[name][-1][0]
+
+    @staticmethod
+    def estimate_velocity(history):
+        """
+        Estimate the linear drift velocity from a position history by least squares.
+
+        @param numpy.ndarray history: 2D array with rows (time_in_s, x, y, z)
+
+        @return (numpy.ndarray, float): drift velocity (x, y, z) in m/s and the RMS deviation of
+                                        the history from the linear drift model.
+        """
+        history = np.asarray(history, dtype=float)
+        if history.ndim != 2 or history.shape[0] < 2:
+            return np.zeros(3, dtype=float), 0.
+        times = history[:, 0] - history[-1, 0]
+        if np.ptp(times) <= 0:
+            return np.zeros(3, dtype=float), 0.
+        design = np.column_stack((times, np.ones(times.size)))
+        coeffs, _, _, _ = np.linalg.lstsq(design, history[:, 1:], rcond=None)
+        residuals = history[:, 1:] - design @ coeffs
+        if history.shape[0] > 2:
+            rms = np.sqrt(np.sum(residuals ** 2) / (history.shape[0] - 2))
+        else:
+            rms = 0.
+        return coeffs[0], rms
+
+    def drift_velocity(self, name):
+        """
+        Drift velocity (x, y, z) of a POI in m/s. Falls back to the global drift velocity if less
+        than two refocus results are available.
+        """
+        if len(self._records.get(name, ())) < 2:
+            return self.global_velocity.copy()
+        return self.estimate_velocity(self._records[name])[0]
+
+    def drift_uncertainty(self, name):
+        """ RMS deviation of the recorded POI positions from the linear drift model. """
+        if len(self._records.get(name, ())) < 3:
+            return self.tolerance
+        return self.estimate_velocity(self._records[name])[1]
+
+    def predict_position(self, name, position, timestamp=None):
+        """
+        Predict the current position of a POI by extrapolating the drift since the last refocus.
+
+        @param str name: Name of the POI
+        @param float[3] position: Last known absolute position (x,y,z) of the POI
+        @param float timestamp: optional, time to predict the position for (default: now)
+
+        @return numpy.ndarray: Predicted absolute position (x,y,z)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        last_time = self.last_refocus_time(name)
+        if last_time is None:
+            return np.array(position[:3], dtype=float)
+        # The drift since the last refocus replaces the ROI shifts applied in the meantime
+        return (np.array(position[:3], dtype=float) - self._shifts.get(name, 0)
+                + self.drift_velocity(name) * (timestamp - last_time))
+
+    def expected_displacement(self, name, timestamp=None):
+        """
+        Expected displacement of a POI since its last refocus. POIs that were never refocused
+        return infinity.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        last_time = self.last_refocus_time(name)
+        if last_time is None:
+            return np.inf
+        elapsed = timestamp - last_time
+        return np.linalg.norm(self.drift_velocity(name)) * elapsed + self.drift_uncertainty(name)
+
+    def due_pois(self, names, timestamp=None, max_interval=None):
+        """
+        Return all POIs from names that need a refocus, sorted by descending priority.
+        A POI is due if its expected displacement exceeds the tolerance or if the time since its
+        last refocus exceeds max_interval (if given).
+
+        @param list names: POI names to consider
+        @param float timestamp: optional, time to evaluate the schedule for (default: now)
+        @param float max_interval: optional, maximum time in seconds between two refocus runs
+
+        @return list: names of the POIs due for a refocus
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        priorities = dict()
+        for name in names:
+            displacement = self.expected_displacement(name, timestamp)
+            last_time = self.last_refocus_time(name)
+            overdue = (max_interval is not None and last_time is not None and
+                       timestamp - last_time >= max_interval)
+            if displacement >= self.tolerance or overdue:
+                priorities[name] = displacement
+        return sorted(priorities, key=priorities.get, reverse=True)
+
+    @staticmethod
+    def order_visits(start_position, positions):
+        """
+        Order POI positions to minimize the total travel of an open path starting at
+        start_position. A nearest neighbor tour is built first and subsequently improved by
+        2-opt segment reversals.
+
+        @param float[3] start_position: Current scanner position (x,y,z)
+        @param dict positions: POI positions with POI names as keys
+
+        @return list: POI names in the order they should be visited
+        """
+        names = list(positions)
+        if len(names) < 2:
+            return names
+        points = np.array([positions[name][:3] for name in names], dtype=float)
+        start = np.array(start_position[:3], dtype=float)
+
+        # Nearest neighbor tour
+        unvisited = np.ones(len(names), dtype=bool)
+        tour = list()
+        current = start
+        for _ in range(len(names)):
+            distances = np.linalg.norm(points - current, axis=1)
+            distances[~unvisited] = np.inf
+            index = int(np.argmin(distances))
+            tour.append(index)
+            unvisited[index] = False
+            current = points[index]
+
+        # 2-opt improvement of the open path (the start position is fixed)
+        path = np.vstack((start, points[tour]))
+        tour = np.array(tour)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(tour)):
+                # Gain of reversing path[i:j+1] for all j > i at once
+                a = path[i - 1]
+                b = path[i]
+                c = path[i + 1:]
+                d = np.vstack((path[i + 2:], np.full((1, 3), np.nan)))
+                old = np.linalg.norm(a - b) + np.linalg.norm(c - d, axis=1)
+                new = np.linalg.norm(a - c, axis=1) + np.linalg.norm(b - d, axis=1)
+                # The last node has no successor, so the open end costs nothing
+                old[-1] = np.linalg.norm(a - b)
+                new[-1] = np.linalg.norm(a - c[-1])
+                gain = old - new
+                best = int(np.argmax(gain))
+                if gain[best] > 1e-12:
+                    j = i + 1 + best
+                    path[i:j + 1] = path[i:j + 1][::-1].copy()
+                    tour[i - 1:j] = tour[i - 1:j][::-1].copy()
+                    improved = True
+        return [names[index] for index in tour]
+
+    @staticmethod
+    def path_length(start_position, positions, order):
+        """ Total travel distance when visiting the POIs in the given order. """
+        if len(order) == 0:
+            return 0.
+        points = np.vstack((np.array(start_position[:3], dtype=float),
+                            [positions[name][:3] for name in order]))
+        return float(np.sum(np.linalg.norm(np.diff(points, axis=0), axis=1)))
+
+
 class PoiManagerLogic(GenericLogic):
 
     """
@@ -367,6 +599,9 @@ class PoiManagerLogic(GenericLogic):
     _move_scanner_after_optimization = StatusVar(default=True)
     _poi_threshold = StatusVar(default=5)
     _poi_diameter = StatusVar(default=1.5)
+    _tracking_tolerance = StatusVar(default=100e-9)
+    _tracking_min_window_fraction = StatusVar(default=0.3)
+    _tracking_refocus_timeout = StatusVar(default=300)
 
     # Signals for connecting modules
     sigRefocusStateUpdated = QtCore.Signal(bool)  # is_active
@@ -376,6 +611,7 @@ class PoiManagerLogic(GenericLogic):
     sigRoiUpdated = QtCore.Signal(dict)  # Dict containing ROI parameters to update
     sigThresholdUpdated = QtCore.Signal(float)
     sigDiameterUpdated = QtCore.Signal(float)
+    sigBatchTrackingUpdated = QtCore.Signal(bool, dict)  # is_active, tracking statistics
 
     # Internal signals
     __sigStartPeriodicRefocus = QtCore.Signal()
@@ -389,6 +625,18 @@ class PoiManagerLogic(GenericLogic):
         self._last_refocus = 0
         self._periodic_refocus_poi = None
 
+        # batch tracking of all POIs
+        self.__tracking_timer = None
+        self._tracking_scheduler = PoiTrackingScheduler()
+        self._tracking_pois = list()
+        self._tracking_queue = list()
+        self._tracking_current = None
+        self._tracking_update_roi = False
+        self._tracking_nominal_sizes = None
+        self._tracking_refocus_start = 0
+        self._tracking_idle_ticks = 0
+        self._tracking_stats = dict()
+
         # threading
         self._threadlock = Mutex()
         return
@@ -400,6 +648,9 @@ class PoiManagerLogic(GenericLogic):
         self.__timer.setSingleShot(False)
         self._last_refocus = 0
         self._periodic_refocus_poi = None
+        self.__tracking_timer = QtCore.QTimer()
+        self.__tracking_timer.setSingleShot(False)
+        self._tracking_scheduler = PoiTrackingScheduler(tolerance=self._tracking_tolerance)
 
         # Connect callback for a finished refocus
         self.optimiserlogic().sigRefocusFinished.connect(
@@ -427,6 +678,7 @@ class PoiManagerLogic(GenericLogic):
     def on_deactivate(self):
         # Stop active processes/loops
         self.stop_periodic_refocus()
+        self.stop_batch_tracking()
 
         # Disconnect signals
         self.optimiserlogic().sigRefocusFinished.disconnect()
@@ -832,6 +1084,8 @@ class PoiManagerLogic(GenericLogic):
     @QtCore.Slot()
     def reset_roi(self):
         self.stop_periodic_refocus()
+        self.stop_batch_tracking()
+        self._tracking_scheduler.reset()
         self._roi = RegionOfInterest()
         self.set_scan_image(False)
         self.sigRoiUpdated.emit({'name': self.roi_name,
@@ -950,6 +1204,193 @@ class PoiManagerLogic(GenericLogic):
                     self._last_refocus = time.time()
         return
 
+    @property
+    def tracking_tolerance(self):
+        return float(self._tracking_tolerance)
+
+    @tracking_tolerance.setter
+    def tracking_tolerance(self, tolerance):
+        self.set_tracking_tolerance(tolerance)
+        return
+
+    @property
+    def batch_tracking_statistics(self):
+        return self._tracking_stats.copy()
+
+    @QtCore.Slot(float)
+    def set_tracking_tolerance(self, tolerance):
+        """
+        Set the maximum tolerated predicted POI displacement before a POI is refocused during
+        batch tracking.
+
+        @param float tolerance: Tolerated displacement in m
+        """
+        if tolerance <= 0:
+            self.log.error('Tracking tolerance must be a value > 0. Unable to set tolerance of '
+                           '"{0}".'.format(tolerance))
+            return
+        with self._threadlock:
+            self._tracking_tolerance = float(tolerance)
+            self._tracking_scheduler.tolerance = float(tolerance)
+        return
+
+    def start_batch_tracking(self, names=None, update_roi_position=False):
+        """
+        Starts tracking of multiple POIs. Instead of refocusing a single POI on a fixed period,
+        all tracked POIs are refocused whenever their predicted drift exceeds the tracking
+        tolerance (or at the latest after refocus_period). POIs due for a refocus are visited in
+        an order minimizing the scanner travel, starting at the predicted position with a refocus
+        window shrunk according to the drift prediction quality.
+
+        @param list names: optional, names of the POIs to track. If None (default) all POIs of
+                           the ROI are tracked.
+        @param bool update_roi_position: Flag indicating if the ROI should be shifted by each
+                                         refocus result (default: False, only the refocused POI
+                                         is updated).
+        """
+        if names is None:
+            names = self.poi_names
+        names = [name for name in names if name in self.poi_names]
+        if len(names) == 0:
+            self.log.error('Unable to start batch tracking. No valid POIs to track given.')
+            return
+
+        with self._threadlock:
+            if self.__tracking_timer.isActive() or self.__timer.isActive():
+                self.log.error('Periodic refocus or batch tracking already running. Unable to '
+                               'start batch tracking.')
+                return
+            self.module_state.lock()
+            self._tracking_pois = names
+            self._tracking_queue = list()
+            self._tracking_current = None
+            self._tracking_update_roi = bool(update_roi_position)
+            self._tracking_scheduler.tolerance = self.tracking_tolerance
+            self._tracking_scheduler.global_velocity = self._tracking_scheduler.estimate_velocity(
+                self.roi_pos_history[-self._tracking_scheduler.history_length:])[0]
+            self._tracking_stats = {'started': time.time(),
+                                    'refocus_count': 0,
+                                    'refocus_time': 0.,
+                                    'travel_distance': 0.,
+                                    'last_batch_size': 0}
+            self.__tracking_timer.timeout.connect(self._batch_tracking_loop)
+            self.__tracking_timer.start(500)
+            self.sigBatchTrackingUpdated.emit(True, self.batch_tracking_statistics)
+        return
+
+    def stop_batch_tracking(self):
+        """ Stops the batch tracking of POIs. """
+        with self._threadlock:
+            if self.__tracking_timer is not None and self.__tracking_timer.isActive():
+                self.__tracking_timer.stop()
+                self.__tracking_timer.timeout.disconnect()
+                self._tracking_queue = list()
+                self._tracking_current = None
+                self._restore_refocus_window()
+                self.module_state.unlock()
+            self.sigBatchTrackingUpdated.emit(False, self.batch_tracking_statistics)
+        return
+
+    @QtCore.Slot()
+    def _batch_tracking_loop(self):
+        """ This is the looped function scheduling and starting the refocus runs of batch
+        tracking.
+
+        If no refocus is running, the next POI from the current batch is refocused. If the batch
+        is exhausted, a new batch of due POIs is ordered to minimize travel.
+        """
+        with self._threadlock:
+            if not self.__tracking_timer.isActive():
+                return
+            if self._tracking_current is not None and not self._check_tracking_refocus():
+                return
+            if self.optimiserlogic().module_state() != 'idle':
+                return
+
+            now = time.time()
+            if len(self._tracking_queue) == 0:
+                due = self._tracking_scheduler.due_pois(
+                    self._tracking_pois, now, max_interval=self.refocus_period)
+                if len(due) == 0:
+                    return
+                predicted = {name: self._tracking_scheduler.predict_position(
+                    name, self.get_poi_position(name), now) for name in due}
+                self._tracking_queue = self._tracking_scheduler.order_visits(
+                    self.scanner_position, predicted)
+                self._tracking_stats['last_batch_size'] = len(self._tracking_queue)
+
+            name = self._tracking_queue.pop(0)
+            if name not in self.poi_names:
+                self._tracking_scheduler.forget(name)
+                return
+            position = self._tracking_scheduler.predict_position(
+                name, self.get_poi_position(name), now)
+            self._tracking_stats['travel_distance'] += float(
+                np.linalg.norm(position - self.scanner_position))
+            self._apply_refocus_window(name)
+            self._tracking_current = name
+            self._tracking_refocus_start = now
+            self._tracking_idle_ticks = 0
+            if self._tracking_update_roi:
+                tag = 'poimanagermoveroi_{0}'.format(name)
+            else:
+                tag = 'poimanager_{0}'.format(name)
+            self.optimiserlogic().start_refocus(initial_pos=position, caller_tag=tag)
+            self.sigRefocusStateUpdated.emit(True)
+        return
+
+    def _check_tracking_refocus(self):
+        """ Give up the running batch tracking refocus if it ended without result or timed out.
+
+        A refocus that fails or is aborted may not report a result. It is considered ended if the
+        optimizer is idle on two consecutive ticks of the tracking loop, since the result of a
+        finished refocus is delivered before the next tick.
+
+        @return bool: True if no refocus is running anymore
+        """
+        optimizer = self.optimiserlogic()
+        elapsed = time.time() - self._tracking_refocus_start
+        if optimizer.module_state() == 'idle':
+            self._tracking_idle_ticks += 1
+            if self._tracking_idle_ticks < 2:
+                return False
+            self.log.warning('Refocus of POI "{0}" ended without result. Continuing batch '
+                             'tracking.'.format(self._tracking_current))
+        elif elapsed > self._tracking_refocus_timeout:
+            self.log.warning('Refocus of POI "{0}" did not finish within {1:.0f} s and is aborted.'
+                             ''.format(self._tracking_current, self._tracking_refocus_timeout))
+            optimizer.stop_refocus()
+        else:
+            self._tracking_idle_ticks = 0
+            return False
+        self._tracking_current = None
+        self._restore_refocus_window()
+        self.sigRefocusStateUpdated.emit(False)
+        return True
+
+    def _apply_refocus_window(self, name):
+        """ Shrink the optimizer scan ranges according to the drift prediction uncertainty of the
+        POI to refocus. The nominal ranges are restored after the refocus has finished.
+        """
+        optimizer = self.optimiserlogic()
+        if self._tracking_nominal_sizes is None:
+            self._tracking_nominal_sizes = (optimizer.refocus_XY_size, optimizer.refocus_Z_size)
+        xy_size, z_size = self._tracking_nominal_sizes
+        # Scan range covering +/- 3 times the prediction uncertainty plus the tolerance
+        window = 6 * (self._tracking_scheduler.drift_uncertainty(name) + self.tracking_tolerance)
+        fraction = np.clip(window / xy_size, self._tracking_min_window_fraction, 1)
+        optimizer.refocus_XY_size = xy_size * fraction
+        optimizer.refocus_Z_size = z_size * fraction
+        return
+
+    def _restore_refocus_window(self):
+        if self._tracking_nominal_sizes is None:
+            return
+        optimizer = self.optimiserlogic()
+        optimizer.refocus_XY_size, optimizer.refocus_Z_size = self._tracking_nominal_sizes
+        self._tracking_nominal_sizes = None
+        return
+
     @QtCore.Slot()
     def optimise_poi_position(self, name=None, update_roi_position=True):
         """
@@ -996,10 +1437,15 @@ class PoiManagerLogic(GenericLogic):
         if caller_tag.startswith('poimanager_') or caller_tag.startswith('poimanagermoveroi_'):
             shift_roi = caller_tag.startswith('poimanagermoveroi_')
             poi_name = caller_tag.split('_', 1)[1]
+            if poi_name == self._tracking_current:
+                self._finish_tracking_refocus(poi_name, np.array(optimal_pos[:3], dtype=float))
             if poi_name in self.poi_names:
                 # We only need x, y, z
                 optimal_pos = np.array(optimal_pos[:3], dtype=float)
                 if shift_roi:
+                    self._tracking_scheduler.add_shift(
+                        [name for name in self.poi_names if name != poi_name],
+                        optimal_pos - self.get_poi_position(poi_name))
                     self.move_roi_from_poi_position(name=poi_name, position=optimal_pos)
                 else:
                     self.set_poi_anchor_from_position(name=poi_name, position=optimal_pos)
@@ -1008,6 +1454,23 @@ class PoiManagerLogic(GenericLogic):
         self.sigRefocusStateUpdated.emit(False)
         return
 
+    def _finish_tracking_refocus(self, name, optimal_pos):
+        """ Record the result of a batch tracking refocus and update the tracking statistics.
+
+        @param str name: Name of the refocused POI
+        @param float[3] optimal_pos: Optimized absolute position (x,y,z) of the POI
+        """
+        with self._threadlock:
+            now = time.time()
+            self._restore_refocus_window()
+            self._tracking_scheduler.add_record(name, optimal_pos, now)
+            self._tracking_stats['refocus_count'] += 1
+            self._tracking_stats['refocus_time'] += now - self._tracking_refocus_start
+            self._tracking_current = None
+            self.sigBatchTrackingUpdated.emit(self.__tracking_timer.isActive(),
+                                              self.batch_tracking_statistics)
+        return
+
     def update_poi_tag_in_savelogic(self):
         if not self._active_poi:
             self.savelogic().remove_additional_parameter('Active POI')
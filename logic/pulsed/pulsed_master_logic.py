@@ -24,6 +24,7 @@ from core.connector import Connector
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 import numpy as np
+import time
 
 
 class PulsedMasterLogic(GenericLogic):
@@ -107,6 +108,7 @@ class PulsedMasterLogic(GenericLogic):
     sigGeneratorSettingsUpdated = QtCore.Signal(dict)
     sigSamplingSettingsUpdated = QtCore.Signal(dict)
     sigPredefinedSequenceGenerated = QtCore.Signal(object, bool)
+    sigPrefetchUpdated = QtCore.Signal(dict)
 
     def __init__(self, config, **kwargs):
         """ Create PulsedMasterLogic object with connectors.
@@ -117,6 +119,14 @@ class PulsedMasterLogic(GenericLogic):
 
         # Dictionary servings as status register
         self.status_dict = dict()
+
+        # Asset sampled in advance to switch to with only a load command
+        self._prefetch = None
+        # Progress of the switch to the prefetched asset
+        self._switch = None
+        self.last_switch_timing = dict()
+        self._measurement_stopped_at = None
+        self.last_run_gap = None
         return
 
     def on_activate(self):
@@ -133,6 +143,9 @@ class PulsedMasterLogic(GenericLogic):
                             'microwave_running': False,
                             'predefined_generation_busy': False,
                             'fitting_busy': False}
+        self._prefetch = None
+        self._switch = None
+        self._measurement_stopped_at = None
 
         # Connect signals controlling PulsedMeasurementLogic
         self.sigDoFit.connect(
@@ -374,6 +387,13 @@ class PulsedMasterLogic(GenericLogic):
     def laser_data(self):
         return self.pulsedmeasurementlogic().laser_data
 
+    @property
+    def measurement_data_snapshot(self):
+        """ Latest snapshot of signal_data, signal_alt_data, measurement_error, raw_data and
+        laser_data. Read the arrays from here in slots of sigMeasurementDataUpdated.
+        """
+        return self.pulsedmeasurementlogic().snapshots.latest()
+
     @property
     def alternative_data_type(self):
         return self.pulsedmeasurementlogic().alternative_data_type
@@ -551,8 +571,20 @@ class PulsedMasterLogic(GenericLogic):
         @param is_paused:
         """
         if isinstance(is_running, bool) and isinstance(is_paused, bool):
+            was_running = self.status_dict['measurement_running']
             self.status_dict['measurement_running'] = is_running
+            if was_running and not is_running:
+                self._measurement_stopped_at = time.time()
+            elif is_running and not was_running and self._measurement_stopped_at is not None:
+                self.last_run_gap = time.time() - self._measurement_stopped_at
+                self.log.debug('Pulsed measurement started {0:.3f} s after the previous one '
+                               'stopped.'.format(self.last_run_gap))
             self.sigMeasurementStatusUpdated.emit(is_running, is_paused)
+            if self._switch is not None:
+                if not is_running and self._switch['state'] == 'stopping':
+                    self._continue_switch()
+                elif is_running and self._switch['state'] == 'starting':
+                    self._finish_switch()
         return
 
     @QtCore.Slot(str)
@@ -690,6 +722,8 @@ class PulsedMasterLogic(GenericLogic):
     def sample_ensemble_finished(self, ensemble):
         self.status_dict['sampling_ensemble_busy'] = False
         self.sigSampleEnsembleComplete.emit(ensemble)
+        if self._prefetch is not None and self._prefetch['type'] == 'PulseBlockEnsemble':
+            self._prefetch_sampled(ensemble)
         if self.status_dict['sampload_busy'] and not self.status_dict['sampling_sequence_busy']:
             if ensemble is None:
                 self.status_dict['sampload_busy'] = False
@@ -717,6 +751,8 @@ class PulsedMasterLogic(GenericLogic):
     def sample_sequence_finished(self, sequence):
         self.status_dict['sampling_sequence_busy'] = False
         self.sigSampleSequenceComplete.emit(sequence)
+        if self._prefetch is not None and self._prefetch['type'] == 'PulseSequence':
+            self._prefetch_sampled(sequence)
         if self.status_dict['sampload_busy']:
             if sequence is None:
                 self.status_dict['sampload_busy'] = False
@@ -793,6 +829,17 @@ class PulsedMasterLogic(GenericLogic):
         else:
             self.pulsedmeasurementlogic().sampling_information = object_instance.sampling_information
             self.pulsedmeasurementlogic().measurement_information = object_instance.measurement_information
+
+        # Start the measurement of a switch only now that it uses the settings of the new asset
+        if self._switch is not None and self._switch['state'] == 'loading':
+            if asset_name == self._prefetch['name'] and asset_type == self._prefetch['type']:
+                self._switch['loaded'] = time.time()
+                self._switch['state'] = 'starting'
+                self.sigToggleMeasurement.emit(True, '')
+            else:
+                self.log.error('Loading of prefetched asset "{0}" failed. Measurement not '
+                               'started.'.format(self._prefetch['name']))
+                self._abort_switch()
         return
 
     @QtCore.Slot(object)
@@ -1063,6 +1110,222 @@ class PulsedMasterLogic(GenericLogic):
         """
         return self.sequencegeneratorlogic().analyze_sequence(sequence=sequence)
 
+    #######################################################################
+    ###             Asset prefetch                                      ###
+    #######################################################################
+    @property
+    def prefetch_status(self):
+        """ Status of the prefetched asset and the timing of the last switch between runs.
+
+        @return dict: name, type and state ('sampling', 'ready', 'failed' or '' if nothing is
+                      prefetched) of the prefetched asset, sampling_time in s, switching (bool),
+                      last_switch (timing dict of the last switch, see _finish_switch) and
+                      last_run_gap (time in s between the last two measurements)
+        """
+        prefetch = self._prefetch if self._prefetch is not None else dict()
+        return {'name': prefetch.get('name', ''),
+                'type': prefetch.get('type', ''),
+                'state': prefetch.get('state', ''),
+                'sampling_time': prefetch.get('sampling_time'),
+                'switching': self._switch is not None,
+                'last_switch': dict(self.last_switch_timing),
+                'last_run_gap': self.last_run_gap}
+
+    @QtCore.Slot(str)
+    def prefetch_ensemble(self, ensemble_name):
+        """ Sample and upload a PulseBlockEnsemble without loading it, e.g. while the current
+        measurement runs. Switch to it with switch_to_prefetched.
+
+        @param str ensemble_name: name of the saved PulseBlockEnsemble
+        """
+        self._prefetch_asset(ensemble_name, 'PulseBlockEnsemble')
+        return
+
+    @QtCore.Slot(str)
+    def prefetch_sequence(self, sequence_name):
+        """ Sample and upload a PulseSequence without loading it, e.g. while the current
+        measurement runs. Switch to it with switch_to_prefetched.
+
+        @param str sequence_name: name of the saved PulseSequence
+        """
+        self._prefetch_asset(sequence_name, 'PulseSequence')
+        return
+
+    def _prefetch_asset(self, asset_name, asset_type):
+        already_busy = self.status_dict['sampling_ensemble_busy'] or self.status_dict[
+            'sampling_sequence_busy'] or self.sequencegeneratorlogic().module_state() == 'locked'
+        if already_busy:
+            self.log.error('Sampling of a different asset already in progress.\n'
+                           '{0} "{1}" not prefetched!'.format(asset_type, asset_name))
+            return
+        if self._switch is not None:
+            self.log.error('Switching to the prefetched asset in progress.\n'
+                           '{0} "{1}" not prefetched!'.format(asset_type, asset_name))
+            return
+        if self._overwrites_loaded_asset(asset_name, asset_type):
+            self.log.error('{0} "{1}" uses waveforms of the asset loaded into the pulse generator '
+                           'and can not be sampled while they are in use.'.format(asset_type,
+                                                                                  asset_name))
+            return
+        in_use = self.status_dict['measurement_running'] or self.status_dict['pulser_running']
+        if in_use and not self.sequencegeneratorlogic().background_upload:
+            self.log.error('The pulse generator does not allow to upload waveforms while running '
+                           '(config option "background_upload" of SequenceGeneratorLogic).\n'
+                           '{0} "{1}" not prefetched!'.format(asset_type, asset_name))
+            return
+
+        self._prefetch = {'name': asset_name,
+                          'type': asset_type,
+                          'state': 'sampling',
+                          'start': time.time(),
+                          'sampling_time': None,
+                          'during_run': self.status_dict['measurement_running']}
+        if asset_type == 'PulseBlockEnsemble':
+            self.status_dict['sampling_ensemble_busy'] = True
+            self.sigSampleBlockEnsemble.emit(asset_name)
+        else:
+            self.status_dict['sampling_sequence_busy'] = True
+            self.sigSampleSequence.emit(asset_name)
+        self.sigPrefetchUpdated.emit(self.prefetch_status)
+        return
+
+    def _overwrites_loaded_asset(self, asset_name, asset_type):
+        """ Whether sampling an asset replaces waveforms or the sequence of the loaded asset.
+
+        @param str asset_name: name of the asset to sample
+        @param str asset_type: 'PulseBlockEnsemble' or 'PulseSequence'
+
+        @return bool: True if sampling the asset would change the loaded asset
+        """
+        loaded_name, loaded_type = self.loaded_asset
+        if not loaded_name:
+            return False
+        if (asset_name, asset_type) == (loaded_name, loaded_type):
+            return True
+        if loaded_type == 'PulseSequence':
+            loaded = self.saved_pulse_sequences.get(loaded_name)
+        else:
+            loaded = self.saved_pulse_block_ensembles.get(loaded_name)
+        if loaded is None:
+            # unknown waveforms, be safe
+            return True
+        in_use = {wfm.rsplit('_', 1)[0] for wfm in
+                  loaded.sampling_information.get('waveforms', list())}
+        in_use.add(loaded_name)
+
+        # waveforms are deleted and written again by the name tag of the ensemble
+        if asset_type == 'PulseSequence':
+            sequence = self.saved_pulse_sequences.get(asset_name)
+            if sequence is None:
+                return False
+            name_tags = set()
+            for step_index, seq_step in enumerate(sequence):
+                if sequence.rotating_frame:
+                    name_tags.add(seq_step.ensemble + '_' + str(step_index).zfill(3))
+                else:
+                    name_tags.add(seq_step.ensemble)
+        else:
+            name_tags = {asset_name}
+        return not in_use.isdisjoint(name_tags)
+
+    def _prefetch_sampled(self, asset):
+        """ Sampling of the prefetched asset finished.
+
+        @param asset: sampled PulseBlockEnsemble or PulseSequence, None if sampling failed
+        """
+        if self._prefetch['state'] != 'sampling':
+            return
+        if asset is not None and asset.name != self._prefetch['name']:
+            # ensemble of a prefetched sequence
+            return
+        self._prefetch['sampling_time'] = time.time() - self._prefetch['start']
+        self._prefetch['state'] = 'failed' if asset is None else 'ready'
+        self.sigPrefetchUpdated.emit(self.prefetch_status)
+        if self._switch is not None and self._switch['state'] == 'waiting':
+            self._continue_switch()
+        return
+
+    @QtCore.Slot()
+    @QtCore.Slot(str)
+    def switch_to_prefetched(self, stash_raw_data_tag=''):
+        """ Stop the running measurement, load the prefetched asset and start the measurement
+        again. If the prefetched asset is still sampling, the measurement keeps running until
+        sampling has finished.
+
+        @param str stash_raw_data_tag: tag to stash the raw data of the stopped measurement with
+        """
+        if self._prefetch is None or self._prefetch['state'] == 'failed':
+            self.log.error('No prefetched asset to switch to.')
+            return
+        if self._switch is not None:
+            self.log.error('Switching to the prefetched asset already in progress.')
+            return
+        self._switch = {'state': '',
+                        'stash': stash_raw_data_tag,
+                        'requested': time.time(),
+                        'stop_requested': None,
+                        'stopped': None,
+                        'load_start': None,
+                        'loaded': None}
+        self.sigPrefetchUpdated.emit(self.prefetch_status)
+        self._continue_switch()
+        return
+
+    def _continue_switch(self):
+        """ Next step of the switch to the prefetched asset. """
+        if self._prefetch['state'] == 'sampling':
+            self._switch['state'] = 'waiting'
+            return
+        if self._prefetch['state'] != 'ready':
+            self.log.error('Sampling of prefetched asset "{0}" failed. Measurement not switched.'
+                           ''.format(self._prefetch['name']))
+            self._abort_switch()
+            return
+        if self.status_dict['measurement_running']:
+            if self._switch['state'] != 'stopping':
+                self._switch['state'] = 'stopping'
+                self._switch['stop_requested'] = time.time()
+                self.sigToggleMeasurement.emit(False, self._switch['stash'])
+            return
+        self._switch['stopped'] = time.time()
+        self._switch['state'] = 'loading'
+        self._switch['load_start'] = self._switch['stopped']
+        if self._prefetch['type'] == 'PulseBlockEnsemble':
+            self.load_ensemble(self._prefetch['name'])
+        else:
+            self.load_sequence(self._prefetch['name'])
+        return
+
+    def _finish_switch(self):
+        """ The measurement with the prefetched asset started, record the timing. """
+        started = time.time()
+        switch = self._switch
+        timing = {'asset': self._prefetch['name'],
+                  'sampling_time': self._prefetch['sampling_time'],
+                  'sampled_during_run': self._prefetch['during_run'],
+                  'stop_time': None if switch['stop_requested'] is None else
+                  switch['stopped'] - switch['stop_requested'],
+                  'load_time': switch['loaded'] - switch['load_start'],
+                  'start_time': started - switch['loaded'],
+                  'gap': started - switch['stopped'],
+                  'total_time': started - switch['requested']}
+        self.last_switch_timing = timing
+        self.log.info('Switched to prefetched asset "{0}". Gap between runs {1:.3f} s (loading '
+                      '{2:.3f} s), sampling took {3:.1f} s.'.format(
+                          timing['asset'], timing['gap'], timing['load_time'],
+                          timing['sampling_time']))
+        self._prefetch = None
+        self._switch = None
+        self.sigPrefetchUpdated.emit(self.prefetch_status)
+        return
+
+    def _abort_switch(self):
+        self._switch = None
+        if self._prefetch is not None and self._prefetch['state'] == 'failed':
+            self._prefetch = None
+        self.sigPrefetchUpdated.emit(self.prefetch_status)
+        return
+
     #######################################################################
     ###             Helper  methods                                     ###
     #######################################################################
@@ -25,19 +25,22 @@ import numpy as np
 import copy
 import time
 import datetime
-import matplotlib.pyplot as plt
 
 from core.connector import Connector
 from core.configoption import ConfigOption
 from core.statusvariable import StatusVar
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 from core.util.network import netobtain
+from core.util.snapshot import SnapshotPublisher
 from core.util import units
 from core.util.math import compute_ft
 from logic.generic_logic import GenericLogic
 from logic.pulsed.pulse_extractor import PulseExtractor
 from logic.pulsed.pulse_analyzer import PulseAnalyzer
 
+plt = lazy_import('matplotlib.pyplot')
+
 
 class PulsedMeasurementLogic(GenericLogic):
     """
@@ -96,6 +99,8 @@ class PulsedMeasurementLogic(GenericLogic):
     psd = StatusVar(default=False)
     window = StatusVar(default='none')
     base_corr = StatusVar(default=True)
+    _fit_warm_start = StatusVar('fit_warm_start', default=False)
+    _fit_max_iterations = StatusVar('fit_max_iterations', default=None)
 
     # notification signals for master module (i.e. GUI)
     sigMeasurementDataUpdated = QtCore.Signal()
@@ -136,6 +141,8 @@ class PulsedMeasurementLogic(GenericLogic):
         self.measurement_error = np.empty((2, 0), dtype=float)
         self.laser_data = np.zeros((10, 20), dtype='int64')
         self.raw_data = np.zeros((10, 20), dtype='int64')
+        # snapshots of the measurement data for the GUI
+        self.snapshots = SnapshotPublisher()
 
         self._saved_raw_data = OrderedDict()  # temporary saved raw data
         self._recalled_raw_data_tag = None  # the currently recalled raw data dict key
@@ -171,6 +178,7 @@ class PulsedMeasurementLogic(GenericLogic):
         # Fitting
         self.fc = self.fitlogic().make_fit_container('pulsed', '1d')
         self.fc.set_units(self._data_units)
+        self.set_fit_warm_start(self._fit_warm_start, self._fit_max_iterations)
 
         # Recall saved status variables
         if 'fits' in self._statusVariables and isinstance(self._statusVariables.get('fits'), dict):
@@ -957,7 +965,7 @@ class PulsedMeasurementLogic(GenericLogic):
                 self._alternative_data_type = alt_data_type
 
             self._compute_alt_data()
-            self.sigMeasurementDataUpdated.emit()
+            self._publish_measurement_data()
         return
 
     @QtCore.Slot()
@@ -968,6 +976,21 @@ class PulsedMeasurementLogic(GenericLogic):
             self._pulsed_analysis_loop()
         return
 
+    def set_fit_warm_start(self, enabled, max_iterations=None):
+        """
+        Configure the fits for live updates during a running measurement.
+
+        @param bool enabled: seed each fit of the signal (or alternative) data with the previous
+                             result of the same data
+        @param int max_iterations: optional, maximum number of function evaluations per fit,
+                                   None for no limit
+        """
+        self._fit_warm_start = bool(enabled)
+        self._fit_max_iterations = None if max_iterations is None else int(max_iterations)
+        self.fc.set_warm_start(self._fit_warm_start)
+        self.fc.set_max_iterations(self._fit_max_iterations)
+        return
+
     @QtCore.Slot(str)
     @QtCore.Slot(str, bool)
     def do_fit(self, fit_method, use_alternative_data=False, data=None):
@@ -988,14 +1011,16 @@ class PulsedMeasurementLogic(GenericLogic):
         if data is None:
             data = self.signal_alt_data if use_alternative_data else self.signal_data
             update_fit_data = True
+            warm_start_key = 'alternative' if use_alternative_data else 'signal'
         else:
             update_fit_data = False
+            warm_start_key = None
 
         if len(data) < 2 or len(data[0]) < 2 or len(data[1]) < 2:
             self.log.debug('The data you are trying to fit does not contain enough data for a fit.')
             return
 
-        x_fit, y_fit, result = self.fc.do_fit(data[0], data[1])
+        x_fit, y_fit, result = self.fc.do_fit(data[0], data[1], warm_start_key=warm_start_key)
 
         fit_data = np.array([x_fit, y_fit])
 
@@ -1144,9 +1169,29 @@ class PulsedMeasurementLogic(GenericLogic):
             # emit signals
             self.sigTimerUpdated.emit(self.__elapsed_time, self.__elapsed_sweeps,
                                       self.__timer_interval)
-            self.sigMeasurementDataUpdated.emit()
+            self._publish_measurement_data()
             return
 
+    def _publish_measurement_data(self):
+        """ Publish the measurement data in the snapshots and emit sigMeasurementDataUpdated.
+
+        signal_data and measurement_error are changed in place and raw_data may be the buffer of
+        the fast counter hardware, so they are copied into back buffers. signal_alt_data and
+        laser_data are replaced by new arrays with every analysis and are handed over without
+        copying, unless laser_data is a view of raw_data (pass through extraction).
+        """
+        handover = ['signal_alt_data']
+        if not np.may_share_memory(self.laser_data, self.raw_data):
+            handover.append('laser_data')
+        self.snapshots.publish({'signal_data': self.signal_data,
+                                'signal_alt_data': self.signal_alt_data,
+                                'measurement_error': self.measurement_error,
+                                'laser_data': self.laser_data,
+                                'raw_data': self.raw_data},
+                               handover=handover)
+        self.sigMeasurementDataUpdated.emit()
+        return
+
     def _extract_laser_pulses(self):
         # Get counter raw data (including recalled raw data from previous measurement)
         fc_data, info_dict = self._get_raw_data()
@@ -1242,7 +1287,7 @@ class PulsedMeasurementLogic(GenericLogic):
         else:
             self.raw_data = np.zeros(number_of_bins, dtype='int64')
 
-        self.sigMeasurementDataUpdated.emit()
+        self._publish_measurement_data()
         return
 
     # FIXME: Revise everything below
@@ -72,6 +72,10 @@ class SequenceGeneratorLogic(GenericLogic):
     _sampling_functions_import_path = ConfigOption(name='additional_sampling_functions_path',
                                                    default=None,
                                                    missing='nothing')
+    # Set to True if the pulse generator can hold several waveforms and accepts new waveforms
+    # while it plays the loaded one (e.g. tektronix_awg70k, keysight_M3202A). Allows to prefetch
+    # the next asset during a running measurement.
+    _background_upload = ConfigOption(name='background_upload', default=False, missing='nothing')
 
     # status vars
     # Global parameters describing the channel usage and common parameters used during pulsed object
@@ -291,6 +295,10 @@ class SequenceGeneratorLogic(GenericLogic):
     def pulse_generator_constraints(self):
         return self.pulsegenerator().get_constraints()
 
+    @property
+    def background_upload(self):
+        return bool(self._background_upload)
+
     @property
     def sampled_waveforms(self):
         return netobtain(self.pulsegenerator().get_waveform_names())
@@ -23,12 +23,14 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 from collections import OrderedDict
 import numpy as np
-import matplotlib.pyplot as plt
 
 from core.connector import Connector
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 from logic.generic_logic import GenericLogic
 
+plt = lazy_import('matplotlib.pyplot')
+
 
 class QdplotLogic(GenericLogic):
 
@@ -23,7 +23,6 @@ from cycler import cycler
 import datetime
 import inspect
 import logging
-import matplotlib.pyplot as plt
 import numpy as np
 import os
 import sys
@@ -32,13 +31,16 @@ import time
 from collections import OrderedDict
 from core.configoption import ConfigOption
 from core.util import units
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 from core.util.network import netobtain
 from logic.generic_logic import GenericLogic
-from matplotlib.backends.backend_pdf import PdfPages
 from PIL import Image
 from PIL import PngImagePlugin
 
+plt = lazy_import('matplotlib.pyplot')
+backend_pdf = lazy_import('matplotlib.backends.backend_pdf')
+
 
 class DailyLogHandler(logging.FileHandler):
     """
@@ -516,7 +518,7 @@ class SaveLogic(GenericLogic):
             # Create the PdfPages object to which we will save the pages:
             # The with statement makes sure that the PdfPages object is closed properly at
             # the end of the block, even if an Exception occurs.
-            with PdfPages(fig_fname_vector) as pdf:
+            with backend_pdf.PdfPages(fig_fname_vector) as pdf:
                 pdf.savefig(plotfig, bbox_inches='tight', pad_inches=0.05)
 
                 # We can also set the file's metadata via the PdfPages object:
@@ -23,15 +23,104 @@ import copy
 import datetime
 import numpy as np
 import os
-import pylab as pb
 import time
 
 from collections import OrderedDict
 from core.connector import Connector
+from core.util.lazy_import import lazy_import
 from core.util.network import netobtain
 from logic.generic_logic import GenericLogic
 from qtpy import QtCore
 
+pb = lazy_import('matplotlib.pyplot')
+
+
+class BinningPyramid:
+    """ All binnings of a single shot signal, from one readout per bin up to max_width readouts.
+
+    All binning levels are stored in one contiguous array, level i (i.e. i+1 readouts per bin)
+    occupies the rows offsets[i]:offsets[i+1]. Incomplete bins at the end of the trace are
+    dropped. Indexing and iterating yields the individual levels as views, so a pyramid can be used
+    like the list of binned arrays.
+    """
+
+    def __init__(self, data, offsets, widths):
+        """
+        @param numpy.ndarray data: binned data of all levels, concatenated along the first axis
+        @param numpy.ndarray offsets: start index of each level in data, plus the total length
+        @param numpy.ndarray widths: number of readouts per bin for each level
+        """
+        self.data = data
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.widths = np.asarray(widths, dtype=np.int64)
+
+    @classmethod
+    def from_signal(cls, signal, max_width):
+        """ Build all binnings of a signal from a single cumulative sum.
+
+        The sum over a bin is the difference of the cumulative sum at its edges, so each level
+        costs only one strided difference. All levels together take O(N log N).
+
+        @param numpy.ndarray signal: 1D signal or 2D array with one column per laser pulse
+        @param int max_width: largest number of readouts per bin
+
+        @return BinningPyramid: the binnings with 1 to max_width readouts per bin
+        """
+        signal = np.asarray(signal, dtype=float)
+        length = signal.shape[0]
+        widths = np.arange(1, max(int(max_width), 1) + 1)
+        counts = length // widths
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        cumulative = np.zeros((length + 1,) + signal.shape[1:])
+        np.cumsum(signal, axis=0, out=cumulative[1:])
+
+        data = np.empty((offsets[-1],) + signal.shape[1:])
+        for level, width in enumerate(widths):
+            edges = cumulative[0:counts[level] * width + 1:width]
+            np.subtract(edges[1:], edges[:-1], out=data[offsets[level]:offsets[level + 1]])
+        return cls(data, offsets, widths)
+
+    def __len__(self):
+        return len(self.widths)
+
+    def __getitem__(self, level):
+        if level < 0:
+            level += len(self)
+        if not 0 <= level < len(self):
+            raise IndexError('Binning level {0} out of range.'.format(level))
+        return self.data[self.offsets[level]:self.offsets[level + 1]]
+
+    def __iter__(self):
+        for level in range(len(self)):
+            yield self[level]
+
+    def normalized(self):
+        """ Normalized signal (p0 - p1) / (p0 + p1) of the first two laser pulses for all levels.
+
+        @return BinningPyramid: pyramid of 1D normalized signals
+        """
+        data = (self.data[:, 0] - self.data[:, 1]) / (self.data[:, 0] + self.data[:, 1])
+        return BinningPyramid(data, self.offsets, self.widths)
+
+    def save(self, path):
+        """ Save the pyramid compactly into a numpy .npz file.
+
+        @param str path: file path
+        """
+        np.savez(path, data=self.data, offsets=self.offsets, widths=self.widths)
+
+    @classmethod
+    def load(cls, path):
+        """ Load a pyramid saved with save.
+
+        @param str path: file path
+
+        @return BinningPyramid: the loaded pyramid
+        """
+        with np.load(path) as npz:
+            return cls(npz['data'], npz['offsets'], npz['widths'])
+
 
 class SingleShotLogic(GenericLogic):
     """ This class brings raw data coming from fastcounter measurements (gated or ungated)
@@ -75,6 +164,8 @@ class SingleShotLogic(GenericLogic):
         self._hist_num_bins = None
 
         self.data_dict = None
+        # (data_dict, num_bins, pyramid) of the last calc_all_binnings call
+        self._binning_cache = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -191,17 +282,17 @@ class SingleShotLogic(GenericLogic):
         @param float smoothing: If pulse detection doesn't work, change this value
         @return numpy array: dimensionality is n_rows x n_laserpulses
         """
-        sum_single_pulses = []
         start_stop_tupel_list = self.find_laser(smoothing=smoothing, n_laserpulses=n_laserpulses)
         if self.data_dict:
             data = self.data_dict['raw_data']
-            for row in data:
-                laser_pulses = [np.sum(row[jj[0]:jj[1]]) for jj in start_stop_tupel_list]
-                sum_single_pulses.append(laser_pulses)
+            # sum each laser pulse over all rows at once
+            sum_single_pulses = np.column_stack(
+                [np.sum(data[:, start:stop], axis=1) for start, stop in start_stop_tupel_list])
         else:
             self.log.error('Pull data from fastcounting device using get_data function before trying to sum_laserpulse.')
+            sum_single_pulses = np.array([])
 
-        return np.array(sum_single_pulses)
+        return sum_single_pulses
 
 
     def get_normalized_signal(self, smoothing=10.0):
@@ -216,7 +307,8 @@ class SingleShotLogic(GenericLogic):
 
         sum_single_pulses = self.sum_laserpulse()
         if sum_single_pulses.shape[1] == 2:
-            normalized_signal = np.array([(ii[0] - ii[1])/(ii[0] + ii[1]) for ii in sum_single_pulses])
+            normalized_signal = ((sum_single_pulses[:, 0] - sum_single_pulses[:, 1])
+                                 / (sum_single_pulses[:, 0] + sum_single_pulses[:, 1]))
         else:
             self.log.warning('could not perform normalisation. Wrong number of laserpulses.')
 
@@ -226,61 +318,41 @@ class SingleShotLogic(GenericLogic):
         """
         calculate reasonable binnings of the signal
         @param int num_bins: minimal number the binnings can have
-        @return list bin_list: Contains the arrays with the binned data.
+        @return BinningPyramid bin_list: Contains the arrays with the binned data.
                                Data is structured as follows: bin_list[0] is the
                                initial binning given by the measurement and then going up.
-        """
 
-        if self.data_dict:
-            data = self.data_dict
-        else:
+        The laser pulses are summed only once and all binnings are derived from a cumulative sum.
+        The result is cached until new data is pulled with get_data.
+        """
+        if not self.data_dict:
             self.log.error('Pull data from fastcounting device using get_data function '
                            'before trying to calc_all_binnings.')
+            return BinningPyramid(np.zeros((0, 2)), [0], [])
+
+        cache = self._binning_cache
+        if cache is not None and cache[0] is self.data_dict and cache[1] == num_bins:
+            return cache[2]
 
-        NN = data['n_rows']
+        NN = self.data_dict['n_rows']
         # this is just a guess value, at some point it doesn't make
         # sense anymore to further decrease the number of bins
         max_bin = NN // num_bins
-        count_var = 1
-        bin_list = []
-        temp_list = []
         signal = self.sum_laserpulse()
-        while count_var <= max_bin:
-            # check if the the first run through loop was done
-            if temp_list:
-                app_arr = np.array(temp_list)
-                bin_list.append(app_arr)
-                temp_list = []
-            jj = 0
-            while jj < NN:
-                sum_ind = np.linspace(jj, jj + count_var - 1, count_var, dtype=np.int)
-                # make sure we don't try to adress not reserved memory
-                jj += count_var
-                if sum_ind[-1] < NN:
-                    # normalize
-                    temp_list.append(np.array([np.sum(signal[sum_ind, 0]), np.sum(signal[sum_ind, 1])]))
-                else:
-                    jj = NN
-            count_var += 1
-
-        return np.array(bin_list)
+        bin_list = BinningPyramid.from_signal(signal[:NN, :2], max_bin)
+
+        self._binning_cache = (self.data_dict, num_bins, bin_list)
+        return bin_list
 
     def calc_all_binnings_normalized(self, num_bins=100):
         """
         Calculate all normalized binnings from singleshot data
         @param integer num_bins: Tells how many data points should still remain ( in this sense restricts the maximum
                                  number of data points added up together )
-        @return list normalized_bin_list: The entries are numpy arrays that represent different binnings
+        @return BinningPyramid normalized_bin_list: The entries are numpy arrays that represent different binnings
                                           ( 1 to n values)
         """
-
-        bin_list = self.calc_all_binnings(num_bins=num_bins)
-        normalized_bin_list = []
-        for binning in bin_list:
-            normalized_binning = (binning[:, 0] - binning[:, 1])/(binning[:, 0] + binning[:, 1])
-            normalized_bin_list.append(normalized_binning)
-
-        return np.array(normalized_bin_list)
+        return self.calc_all_binnings(num_bins=num_bins).normalized()
 
 
     def get_timetrace(self):
@@ -294,7 +366,7 @@ class SingleShotLogic(GenericLogic):
         # what needs to be done here now is the basic evaluation steps like fit, threshold
         # readout fidelity
 
-        bin_list = self.calc_all_binnings(self, num_bins=100)
+        bin_list = self.calc_all_binnings(num_bins=100)
 
         param_dict_list = []
         fidelity_list = []
@@ -365,9 +437,9 @@ class SingleShotLogic(GenericLogic):
         self.get_data()
 
         if normalized:
-            bin_list = self.calc_all_binnings()
-        else:
             bin_list = self.calc_all_binnings_normalized()
+        else:
+            bin_list = self.calc_all_binnings()
 
         return bin_list
 
@@ -431,7 +503,8 @@ class SingleShotLogic(GenericLogic):
         When called this will save the attribute data_dict of class savelogic to file.
         The raw data will be postprocessed to bin lists as well as normalized bin lists
         ( containing all the possible binnings of the data. Additionally the meta_data
-        will be saved.
+        will be saved. The bin lists are saved as .npz files, they can be loaded with
+        BinningPyramid.load.
         @return:
         """
         filepath = self._save_logic.get_path_for_module(module_name='SingleShot')
@@ -445,7 +518,7 @@ class SingleShotLogic(GenericLogic):
 
             normalized_bin_list = self.calc_all_binnings_normalized()
             save_path2 = os.path.join(filepath, filelabel2)
-            np.save(save_path2, normalized_bin_list)
+            normalized_bin_list.save(save_path2)
             if visualize:
                 visualize_path = os.path.join(filepath, timestamp_str + '_visualize_bins')
                 os.mkdir(visualize_path)
@@ -459,7 +532,7 @@ class SingleShotLogic(GenericLogic):
 
             bin_list = self.calc_all_binnings()
             save_path1 = os.path.join(filepath, filelabel1)
-            np.save(save_path1, bin_list)
+            bin_list.save(save_path1)
 
         meta_data_dict = copy.deepcopy(self.data_dict)
         meta_data_dict.pop('raw_data')
@@ -515,7 +588,7 @@ class SingleShotLogic(GenericLogic):
         @param record_length:
         @return:
         """
-        normalized_bin_list = self.calc_all_binnings_normalized(self, num_bins=100)
+        normalized_bin_list = self.calc_all_binnings_normalized(num_bins=100)
 
         # for now take only the initial binning
         data = normalized_bin_list[0]
@@ -527,7 +600,7 @@ class SingleShotLogic(GenericLogic):
         self.do_calculate_histogram(data)
 
         # update the trace in the gui
-        self._do_calculate_trace(time_axis, data)
+        self.do_calculate_trace(time_axis, data)
 
 
 
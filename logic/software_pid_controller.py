@@ -23,6 +23,8 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 from core.util.mutex import Mutex
 import numpy as np
+import threading
+import time
 
 from logic.generic_logic import GenericLogic
 from interface.pid_controller_interface import PIDControllerInterface
@@ -34,14 +36,42 @@ from core.statusvariable import StatusVar
 class SoftPIDController(GenericLogic, PIDControllerInterface):
     """
     Control a process via software PID.
+
+    The control loop runs in a dedicated thread at a fixed rate of one step every timestep ms.
+    Steps are scheduled on the monotonic clock relative to the start of the loop, so timing errors
+    do not add up. The last spin_time seconds before a step are busy-waited for a precise start.
+    If a step is late by more than a period, the missed steps are skipped and counted as overruns.
+    get_timing_statistics reports the jitter, i.e. how late the steps start.
+
+    If the process is a chain of process value modifiers, the process value is read directly from
+    the hardware at the end of the chain and the transformations of the modifiers are applied in
+    the control thread.
+
+    Process value, control value and setpoint of the last history_length steps are kept in a ring
+    buffer, see get_history.
+
+    Example config for copy-paste:
+
+    softpid:
+        module.Class: 'software_pid_controller.SoftPIDController'
+        timestep: 100  # ms
+        history_length: 10000  # optional
+        spin_time: 0.001  # optional, s
+        connect:
+            process: 'processdummy'
+            control: 'processdummy'
     """
 
     # declare connectors
     process = Connector(interface='ProcessInterface')
     control = Connector(interface='ProcessControlInterface')
+    datalogger = Connector(interface='DataLoggerInterface', optional=True)
 
     # config opt
     timestep = ConfigOption(default=100)
+    datalogger_channel = ConfigOption('datalogger_channel', 'pid', missing='nothing')
+    history_length = ConfigOption('history_length', 10000, missing='nothing')
+    spin_time = ConfigOption('spin_time', 0.001, missing='nothing')
 
     # status vars
     kP = StatusVar(default=1)
@@ -70,29 +100,100 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
         """
         self._process = self.process()
         self._control = self.control()
+        self._data_logger = self.datalogger()
+        if self._data_logger is not None:
+            self._data_logger.set_log_channels(
+                {self.datalogger_channel: {'fields': ['process_value', 'control_value',
+                                                      'setpoint']}})
 
         self.previousdelta = 0
         self.cv = self._control.get_control_value()
+        self._compile_process_value()
+
+        # rows: time since the start of the loop, process value, control value, setpoint
+        self._history = np.zeros((4, max(1, int(self.history_length))))
+        self._history_index = 0
+        self._history_count = 0
+        # how late the last steps started, in s
+        self._jitter = np.zeros(1000)
+        self._step_times = np.zeros(1000)
+        self._steps = 0
+        self._overruns = 0
+        self._errors = 0
 
-        self.timer = QtCore.QTimer()
-        self.timer.setSingleShot(True)
-        self.timer.setInterval(self.timestep)
-
-        self.timer.timeout.connect(self._calcNextStep, QtCore.Qt.QueuedConnection)
-        self.sigNewValue.connect(self._control.set_control_value)
-
-        self.history = np.zeros([3, 5])
         self.savingState = False
         self.enable = False
         self.integrated = 0
         self.countdown = 2
 
-        self.timer.start(self.timestep)
+        self._stop_loop = threading.Event()
+        self._loop_thread = threading.Thread(target=self._control_loop,
+                                             name='{0}-control'.format(self._name), daemon=True)
+        self._loop_thread.start()
 
     def on_deactivate(self):
         """ Perform required deactivation.
         """
-        pass
+        self._stop_loop.set()
+        self._loop_thread.join()
+
+    def _compile_process_value(self):
+        """ Find the hardware at the end of a chain of process value modifiers and collect their
+            transformations, hardware side first.
+        """
+        source = self._process
+        transforms = list()
+        while hasattr(source, 'get_process_value_source'):
+            source, transform = source.get_process_value_source()
+            transforms.append(transform)
+        transforms.reverse()
+        self._read_raw_process_value = source.get_process_value
+        self._process_value_transforms = transforms
+
+    def _read_process_value(self):
+        """ Read the process value through the compiled chain of process value modifiers.
+
+            @return float: process value
+        """
+        value = self._read_raw_process_value()
+        for transform in self._process_value_transforms:
+            value = transform(value)
+        return float(value)
+
+    def _control_loop(self):
+        """ Call _calcNextStep at a fixed rate until the module is deactivated. """
+        period = self.timestep / 1000
+        start = time.monotonic()
+        self._loop_start = start
+        tick = 0
+        while not self._stop_loop.is_set():
+            tick += 1
+            deadline = start + tick * period
+            remaining = deadline - time.monotonic()
+            if remaining > self.spin_time and self._stop_loop.wait(remaining - self.spin_time):
+                break
+            while time.monotonic() < deadline:
+                pass
+            step_start = time.monotonic()
+            late = step_start - deadline
+            if late >= period:
+                missed = int(late // period)
+                self._overruns += missed
+                tick += missed
+            try:
+                self._calcNextStep()
+            except:
+                self._errors += 1
+                if self._errors == 1:
+                    self.log.exception('PID control step failed.')
+            else:
+                if self._errors > 1:
+                    self.log.warning('{0:d} PID control steps failed.'.format(self._errors))
+                self._errors = 0
+            index = self._steps % len(self._jitter)
+            self._jitter[index] = late
+            self._step_times[index] = time.monotonic() - step_start
+            self._steps += 1
 
     def _calcNextStep(self):
         """ This function implements the Takahashi Type C PID
@@ -101,7 +202,7 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
              The D term is NOT low-pass filtered.
              This function should be called once every TS seconds.
         """
-        self.pv = self._process.get_process_value()
+        self.pv = self._read_process_value()
 
         if self.countdown > 0:
             self.countdown -= 1
@@ -130,11 +231,6 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
             if self.cv < limits[0]:
                 self.cv = limits[0]
 
-            self.history = np.roll(self.history, -1, axis=1)
-            self.history[0, -1] = self.pv
-            self.history[1, -1] = self.cv
-            self.history[2, -1] = self.setpoint
-            self.sigNewValue.emit(self.cv)
         else:
             self.cv = self.manualvalue
             limits = self._control.get_control_limit()
@@ -142,9 +238,51 @@ class SoftPIDController(GenericLogic, PIDControllerInterface):
                 self.cv = limits[1]
             if self.cv < limits[0]:
                 self.cv = limits[0]
-            self.sigNewValue.emit(self.cv)
+        # set directly from the control thread, a queued signal would wait for the event loop
+        self._control.set_control_value(self.cv)
+        self.sigNewValue.emit(self.cv)
+
+        index = self._history_index
+        self._history[:, index] = (time.monotonic() - self._loop_start, self.pv, self.cv,
+                                   self.setpoint)
+        self._history_index = (index + 1) % self._history.shape[1]
+        self._history_count = min(self._history_count + 1, self._history.shape[1])
 
-        self.timer.start(self.timestep)
+        if self._data_logger is not None:
+            self._data_logger.log_to_channel(self.datalogger_channel,
+                                             [self.pv, self.cv, self.setpoint])
+
+    def get_history(self, count=None):
+        """ Process value, control value and setpoint of the last steps in chronological order.
+
+            @param int count: optional, number of steps, all kept steps if None
+
+            @return numpy.ndarray: rows time in s since the start of the loop, process value,
+                                   control value and setpoint
+        """
+        stored = self._history_count
+        count = stored if count is None else min(int(count), stored)
+        index = np.arange(self._history_index - count, self._history_index) % self._history.shape[1]
+        return self._history[:, index]
+
+    def get_timing_statistics(self):
+        """ Timing of the control loop over the last 1000 steps.
+
+            @return dict: number of steps, overruns (skipped steps), period, mean, standard
+                          deviation and maximum of the jitter (delay of the step start) and mean
+                          and maximum duration of a step, all times in s
+        """
+        count = min(self._steps, len(self._jitter))
+        jitter = self._jitter[:count]
+        step_times = self._step_times[:count]
+        return {'steps': self._steps,
+                'overruns': self._overruns,
+                'period': self.timestep / 1000,
+                'mean_jitter': float(jitter.mean()) if count else 0.,
+                'std_jitter': float(jitter.std()) if count else 0.,
+                'max_jitter': float(jitter.max()) if count else 0.,
+                'mean_step_time': float(step_times.mean()) if count else 0.,
+                'max_step_time': float(step_times.max()) if count else 0.}
 
     def startLoop(self):
         """ Start the control loop. """
@@ -22,14 +22,18 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 from collections import OrderedDict
 import numpy as np
-import matplotlib.pyplot as plt
+import time
 
+from core.configoption import ConfigOption
 from core.connector import Connector
 from core.statusvariable import StatusVar
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 from core.util.network import netobtain
 from logic.generic_logic import GenericLogic
 
+plt = lazy_import('matplotlib.pyplot')
+
 
 class SpectrumLogic(GenericLogic):
 
@@ -44,6 +48,12 @@ class SpectrumLogic(GenericLogic):
             savelogic: 'savelogic'
             odmrlogic: 'odmrlogic' # optional
             fitlogic: 'fitlogic'
+        differential_update_interval: 0.5  # optional, minimum time in s between GUI updates
+
+    The differential spectrum (modulation on minus off) is accumulated in place. Besides the sums
+    of the on and off spectra, the sum of squares of the difference of every repetition is kept,
+    which gives a running signal to noise ratio per pixel (differential_snr). The acquisition
+    stops by itself when the SNR reaches the target set with set_differential_target_snr.
     """
 
     # declare connectors
@@ -52,15 +62,28 @@ class SpectrumLogic(GenericLogic):
     savelogic = Connector(interface='SaveLogic')
     fitlogic = Connector(interface='FitLogic')
 
+    # minimum time in s between two GUI updates during a differential acquisition
+    _diff_update_interval = ConfigOption('differential_update_interval', 0.5, missing='nothing')
+
     # declare status variables
     _spectrum_data = StatusVar('spectrum_data', np.empty((2, 0)))
     _spectrum_background = StatusVar('spectrum_background', np.empty((2, 0)))
     _background_correction = StatusVar('background_correction', False)
     fc = StatusVar('fits', None)
+    # target SNR of the differential spectrum, 0 for no automatic stop
+    _diff_target_snr = StatusVar('differential_target_snr', 0.)
+    # 'max' or 'median' of the SNR of the pixels in the SNR region
+    _diff_snr_statistic = StatusVar('differential_snr_statistic', 'max')
+    # wavelength range the target SNR applies to, None for all pixels
+    _diff_snr_region = StatusVar('differential_snr_region', None)
+    # the noise estimate of few repetitions is unreliable, do not stop before
+    _diff_min_repetitions = StatusVar('differential_min_repetitions', 10)
 
     # Internal signals
     sig_specdata_updated = QtCore.Signal()
     sig_next_diff_loop = QtCore.Signal()
+    # SNR statistic of the differential spectrum, number of repetitions
+    sig_diff_snr_updated = QtCore.Signal(float, int)
 
     # External signals eg for GUI module
     spectrum_fit_updated_Signal = QtCore.Signal(np.ndarray, dict, str)
@@ -88,6 +111,12 @@ class SpectrumLogic(GenericLogic):
         self.diff_spec_data_mod_on = np.array([])
         self.diff_spec_data_mod_off = np.array([])
         self.repetition_count = 0    # count loops for differential spectrum
+        # sum of the squared differences of all repetitions and work buffers, same length as spectrum
+        self._diff_square_sum = np.array([])
+        self._diff_buffer = np.array([])
+        self._snr_work = (np.array([]), np.array([]))
+        self._last_diff_update = 0.
+        self._diff_updated_count = 0
 
         self._spectrometer_device = self.spectrometer()
         self._odmr_logic = self.odmrlogic()
@@ -145,6 +174,7 @@ class SpectrumLogic(GenericLogic):
         # saved with this single spectrum.
         self.diff_spec_data_mod_on = np.array([])
         self.diff_spec_data_mod_off = np.array([])
+        self._diff_square_sum = np.array([])
 
         self.sig_specdata_updated.emit()
 
@@ -194,14 +224,19 @@ class SpectrumLogic(GenericLogic):
         # Taking a demo spectrum gives us the wavelength values and the length of the spectrum data.
         demo_data = netobtain(self._spectrometer_device.recordSpectrum())
 
-        wavelengths = demo_data[0, :]
-        empty_signal = np.zeros(len(wavelengths))
+        wavelengths = np.array(demo_data[0, :], dtype=float)
+        size = len(wavelengths)
 
         # Using this information to initialise the differential spectrum data arrays.
-        self._spectrum_data = np.array([wavelengths, empty_signal])
-        self.diff_spec_data_mod_on = np.array([wavelengths, empty_signal])
-        self.diff_spec_data_mod_off = np.array([wavelengths, empty_signal])
+        self._spectrum_data = np.array([wavelengths, np.zeros(size)])
+        self.diff_spec_data_mod_on = np.array([wavelengths, np.zeros(size)])
+        self.diff_spec_data_mod_off = np.array([wavelengths, np.zeros(size)])
+        self._diff_square_sum = np.zeros(size)
+        self._diff_buffer = np.zeros(size)
+        self._snr_work = (np.zeros(size), np.zeros(size))
         self.repetition_count = 0
+        self._diff_updated_count = 0
+        self._last_diff_update = time.monotonic()
 
         # Starting the measurement loop
         self._loop_differential_spectrum()
@@ -217,35 +252,161 @@ class SpectrumLogic(GenericLogic):
 
     def _loop_differential_spectrum(self):
         """ This loop toggles the modulation and iteratively records a differential spectrum.
+
+        The on and off sums and the sum of the squared differences are updated in place. The
+        differential spectrum is calculated and the GUI updated at most every
+        differential_update_interval seconds.
         """
 
-        # If the loop should not continue, then return immediately without
+        # If the loop should not continue, then show the last repetitions and return without
         # emitting any signal to repeat.
         if not self._continue_differential:
+            if self._diff_updated_count != self.repetition_count:
+                self._update_differential_spectrum()
             return
 
         # Otherwise, we make a measurement and then emit a signal to repeat this loop.
+        mod_on_sum = self.diff_spec_data_mod_on[1, :]
+        mod_off_sum = self.diff_spec_data_mod_off[1, :]
 
         # Toggle on, take spectrum and add data to the mod_on data
         self.toggle_modulation(on=True)
         these_data = netobtain(self._spectrometer_device.recordSpectrum())
-        self.diff_spec_data_mod_on[1, :] += these_data[1, :]
+        np.add(mod_on_sum, these_data[1, :], out=mod_on_sum)
+        np.copyto(self._diff_buffer, these_data[1, :])
 
         # Toggle off, take spectrum and add data to the mod_off data
         self.toggle_modulation(on=False)
         these_data = netobtain(self._spectrometer_device.recordSpectrum())
-        self.diff_spec_data_mod_off[1, :] += these_data[1, :]
+        np.add(mod_off_sum, these_data[1, :], out=mod_off_sum)
+
+        # Sum of the squared differences of the repetitions for the noise estimate
+        np.subtract(self._diff_buffer, these_data[1, :], out=self._diff_buffer)
+        np.multiply(self._diff_buffer, self._diff_buffer, out=self._diff_buffer)
+        np.add(self._diff_square_sum, self._diff_buffer, out=self._diff_square_sum)
 
         self.repetition_count += 1    # increment the loop count
 
-        # Calculate the differential spectrum
-        self._spectrum_data[1, :] = self.diff_spec_data_mod_on[
-            1, :] - self.diff_spec_data_mod_off[1, :]
+        target_reached = False
+        if (self._diff_target_snr > 0
+                and self.repetition_count >= max(2, self._diff_min_repetitions)):
+            snr = self._snr_statistic(self._calculate_snr(self._snr_work))
+            target_reached = snr >= self._diff_target_snr
 
-        self.sig_specdata_updated.emit()
+        now = time.monotonic()
+        if target_reached or now - self._last_diff_update >= self._diff_update_interval:
+            self._update_differential_spectrum()
+
+        if target_reached:
+            self.log.info('Differential spectrum reached the target SNR of {0:.3g} after {1:d} '
+                          'repetitions.'.format(self._diff_target_snr, self.repetition_count))
+            self._continue_differential = False
+            return
 
         self.sig_next_diff_loop.emit()
 
+    def _update_differential_spectrum(self):
+        """ Calculate the differential spectrum and notify the GUI.
+        """
+        np.subtract(self.diff_spec_data_mod_on[1, :], self.diff_spec_data_mod_off[1, :],
+                    out=self._spectrum_data[1, :])
+        self._last_diff_update = time.monotonic()
+        self._diff_updated_count = self.repetition_count
+        self.sig_specdata_updated.emit()
+        if self.repetition_count > 1:
+            snr = self._snr_statistic(self._calculate_snr(self._snr_work))
+            self.sig_diff_snr_updated.emit(snr, self.repetition_count)
+
+    def _calculate_snr(self, work=None):
+        """ Signal to noise ratio per pixel of the differential spectrum.
+
+        The signal is the mean difference of the repetitions, the noise its standard error
+        estimated from the scatter of the repetitions.
+
+        @param tuple work: optional, two arrays of the spectrum size to calculate in. The
+                           acquisition loop passes its own, other callers get new arrays, so a
+                           call from the GUI thread does not overwrite data of the running loop.
+
+        @return numpy.ndarray: SNR per pixel, the second work array
+        """
+        if work is None:
+            work = (np.empty(len(self._diff_square_sum)), np.empty(len(self._diff_square_sum)))
+        mean, snr = work
+        count = self.repetition_count
+        if count < 2:
+            snr[:] = 0
+            return snr
+        np.subtract(self.diff_spec_data_mod_on[1, :], self.diff_spec_data_mod_off[1, :], out=mean)
+        mean /= count
+        # (count - 1) * variance = sum of squares - count * mean^2
+        np.multiply(mean, mean, out=snr)
+        snr *= -count
+        snr += self._diff_square_sum
+        np.maximum(snr, 0, out=snr)
+        # squared standard error of the mean
+        snr /= (count - 1) * count
+        np.sqrt(snr, out=snr)
+        np.abs(mean, out=mean)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(mean, snr, out=snr)
+        snr[np.isnan(snr)] = 0
+        return snr
+
+    def _snr_statistic(self, snr):
+        """ The SNR value compared to the target SNR.
+
+        @param numpy.ndarray snr: SNR per pixel
+
+        @return float: maximum or median of the SNR in the SNR region
+        """
+        if self._diff_snr_region is not None:
+            wavelengths = self.diff_spec_data_mod_on[0, :]
+            start = np.searchsorted(wavelengths, min(self._diff_snr_region))
+            stop = np.searchsorted(wavelengths, max(self._diff_snr_region), side='right')
+            snr = snr[start:stop]
+        if len(snr) == 0:
+            return 0.
+        if self._diff_snr_statistic == 'median':
+            return float(np.median(snr))
+        return float(np.max(snr))
+
+    @property
+    def differential_snr(self):
+        """ Running signal to noise ratio per pixel of the differential spectrum.
+
+        @return numpy.ndarray: wavelengths and SNR, shape (2, pixels)
+        """
+        if len(self._diff_square_sum) == 0:
+            return np.empty((2, 0))
+        return np.array([self.diff_spec_data_mod_on[0, :], self._calculate_snr()])
+
+    def set_differential_target_snr(self, target_snr, statistic='max', region=None,
+                                    min_repetitions=10):
+        """ Set the SNR at which the differential acquisition stops.
+
+        @param float target_snr: target SNR, 0 to acquire until stopped
+        @param str statistic: 'max' or 'median' of the SNR of the pixels in the region
+        @param list region: optional, wavelength range [min, max] in m, None for all pixels
+        @param int min_repetitions: minimum number of repetitions before the acquisition stops
+        """
+        if statistic not in ('max', 'median'):
+            self.log.error('Unknown SNR statistic "{0}", use "max" or "median".'.format(statistic))
+            return
+        self._diff_target_snr = max(0., float(target_snr))
+        self._diff_snr_statistic = statistic
+        self._diff_snr_region = None if region is None else [float(min(region)),
+                                                             float(max(region))]
+        self._diff_min_repetitions = max(2, int(min_repetitions))
+
+    def get_differential_target_snr(self):
+        """ Get the settings for the automatic stop of the differential acquisition.
+
+        @return tuple: target SNR, statistic, region ([min, max] wavelength or None),
+                       minimum number of repetitions
+        """
+        return (self._diff_target_snr, self._diff_snr_statistic, self._diff_snr_region,
+                self._diff_min_repetitions)
+
     def stop_differential_spectrum(self):
         """Stop an ongoing differential spectrum acquisition
         """
@@ -276,6 +437,9 @@ class SpectrumLogic(GenericLogic):
             additional experimental information to be included in the saved data file header.
         """
         filepath = self._save_logic.get_path_for_module(module_name='spectra')
+        if not background and self._diff_updated_count != self.repetition_count:
+            # GUI updates of the differential spectrum are throttled
+            self._update_differential_spectrum()
         if background:
             filelabel = 'background'
             spectrum_data = self._spectrum_background
@@ -313,6 +477,8 @@ class SpectrumLogic(GenericLogic):
             data['signal_mod_on'] = self.diff_spec_data_mod_on[1, :]
             data['signal_mod_off'] = self.diff_spec_data_mod_off[1, :]
             data['differential'] = spectrum_data[1, :]
+            if len(self._diff_square_sum) == len(spectrum_data[1, :]):
+                data['snr'] = self._calculate_snr()
         else:
             data['signal'] = spectrum_data[1, :]
 
@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+"""
+This file contains the measurement queue of the task runner.
+
+The queue runs InterruptableTasks of the task runner one after another without manual
+interaction, e.g. ODMR, pulsed measurement and refocus for every point of interest of an
+overnight campaign. A job is a task name and a parameter dictionary, which the task reads from
+self.parameters when it starts. Batches of jobs are created from parameter sweeps.
+
+Every task uses resources, by default the logic modules given in needsmodules of its task
+configuration, or the list given with 'resources'. A job only starts when none of its resources is
+locked, neither by another module nor by a preparation running in the queue. Tasks may implement
+prepareTask, e.g. to sample the waveform of the next pulsed measurement. The queue prepares the next
+job while the current job runs, if the resources of the preparation (task configuration
+'prepareresources', none by default) are not used by the current job. Consecutive jobs are
+started immediately when the previous one finishes.
+
+The queue records the time of every step of every job, see TaskQueue.timings.
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from qtpy import QtCore
+
+from core.util.mutex import Mutex
+import logic.generic_task as gt
+
+logger = logging.getLogger(__name__)
+
+
+class TaskQueue(QtCore.QObject):
+    """ Queue of parameterized task runs, see the module docstring.
+
+    The queue lives in the thread of the task runner. All public methods are thread safe.
+    Job states: 'queued', 'preparing', 'prepared', 'running', 'finished', 'failed', 'cancelled'.
+    """
+    sigQueueChanged = QtCore.Signal()
+    sigJobFinished = QtCore.Signal(dict)
+    sigQueueFinished = QtCore.Signal()
+
+    _sigSchedule = QtCore.Signal()
+    _sigPrepared = QtCore.Signal(int, object, bool)
+
+    def __init__(self, runner, retry_interval=1.0, parent=None):
+        """
+        @param TaskRunner runner: the task runner owning the tasks
+        @param float retry_interval: time in s after which a job waiting for resources is checked
+                                     again
+        @param QObject parent: optional, parent object
+        """
+        super().__init__(parent)
+        self._runner = runner
+        self.retry_interval = float(retry_interval)
+        self._lock = Mutex(recursive=True)
+        self._jobs = OrderedDict()
+        self._next_id = 0
+        self._next_batch = 0
+        self._active = False
+        self._current = None
+        self._preparing = None
+        # resource: id of the job holding it
+        self._locks = dict()
+        self._last_stop = None
+        self._started = None
+        self._waiting_for = None
+
+        self._retry_timer = QtCore.QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._schedule)
+        self._sigSchedule.connect(self._schedule, QtCore.Qt.QueuedConnection)
+        self._sigPrepared.connect(self._prepared, QtCore.Qt.QueuedConnection)
+
+    def add(self, taskname, parameters=None, batch=None):
+        """ Add a job to the end of the queue.
+
+        @param str taskname: name of the task in the task runner
+        @param dict parameters: optional, parameters for the task
+        @param int batch: optional, number of the batch the job belongs to
+
+        @return int: job id
+        """
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = {'id': job_id,
+                                  'task': taskname,
+                                  'parameters': dict() if parameters is None else dict(parameters),
+                                  'batch': batch,
+                                  'state': 'queued',
+                                  'prepared': None,
+                                  'success': None,
+                                  'queued': time.time(),
+                                  'prepare_start': None,
+                                  'prepare_stop': None,
+                                  'prepared_ahead': False,
+                                  'start': None,
+                                  'stop': None,
+                                  'gap': None,
+                                  'steps': 0,
+                                  'step_time': 0.,
+                                  'max_step_time': 0.}
+        self.sigQueueChanged.emit()
+        self._sigSchedule.emit()
+        return job_id
+
+    def addBatch(self, taskname, sweep, fixed=None):
+        """ Add one job for every point of a parameter sweep.
+
+        @param str taskname: name of the task in the task runner
+        @param sweep: dict of parameter name: list of values, for all combinations of the values
+                      (the last parameter changes fastest), or a list of parameter dicts
+        @param dict fixed: optional, parameters that are the same for all jobs
+
+        @return list(int): job ids
+        """
+        if isinstance(sweep, dict):
+            names = list(sweep)
+            points = [dict(zip(names, values))
+                      for values in itertools.product(*(sweep[name] for name in names))]
+        else:
+            points = [dict(point) for point in sweep]
+        with self._lock:
+            batch = self._next_batch
+            self._next_batch += 1
+        job_ids = list()
+        for point in points:
+            parameters = dict() if fixed is None else dict(fixed)
+            parameters.update(point)
+            job_ids.append(self.add(taskname, parameters, batch=batch))
+        return job_ids
+
+    def cancel(self, job_id):
+        """ Cancel a job that did not start yet.
+
+        @param int job_id: job id
+
+        @return bool: whether the job was cancelled
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['state'] not in ('queued', 'preparing', 'prepared'):
+                return False
+            job['state'] = 'cancelled'
+        self.sigQueueChanged.emit()
+        return True
+
+    def clear(self):
+        """ Cancel all jobs that did not start yet and forget all jobs that are done. """
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job['state'] in ('queued', 'prepared', 'finished', 'failed', 'cancelled'):
+                    del self._jobs[job_id]
+                elif job['state'] == 'preparing':
+                    job['state'] = 'cancelled'
+        self.sigQueueChanged.emit()
+
+    def start(self):
+        """ Start executing the queued jobs. """
+        with self._lock:
+            if self._active:
+                return
+            self._active = True
+            self._started = time.time()
+            self._last_stop = None
+        self._sigSchedule.emit()
+
+    def stop(self, abort=False):
+        """ Do not start further jobs.
+
+        @param bool abort: also stop the running job
+        """
+        with self._lock:
+            self._active = False
+            current = self._current
+        if abort and current is not None:
+            self._runner.stopTask(self._runner.getTaskByName(current['task']))
+
+    def isRunning(self):
+        """ Whether the queue executes jobs.
+
+        @return bool: True if jobs are executed or the running job did not finish yet
+        """
+        with self._lock:
+            return self._active or self._current is not None
+
+    def jobs(self):
+        """ All jobs of the queue.
+
+        @return list(dict): copies of the job dictionaries in queue order
+        """
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+
+    def timings(self):
+        """ Durations of the steps of all jobs that started.
+
+        wait: time from queueing to start, prepare: duration of the preparation,
+        prepared_ahead: whether the preparation ran during the previous job, gap: time from the end
+        of the previous job to the start, run: time from start to end, steps: number of task steps,
+        step_time and max_step_time: total and longest time of the task steps. All times in s,
+        None if the step did not happen.
+
+        @return list(dict): one dictionary per job
+        """
+        def duration(start, stop):
+            return None if start is None or stop is None else stop - start
+
+        with self._lock:
+            return [{'id': job['id'],
+                     'task': job['task'],
+                     'parameters': dict(job['parameters']),
+                     'batch': job['batch'],
+                     'state': job['state'],
+                     'wait': duration(job['queued'], job['start']),
+                     'prepare': duration(job['prepare_start'], job['prepare_stop']),
+                     'prepared_ahead': job['prepared_ahead'],
+                     'gap': job['gap'],
+                     'run': duration(job['start'], job['stop']),
+                     'steps': job['steps'],
+                     'step_time': job['step_time'],
+                     'max_step_time': job['max_step_time']}
+                    for job in self._jobs.values() if job['start'] is not None]
+
+    @staticmethod
+    def needsPreparation(task):
+        """ Whether a task implements a preparation.
+
+        @param dict task: task dictionary of the task runner
+
+        @return bool: True if the task overrides prepareTask
+        """
+        return type(task['object']).prepareTask is not gt.InterruptableTask.prepareTask
+
+    def _schedule(self):
+        """ Start the next job or its preparation, prepare the following job ahead. """
+        with self._lock:
+            if not self._active:
+                return
+            if self._current is None:
+                job = self._nextJob()
+                if job is None:
+                    self._finishQueue()
+                    return
+                task = self._task(job)
+                if task is None:
+                    self._sigSchedule.emit()
+                    return
+                if job['state'] == 'queued' and self.needsPreparation(task):
+                    if self._preparing is None and self._resourcesFree(task['prepareresources']):
+                        self._prepare(job, task)
+                    else:
+                        self._retry()
+                    return
+                if job['state'] == 'preparing':
+                    # _prepared schedules again
+                    return
+                if not self._canStart(job, task):
+                    self._retry()
+                    return
+                self._startJob(job, task)
+            self._prepareAhead()
+
+    def _nextJob(self):
+        for job in self._jobs.values():
+            if job['state'] in ('queued', 'preparing', 'prepared'):
+                return job
+        return None
+
+    def _task(self, job):
+        """ The task dictionary of a job, None and the job failed if it can not run. """
+        try:
+            task = self._runner.getTaskByName(job['task'])
+        except KeyError:
+            logger.error('Queued task {0} does not exist.'.format(job['task']))
+            task = None
+        else:
+            if not isinstance(task['object'], gt.InterruptableTask):
+                logger.error('Only interruptable tasks can be queued, not {0}.'.format(
+                    job['task']))
+                task = None
+            elif not task['ok']:
+                logger.error('Task {0} did not pass all checks for required tasks and modules '
+                             'and cannot be run.'.format(job['task']))
+                task = None
+        if task is None:
+            job['state'] = 'failed'
+            job['success'] = False
+            self.sigQueueChanged.emit()
+        return task
+
+    def _resourcesFree(self, resources, job=None):
+        """ Whether no other job holds one of the resources and no module resource is locked. """
+        loaded = self._runner._manager.tree['loaded']['logic']
+        for resource in resources:
+            holder = self._locks.get(resource)
+            if holder is not None and (job is None or holder != job['id']):
+                return False
+            module = loaded.get(resource)
+            if module is not None and module.module_state() == 'locked':
+                return False
+        return True
+
+    def _canStart(self, job, task):
+        if not task['object'].isstate('stopped'):
+            waiting_for = 'task {0} to stop'.format(job['task'])
+        elif not self._resourcesFree(task['resources'], job):
+            waiting_for = 'resources {0}'.format(', '.join(task['resources']))
+        elif not task['object'].checkStartPrerequisites():
+            waiting_for = 'start prerequisites of task {0}'.format(job['task'])
+        else:
+            self._waiting_for = None
+            return True
+        if self._waiting_for != (job['id'], waiting_for):
+            self._waiting_for = (job['id'], waiting_for)
+            logger.info('Queued job {0} is waiting for {1}.'.format(job['id'], waiting_for))
+        return False
+
+    def _retry(self):
+        if not self._retry_timer.isActive():
+            self._retry_timer.start(int(self.retry_interval * 1000))
+
+    def _startJob(self, job, task):
+        for resource in task['resources']:
+            self._locks[resource] = job['id']
+        job['state'] = 'running'
+        job['start'] = time.time()
+        if self._last_stop is not None:
+            job['gap'] = job['start'] - self._last_stop
+        self._current = job
+        obj = task['object']
+        obj.parameters = dict(job['parameters'])
+        obj.prepared = job['prepared']
+        job['prepared'] = None
+        obj.sigFinished.connect(self._jobFinished, QtCore.Qt.QueuedConnection)
+        self.sigQueueChanged.emit()
+        try:
+            self._runner.startTask(task)
+        except:
+            logger.exception('Error while starting queued job {0}.'.format(job['id']))
+        # A task that started emits sigFinished in any case. One that is still stopped never
+        # will, so the job is over.
+        if obj.isstate('stopped'):
+            logger.error('Task {0} of queued job {1} did not start.'.format(job['task'],
+                                                                            job['id']))
+            self._endJob(job, task, started=False)
+
+    def _jobFinished(self):
+        with self._lock:
+            job = self._current
+            if job is None:
+                return
+            self._endJob(job, self._runner.getTaskByName(job['task']))
+
+    def _endJob(self, job, task, started=True):
+        """ Record the result of the current job, release its resources and schedule the next.
+
+        @param dict job: the current job
+        @param dict task: task dictionary of the job
+        @param bool started: whether the task ran. If not, the job failed.
+        """
+        obj = task['object']
+        try:
+            obj.sigFinished.disconnect(self._jobFinished)
+        except TypeError:
+            pass
+        job['stop'] = time.time()
+        self._last_stop = job['stop']
+        if started:
+            job['success'] = obj.result.success
+            job['state'] = 'failed' if obj.result.success is False else 'finished'
+            job['steps'] = obj.timing['steps']
+            job['step_time'] = obj.timing['step_time']
+            job['max_step_time'] = obj.timing['max_step_time']
+        else:
+            job['success'] = False
+            job['state'] = 'failed'
+        for resource in task['resources']:
+            if self._locks.get(resource) == job['id']:
+                del self._locks[resource]
+        obj.parameters = dict()
+        obj.prepared = None
+        self._current = None
+        finished = dict(job)
+        self.sigJobFinished.emit(finished)
+        self.sigQueueChanged.emit()
+        self._sigSchedule.emit()
+
+    def _prepareAhead(self):
+        """ Prepare the job after the running one, if the running job does not need the
+        resources of the preparation.
+        """
+        if self._current is None or self._preparing is not None:
+            return
+        for job in self._jobs.values():
+            if job['state'] == 'queued':
+                break
+        else:
+            return
+        try:
+            task = self._runner.getTaskByName(job['task'])
+        except KeyError:
+            return
+        if not isinstance(task['object'], gt.InterruptableTask) or not self.needsPreparation(task):
+            return
+        if self._resourcesFree(task['prepareresources']):
+            self._prepare(job, task, ahead=True)
+
+    def _prepare(self, job, task, ahead=False):
+        """ Run the preparation of a job in a worker thread. """
+        for resource in task['prepareresources']:
+            self._locks[resource] = job['id']
+        job['state'] = 'preparing'
+        job['prepared_ahead'] = ahead
+        job['prepare_start'] = time.time()
+        self._preparing = job
+        thread = threading.Thread(target=self._prepareWorker,
+                                  args=(job, task['object'], dict(job['parameters'])),
+                                  name='task-queue-prepare', daemon=True)
+        thread.start()
+        self.sigQueueChanged.emit()
+
+    def _prepareWorker(self, job, obj, parameters):
+        try:
+            prepared = obj.prepareTask(parameters)
+            success = True
+        except:
+            logger.exception('Error while preparing queued job {0} of task {1}.'.format(
+                job['id'], job['task']))
+            prepared = None
+            success = False
+        with self._lock:
+            job['prepare_stop'] = time.time()
+        self._sigPrepared.emit(job['id'], prepared, success)
+
+    def _prepared(self, job_id, prepared, success):
+        with self._lock:
+            job = self._jobs.get(job_id, self._preparing)
+            self._preparing = None
+            for resource, holder in list(self._locks.items()):
+                if holder == job_id and (self._current is None or self._current['id'] != job_id):
+                    del self._locks[resource]
+            if job['state'] == 'preparing':
+                if success:
+                    job['state'] = 'prepared'
+                    job['prepared'] = prepared
+                else:
+                    job['state'] = 'failed'
+                    job['success'] = False
+        self.sigQueueChanged.emit()
+        self._sigSchedule.emit()
+
+    def _finishQueue(self):
+        """ Log a summary of the jobs run since the queue was started. """
+        self._active = False
+        jobs = [job for job in self._jobs.values()
+                if job['stop'] is not None and job['start'] >= self._started]
+        if jobs:
+            total = jobs[-1]['stop'] - self._started
+            run = sum(job['stop'] - job['start'] for job in jobs)
+            gaps = sum(job['gap'] for job in jobs if job['gap'] is not None)
+            failed = sum(1 for job in jobs if job['state'] == 'failed')
+            logger.info('Task queue finished {0} jobs ({1} failed) in {2:.1f} s, {3:.1f} s '
+                        'running and {4:.3f} s between jobs.'.format(
+                            len(jobs), failed, total, run, gaps))
+        self.sigQueueFinished.emit()
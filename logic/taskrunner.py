@@ -23,8 +23,10 @@ top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi
 from qtpy import QtCore
 import importlib
 
+from core.configoption import ConfigOption
 from core.util.models import ListTableModel
 from logic.generic_logic import GenericLogic
+from logic.task_queue import TaskQueue
 import logic.generic_task as gt
 
 
@@ -93,9 +95,13 @@ class TaskRunner(GenericLogic):
     sigLoadTasks = QtCore.Signal()
     sigCheckTasks = QtCore.Signal()
 
+    # time in s after which a queued job waiting for resources is checked again
+    queue_retry_interval = ConfigOption('queue_retry_interval', 0.2)
+
     def on_activate(self):
         """ Initialise task runner.
         """
+        self.queue = TaskQueue(self, retry_interval=self.queue_retry_interval)
         self.model = TaskListTableModel()
         self.model.rowsInserted.connect(self.modelChanged)
         self.model.rowsRemoved.connect(self.modelChanged)
@@ -107,6 +113,7 @@ class TaskRunner(GenericLogic):
     def on_deactivate(self):
         """ Shut down task runner.
         """
+        self.queue.stop()
         self._manager.registerTaskRunner(None)
 
     def loadTasks(self):
@@ -148,6 +155,11 @@ class TaskRunner(GenericLogic):
             else:
                 t['config'] = {}
 
+            # resources locked by the task queue while the task runs or prepares
+            t['resources'] = list(config['tasks'][task].get(
+                'resources', t['needsmodules'].values()))
+            t['prepareresources'] = list(config['tasks'][task].get('prepareresources', []))
+
             try:
                 ref = dict()
                 for moddef, mod in t['needsmodules'].items():
@@ -188,12 +200,18 @@ class TaskRunner(GenericLogic):
             [str] pausetasks: this stuff needs to be paused before task can run
             dict needsmodules: task needs these modules
             dict config: extra configuration
+            [str] resources: resources locked by the task queue while the task runs
+            [str] prepareresources: resources locked while the task queue prepares the task
         """
         try:
             if not 'preposttasks' in task:
                 task['preposttasks'] = []
             if not 'pausetasks' in task:
                 task['pausetasks'] = []
+            if not 'resources' in task:
+                task['resources'] = []
+            if not 'prepareresources' in task:
+                task['prepareresources'] = []
             task['module'] = None
             task['needsmodules'] = {}
             task['config'] = {}
@@ -346,6 +364,47 @@ class TaskRunner(GenericLogic):
         else:
             self.log.error('Task cannot be stopped: {0}'.format(task['name']))
 
+    def queueTask(self, taskname, parameters=None):
+        """ Add a run of a task to the end of the measurement queue.
+
+        @param str taskname: name of the task
+        @param dict parameters: optional, parameters the task is started with
+
+        @return int: job id
+        """
+        return self.queue.add(taskname, parameters)
+
+    def queueBatch(self, taskname, sweep, fixed=None):
+        """ Add one run of a task per point of a parameter sweep to the measurement queue.
+
+        @param str taskname: name of the task
+        @param sweep: dict of parameter name: list of values, for all combinations of the values,
+                      or a list of parameter dicts
+        @param dict fixed: optional, parameters that are the same for all runs
+
+        @return list(int): job ids
+        """
+        return self.queue.addBatch(taskname, sweep, fixed)
+
+    def startQueue(self):
+        """ Start running the queued tasks one after another.
+        """
+        self.queue.start()
+
+    def stopQueue(self, abort=False):
+        """ Do not start further queued tasks.
+
+        @param bool abort: also stop the running task
+        """
+        self.queue.stop(abort)
+
+    def getQueueTimings(self):
+        """ Get the durations of the steps of all queued task runs that started.
+
+        @return list(dict): timing dictionary per run, see TaskQueue.timings
+        """
+        return self.queue.timings()
+
     def getTaskByName(self, taskname):
         """ Get task dictionary for a given task name.
 
@@ -408,6 +467,8 @@ class TaskRunner(GenericLogic):
                             t['object'].resume()
                         elif t['object'].isstate('stopped'):
                             pass
+                        elif t['object'].isstate('pausing'):
+                            self._resumeWhenPaused(t['object'])
                         else:
                             self.log.error('Pausetask {} failed while '
                                     'resuming after stop: {}'.format(
@@ -419,6 +480,17 @@ class TaskRunner(GenericLogic):
                 return False
         return True
 
+    def _resumeWhenPaused(self, obj):
+        """ Resume a task as soon as it finished pausing.
+
+        @param InterruptableTask obj: task in state pausing
+        """
+        def resume():
+            obj.sigPaused.disconnect(resume)
+            if obj.can('resume'):
+                obj.resume()
+        obj.sigPaused.connect(resume)
+
     def postRunPPTasks(self, ref):
         """ Try executing post action for preposttasks associated with a given task.
 
@@ -27,6 +27,41 @@ from core.connector import Connector
 from logic.generic_logic import GenericLogic
 
 
+def run_length_encode(binary_trace):
+    """ Run-length encoding of a binary (or any discrete) trace.
+
+    @param np.array binary_trace: 1D array of states
+
+    @return tuple(values, starts, lengths):
+                np.array values: state of each run
+                np.array starts: index of the first point of each run
+                np.array lengths: number of points in each run
+    """
+    binary_trace = np.asarray(binary_trace)
+    if binary_trace.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return binary_trace[:0], empty, empty
+    change_index = np.flatnonzero(binary_trace[1:] != binary_trace[:-1]) + 1
+    starts = np.concatenate(([0], change_index))
+    lengths = np.diff(np.concatenate((starts, [binary_trace.size])))
+    return binary_trace[starts], starts, lengths
+
+
+def dwell_times(binary_trace, dt=1):
+    """ Durations of the uninterrupted stays in the high and in the low state.
+
+    The runs at the beginning and the end of the trace are included, although they are truncated.
+
+    @param np.array binary_trace: 1D boolean array, True for the high state
+    @param float dt: time between two points of the trace
+
+    @return tuple(np.array, np.array): dwell times in the high and in the low state
+    """
+    values, _, lengths = run_length_encode(np.asarray(binary_trace, dtype=bool))
+    durations = lengths * dt
+    return durations[values], durations[~values]
+
+
 class TraceAnalysisLogic(GenericLogic):
     """ Perform a gated counting measurement with the hardware.  """
 
@@ -56,6 +91,8 @@ class TraceAnalysisLogic(GenericLogic):
         self.spin_flip_prob = 0
         self.fidelity_left = 0
         self.fidelity_right = 0
+        # histogram and result of the last double gaussian fit of analyze_flip_prob4
+        self._hist_fit_cache = None
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -164,8 +201,11 @@ class TraceAnalysisLogic(GenericLogic):
                       float lifetime_bright: lifetime in the bright state in s
         """
 
-        hist_data = self.calculate_histogram(trace=trace, num_bins=num_bins)
-        threshold_fit, fidelity, fit_param = self.calculate_threshold(hist_data)
+        if threshold is None:
+            hist_data = self.calculate_histogram(trace=trace, num_bins=num_bins)
+            threshold_fit, fidelity, fit_param = self.calculate_threshold(hist_data)
+        else:
+            threshold_fit, fidelity, fit_param = threshold, None, dict()
         bin_trace = self.calculate_binary_trace(trace, threshold_fit)
 
         # here the index_arr contain all indices where the state is above
@@ -232,36 +272,24 @@ class TraceAnalysisLogic(GenericLogic):
                       float lifetime_dark: the lifetime in the dark state in s
                       float lifetime_bright: lifetime in the bright state in s
         """
-        no_flip = 0.0
+        trace = np.asarray(trace)
+        high = trace > threshold
+        low = trace < threshold
 
         if analyze_mode == 'full':
-            for ii in range(len(trace) - 1):
-                if trace[ii] > threshold and trace[ii + 1] > threshold:
-                    no_flip = no_flip + 1
-
-                elif trace[ii] < threshold and trace[ii + 1] < threshold:
-                    no_flip = no_flip + 1
-
+            no_flip = np.count_nonzero(high[:-1] & high[1:]) + np.count_nonzero(low[:-1] & low[1:])
             probability = 1.0 - (no_flip / len(trace))
             lost_events = 0.0
 
         if analyze_mode == 'dark':
-            dark_counter = 0.0
-            for ii in range(len(trace) - 1):
-                if trace[ii] < threshold:
-                    dark_counter = dark_counter + 1
-                    if trace[ii + 1] < threshold:
-                        no_flip = no_flip + 1
+            dark_counter = np.count_nonzero(low[:-1])
+            no_flip = np.count_nonzero(low[:-1] & low[1:])
             probability = 1.0 - (no_flip / dark_counter)
             lost_events = (1.0 - (dark_counter / len(trace))) * 100
 
         if analyze_mode == 'bright':
-            bright_counter = 0.0
-            for ii in range(len(trace) - 1):
-                if trace[ii] > threshold:
-                    bright_counter = bright_counter + 1
-                    if trace[ii + 1] > threshold:
-                        no_flip = no_flip + 1
+            bright_counter = np.count_nonzero(high[:-1])
+            no_flip = np.count_nonzero(high[:-1] & high[1:])
             probability = 1.0 - (no_flip / bright_counter)
             lost_events = (1.0 - (bright_counter / len(trace))) * 100
 
@@ -284,39 +312,13 @@ class TraceAnalysisLogic(GenericLogic):
         """
         init_threshold = init_threshold if init_threshold is not None else [1, 1]
         ana_threshold = ana_threshold if ana_threshold is not None else [1, 1]
-        no_flip = 0.0
-        flip = 0.0
-
-        # find all indices in the trace-array, where the value is above init_threshold[1]
-        init_high = np.where(trace[:-1] > init_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below init_threshold[0]
-        init_low = np.where(trace[:-1] < init_threshold[0])[0]
-        # find all indices in the trace-array, where the value is above ana_threshold[1]
-        ana_high = np.where(trace > ana_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below ana_threshold[0]
-        ana_low = np.where(trace < ana_threshold[0])[0]
 
-        if analyze_mode == 'bright' or analyze_mode == 'full':
-            # analyze the trace where the data were the nuclear was initalized into one direction
-            for index in init_high:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    no_flip = no_flip + 1
-                elif index + 1 in ana_low:
-                    flip = flip + 1
-
-        if analyze_mode == 'dark' or analyze_mode == 'full':
-            # repeat the same if the nucleus was initalized into the other array
-            for index in init_low:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    flip = flip + 1
-                elif index + 1 in ana_low:
-                    no_flip = no_flip + 1
+        flip, no_flip = self._count_flips(trace, init_threshold, ana_threshold, analyze_mode)
 
         # the flip probability is given by the number of flips divided by the total number of analyzed data points
         if (flip + no_flip) == 0:
             self.log.error('There is not enough data to anaylsis SSR!')
+            probability = np.nan
         else:
             probability = flip / (flip + no_flip)
         # the number of lost events is given by the length of the time_trace minus the number of analyzed data points
@@ -324,7 +326,8 @@ class TraceAnalysisLogic(GenericLogic):
 
         return probability, lost_events
 
-    def analyze_flip_prob4(self, trace, bins=30, init_threshold = None, ana_threshold = None, analyze_mode='full'):
+    def analyze_flip_prob4(self, trace, bins=30, init_threshold = None, ana_threshold = None, analyze_mode='full',
+                           refit=True):
         """
         Method which calculates the histogram, the fidelity and the flip probability of a time trace.
         :param trace:
@@ -332,17 +335,25 @@ class TraceAnalysisLogic(GenericLogic):
         :param init_margin:
         :param ana_margin:
         :param analyze_mode:
+        :param refit: if False, the double gaussian fit of the previous call is reused. The fit is
+                      also reused if the histogram did not change.
         :return:
         """
 
         init_threshold = init_threshold if init_threshold is not None else [1, 1]
         ana_threshold = ana_threshold if ana_threshold is not None else [1, 1]
-        self.calculate_histogram(trace, bins)
+        self.hist_data = self.calculate_histogram(trace, bins)
         axis = self.hist_data[0][:-1] + (self.hist_data[0][1] - self.hist_data[0][0]) / 2.
         data = self.hist_data[1]
 
         try:
-            hist_fit_x, hist_fit_y, param_dict, fit_result = self.do_doublegaussian_fit(axis, data)
+            cache = self._hist_fit_cache
+            if cache is not None and (not refit or (np.array_equal(cache[0], axis)
+                                                    and np.array_equal(cache[1], data))):
+                hist_fit_x, hist_fit_y, param_dict, fit_result = cache[2]
+            else:
+                hist_fit_x, hist_fit_y, param_dict, fit_result = self.do_doublegaussian_fit(axis, data)
+                self._hist_fit_cache = (axis, data, (hist_fit_x, hist_fit_y, param_dict, fit_result))
             fit_params = fit_result.best_values
 
             # calculate the fidelity for the left and right part from the threshold
@@ -366,33 +377,7 @@ class TraceAnalysisLogic(GenericLogic):
             self.log.warning('Not enough data points yet!')
 
         # calculate the flip probability
-        no_flip = 0.0
-        flip = 0.0
-        # find all indices in the trace-array, where the value is above init_threshold[1]
-        init_high = np.where(trace[:-1] > init_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below init_threshold[0]
-        init_low = np.where(trace[:-1] < init_threshold[0])[0]
-        # find all indices in the trace-array, where the value is above ana_threshold[1]
-        ana_high = np.where(trace > ana_threshold[1])[0]
-        # find all indices in the trace-array, where the value is below ana_threshold[0]
-        ana_low = np.where(trace < ana_threshold[0])[0]
-
-        if analyze_mode == 'bright' or analyze_mode == 'full':
-            # analyze the trace where the data were the nuclear was initalized into one direction
-            for index in init_high:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    no_flip = no_flip + 1
-                elif index + 1 in ana_low:
-                    flip = flip + 1
-        if analyze_mode == 'dark' or analyze_mode == 'full':
-            # repeat the same if the nucleus was initalized into the other array
-            for index in init_low:
-                # check if the following data point is in the analysis array
-                if index + 1 in ana_high:
-                    flip = flip + 1
-                elif index + 1 in ana_low:
-                    no_flip = no_flip + 1
+        flip, no_flip = self._count_flips(trace, init_threshold, ana_threshold, analyze_mode)
 
         # the flip probability is given by the number of flips divided by the total number of analyzed data points
         if (flip + no_flip) == 0:
@@ -411,6 +396,36 @@ class TraceAnalysisLogic(GenericLogic):
 
         return self.spin_flip_prob, lost_events, hist_fit_x, hist_fit_y, fit_result
 
+    def _count_flips(self, trace, init_threshold, ana_threshold, analyze_mode='full'):
+        """ Count flips and non-flips between consecutive readouts of a single shot trace.
+
+        A readout above init_threshold[1] (below init_threshold[0]) initialises the high (low)
+        state, the following readout is analysed with ana_threshold in the same way.
+
+        @param np.array trace: 1D trace of data
+        @param list init_threshold: [low, high] thresholds for the initial readout
+        @param list ana_threshold: [low, high] thresholds for the analysed readout
+        @param str analyze_mode: 'full', 'bright' (high initial state) or 'dark' (low initial state)
+
+        @return tuple(int, int): number of flips and number of non-flips
+        """
+        trace = np.asarray(trace)
+        init_high = trace[:-1] > init_threshold[1]
+        init_low = trace[:-1] < init_threshold[0]
+        # the following readout counts as low state only if it is not in the high state
+        ana_high = trace[1:] > ana_threshold[1]
+        ana_low = (trace[1:] < ana_threshold[0]) & ~ana_high
+
+        flip = 0
+        no_flip = 0
+        if analyze_mode == 'bright' or analyze_mode == 'full':
+            no_flip += np.count_nonzero(init_high & ana_high)
+            flip += np.count_nonzero(init_high & ana_low)
+        if analyze_mode == 'dark' or analyze_mode == 'full':
+            flip += np.count_nonzero(init_low & ana_high)
+            no_flip += np.count_nonzero(init_low & ana_low)
+        return int(flip), int(no_flip)
+
     def analyze_flip_prob_postselect(self):
         """ Post select the data trace so that the flip probability is only
             calculated from a jump from below a threshold value to an value
@@ -506,69 +521,15 @@ class TraceAnalysisLogic(GenericLogic):
                                                                                distr='gaussian_normalized')
                 threshold = threshold_fit
 
-            # helper functions to get and analyze the timetrace
-            def analog_digitial_converter(cut_off, data):
-                new_digital_trace = []
-                for data_point in data:
-                    if data_point >= cut_off:
-                        new_digital_trace.append(1)
-                    else:
-                        new_digital_trace.append(0)
-                return new_digital_trace
-
-            def time_in_high_low(raw_digital_trace, local_dt):
-                """
-                What I need this function to do is to get all consecutive {1, ... , n} 1s or 0s and add
-                them up and put into a list to later make a histogram from them.
-                """
-                occurances = []
-                index = 0
-                index2 = 0
-
-                while index < len(raw_digital_trace):
-                    occurances.append(0)
-                    # start following the consecutive 1s
-                    while raw_digital_trace[index] == 1:
-                        occurances[index2] += 1
-                        if index == (len(raw_digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * local_dt
-                        else:
-                            index += 1
-                    if raw_digital_trace[index - 1] == 1:
-                        index2 += 1
-                        occurances.append(0)
-                    # start following the consecutive 0s
-                    while raw_digital_trace[index] == 0:
-                        occurances[index2] -= 1
-                        if index == (len(raw_digital_trace) - 1):
-                            occurances = np.array(occurances)
-                            return occurances * local_dt
-                        else:
-                            index += 1
-                    index2 += 1
-
-            digital_trace = analog_digitial_converter(threshold, trace)
-            time_array = time_in_high_low(digital_trace, dt)
-
-            # now we need to make a histogram as well as a fit
-            # what would be a good estimate for the number of bins
-
-            # longest = np.max(np.array(occurances))
-            # number of steps in between, rather not use that for now
-            # est_bins = np.int(longest/dt)
-
-            time_array_high = np.array([ii for ii in filter(lambda x: x > 0, time_array)])
-            time_array_low = np.array([ii for ii in filter(lambda x: x < 0, time_array)])
+            # digitize the trace and get the time spent in each uninterrupted stay in the high or
+            # low state. The dwell times in the low state are negative, as before.
+            time_array_high, time_array_low = dwell_times(np.asarray(trace) >= threshold, dt)
+            time_array_low = -time_array_low
 
             # get lifetime of bright state
             time_hist_high = np.histogram(time_array_high, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_high[0][0:num_bins]))]
-
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
+            indices = np.flatnonzero(time_hist_high[0][0:num_bins] > 0)
             self.log.debug('threshold {0}'.format(threshold))
-            self.log.debug('time_array:{0}'.format(time_array))
             self.log.debug('time_array_high:{0}'.format(time_array_high))
             self.log.debug('time_hist_high:{0}'.format(time_hist_high))
             self.log.debug('indices: {0}'.format(indices))
@@ -588,10 +549,8 @@ class TraceAnalysisLogic(GenericLogic):
 
             # get lifetime of dark state
             time_hist_low = np.histogram(time_array_low, bins=num_bins)
-            vals = [i for i in filter(lambda x: x[1] > 0, enumerate(time_hist_low[0][0:num_bins]))]
-            indices = np.array([val[0] for val in vals])
-            indices = np.array([np.int(indice) for indice in indices])
-            values = np.array([val[1] for val in vals])
+            indices = np.flatnonzero(time_hist_low[0][0:num_bins] > 0)
+            values = time_hist_low[0][indices]
             # positive axis
             mirror_axis = -time_hist_low[1][indices]
             result = self._fit_logic.make_decayexponential_fit(mirror_axis,
@@ -26,14 +26,281 @@ from collections import OrderedDict
 import numpy as np
 import time
 import datetime
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+import threading
 
 from core.connector import Connector
 from core.configoption import ConfigOption
 from logic.generic_logic import GenericLogic
+from core.util.lazy_import import lazy_import
 from core.util.mutex import Mutex
 
+mpl = lazy_import('matplotlib')
+plt = lazy_import('matplotlib.pyplot')
+
+
+class RingBuffer:
+
+    """ Fixed size buffer for rows of float values. When full, the oldest rows are overwritten.
+
+    Rows are addressed by an absolute index counting all rows ever appended, so readers can keep a
+    watermark of what they have already processed.
+
+    Every row is stored twice, at position i and i + capacity, so the retained rows are always a
+    contiguous block in chronological order and can be handed out as a view without copying.
+    """
+
+    def __init__(self, capacity, columns):
+        self.capacity = int(capacity)
+        self.columns = int(columns)
+        self._data = np.zeros((2 * self.capacity, self.columns))
+        self._lock = threading.Lock()
+        self._total = 0
+
+    def clear(self):
+        """ Remove all rows. """
+        with self._lock:
+            self._total = 0
+
+    def __len__(self):
+        return min(self._total, self.capacity)
+
+    @property
+    def total(self):
+        """ Absolute index of the next row, i.e. the number of rows ever appended. """
+        return self._total
+
+    @property
+    def first_index(self):
+        """ Absolute index of the oldest retained row. """
+        return max(0, self._total - self.capacity)
+
+    @property
+    def overflowed(self):
+        """ True if rows have been overwritten. """
+        return self._total > self.capacity
+
+    def append(self, rows):
+        """ Append one row or a 2D array of rows.
+
+        @param rows: sequence of length columns or array of shape (n, columns)
+        """
+        rows = np.asarray(rows, dtype=float).reshape(-1, self.columns)
+        appended = rows.shape[0]
+        if appended > self.capacity:
+            rows = rows[-self.capacity:]
+        with self._lock:
+            start = (self._total + appended - rows.shape[0]) % self.capacity
+            stop = start + rows.shape[0]
+            split = min(stop, self.capacity) - start
+            for mirror in (0, self.capacity):
+                self._data[mirror + start:mirror + start + split] = rows[:split]
+                if split < rows.shape[0]:
+                    self._data[mirror:mirror + stop - self.capacity] = rows[split:]
+            self._total += appended
+
+    def last(self):
+        """ The newest row or None if the buffer is empty. """
+        with self._lock:
+            if self._total == 0:
+                return None
+            return self._data[(self._total - 1) % self.capacity].copy()
+
+    def get(self, start=None):
+        """ Copy of the rows from absolute index start (default: oldest retained row) to the newest.
+
+        @param int start: absolute index of the first row. Clipped to the oldest retained row.
+
+        @return numpy.ndarray: rows in chronological order, shape (n, columns)
+        """
+        return self.read(start)[1]
+
+    def read(self, start=None):
+        """ Same as get, but also return the absolute index of the first returned row.
+
+        @param int start: absolute index of the first row. Clipped to the oldest retained row.
+
+        @return (int, numpy.ndarray): index of the first row, rows in chronological order
+        """
+        start, rows = self._window(start)
+        return start, rows.copy()
+
+    def view(self, start=None):
+        """ Same as get, but return a read-only view into the buffer instead of a copy.
+
+        The rows are not protected against later appends. Once the buffer has wrapped around, rows
+        of the view are overwritten by newer ones. Meant for display, use get for processing.
+
+        @param int start: absolute index of the first row. Clipped to the oldest retained row.
+
+        @return numpy.ndarray: rows in chronological order, shape (n, columns)
+        """
+        rows = self._window(start)[1]
+        rows.flags.writeable = False
+        return rows
+
+    def _window(self, start):
+        """ Absolute index of the first row and view of the rows from start to the newest. """
+        with self._lock:
+            first = max(0, self._total - self.capacity)
+            start = first if start is None else min(max(start, first), self._total)
+            begin = start % self.capacity
+            return start, self._data[begin:begin + self._total - start]
+
+
+class StreamingHistogram:
+
+    """ Histogram of count rates vs wavelength, updated incrementally.
+
+    All samples are accumulated in a fine base histogram with fixed bin width. The displayed
+    histogram with arbitrary binning and range is updated only in the bins hit by new samples and
+    can be rebinned from the base histogram at any time, without the raw data.
+    """
+
+    def __init__(self, base_bin_width=1e-4, max_base_bins=2000000):
+        """
+        @param float base_bin_width: bin width of the base histogram (nm)
+        @param int max_base_bins: maximum number of base bins. Samples that would extend the base
+                                  histogram beyond this size are rejected.
+        """
+        self.base_bin_width = float(base_bin_width)
+        self.max_base_bins = int(max_base_bins)
+        self.set_binning(200, 650, 750)
+        self.clear()
+
+    def clear(self):
+        """ Remove all samples. """
+        self._base_offset = 0
+        self._base_sum = np.zeros(0)
+        self._base_n = np.zeros(0)
+        self._base_max = np.zeros(0)
+        # absolute range of base bins accepted so far
+        self._base_low = 0
+        self._base_high = 0
+        self.rejected = 0
+        self._rebin()
+
+    def set_binning(self, bins, xmin, xmax):
+        """ Change the binning of the displayed histogram and rebin it from the base histogram.
+
+        @param int bins: number of bins
+        @param float xmin: lower edge of the first bin
+        @param float xmax: upper edge of the last bin
+        """
+        self.bins = int(bins)
+        self.xmin = float(xmin)
+        self.xmax = float(xmax)
+        self._bin_width = (self.xmax - self.xmin) / self.bins
+        if hasattr(self, '_base_sum'):
+            self._rebin()
+
+    @property
+    def axis(self):
+        """ Center of the displayed bins. """
+        return self.xmin + (np.arange(self.bins) + 0.5) * self._bin_width
+
+    @property
+    def histogram(self):
+        """ Mean count rate in each displayed bin (0 for empty bins). """
+        return np.divide(self._sum, self._n, out=np.zeros(self.bins), where=self._n > 0)
+
+    @property
+    def envelope(self):
+        """ Maximum count rate in each displayed bin. """
+        return self._max.copy()
+
+    def add(self, wavelengths, counts):
+        """ Add samples to the base and the displayed histogram.
+
+        @param numpy.ndarray wavelengths: wavelength of each sample (nm)
+        @param numpy.ndarray counts: count rate of each sample
+        """
+        wavelengths = np.asarray(wavelengths, dtype=float)
+        counts = np.asarray(counts, dtype=float)
+        if wavelengths.size == 0:
+            return
+        base_index = np.floor(wavelengths / self.base_bin_width).astype(np.int64)
+        valid = self._extend_base(base_index)
+        if not np.all(valid):
+            self.rejected += np.count_nonzero(~valid)
+            base_index = base_index[valid]
+            counts = counts[valid]
+            if base_index.size == 0:
+                return
+
+        # update the touched base bins only
+        local = base_index - self._base_offset
+        first = int(local.min())
+        touched = slice(first, int(local.max()) + 1)
+        local -= first
+        self._base_sum[touched] += np.bincount(local, weights=counts)
+        self._base_n[touched] += np.bincount(local)
+        np.maximum.at(self._base_max[touched], local, counts)
+
+        # update the touched display bins. Bins are assigned by the center of the base bin, so an
+        # update gives exactly the same result as rebinning from the base histogram.
+        display_index = self._display_index(base_index)
+        inside = (display_index >= 0) & (display_index < self.bins)
+        display_index = display_index[inside]
+        counts = counts[inside]
+        self._sum += np.bincount(display_index, weights=counts, minlength=self.bins)
+        self._n += np.bincount(display_index, minlength=self.bins)
+        np.maximum.at(self._max, display_index, counts)
+
+    def _display_index(self, base_index):
+        """ Display bin of the given absolute base bins. """
+        centers = (base_index + 0.5) * self.base_bin_width
+        return np.floor((centers - self.xmin) / self._bin_width).astype(np.int64)
+
+    def _extend_base(self, base_index):
+        """ Grow the base histogram to contain the given bins, as far as allowed.
+
+        The arrays are reallocated with at least twice their size, so a slowly drifting
+        wavelength causes only a few reallocations.
+
+        @return numpy.ndarray: bool mask of the bins contained in the base histogram
+        """
+        if self._base_high <= self._base_low:
+            # center the first allocation on the median of the first samples
+            self._base_low = self._base_high = int(np.median(base_index))
+        low = min(int(base_index.min()), self._base_low)
+        high = max(int(base_index.max()) + 1, self._base_high)
+        if high - low > self.max_base_bins:
+            center = (self._base_low + self._base_high) // 2
+            low = max(low, center - self.max_base_bins // 2)
+            high = min(high, low + self.max_base_bins)
+
+        if low < self._base_offset or high > self._base_offset + self._base_sum.size:
+            size = min(max(high - low, 2 * self._base_sum.size), self.max_base_bins)
+            offset = low - (size - (high - low)) // 2
+            used = slice(self._base_low - self._base_offset,
+                         self._base_high - self._base_offset)
+            moved = slice(self._base_low - offset, self._base_high - offset)
+            for name in ('_base_sum', '_base_n', '_base_max'):
+                grown = np.zeros(size)
+                grown[moved] = getattr(self, name)[used]
+                setattr(self, name, grown)
+            self._base_offset = offset
+        self._base_low = low
+        self._base_high = high
+        return (base_index >= low) & (base_index < high)
+
+    def _rebin(self):
+        """ Recalculate the displayed histogram from the base histogram. """
+        self._sum = np.zeros(self.bins)
+        self._n = np.zeros(self.bins)
+        self._max = np.zeros(self.bins)
+        filled = np.flatnonzero(self._base_n)
+        if filled.size == 0:
+            return
+        display_index = self._display_index(filled + self._base_offset)
+        inside = (display_index >= 0) & (display_index < self.bins)
+        display_index = display_index[inside]
+        filled = filled[inside]
+        self._sum += np.bincount(display_index, weights=self._base_sum[filled],
+                                 minlength=self.bins)
+        self._n += np.bincount(display_index, weights=self._base_n[filled], minlength=self.bins)
+        np.maximum.at(self._max, display_index, self._base_max[filled])
+
 
 class HardwarePull(QtCore.QObject):
 
@@ -73,7 +340,7 @@ class HardwarePull(QtCore.QObject):
         # only wavelength >200 nm make sense, ignore the rest
         if self._parentclass.current_wavelength > 200:
             self._parentclass._wavelength_data.append(
-                np.array([time_stamp, self._parentclass.current_wavelength])
+                (time_stamp, self._parentclass.current_wavelength)
             )
 
         # check if we have a new min or max and save it if so
@@ -93,6 +360,26 @@ class HardwarePull(QtCore.QObject):
 class WavemeterLoggerLogic(GenericLogic):
 
     """This logic module gathers data from wavemeter and the counter logic.
+
+    Wavelength readings and the count rates stitched to them are kept in ring buffers of fixed
+    size, so the memory use does not grow during long scans. The histogram is accumulated in a
+    fine base histogram (bin width histogram_base_resolution in nm), from which the displayed
+    histogram is rebinned when bins or range are changed.
+
+    Example config for copy-paste:
+
+    wavemeter_logger_logic:
+        module.Class: 'wavemeter_logger_logic.WavemeterLoggerLogic'
+        logic_acquisition_timing: 20.0
+        logic_update_timing: 100.0
+        wavelength_buffer_size: 1000000 # optional, number of wavelength readings kept
+        stitched_buffer_size: 1000000 # optional, number of stitched count values kept
+        histogram_base_resolution: 1e-4 # optional, in nm
+        connect:
+            wavemeter1: 'wavemeter'
+            counterlogic: 'counterlogic'
+            savelogic: 'savelogic'
+            fitlogic: 'fitlogic'
     """
 
     sig_data_updated = QtCore.Signal()
@@ -110,6 +397,10 @@ class WavemeterLoggerLogic(GenericLogic):
     # config opts
     _logic_acquisition_timing = ConfigOption('logic_acquisition_timing', 20.0, missing='warn')
     _logic_update_timing = ConfigOption('logic_update_timing', 100.0, missing='warn')
+    _wavelength_buffer_size = ConfigOption('wavelength_buffer_size', 1000000, missing='nothing')
+    _stitched_buffer_size = ConfigOption('stitched_buffer_size', 1000000, missing='nothing')
+    _histogram_base_resolution = ConfigOption('histogram_base_resolution', 1e-4,
+                                              missing='nothing')
 
     def __init__(self, config, **kwargs):
         """ Create WavemeterLoggerLogic object with connectors.
@@ -124,10 +415,11 @@ class WavemeterLoggerLogic(GenericLogic):
 
         self._acqusition_start_time = 0
         self._bins = 200
-        self._data_index = 0
 
-        self._recent_wavelength_window = [0, 0]
-        self.counts_with_wavelength = []
+        # watermarks of the stitching: number of processed entries of the counter data and
+        # absolute index of the first wavelength reading still needed for interpolation
+        self._count_watermark = 0
+        self._wavelength_watermark = 0
 
         self._xmin = 650
         self._xmax = 750
@@ -139,7 +431,11 @@ class WavemeterLoggerLogic(GenericLogic):
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
-        self._wavelength_data = []
+        self._wavelength_data = RingBuffer(self._wavelength_buffer_size, 2)
+        self._stitched_data = RingBuffer(self._stitched_buffer_size, 3)
+        self._histogram = StreamingHistogram(self._histogram_base_resolution)
+        self._histogram.set_binning(self._bins, self._xmin, self._xmax)
+        self._reset_recent_average()
 
         self.stopRequested = False
 
@@ -173,12 +469,8 @@ class WavemeterLoggerLogic(GenericLogic):
             default_fits['1d'] = d1
             self.fc.load_from_dict(default_fits)
 
-        # create a new x axis from xmin to xmax with bins points
-        self.histogram_axis = np.arange(
-            self._xmin,
-            self._xmax,
-            (self._xmax - self._xmin) / self._bins
-            )
+        # x axis with the centers of the bins from xmin to xmax
+        self.histogram_axis = self._histogram.axis
         self.histogram = np.zeros(self.histogram_axis.shape)
         self.envelope_histogram = np.zeros(self.histogram_axis.shape)
 
@@ -186,6 +478,11 @@ class WavemeterLoggerLogic(GenericLogic):
             self._attach_counts_to_wavelength,
             QtCore.Qt.QueuedConnection
             )
+        # repeats the stitching while scanning, without blocking the logic thread
+        self._update_timer = QtCore.QTimer()
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(int(self._logic_update_timing))
+        self._update_timer.timeout.connect(self._attach_counts_to_wavelength)
 
         # fit data
         self.wlog_fit_x = np.linspace(self._xmin, self._xmax, self._bins*5)
@@ -210,6 +507,8 @@ class WavemeterLoggerLogic(GenericLogic):
         """
         if self.module_state() != 'idle' and self.module_state() != 'deactivated':
             self.stop_scanning()
+        self._update_timer.stop()
+        self._update_timer.timeout.disconnect()
         self.hardware_thread.quit()
         self.sig_handle_timer.disconnect()
 
@@ -237,8 +536,26 @@ class WavemeterLoggerLogic(GenericLogic):
         """
         return self._bins
 
+    @property
+    def counts_with_wavelength(self):
+        """ Retained stitched data, rows of (time, counts, interpolated wavelength).
+
+            @return numpy.ndarray: array of shape (n, 3)
+        """
+        return self._stitched_data.get()
+
+    @property
+    def counts_with_wavelength_view(self):
+        """ Same as counts_with_wavelength, but a read-only view into the buffer without copy.
+
+            Meant for display, rows may be overwritten by the running acquisition.
+
+            @return numpy.ndarray: array of shape (n, 3)
+        """
+        return self._stitched_data.view()
+
     def recalculate_histogram(self, bins=None, xmin=None, xmax=None):
-        """ Recalculate the current spectrum from raw data.
+        """ Recalculate the current spectrum from the base histogram.
 
             @praram int bins: new number of bins
             @param float xmin: new minimum wavelength
@@ -251,12 +568,10 @@ class WavemeterLoggerLogic(GenericLogic):
         if xmax is not None:
             self._xmax = xmax
 
-        # create a new x axis from xmin to xmax with bins points
-        self.rawhisto = np.zeros(self._bins)
-        self.envelope_histogram = np.zeros(self._bins)
-        self.sumhisto = np.ones(self._bins) * 1.0e-10
-        self.histogram_axis = np.linspace(self._xmin, self._xmax, self._bins)
-        self.sig_update_histogram_next.emit(True)
+        with self.threadlock:
+            self._histogram.set_binning(self._bins, self._xmin, self._xmax)
+            self._update_histogram_data()
+        self.sig_data_updated.emit()
 
     def get_fit_functions(self):
         """ Return the names of all ocnfigured fit functions.
@@ -296,23 +611,20 @@ class WavemeterLoggerLogic(GenericLogic):
 
         if not resume:
             self._acqusition_start_time = self._counter_logic._saving_start_time
-            self._wavelength_data = []
-
-            self.data_index = 0
+            with self.threadlock:
+                self._wavelength_data.clear()
+                self._stitched_data.clear()
+                self._histogram.clear()
+                self._count_watermark = 0
+                self._wavelength_watermark = 0
+                self._update_histogram_data()
 
-            self._recent_wavelength_window = [0, 0]
-            self.counts_with_wavelength = []
-
-            self.rawhisto = np.zeros(self._bins)
-            self.sumhisto = np.ones(self._bins) * 1.0e-10
             self.intern_xmax = -1.0
             self.intern_xmin = 1.0e10
-            self.recent_avg = [0, 0, 0]
-            self.recent_count = 0
+            self._reset_recent_average()
 
         # start the measuring thread
         self.sig_handle_timer.emit(True)
-        self._complete_histogram = True
         self.sig_update_histogram_next.emit(False)
 
         return 0
@@ -333,136 +645,99 @@ class WavemeterLoggerLogic(GenericLogic):
 
         return 0
 
-    def _attach_counts_to_wavelength(self, complete_histogram):
+    def _attach_counts_to_wavelength(self, complete_histogram=False):
         """ Interpolate a wavelength value for each photon count value.  This process assumes that
         the wavelength is varying smoothly and fairly continuously, which is sensible for most
         measurement conditions.
 
-        Recent count values are those recorded AFTER the previous stitch operation, but BEFORE the
+        Only count values recorded after the count watermark are processed, and only up to the
         most recent wavelength value (do not extrapolate beyond the current wavelength
-        information).
-        """
+        information). Later counts wait for the next pass.
 
-        # If there is not yet any wavelength data, then wait and signal next loop
-        if len(self._wavelength_data) == 0:
-            time.sleep(self._logic_update_timing * 1e-3)
-            self.sig_data_updated.emit()
-            return
-
-        # The end of the recent_wavelength_window is the time of the latest wavelength data
-        self._recent_wavelength_window[1] = self._wavelength_data[-1][0]
-
-        # (speed-up) We only need to worry about "recent" counts, because as the count data gets
-        # very long all the earlier points will already be attached to wavelength values.
-        count_recentness = 100  # TODO: calculate this from count_freq and wavemeter refresh rate
-
-        # TODO: Does this depend on things, or do we loop fast enough to get every wavelength value?
-        wavelength_recentness = np.min([5, len(self._wavelength_data)])
-
-        recent_counts = np.array(self._counter_logic._data_to_save[-count_recentness:])
-        recent_wavelengths = np.array(self._wavelength_data[-wavelength_recentness:])
-
-        # The latest counts are those recorded during the recent_wavelength_window
-        count_idx = [0, 0]
-        count_idx[0] = np.searchsorted(recent_counts[:, 0], self._recent_wavelength_window[0])
-        count_idx[1] = np.searchsorted(recent_counts[:, 0], self._recent_wavelength_window[1])
-
-        latest_counts = recent_counts[count_idx[0]:count_idx[1]]
-
-        # Interpolate to obtain wavelength values at the times of each count
-        interpolated_wavelengths = np.interp(latest_counts[:, 0],
-                                             xp=recent_wavelengths[:, 0],
-                                             fp=recent_wavelengths[:, 1]
-                                             )
-
-        # Stitch interpolated wavelength into latest counts array
-        latest_stitched_data = np.insert(latest_counts, 2, values=interpolated_wavelengths, axis=1)
-
-        # Add this latest data to the list of counts vs wavelength
-        self.counts_with_wavelength += latest_stitched_data.tolist()
-
-        # The start of the recent data window for the next round will be the end of this one.
-        self._recent_wavelength_window[0] = self._recent_wavelength_window[1]
-
-        # Run the old update histogram method to keep duplicate data
-        self._update_histogram(complete_histogram)
+        @param bool complete_histogram: rebin the displayed histogram from the base histogram
+        """
+        with self.threadlock:
+            stitched = self._stitch_new_counts()
+            if stitched is not None:
+                self._histogram.add(stitched[:, 2], stitched[:, 1])
+                self._update_recent_average(stitched)
+            if complete_histogram:
+                self._histogram.set_binning(self._bins, self._xmin, self._xmax)
+            self._update_histogram_data()
 
         # Signal that data has been updated
         self.sig_data_updated.emit()
 
-        # Wait and repeat if measurement is ongoing
-        time.sleep(self._logic_update_timing * 1e-3)
-
+        # Repeat after the update interval if measurement is ongoing
         if self.module_state() == 'running':
-            self.sig_update_histogram_next.emit(False)
+            self._update_timer.start()
 
-    def _update_histogram(self, complete_histogram):
-        """ Calculate new points for the histogram.
+    def _stitch_new_counts(self):
+        """ Stitch the new count values to interpolated wavelengths and advance the watermarks.
 
-        @param bool complete_histogram: should the complete histogram be recalculated, or just the
-                                        most recent data?
-        @return:
+        @return numpy.ndarray: new rows of (time, counts, wavelength) or None
         """
+        latest_wavelength = self._wavelength_data.last()
+        if latest_wavelength is None:
+            return None
+
+        count_data = self._counter_logic._data_to_save
+        if len(count_data) < self._count_watermark:
+            # the counter started a new trace
+            self._count_watermark = 0
+        new_counts = count_data[self._count_watermark:]
+        if len(new_counts) == 0:
+            return None
+        new_counts = np.array(new_counts, dtype=float).reshape(len(new_counts), -1)[:, :2]
+
+        # The latest counts are those recorded before the latest wavelength value
+        ready = np.searchsorted(new_counts[:, 0], latest_wavelength[0], side='right')
+        if ready == 0:
+            return None
+        latest_counts = new_counts[:ready]
+        self._count_watermark += ready
 
-        # If things like num_of_bins have changed, then recalculate the complete histogram
-        # Note: The histogram may be recalculated (bins changed, etc) from the stitched data.
-        # There is no need to recompute the interpolation for the stitched data.
-        if complete_histogram:
-            count_window = len(self._counter_logic._data_to_save)
-            self._data_index = 0
-            self.log.info('Recalcutating Laser Scanning Histogram for: '
-                          '{0:d} counts and {1:d} wavelength.'.format(
-                              count_window,
-                              len(self._wavelength_data)
-                          )
-                          )
-        else:
-            count_window = min(100, len(self._counter_logic._data_to_save))
-
-        if count_window < 2:
-            time.sleep(self._logic_update_timing * 1e-3)
-            self.sig_update_histogram_next.emit(False)
-            return
-
-        temp = np.array(self._counter_logic._data_to_save[-count_window:])
-
-        # only do something if there is wavelength data to work with
-        if len(self._wavelength_data) > 0:
-
-            for i in self._wavelength_data[self._data_index:]:
-                self._data_index += 1
-
-                if i[1] < self._xmin or i[1] > self._xmax:
-                    continue
-
-                # calculate the bin the new wavelength needs to go in
-                newbin = np.digitize([i[1]], self.histogram_axis)[0]
-                # if the bin make no sense, start from the beginning
-                if newbin > len(self.rawhisto) - 1:
-                    continue
+        # Interpolate to obtain wavelength values at the times of each count
+        first_index, wavelengths = self._wavelength_data.read(self._wavelength_watermark)
+        interpolated_wavelengths = np.interp(latest_counts[:, 0],
+                                             xp=wavelengths[:, 0],
+                                             fp=wavelengths[:, 1])
 
-                # sum the counts in rawhisto and count the occurence of the bin in sumhisto
-                interpolation = np.interp(i[0], xp=temp[:, 0], fp=temp[:, 1])
-                self.rawhisto[newbin] += interpolation
-                self.sumhisto[newbin] += 1.0
+        # Keep the wavelength value preceding the last stitched count for the next interpolation
+        last_needed = np.searchsorted(wavelengths[:, 0], latest_counts[-1, 0], side='right') - 1
+        self._wavelength_watermark = first_index + max(last_needed, 0)
 
-                self.envelope_histogram[newbin] = np.max([interpolation,
-                                                          self.envelope_histogram[newbin]
-                                                          ])
+        # Stitch interpolated wavelength into latest counts array
+        latest_stitched_data = np.column_stack((latest_counts, interpolated_wavelengths))
+        if not self._stitched_data.overflowed and (self._stitched_data.total + ready
+                                                   > self._stitched_data.capacity):
+            self.log.warning('Stitched data buffer is full, the oldest count values are dropped '
+                             'from the raw data. The histogram still contains all values.')
+        self._stitched_data.append(latest_stitched_data)
+        return latest_stitched_data
+
+    def _update_histogram_data(self):
+        """ Copy the current histogram to the attributes read by GUI, fit and save. """
+        self.histogram_axis = self._histogram.axis
+        self.histogram = self._histogram.histogram
+        self.envelope_histogram = self._histogram.envelope
+
+    def _reset_recent_average(self):
+        """ Clear the running average of the recent data points. """
+        self._recent_sum = np.zeros(3)
+        self._recent_count = 0
+        self.last_point_time = time.time()
 
-                datapoint = [i[1], i[0], interpolation]
-                if time.time() - self.last_point_time > 1:
-                    self.sig_new_data_point.emit(self.recent_avg)
-                    self.last_point_time = time.time()
-                    self.recent_count = 0
-                else:
-                    self.recent_count += 1
-                    for j in range(3):
-                        self.recent_avg[j] -= self.recent_avg[j] / self.recent_count
-                        self.recent_avg[j] += datapoint[j] / self.recent_count
+    def _update_recent_average(self, stitched):
+        """ Average the stitched data as (wavelength, time, counts) and emit it once a second.
 
-            # the plot data is the summed counts divided by the occurence of the respective bins
-            self.histogram = self.rawhisto / self.sumhisto
+        @param numpy.ndarray stitched: new rows of (time, counts, wavelength)
+        """
+        self._recent_sum += stitched[:, (2, 0, 1)].sum(axis=0)
+        self._recent_count += stitched.shape[0]
+        if time.time() - self.last_point_time > 1:
+            self.sig_new_data_point.emit(list(self._recent_sum / self._recent_count))
+            self._reset_recent_average()
 
     def save_data(self, timestamp=None):
         """ Save the counter trace data and writes it to a file.
@@ -512,7 +787,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Time (s), Wavelength (nm)'] = self._wavelength_data
+        data['Time (s), Wavelength (nm)'] = self._wavelength_data.get()
         # write the parameters:
         parameters = OrderedDict()
         parameters['Acquisition Timing (ms)'] = self._logic_acquisition_timing
@@ -558,7 +833,7 @@ class WavemeterLoggerLogic(GenericLogic):
 
         # prepare the data in a dict or in an OrderedDict:
         data = OrderedDict()
-        data['Measurement Time (s), Signal (counts/s), Interpolated Wavelength (nm)'] = np.array(self.counts_with_wavelength)
+        data['Measurement Time (s), Signal (counts/s), Interpolated Wavelength (nm)'] = self.counts_with_wavelength
 
         fig = self.draw_figure()
         # write the parameters:
@@ -587,8 +862,9 @@ class WavemeterLoggerLogic(GenericLogic):
         """
         # TODO: Draw plot for second APD if it is connected
 
-        wavelength_data = [entry[2] for entry in self.counts_with_wavelength]
-        count_data = np.array([entry[1] for entry in self.counts_with_wavelength])
+        stitched_data = self.counts_with_wavelength
+        wavelength_data = stitched_data[:, 2]
+        count_data = stitched_data[:, 1]
 
         # Index of max counts, to use to position "0" of frequency-shift axis
         count_max_index = count_data.argmax()
@@ -20,9 +20,12 @@ Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
 top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
 """
 
+import numpy as np
 from pyqtgraph import PlotWidget, ImageItem, ViewBox, InfiniteLine, ROI
+from pyqtgraph import functions as fn
 from qtpy import QtCore
 from core.util.filters import scan_blink_correction
+from gui.plotrefresh import changed_rows
 
 __all__ = ['ScanImageItem', 'ScanPlotWidget', 'ScanViewBox']
 
@@ -42,6 +45,8 @@ class ScanImageItem(ImageItem):
         self.use_blink_correction = False
         self.blink_correction_axis = 0
         self.orig_image = None
+        # copy of the image last rendered by setImageRows
+        self._rendered_image = None
         super().__init__(*args, **kwargs)
         return
 
@@ -82,11 +87,43 @@ class ScanImageItem(ImageItem):
         """
         pg.ImageItem method override to apply optional filter when setting image data.
         """
+        self._rendered_image = None
         if self.use_blink_correction:
             self.orig_image = image
             image = scan_blink_correction(image=image, axis=self.blink_correction_axis)
         return super().setImage(image=image, autoLevels=autoLevels, **kwargs)
 
+    def setImageRows(self, image, levels):
+        """
+        Set new image data, rendering only the rows that changed since the last call.
+
+        Meant for images filled line by line during a scan. The whole image is rendered (by
+        setImage) if the shape, the levels or the lookup table changed, or if blink correction
+        or automatic downsampling are active.
+
+        @param numpy.ndarray image: 2D image data in row-major order
+        @param tuple levels: (min, max) of the color scale
+        """
+        levels = np.asarray(levels, dtype=float)
+        rows = None
+        if (self._rendered_image is not None and self.qimage is not None
+                and not self.use_blink_correction and not self.autoDownsample
+                and self.axisOrder == 'row-major' and image.ndim == 2 and not callable(self.lut)
+                and self.levels is not None and np.array_equal(levels, self.levels)):
+            rows = changed_rows(self._rendered_image, image)
+        if rows is None:
+            self.setImage(image=image, autoLevels=False, levels=levels)
+            self._rendered_image = np.array(image)
+            return
+        if len(rows) > 0:
+            self.image = image
+            argb, alpha = fn.makeARGB(image[rows], lut=self.lut, levels=self.levels)
+            fn.imageToArray(self.qimage, copy=False, transpose=False)[rows] = argb
+            self._rendered_image[rows] = image[rows]
+            self.update()
+            self.sigImageChanged.emit()
+        return
+
     def mouseClickEvent(self, ev):
         if not ev.double():
             pos = self.getViewBox().mapSceneToView(ev.scenePos())
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the FitLogic batch fit engine against fitting every trace individually.
+
+Synthetic ODMR (Lorentzian dip) and Rabi (sine) traces are fitted once trace by trace with the
+make_*_fit methods used by FitContainer.do_fit and once with run_batch_fit using one and all CPUs.
+Run it from the qudi main directory:
+
+    python tools/batch_fit_benchmark.py [n_traces]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.fit_logic import FitMethodsContext, run_batch_fit
+
+
+def lorentzian_traces(n_traces, rng):
+    x_axis = np.linspace(2.82e9, 2.92e9, 101)
+    centers = 2.87e9 + rng.normal(0, 5e6, n_traces)
+    data = 1e5 * (1 - 0.2 / (1 + ((x_axis - centers[:, np.newaxis]) / 4e6) ** 2))
+    data += rng.normal(0, 500, data.shape)
+    return x_axis, data, centers
+
+
+def sine_traces(n_traces, rng):
+    x_axis = np.linspace(0, 1e-6, 101)
+    frequencies = 5e6 + rng.normal(0, 2e5, n_traces)
+    data = 0.5 + 0.2 * np.sin(2 * np.pi * frequencies[:, np.newaxis] * x_axis + 0.5)
+    data += rng.normal(0, 0.02, data.shape)
+    return x_axis, data, frequencies
+
+
+def benchmark(name, fit_function, estimator, x_axis, data, truth, result_param):
+    context = FitMethodsContext()
+    make_fit = getattr(context, 'make_{0}_fit'.format(fit_function))
+    if estimator == 'generic':
+        estimate = getattr(context, 'estimate_{0}'.format(fit_function))
+    else:
+        estimate = getattr(context, 'estimate_{0}_{1}'.format(fit_function, estimator))
+
+    start = time.perf_counter()
+    single = np.array([make_fit(x_axis=x_axis, data=trace, estimator=estimate).params[
+        result_param].value for trace in data])
+    single_time = time.perf_counter() - start
+    print('{0}: {1:d} traces'.format(name, data.shape[0]))
+    print('    trace by trace:        {0:8.3f} s, max error {1:.3e}'.format(
+        single_time, np.max(np.abs(single - truth))))
+
+    for processes in sorted({1, os.cpu_count()}):
+        start = time.perf_counter()
+        result = run_batch_fit(x_axis, data, fit_function, estimator, processes=processes)
+        batch_time = time.perf_counter() - start
+        print('    batch ({0:2d} processes): {1:8.3f} s, max error {2:.3e}, speedup {3:.2f}'.format(
+            processes, batch_time, np.max(np.abs(result[result_param] - truth)),
+            single_time / batch_time))
+
+
+if __name__ == '__main__':
+    n_traces = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    rng = np.random.RandomState(0)
+    benchmark('Lorentzian dip', 'lorentzian', 'dip', *lorentzian_traces(n_traces, rng), 'center')
+    benchmark('Sine', 'sine', 'generic', *sine_traces(n_traces, rng), 'frequency')
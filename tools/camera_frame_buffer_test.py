@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Test of the frame ring buffer and the frame recording of the camera logic with the camera dummy.
+
+The acquisition loop of CameraLogic is stepped directly, without the Qt event loop, at a known
+pace. The test checks
+  * the frame count and the content of the ring buffer
+  * the accounting of frames acquired by the camera in live mode but never fetched
+  * the average and accumulate processing modes against the buffered frames
+  * a recording read back with read_frame_file against the buffered frames
+  * the accounting of frames dropped by the recorder while the disk does not keep up
+Run it from the qudi main directory:
+
+    python tools/camera_frame_buffer_test.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from qtpy import QtCore
+
+from hardware.camera.camera_dummy import CameraDummy
+from logic import camera_logic
+from logic.camera_frame_buffer import FrameFileWriter, read_frame_file
+
+EXPOSURE = 0.02
+RING_BUFFER_FRAMES = 10
+CHUNK_FRAMES = 4
+MAX_CHUNKS = 2
+
+
+class SaveLogicStandIn:
+    """ Provides the data directory of the camera logic. """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path_for_module(self, module_name):
+        return self.path
+
+
+class StalledDiskWriter(FrameFileWriter):
+    """ FrameFileWriter whose disk does not write anything until release is set. """
+
+    release = threading.Event()
+
+    def _write_loop(self):
+        self.release.wait()
+        super()._write_loop()
+
+
+def step(logic, frames, interval=EXPOSURE):
+    """ Run the acquisition loop for a number of frames at the given interval. """
+    for _ in range(frames):
+        start = time.monotonic()
+        logic.loop()
+        remaining = interval - (time.monotonic() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def check_ring_buffer(logic):
+    logic.start_loop()
+    step(logic, 25)
+    logic.stop_loop()
+    statistics = logic.get_frame_statistics()
+    assert statistics['acquired'] == 25, statistics
+    assert statistics['buffered'] == RING_BUFFER_FRAMES, statistics
+    timestamps, frames = logic.get_buffered_frames()
+    assert frames.shape == (RING_BUFFER_FRAMES, 48, 64), frames.shape
+    assert np.all(np.diff(timestamps) > 0), 'frames are not in acquisition order'
+    assert np.array_equal(frames[-1], logic.get_last_image())
+    assert len(logic.get_buffered_frames(3)[1]) == 3
+    assert 0.5 / EXPOSURE < statistics['frame_rate'] < 1.5 / EXPOSURE, statistics
+
+
+def check_dropped_frames(logic):
+    # fetching every third frame only, the camera acquires two frames in between
+    logic.start_loop()
+    step(logic, 10, interval=3 * EXPOSURE)
+    logic.stop_loop()
+    statistics = logic.get_frame_statistics()
+    assert statistics['acquired'] == 10, statistics
+    assert 15 <= statistics['dropped'] <= 25, statistics
+
+
+def check_processing(logic):
+    logic.start_loop()
+    logic.set_processing_mode('average')
+    step(logic, 15)
+    average = logic.get_last_image()
+    assert np.allclose(average, logic.get_buffered_frames()[1].mean(axis=0))
+    logic.set_processing_mode('accumulate')
+    step(logic, 5)
+    accumulated = logic.get_last_image()
+    assert np.allclose(accumulated, logic.get_buffered_frames(5)[1].sum(axis=0))
+    logic.set_processing_mode('none')
+    logic.stop_loop()
+
+
+def check_recording(logic):
+    logic.start_loop()
+    path = logic.start_recording('test')
+    step(logic, RING_BUFFER_FRAMES)
+    statistics = logic.get_frame_statistics()
+    assert logic.stop_recording() == path
+    logic.stop_loop()
+    assert statistics['record_dropped'] == 0, statistics
+    recording = read_frame_file(path)
+    timestamps, frames = logic.get_buffered_frames()
+    assert recording['frames'].shape == frames.shape, recording['frames'].shape
+    assert np.array_equal(recording['timestamps'], timestamps)
+    assert np.array_equal(recording['frames'], frames)
+    assert recording['metadata']['exposure'] == EXPOSURE
+
+
+def check_record_dropped(logic):
+    # keep all frames delivered by the camera, the ring buffer holds only the last ones
+    camera = logic._hardware
+    delivered = list()
+
+    def get_acquired_data():
+        delivered.append(CameraDummy.get_acquired_data(camera))
+        return delivered[-1]
+
+    camera.get_acquired_data = get_acquired_data
+    camera_logic.FrameFileWriter = StalledDiskWriter
+    try:
+        logic.start_loop()
+        path = logic.start_recording('stalled')
+        step(logic, 20, interval=0)
+        statistics = logic.get_frame_statistics()
+        StalledDiskWriter.release.set()
+        logic.stop_recording()
+        logic.stop_loop()
+    finally:
+        camera_logic.FrameFileWriter = FrameFileWriter
+        del camera.get_acquired_data
+    # all chunk buffers are filled with the first frames, the following ones are dropped
+    accepted = CHUNK_FRAMES * MAX_CHUNKS
+    assert statistics['record_dropped'] == 20 - accepted, statistics
+    recording = read_frame_file(path)
+    assert len(recording['frames']) == accepted, len(recording['frames'])
+    assert np.array_equal(recording['frames'], np.array(delivered[:accepted]))
+    assert np.all(np.diff(recording['timestamps']) > 0)
+
+
+def main():
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        camera = CameraDummy(manager=None, name='camera',
+                             config={'resolution': (64, 48), 'exposure': EXPOSURE})
+        camera.module_state.activate()
+        logic = camera_logic.CameraLogic(manager=None, name='cameralogic',
+                                         config={'ring_buffer_frames': RING_BUFFER_FRAMES,
+                                                 'record_chunk_frames': CHUNK_FRAMES,
+                                                 'record_max_chunks': MAX_CHUNKS,
+                                                 'default_exposure': 1 / EXPOSURE})
+        logic.hardware = lambda: camera
+        logic.savelogic = lambda: SaveLogicStandIn(directory)
+        logic.module_state.activate()
+        try:
+            for check in (check_ring_buffer, check_dropped_frames, check_processing,
+                          check_recording, check_record_dropped):
+                check(logic)
+                print('{0}: OK'.format(check.__name__))
+        finally:
+            logic.module_state.deactivate()
+            camera.module_state.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Test of core.util.ftp.FTPSessionPool against a local FTP stand-in.
+
+A minimal FTP server (passive mode, the commands used by the AWG drivers only) is started on
+localhost, serving a temporary directory. The test checks
+  * that sessions are reused for consecutive transfers and the listing is cached
+  * concurrent uploads with upload_many, including overwriting existing files
+  * the recovery after the server dropped all connections (as an instrument does after an idle
+    timeout): the stale idle sessions are discarded and the call succeeds on a new session
+  * that errors of local files are raised without reconnecting or touching the file on the server
+  * that a failing server raises instead of retrying endlessly
+Run it from the qudi main directory:
+
+    python tools/ftp_session_pool_test.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.util.ftp import FTPSessionPool
+
+WORKING_DIR = 'waves'
+
+
+class FTPHandler(socketserver.StreamRequestHandler):
+    """ Control connection of the FTP stand-in. Data connections are passive only. """
+
+    def setup(self):
+        super().setup()
+        self.server.connections.add(self.request)
+        self.cwd = self.server.root
+        self.data_socket = None
+
+    def finish(self):
+        self.server.connections.discard(self.request)
+        if self.data_socket is not None:
+            self.data_socket.close()
+        super().finish()
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('latin-1'))
+
+    def handle(self):
+        self.reply('220 qudi FTP stand-in')
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                return
+            if not line:
+                return
+            command, _, argument = line.decode('latin-1').rstrip('\r\n').partition(' ')
+            command = command.upper()
+            self.server.commands.append(command)
+            method = getattr(self, 'ftp_' + command.lower(), None)
+            if method is None:
+                self.reply('502 Command not implemented')
+            elif method(argument) is False:
+                return
+
+    def open_data_connection(self):
+        self.reply('150 Opening data connection')
+        connection, _ = self.data_socket.accept()
+        self.data_socket.close()
+        self.data_socket = None
+        return connection
+
+    def ftp_user(self, argument):
+        self.reply('331 Password required')
+
+    def ftp_pass(self, argument):
+        self.server.logins += 1
+        self.reply('230 Logged in')
+
+    def ftp_cwd(self, argument):
+        path = os.path.join(self.cwd, argument)
+        if not os.path.isdir(path):
+            self.reply('550 No such directory')
+        else:
+            self.cwd = path
+            self.reply('250 Directory changed')
+
+    def ftp_pwd(self, argument):
+        self.reply('257 "/{0}"'.format(os.path.relpath(self.cwd, self.server.root)))
+
+    def ftp_type(self, argument):
+        self.reply('200 Type set')
+
+    def ftp_pasv(self, argument):
+        self.data_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.data_socket.bind(('127.0.0.1', 0))
+        self.data_socket.listen(1)
+        port = self.data_socket.getsockname()[1]
+        self.reply('227 Entering Passive Mode (127,0,0,1,{0:d},{1:d})'.format(port >> 8,
+                                                                             port & 0xff))
+
+    def ftp_list(self, argument):
+        connection = self.open_data_connection()
+        with connection:
+            for name in sorted(os.listdir(self.cwd)):
+                if os.path.isdir(os.path.join(self.cwd, name)):
+                    line = '05-10-16  05:22PM       <DIR>          {0}'.format(name)
+                else:
+                    size = os.path.getsize(os.path.join(self.cwd, name))
+                    line = '05-10-16  05:22PM {0:20d} {1}'.format(size, name)
+                connection.sendall((line + '\r\n').encode('latin-1'))
+        self.reply('226 Transfer complete')
+
+    def ftp_stor(self, argument):
+        connection = self.open_data_connection()
+        with connection, open(os.path.join(self.cwd, argument), 'wb') as file:
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    break
+                file.write(data)
+        self.reply('226 Transfer complete')
+
+    def ftp_dele(self, argument):
+        path = os.path.join(self.cwd, argument)
+        if not os.path.isfile(path):
+            self.reply('550 No such file')
+        else:
+            os.remove(path)
+            self.reply('250 File deleted')
+
+    def ftp_quit(self, argument):
+        self.reply('221 Bye')
+        return False
+
+
+class FTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root):
+        super().__init__(('127.0.0.1', 0), FTPHandler)
+        self.root = root
+        self.connections = set()
+        self.commands = list()
+        self.logins = 0
+
+    def drop_connections(self):
+        """ Close all control connections, like an idle timeout on the instrument. """
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+
+
+def write_files(directory, count, size):
+    files = list()
+    for index in range(count):
+        filename = 'test_ch{0:d}.wfm'.format(index + 1)
+        filepath = os.path.join(directory, filename)
+        with open(filepath, 'wb') as file:
+            file.write(os.urandom(size))
+        files.append((filepath, filename))
+    return files
+
+
+def check_reuse_and_listing_cache(pool, server, files):
+    pool.upload_many(files[:1])
+    logins = server.logins
+    pool.upload_many(files[:1])
+    pool.check_connection()
+    assert server.logins == logins, 'consecutive transfers did not reuse the session'
+    commands = server.commands.count('LIST')
+    pool.list_files()
+    pool.list_files()
+    assert server.commands.count('LIST') == commands, 'the listing was not cached'
+    assert files[0][1] in pool.list_files(use_cache=False)
+
+
+def check_upload_many(pool, server, files):
+    assert pool.upload_many(files) == [filename for _, filename in files]
+    # overwrite all of them again
+    pool.upload_many(files)
+    for filepath, filename in files:
+        with open(filepath, 'rb') as local, \
+                open(os.path.join(server.root, WORKING_DIR, filename), 'rb') as remote:
+            assert local.read() == remote.read(), 'content of {0} differs'.format(filename)
+    assert sorted(pool.list_files(use_cache=False)) == sorted(name for _, name in files)
+    assert pool.sessions_opened <= pool.max_sessions
+
+
+def check_reconnect(pool, server, files):
+    # fill the pool with several idle sessions, then let the server drop all of them
+    pool.upload_many(files)
+    assert pool._idle_sessions.qsize() > 1, 'no idle sessions to test with'
+    server.drop_connections()
+    logins = server.logins
+    assert sorted(pool.list_files(use_cache=False)) == sorted(name for _, name in files)
+    assert server.logins == logins + 1, \
+        'expected a single new login after the disconnect, got {0:d}'.format(
+            server.logins - logins)
+    # the stale idle sessions were dropped, so the next calls work without reconnecting
+    pool.check_connection()
+    pool.upload_many(files[:1])
+    assert server.logins == logins + 1
+
+
+def check_local_error(pool, server, files):
+    pool.upload_many(files[:1])
+    logins = server.logins
+    commands = len(server.commands)
+    try:
+        pool.upload(files[0][0] + '.missing', files[0][1])
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError('no error raised for a missing local file')
+    assert len(server.commands) == commands, 'the server was contacted for a missing file'
+    assert files[0][1] in pool.list_files(use_cache=False)
+    pool.upload_many(files[:1])
+    assert server.logins == logins, 'the sessions were dropped after a local error'
+
+
+def check_server_gone(pool, server):
+    server.shutdown()
+    server.server_close()
+    server.drop_connections()
+    try:
+        pool.list_files(use_cache=False)
+    except FTPSessionPool._connection_errors:
+        pass
+    else:
+        raise AssertionError('no error raised without a server')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as local_dir:
+        os.mkdir(os.path.join(root, WORKING_DIR))
+        # a directory entry must not show up in the listing
+        os.mkdir(os.path.join(root, WORKING_DIR, 'subdir'))
+        server = FTPServer(root)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        pool = FTPSessionPool(host='127.0.0.1', port=server.server_address[1],
+                              working_dir=WORKING_DIR, max_sessions=4, timeout=5)
+        files = write_files(local_dir, 4, 100000)
+
+        for check in (check_reuse_and_listing_cache, check_upload_many, check_reconnect,
+                      check_local_error):
+            check(pool, server, files)
+            print('{0}: OK'.format(check.__name__))
+        check_server_gone(pool, server)
+        print('check_server_gone: OK')
+        pool.close()
+        print('{0:d} logins in total'.format(server.logins))
+
+
+if __name__ == '__main__':
+    main()
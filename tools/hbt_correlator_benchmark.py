@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the software time tag correlator used by the HBT logic.
+
+Synthetic time tag streams of two detectors are correlated for
+  * uncorrelated Poissonian light (g2(0) = 1)
+  * a single photon emitter with an excited state lifetime, split on a 50:50 beam splitter
+    (antibunching, g2(0) = 0)
+and the throughput of the vectorized correlator is compared to a plain python implementation.
+Run it from the qudi main directory:
+
+    python tools/hbt_correlator_benchmark.py [count_rate_in_Hz]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.util.correlator import TimeTagCorrelator
+
+# all times in ps
+BIN_WIDTH = 500
+N_BINS = 400
+DURATION = int(2e12)
+CHUNK_DURATION = int(1e11)
+
+
+def poisson_streams(rate, rng):
+    n_events = rng.poisson(rate * DURATION * 1e-12, 2)
+    start_tags = np.sort(rng.integers(0, DURATION, n_events[0]))
+    stop_tags = np.sort(rng.integers(0, DURATION, n_events[1]))
+    return start_tags, stop_tags
+
+
+def antibunched_streams(rate, rng, lifetime=12000, detection_efficiency=0.05):
+    """ Photons of a single emitter excited at a high rate. After each emission the emitter needs
+    an exponentially distributed time to emit again. Detected photons are split 50:50.
+    """
+    n_emissions = int(2 * rate * DURATION * 1e-12 / detection_efficiency)
+    emission_times = np.cumsum(rng.exponential(lifetime, n_emissions) +
+                               rng.exponential(0.5 / (rate * 1e-12) * detection_efficiency,
+                                               n_emissions)).astype(np.int64)
+    emission_times = emission_times[emission_times < DURATION]
+    detected = emission_times[rng.random(emission_times.size) < detection_efficiency]
+    to_start = rng.random(detected.size) < 0.5
+    return detected[to_start], detected[~to_start]
+
+
+def python_correlation(start_tags, stop_tags):
+    """ Straight forward multi stop correlation with python loops as reference. """
+    histogram = np.zeros(N_BINS, dtype=np.int64)
+    lower_edge = -(N_BINS // 2) * BIN_WIDTH
+    first_stop = 0
+    stop_list = stop_tags.tolist()
+    for start in start_tags.tolist():
+        while first_stop < len(stop_list) and stop_list[first_stop] < start + lower_edge:
+            first_stop += 1
+        index = first_stop
+        while index < len(stop_list) and stop_list[index] < start + lower_edge + N_BINS * BIN_WIDTH:
+            histogram[(stop_list[index] - start - lower_edge) // BIN_WIDTH] += 1
+            index += 1
+    return histogram
+
+
+def benchmark(name, start_tags, stop_tags):
+    correlator = TimeTagCorrelator(bin_width=BIN_WIDTH, n_bins=N_BINS)
+    start = time.perf_counter()
+    for chunk_start in range(0, DURATION, CHUNK_DURATION):
+        chunk_end = chunk_start + CHUNK_DURATION
+        correlator.add_timestamps(
+            start_tags[np.searchsorted(start_tags, chunk_start):np.searchsorted(start_tags,
+                                                                                 chunk_end)],
+            stop_tags[np.searchsorted(stop_tags, chunk_start):np.searchsorted(stop_tags,
+                                                                               chunk_end)],
+            chunk_end)
+    vectorized_time = time.perf_counter() - start
+    n_tags = start_tags.size + stop_tags.size
+    g2 = correlator.get_normalised_data()
+    zero_bin = N_BINS // 2
+
+    # python reference on a fraction of the data
+    n_ref = min(start_tags.size, 20000)
+    ref_stop = stop_tags[stop_tags < start_tags[n_ref - 1] + N_BINS * BIN_WIDTH]
+    start = time.perf_counter()
+    python_correlation(start_tags[:n_ref], ref_stop)
+    python_time = (time.perf_counter() - start) * start_tags.size / n_ref
+
+    print('{0}: {1:d} time tags'.format(name, n_tags))
+    print('    g2(0) = {0:.3f}, g2(far) = {1:.3f}'.format(g2[zero_bin], np.mean(g2[:20])))
+    print('    vectorized: {0:8.3f} s ({1:.2e} tags/s)'.format(vectorized_time,
+                                                               n_tags / vectorized_time))
+    print('    python:     {0:8.3f} s (extrapolated), speedup {1:.1f}'.format(
+        python_time, python_time / vectorized_time))
+
+
+if __name__ == '__main__':
+    count_rate = float(sys.argv[1]) if len(sys.argv) > 1 else 1e5
+    rng = np.random.default_rng(0)
+    benchmark('Poissonian', *poisson_streams(count_rate, rng))
+    benchmark('Antibunched', *antibunched_streams(count_rate, rng))
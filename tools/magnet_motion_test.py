@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Test of the waiting for magnet movements and of the adaptive 2D alignment with the magnet dummy.
+
+The magnet dummy simulates the motion with the axis velocities, the alignment measurement is
+replaced by a synthetic signal of the magnet position with a single maximum. The test checks
+  * that _wait_for_motion returns after about the travel time with a few polls and that
+    sigPosReached is emitted when the position was reached
+  * that a timeout and a move ignored by the hardware are reported as not reached and do not
+    emit sigPosReached
+  * that the adaptive 2D alignment (GridPatternSearch) finds the maximum on the grid with a
+    fraction of the grid points, fills the data matrix and ends at the best point
+Run it from the qudi main directory:
+
+    python tools/magnet_motion_test.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from qtpy import QtCore
+
+from hardware.magnet.magnet_dummy import MagnetDummy
+from logic.magnet_logic import MagnetLogic
+
+VELOCITY = 20e-3
+CHECKTIME = 0.1
+START = {'x': 20e-3, 'y': 20e-3}
+# alignment grid of 21 x 21 points around START, maximum of the signal at grid index (14, 5)
+GRID_RANGE = 10e-3
+GRID_STEP = 0.5e-3
+PEAK_INDEX = (14, 5)
+
+
+class ODMRLogicStandIn:
+    """ Provides the fit functions the magnet logic asks for on activation. """
+
+    def get_fit_functions(self):
+        return {'No Fit': None, 'Lorentzian dip': None}
+
+
+def count_emits(signal):
+    emits = list()
+    signal.connect(lambda *args: emits.append(args), QtCore.Qt.DirectConnection)
+    return emits
+
+
+def move_to(logic, position):
+    logic._magnet_device.move_abs(position)
+    assert logic._wait_for_motion(position)
+
+
+def check_position_reached(logic):
+    move_to(logic, START)
+    reached = count_emits(logic.sigPosReached)
+    target = {'x': START['x'] + 4e-3, 'y': START['y'] - 2e-3}
+    travel_time = 4e-3 / VELOCITY
+    polls = logic.get_motion_statistics()['polls']
+    start = time.monotonic()
+    logic._magnet_device.move_abs(target)
+    assert logic._check_position_reached_loop(START, target)
+    duration = time.monotonic() - start
+    assert travel_time <= duration < travel_time + 2 * CHECKTIME, duration
+    assert logic.get_motion_statistics()['polls'] - polls <= 4, logic.get_motion_statistics()
+    assert reached == [()], 'sigPosReached was not emitted once'
+    position = logic.get_pos(['x', 'y'])
+    assert all(np.isclose(position[axis], target[axis]) for axis in target), position
+
+
+def check_timeout(logic):
+    move_to(logic, START)
+    reached = count_emits(logic.sigPosReached)
+    target = {'x': START['x'] + 10e-3}
+    move_timeout = logic._move_timeout
+    logic._move_timeout = 0.2
+    try:
+        start = time.monotonic()
+        logic._magnet_device.move_abs(target)
+        assert not logic._check_position_reached_loop(START, target)
+        assert time.monotonic() - start < 0.2 + CHECKTIME
+    finally:
+        logic._move_timeout = move_timeout
+        logic._magnet_device.abort()
+    assert reached == [], 'sigPosReached was emitted after a timeout'
+
+
+def check_ignored_move(logic):
+    move_to(logic, START)
+    reached = count_emits(logic.sigPosReached)
+    # outside of the range of the dummy, the move is ignored and the magnet does not start
+    target = {'x': -1e-3}
+    start = time.monotonic()
+    logic._magnet_device.move_abs(target)
+    assert not logic._check_position_reached_loop(START, target)
+    assert time.monotonic() - start < 3 * CHECKTIME + 2 * CHECKTIME
+    assert reached == [], 'sigPosReached was emitted for a position that was not reached'
+
+
+def check_adaptive_alignment(logic, app):
+    move_to(logic, START)
+    peak = {'x': START['x'] - GRID_RANGE / 2 + PEAK_INDEX[0] * GRID_STEP,
+            'y': START['y'] - GRID_RANGE / 2 + PEAK_INDEX[1] * GRID_STEP}
+    measured = list()
+
+    def measure():
+        position = logic._magnet_device.get_pos(['x', 'y'])
+        value = np.exp(-((position['x'] - peak['x']) ** 2 + (position['y'] - peak['y']) ** 2)
+                       / (2 * (2e-3) ** 2))
+        measured.append(value)
+        return value, {}
+
+    logic._do_alignment_measurement = measure
+    logic._optimize_pos_freq = 0
+    logic.align_2d_axis0_name = 'x'
+    logic.align_2d_axis1_name = 'y'
+    logic.align_2d_axis0_range = GRID_RANGE
+    logic.align_2d_axis1_range = GRID_RANGE
+    logic.align_2d_axis0_step = GRID_STEP
+    logic.align_2d_axis1_step = GRID_STEP
+    logic.curr_2d_search_mode = 'adaptive'
+    logic.align_2d_coarse_step = 4
+    logic.align_2d_maximize = True
+    logic.align_2d_max_points = 0
+
+    matrix_changed = count_emits(logic.sig2DMatrixChanged)
+    logic.sigMeasurementFinished.connect(app.quit)
+    QtCore.QTimer.singleShot(60000, app.quit)
+    assert logic.start_2d_alignment(stepwise_meas=True) == 0
+    app.exec_()
+    logic.sigMeasurementFinished.disconnect(app.quit)
+
+    search = logic._adaptive_search
+    grid_points = logic._2D_data_matrix.size
+    assert search.finished, 'the alignment did not finish'
+    assert search.best()[0] == PEAK_INDEX, search.best()
+    assert len(measured) == len(search.values) == len(matrix_changed)
+    assert len(measured) < grid_points / 3, \
+        '{0:d} of {1:d} points measured'.format(len(measured), grid_points)
+    for index, value in search.values.items():
+        assert logic._2D_data_matrix[index] == value
+    position = logic.get_pos(['x', 'y'])
+    assert all(np.isclose(position[axis], peak[axis]) for axis in peak), position
+    print('    maximum found after {0:d} of {1:d} points'.format(len(measured), grid_points))
+
+
+def main():
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+    magnet = MagnetDummy(manager=None, name='magnet', config={'simulate_motion': True})
+    magnet.module_state.activate()
+    magnet.set_velocity({'x': VELOCITY, 'y': VELOCITY})
+    logic = MagnetLogic(manager=None, name='magnetlogic', config={'min_checktime': 0.01})
+    logic.magnetstage = lambda: magnet
+    logic.odmrlogic = lambda: ODMRLogicStandIn()
+    for connector in ('optimizerlogic', 'counterlogic', 'savelogic', 'scannerlogic',
+                      'traceanalysis', 'gatedcounterlogic', 'sequencegeneratorlogic'):
+        setattr(logic, connector, lambda: None)
+    logic.module_state.activate()
+    logic._checktime = CHECKTIME
+    try:
+        for check in (check_position_reached, check_timeout, check_ignored_move):
+            check(logic)
+            print('{0}: OK'.format(check.__name__))
+        check_adaptive_alignment(logic, app)
+        print('check_adaptive_alignment: OK')
+    finally:
+        logic.module_state.deactivate()
+        magnet.module_state.deactivate()
+
+
+if __name__ == '__main__':
+    main()
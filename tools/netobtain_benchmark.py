@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Loopback benchmark of the transfer of numpy arrays from a remote module.
+
+An rpyc server providing the bulk array transfer (core.util.network.BulkArrayService) is started
+on localhost. Arrays of different sizes are then obtained by the client
+  * with rpyc.utils.classic.obtain, i.e. pickled through the rpyc channel (previous netobtain)
+  * with netobtain, i.e. as raw buffer over the bulk channel
+  * with netobtain and zlib compression
+  * with netobtain through the rpyc channel (used for SSL connections)
+and the transfer rates are printed. Run it from the qudi main directory:
+
+    python tools/netobtain_benchmark.py [repetitions]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rpyc
+import rpyc.utils.classic
+from rpyc.utils.server import ThreadedServer
+
+from core.util import network
+
+rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+
+# number of elements of the transferred arrays (float64 count traces)
+ARRAY_SIZES = [1000, 100000, 1000000, 10000000]
+
+
+class DataService(network.BulkArrayService):
+    """ Stand-in for a shared module returning count traces, like get_data_trace. """
+
+    _traces = dict()
+
+    def exposed_get_data_trace(self, size):
+        # generate each trace only once, so that only the transfer is timed
+        if size not in self._traces:
+            rng = np.random.default_rng(size)
+            self._traces[size] = rng.poisson(5, size).astype(np.float64)
+        return self._traces[size]
+
+
+def obtain_in_band(obj):
+    """ netobtain without the bulk channel, as for SSL connections. """
+    conn = object.__getattribute__(obj, '____conn__')
+    return network.unpack_array(conn.root.pack_array(obj, None))
+
+
+def transfer_rate(conn, size, obtain, repetitions):
+    """ Mean time per transfer and rate in MB/s. """
+    array = None
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        array = obtain(conn.root.get_data_trace(size))
+    duration = (time.perf_counter() - start) / repetitions
+    return array, duration, array.nbytes / duration / 1e6
+
+
+def main(repetitions):
+    server = ThreadedServer(DataService, hostname='127.0.0.1', port=0,
+                            protocol_config={'allow_all_attrs': True, 'allow_pickle': True})
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    while not server.active:
+        time.sleep(0.01)
+    port = server.listener.getsockname()[1]
+    conn = rpyc.connect('127.0.0.1', port,
+                        config={'allow_all_attrs': True, 'allow_pickle': True})
+
+    methods = (('pickle (classic.obtain)', rpyc.utils.classic.obtain, None),
+               ('raw buffer (netobtain)', network.netobtain, None),
+               ('raw buffer + zlib', network.netobtain, 'zlib'),
+               ('raw buffer, in-band', obtain_in_band, None))
+    try:
+        for size in ARRAY_SIZES:
+            print('{0:d} float64 values ({1:.1f} MB):'.format(size, size * 8 / 1e6))
+            reference = None
+            for name, obtain, compression in methods:
+                network.bulk_compression = compression
+                reps = max(1, repetitions * 100000 // max(size, 100000))
+                array, duration, rate = transfer_rate(conn, size, obtain, reps)
+                if reference is None:
+                    reference = array
+                assert np.array_equal(array, reference)
+                print('    {0:24s} {1:9.2f} ms  {2:8.1f} MB/s'.format(name, duration * 1e3, rate))
+    finally:
+        network.bulk_compression = None
+        conn.close()
+        server.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
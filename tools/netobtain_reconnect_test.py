@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Test of the release of bulk channels of netobtain when remote connections are closed.
+
+An rpyc server providing the bulk array transfer (core.util.network.BulkArrayService) is started
+on localhost. The client connects repeatedly, obtains an array over the bulk channel and closes
+the connection again, as a qudi instance reconnecting to a remote module does. The test checks
+  * that the bulk client of a closed connection is dropped with the next netobtain
+  * that its bulk socket is closed, so the sender thread on the server side ends
+  * that the closed connection is garbage collected
+Run it from the qudi main directory:
+
+    python tools/netobtain_reconnect_test.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import gc
+import os
+import sys
+import threading
+import time
+import weakref
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rpyc
+from rpyc.utils.server import ThreadedServer
+
+from core.util import network
+
+rpyc.core.protocol.DEFAULT_CONFIG['allow_pickle'] = True
+
+RECONNECTS = 10
+
+
+class DataService(network.BulkArrayService):
+    """ Stand-in for a shared module returning a count trace. """
+
+    trace = np.arange(100000, dtype=np.float64)
+
+    def exposed_get_data_trace(self):
+        return self.trace
+
+
+def sender_threads():
+    return sum(1 for thread in threading.enumerate() if thread.name == 'bulk-array-sender')
+
+
+def wait_for(condition, timeout=5):
+    """ Wait until the server side threads caught up. """
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.01)
+    return condition()
+
+
+def connect(port):
+    return rpyc.connect('127.0.0.1', port, config={'allow_all_attrs': True, 'allow_pickle': True})
+
+
+def obtain_trace(conn):
+    array = network.netobtain(conn.root.get_data_trace())
+    assert isinstance(array, np.ndarray) and np.array_equal(array, DataService.trace)
+
+
+def check_reconnect(port):
+    closed = list()
+    for _ in range(RECONNECTS):
+        conn = connect(port)
+        obtain_trace(conn)
+        entry = network._bulk_clients[id(conn)]
+        assert entry[1] is not False and entry[1]._socket is not None, \
+            'the array was not transferred over the bulk channel'
+        assert len(network._bulk_clients) == 1, \
+            '{0:d} bulk clients are kept'.format(len(network._bulk_clients))
+        assert wait_for(lambda: sender_threads() == 1), \
+            '{0:d} bulk sender threads are running'.format(sender_threads())
+        closed.append((weakref.ref(conn), entry[1]))
+        conn.close()
+        del conn, entry
+
+    # the next netobtain drops the client of the last closed connection
+    conn = connect(port)
+    obtain_trace(conn)
+    assert list(network._bulk_clients) == [id(conn)]
+    assert all(client._socket is None for _, client in closed), 'a bulk socket was not closed'
+    assert wait_for(lambda: sender_threads() == 1)
+    closed = [conn_ref for conn_ref, _ in closed]
+    gc.collect()
+    alive = sum(1 for conn_ref in closed if conn_ref() is not None)
+    assert alive == 0, '{0:d} closed connections were not garbage collected'.format(alive)
+    conn.close()
+
+
+def main():
+    server = ThreadedServer(DataService, hostname='127.0.0.1', port=0,
+                            protocol_config={'allow_all_attrs': True, 'allow_pickle': True})
+    threading.Thread(target=server.start, daemon=True).start()
+    while not server.active:
+        time.sleep(0.01)
+    try:
+        check_reconnect(server.listener.getsockname()[1])
+        print('check_reconnect: OK')
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of line by line against frame scanning of the NI X series hardware module.
+
+The hardware module runs on the simulated DAQmx library (hardware/daqmx_simulator.py), which
+produces the samples in real time of the scanner clock. An image is scanned once with scan_line
+for every line and once with set_up_frame/scan_frame, for a driver without overhead and for a
+driver overhead of CALL_LATENCY per DAQmx call and COMMIT_LATENCY per start of a reconfigured
+task. The overheads are assumptions of the simulation, pass your own values as arguments to see
+how the result depends on them. Run it from the qudi main directory:
+
+    python tools/ni_frame_scan_benchmark.py [pixels] [clock_frequency] [call_latency] [commit_latency]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from hardware import daqmx_simulator
+from hardware.national_instruments_x_series import NationalInstrumentsXSeries
+
+CALL_LATENCY = 50e-6
+COMMIT_LATENCY = 2e-3
+
+CONFIG = {
+    'photon_sources': ['/Dev1/PFI8'],
+    'clock_channel': '/Dev1/Ctr0',
+    'counter_channels': ['/Dev1/Ctr1'],
+    'scanner_clock_channel': '/Dev1/Ctr2',
+    'pixel_clock_channel': '/Dev1/PFI6',
+    'scanner_ao_channels': ['/Dev1/AO0', '/Dev1/AO1', '/Dev1/AO2'],
+    'scanner_counter_channels': ['/Dev1/Ctr3'],
+    'scanner_voltage_ranges': [[-10, 10], [-10, 10], [-10, 10]],
+    'scanner_position_ranges': [[0, 200e-6], [0, 200e-6], [-100e-6, 100e-6]],
+    'odmr_trigger_channel': '/Dev1/PFI7',
+    'odmr_trigger_line': 'Dev1/port0/line0',
+    'odmr_switch_line': 'Dev1/port0/line1',
+    'gate_in_channel': '/Dev1/PFI9',
+    'simulated': True,
+}
+
+
+def image_path(pixels):
+    """ Positions of a square xy image, lines of pixels samples at z = 0. """
+    x = np.linspace(0, 100e-6, pixels)
+    frame = np.zeros((3, pixels, pixels))
+    frame[0] = x
+    frame[1] = x[:, np.newaxis]
+    return frame
+
+
+def scan_lines(card, frame):
+    image = np.empty((frame.shape[1], frame.shape[2], 1))
+    for i in range(frame.shape[1]):
+        image[i] = card.scan_line(frame[:, i, :], pixel_clock=True)
+    return image
+
+
+def scan_frame(card, frame):
+    card.set_up_frame(frame, pixel_clock=True)
+    image = np.array(card.scan_frame())
+    card.close_frame()
+    return image
+
+
+def timed(func, *args):
+    calls = daqmx_simulator.call_count
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start, daqmx_simulator.call_count - calls
+
+
+def main(pixels, clock_frequency, call_latency, commit_latency):
+    card = NationalInstrumentsXSeries(manager=None, name='nicard', config=CONFIG)
+    card.module_state.activate()
+    card.set_up_scanner_clock(clock_frequency=clock_frequency)
+    card.set_up_scanner()
+    frame = image_path(pixels)
+    acquisition_time = frame.shape[1] * frame.shape[2] / clock_frequency
+    print('{0:d}x{0:d} pixels at {1:g} Hz, {2:.3f} s of acquisition'.format(
+        pixels, clock_frequency, acquisition_time))
+
+    for call, commit in ((0., 0.), (call_latency, commit_latency)):
+        daqmx_simulator.call_latency = call
+        daqmx_simulator.commit_latency = commit
+        line_image, line_time, line_calls = timed(scan_lines, card, frame)
+        frame_image, frame_time, frame_calls = timed(scan_frame, card, frame)
+        assert line_image.shape == frame_image.shape
+        print('Driver overhead {0:g} ms per call, {1:g} ms per commit:'.format(
+            call * 1e3, commit * 1e3))
+        print('    scan_line:  {0:7.3f} s, {1:6d} DAQmx calls'.format(line_time, line_calls))
+        print('    scan_frame: {0:7.3f} s, {1:6d} DAQmx calls'.format(frame_time, frame_calls))
+        print('    mean count rate line / frame: {0:.3g} / {1:.3g} counts/s'.format(
+            line_image.mean(), frame_image.mean()))
+
+    card.close_scanner()
+    card.close_scanner_clock()
+    card.module_state.deactivate()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if len(args) > 0 else 100,
+         float(args[1]) if len(args) > 1 else 1e5,
+         float(args[2]) if len(args) > 2 else CALL_LATENCY,
+         float(args[3]) if len(args) > 3 else COMMIT_LATENCY)
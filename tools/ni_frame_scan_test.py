@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Test of the frame scan of the NI X series hardware module on the simulated DAQmx library.
+
+The photon noise of the simulation is switched off, so the frame scan has to give exactly the
+count rate of the simulated sample at the scanner positions. The test checks
+  * that importing the hardware module does not import the simulator, and that the simulator is
+    only used by the instance configured with 'simulated: True'
+  * the image of scan_frame, of reading the frame in blocks of lines and of the frame set up
+    after line scans
+  * repeated frames reusing the same buffers, and the scanner position after a frame
+  * the errors of set_up_frame and the return to line scanning after close_frame
+Run it from the qudi main directory:
+
+    python tools/ni_frame_scan_test.py
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from hardware import national_instruments_x_series
+from hardware.national_instruments_x_series import NationalInstrumentsXSeries
+
+assert 'hardware.daqmx_simulator' not in sys.modules, 'the simulator is imported with the module'
+
+from tools.ni_frame_scan_benchmark import CONFIG, image_path, scan_lines
+
+CLOCK_FREQUENCY = 1e5
+PIXELS = 20
+
+
+class NoNoise:
+    """ Replaces the random generator of the simulator by the expectation values. """
+
+    @staticmethod
+    def poisson(lam, size=None):
+        return np.rint(lam)
+
+    @staticmethod
+    def normal(loc=0., scale=1., size=None):
+        return np.full(size, loc, dtype=float)
+
+
+def check_backend(card):
+    from hardware import daqmx_simulator
+    assert card._daq is daqmx_simulator
+    assert national_instruments_x_series.daq is not daqmx_simulator, \
+        'the module global DAQmx library was replaced'
+
+
+def expected_image(card, frame):
+    """ Count rate of the sample at the frame positions, in whole counts per pixel. """
+    from hardware import daqmx_simulator
+    volts = card._scanner_position_to_volt(frame.reshape(frame.shape[0], -1))
+    counts = np.rint(daqmx_simulator.count_rate(volts) / CLOCK_FREQUENCY)
+    return (counts * CLOCK_FREQUENCY).reshape(frame.shape[1], frame.shape[2], 1)
+
+
+def check_frame_image(card):
+    frame = image_path(PIXELS)
+    # line scans before must not disturb the frame
+    line_image = scan_lines(card, frame)
+    assert line_image.shape == (PIXELS, PIXELS, 1)
+    assert card.set_up_frame(frame, pixel_clock=True) == 0
+    frame_image = np.array(card.scan_frame())
+    expected = expected_image(card, frame)
+    assert frame_image.shape == expected.shape, frame_image.shape
+    assert np.allclose(frame_image, expected), \
+        'largest difference {0:g} counts/s'.format(np.abs(frame_image - expected).max())
+    assert np.allclose(card.get_scanner_position()[:3], frame[:, -1, -1])
+
+    # the same frame in blocks of lines
+    assert card.start_frame() == 0
+    blocks = [np.array(card.read_frame_lines(lines)) for lines in (1, 7, 12)]
+    assert [block.shape[0] for block in blocks] == [1, 7, 12]
+    assert np.allclose(np.concatenate(blocks), frame_image)
+    assert card.close_frame() == 0
+
+
+def check_repeated_frames(card):
+    frame = image_path(PIXELS)
+    assert card.set_up_frame(frame) == 0
+    first = card.scan_frame()
+    first_copy = np.array(first)
+    second = card.scan_frame()
+    assert np.shares_memory(first, second), 'the frame buffers were not reused'
+    assert np.allclose(second, first_copy)
+    assert card.close_frame() == 0
+
+
+def check_errors(card):
+    assert card.set_up_frame(np.zeros((3, PIXELS))) < 0
+    assert card.set_up_frame(image_path(PIXELS)) == 0
+    assert card.set_up_frame(image_path(PIXELS)) < 0, 'a second frame was accepted'
+    assert card.close_frame() == 0
+    assert card.close_frame() == 0
+    # back to line scanning
+    line = image_path(PIXELS)[:, 0, :]
+    assert np.array(card.scan_line(line)).shape == (PIXELS, 1)
+
+
+def main():
+    from hardware import daqmx_simulator
+    daqmx_simulator.rng = NoNoise()
+
+    card = NationalInstrumentsXSeries(manager=None, name='nicard', config=CONFIG)
+    card.module_state.activate()
+    try:
+        assert card.set_up_scanner_clock(clock_frequency=CLOCK_FREQUENCY) == 0
+        assert card.set_up_scanner() == 0
+        for check in (check_backend, check_frame_image, check_repeated_frames,
+                      check_errors):
+            check(card)
+            print('{0}: OK'.format(check.__name__))
+    finally:
+        card.close_frame()
+        card.close_scanner()
+        card.close_scanner_clock()
+        card.module_state.deactivate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the single shot trace analysis of the trace analysis logic.
+
+A synthetic single shot readout trace (a telegraph signal between a dark and a bright state with
+Poissonian photon counts) is analysed with the vectorized implementation of
+  * analyze_flip_prob2
+  * analyze_flip_prob3 / the flip counting of analyze_flip_prob4
+  * the dwell time extraction of analyze_lifetime
+and compared to the previous python loop implementations, which are copied below. The loop
+implementations are run on a shorter trace, since the flip counting of analyze_flip_prob3 scales
+quadratically with the trace length.
+Run it from the qudi main directory:
+
+    python tools/trace_analysis_benchmark.py [number_of_readouts]
+
+Qudi is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Qudi. If not, see <http://www.gnu.org/licenses/>.
+
+Copyright (c) the Qudi Developers. See the COPYRIGHT.txt file at the
+top-level directory of this distribution and at <https://github.com/Ulm-IQO/qudi/>
+"""
+
+import logging
+import os
+import sys
+import time
+import types
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from logic.trace_analysis_logic import TraceAnalysisLogic, dwell_times
+
+FLIP_PROBABILITY = 0.02
+DARK_COUNTS = 1.
+BRIGHT_COUNTS = 25.
+THRESHOLD = 8.5
+INIT_THRESHOLD = [5, 12]
+ANA_THRESHOLD = [8, 9]
+LEGACY_LENGTH = 20000
+
+
+def single_shot_trace(length, rng):
+    """ Telegraph signal with flip probability FLIP_PROBABILITY per readout. """
+    flips = rng.random(length) < FLIP_PROBABILITY
+    state = np.cumsum(flips) % 2 == 1
+    return rng.poisson(np.where(state, BRIGHT_COUNTS, DARK_COUNTS)).astype(float)
+
+
+def legacy_flip_prob2(trace, threshold):
+    no_flip = 0.0
+    for ii in range(len(trace) - 1):
+        if trace[ii] > threshold and trace[ii + 1] > threshold:
+            no_flip = no_flip + 1
+        elif trace[ii] < threshold and trace[ii + 1] < threshold:
+            no_flip = no_flip + 1
+    return 1.0 - (no_flip / len(trace))
+
+
+def legacy_flip_prob3(trace, init_threshold, ana_threshold):
+    no_flip = 0.0
+    flip = 0.0
+    init_high = np.where(trace[:-1] > init_threshold[1])[0]
+    init_low = np.where(trace[:-1] < init_threshold[0])[0]
+    ana_high = np.where(trace > ana_threshold[1])[0]
+    ana_low = np.where(trace < ana_threshold[0])[0]
+    for index in init_high:
+        if index + 1 in ana_high:
+            no_flip = no_flip + 1
+        elif index + 1 in ana_low:
+            flip = flip + 1
+    for index in init_low:
+        if index + 1 in ana_high:
+            flip = flip + 1
+        elif index + 1 in ana_low:
+            no_flip = no_flip + 1
+    return flip / (flip + no_flip)
+
+
+def legacy_dwell_times(trace, threshold, local_dt):
+    raw_digital_trace = []
+    for data_point in trace:
+        if data_point >= threshold:
+            raw_digital_trace.append(1)
+        else:
+            raw_digital_trace.append(0)
+    occurances = []
+    index = 0
+    index2 = 0
+    while index < len(raw_digital_trace):
+        occurances.append(0)
+        while raw_digital_trace[index] == 1:
+            occurances[index2] += 1
+            if index == (len(raw_digital_trace) - 1):
+                return np.array(occurances) * local_dt
+            else:
+                index += 1
+        if raw_digital_trace[index - 1] == 1:
+            index2 += 1
+            occurances.append(0)
+        while raw_digital_trace[index] == 0:
+            occurances[index2] -= 1
+            if index == (len(raw_digital_trace) - 1):
+                return np.array(occurances) * local_dt
+            else:
+                index += 1
+        index2 += 1
+
+
+def analysis_logic():
+    """ Minimal stand-in for the module instance, the analysis methods only need a logger. """
+    logic = types.SimpleNamespace(log=logging.getLogger('trace_analysis_benchmark'))
+    logic._count_flips = lambda *args: TraceAnalysisLogic._count_flips(logic, *args)
+    return logic
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main(length):
+    rng = np.random.default_rng(1)
+    logic = analysis_logic()
+
+    # check the vectorized against the loop implementations on a short trace
+    short_trace = single_shot_trace(LEGACY_LENGTH, rng)
+    legacy2, t_legacy2 = timed(legacy_flip_prob2, short_trace, THRESHOLD)
+    new2, _ = timed(TraceAnalysisLogic.analyze_flip_prob2, logic, short_trace, THRESHOLD)
+    legacy3, t_legacy3 = timed(legacy_flip_prob3, short_trace, INIT_THRESHOLD, ANA_THRESHOLD)
+    new3, _ = timed(TraceAnalysisLogic.analyze_flip_prob3, logic, short_trace, INIT_THRESHOLD,
+                    ANA_THRESHOLD)
+    legacy_dwell, t_legacy_dwell = timed(legacy_dwell_times, short_trace, THRESHOLD, 1e-3)
+    high, low = dwell_times(short_trace >= THRESHOLD, 1e-3)
+    assert np.isclose(legacy2, new2[0]), (legacy2, new2)
+    assert np.isclose(legacy3, new3[0]), (legacy3, new3)
+    assert np.allclose(np.sort(legacy_dwell[legacy_dwell > 0]), np.sort(high))
+    assert np.allclose(np.sort(-legacy_dwell[legacy_dwell < 0]), np.sort(low))
+
+    print('Loop implementations, {0:d} readouts:'.format(LEGACY_LENGTH))
+    print('    analyze_flip_prob2:  {0:8.3f} s'.format(t_legacy2))
+    print('    analyze_flip_prob3:  {0:8.3f} s'.format(t_legacy3))
+    print('    lifetime dwell times: {0:7.3f} s'.format(t_legacy_dwell))
+
+    trace = single_shot_trace(length, rng)
+    result2, t2 = timed(TraceAnalysisLogic.analyze_flip_prob2, logic, trace, THRESHOLD)
+    result3, t3 = timed(TraceAnalysisLogic.analyze_flip_prob3, logic, trace, INIT_THRESHOLD,
+                        ANA_THRESHOLD)
+    (high, low), t_dwell = timed(dwell_times, trace >= THRESHOLD, 1e-3)
+    print('Vectorized implementations, {0:d} readouts:'.format(length))
+    print('    analyze_flip_prob2:  {0:8.3f} s'.format(t2))
+    print('    analyze_flip_prob3:  {0:8.3f} s'.format(t3))
+    print('    lifetime dwell times: {0:7.3f} s'.format(t_dwell))
+    print('Flip probability (threshold / init and analysis thresholds): {0:.4f} / {1:.4f}, '
+          'simulated {2:.4f}'.format(result2[0], result3[0], FLIP_PROBABILITY))
+    print('Mean dwell time bright / dark: {0:.1f} ms / {1:.1f} ms, simulated {2:.1f} ms'
+          ''.format(high.mean() * 1e3, low.mean() * 1e3, 1 / FLIP_PROBABILITY))
+
+
+if __name__ == '__main__':
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 10000000)